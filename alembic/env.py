@@ -16,6 +16,13 @@ from app.db.base import Base
 # (évite les import circulaires avec Base)
 from app.db.models import vehicle  # noqa: F401
 from app.db.models import vehicle_status  # noqa: F401
+from app.db.models import job  # noqa: F401
+from app.db.models import vehicle_analytics  # noqa: F401
+from app.db.models import segments  # noqa: F401
+from app.db.models import vehicle_position  # noqa: F401
+from app.db.models import vehicle_change  # noqa: F401
+from app.db.models import alert  # noqa: F401
+from app.db.models import webhook  # noqa: F401
 
 # ---------------------------------------------------------
 # Configuration Alembic
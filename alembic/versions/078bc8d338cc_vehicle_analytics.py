@@ -0,0 +1,52 @@
+"""vehicle analytics
+
+Revision ID: 078bc8d338cc
+Revises: 94d33eef8726
+Create Date: 2026-10-19 13:41:27.902000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '078bc8d338cc'
+down_revision: Union[str, Sequence[str], None] = '94d33eef8726'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('vehicle_analytics',
+    sa.Column('vehicle_id', sa.Integer(), nullable=False),
+    sa.Column('checkpoint_status_id', sa.Integer(), nullable=False),
+    sa.Column('samples', sa.Integer(), nullable=False),
+    sa.Column('last_timestamp', sa.DateTime(), nullable=True),
+    sa.Column('last_battery_level', sa.Float(), nullable=True),
+    sa.Column('last_odometer_km', sa.Float(), nullable=True),
+    sa.Column('total_distance_km', sa.Float(), nullable=False),
+    sa.Column('driving_battery_drop_pct', sa.Float(), nullable=False),
+    sa.Column('idle_battery_drop_pct', sa.Float(), nullable=False),
+    sa.Column('idle_seconds', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['vehicle_id'], ['vehicles.id'], ),
+    sa.PrimaryKeyConstraint('vehicle_id')
+    )
+    op.create_table('vehicle_daily_distance',
+    sa.Column('vehicle_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('distance_km', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['vehicle_id'], ['vehicles.id'], ),
+    sa.PrimaryKeyConstraint('vehicle_id', 'day')
+    )
+    op.create_index(op.f('ix_vehicle_status_vehicle_id'), 'vehicle_status', ['vehicle_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_vehicle_status_vehicle_id'), table_name='vehicle_status')
+    op.drop_table('vehicle_daily_distance')
+    op.drop_table('vehicle_analytics')
@@ -0,0 +1,58 @@
+"""cascade vehicle deletes
+
+Revision ID: 08bdebb29057
+Revises: fae012bead8e
+Create Date: 2026-10-19 00:55:34.381143
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '08bdebb29057'
+down_revision: Union[str, Sequence[str], None] = 'fae012bead8e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Tables dont la clé étrangère vers vehicles passe en ON DELETE CASCADE
+TABLES = (
+    "vehicle_status",
+    "vehicle_analytics",
+    "vehicle_daily_distance",
+    "charging_sessions",
+    "trips",
+    "segment_detector_state",
+)
+
+# SQLite : les clés étrangères sont anonymes, on leur donne un nom le temps
+# de la reconstruction de la table (mode batch).
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+
+def _set_vehicle_fk(table: str, ondelete: Union[str, None]) -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        name = f"fk_{table}_vehicle_id_vehicles"
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(name, type_="foreignkey")
+            batch_op.create_foreign_key(name, "vehicles", ["vehicle_id"], ["id"], ondelete=ondelete)
+    else:
+        # Nom par défaut de Postgres
+        name = f"{table}_vehicle_id_fkey"
+        op.drop_constraint(name, table, type_="foreignkey")
+        op.create_foreign_key(name, table, "vehicles", ["vehicle_id"], ["id"], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        _set_vehicle_fk(table, "CASCADE")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        _set_vehicle_fk(table, None)
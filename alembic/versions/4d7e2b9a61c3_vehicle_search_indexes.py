@@ -0,0 +1,29 @@
+"""vehicle search indexes
+
+Revision ID: 4d7e2b9a61c3
+Revises: cab19d444435
+Create Date: 2026-10-19 10:05:12.407000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d7e2b9a61c3'
+down_revision: Union[str, Sequence[str], None] = 'cab19d444435'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Recherche par préfixe sur le nom (le VIN a déjà un index unique)
+    op.create_index(op.f('ix_vehicles_name'), 'vehicles', ['name'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_vehicles_name'), table_name='vehicles')
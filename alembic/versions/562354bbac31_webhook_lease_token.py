@@ -0,0 +1,28 @@
+"""webhook lease token
+
+Revision ID: 562354bbac31
+Revises: 5b93868acbf1
+Create Date: 2026-10-19 02:35:22.285761
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '562354bbac31'
+down_revision: Union[str, Sequence[str], None] = '5b93868acbf1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('webhook_deliveries', sa.Column('lease_token', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('webhook_deliveries', 'lease_token')
@@ -0,0 +1,43 @@
+"""status insert time
+
+Revision ID: 5b93868acbf1
+Revises: d65205d0e5a5
+Create Date: 2026-10-19 02:21:56.640418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b93868acbf1'
+down_revision: Union[str, Sequence[str], None] = 'd65205d0e5a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Heure d'insertion côté base : PostgreSQL remplit les lignes existantes
+    # avec l'heure de la migration ; SQLite refuse un défaut non constant
+    # dans ADD COLUMN, la table est reconstruite (AUTOINCREMENT conservé).
+    if op.get_bind().dialect.name == "sqlite":
+        with op.batch_alter_table(
+            'vehicle_status', recreate='always', table_kwargs={'sqlite_autoincrement': True}
+        ) as batch_op:
+            batch_op.add_column(sa.Column('created_at', sa.DateTime(), server_default=sa.text("(strftime('%Y-%m-%d %H:%M:%f', 'now'))"), nullable=True))
+    else:
+        op.add_column('vehicle_status', sa.Column('created_at', sa.DateTime(), server_default=sa.text("TIMEZONE('utc', CURRENT_TIMESTAMP)"), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "sqlite":
+        with op.batch_alter_table(
+            'vehicle_status', recreate='always', table_kwargs={'sqlite_autoincrement': True}
+        ) as batch_op:
+            batch_op.drop_column('created_at')
+    else:
+        op.drop_column('vehicle_status', 'created_at')
@@ -0,0 +1,53 @@
+"""vehicle changes
+
+Revision ID: 667cc8994447
+Revises: 758632d6a027
+Create Date: 2026-10-19 01:23:15.352877
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '667cc8994447'
+down_revision: Union[str, Sequence[str], None] = '758632d6a027'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _status_autoincrement(enabled: bool) -> None:
+    # SQLite réutilise le plus grand rowid supprimé sans AUTOINCREMENT :
+    # les ids de statuts servent de curseur au flux de changements, la
+    # table est reconstruite (Postgres : séquence, rien à faire).
+    if op.get_bind().dialect.name == "sqlite":
+        with op.batch_alter_table(
+            'vehicle_status', recreate='always', table_kwargs={'sqlite_autoincrement': enabled}
+        ):
+            pass
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('vehicle_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('vehicle_id', sa.Integer(), nullable=False),
+    sa.Column('op', sa.String(length=16), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sqlite_autoincrement=True
+    )
+    # Les véhicules existants ouvrent le journal
+    op.execute(
+        "INSERT INTO vehicle_changes (vehicle_id, op, changed_at) "
+        "SELECT id, 'created', CURRENT_TIMESTAMP FROM vehicles ORDER BY id"
+    )
+    _status_autoincrement(True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _status_autoincrement(False)
+    op.drop_table('vehicle_changes')
@@ -0,0 +1,43 @@
+"""vehicle positions
+
+Revision ID: 758632d6a027
+Revises: f843e761d57a
+Create Date: 2026-10-19 01:12:32.478934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '758632d6a027'
+down_revision: Union[str, Sequence[str], None] = 'f843e761d57a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('vehicle_positions',
+    sa.Column('vehicle_id', sa.Integer(), nullable=False),
+    sa.Column('status_id', sa.BigInteger(), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.Column('geohash', sa.String(length=12), nullable=False),
+    sa.ForeignKeyConstraint(['vehicle_id'], ['vehicles.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('vehicle_id')
+    )
+    op.create_index(op.f('ix_vehicle_positions_geohash'), 'vehicle_positions', ['geohash'], unique=False)
+    op.add_column('vehicle_status', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('vehicle_status', sa.Column('longitude', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('vehicle_status', 'longitude')
+    op.drop_column('vehicle_status', 'latitude')
+    op.drop_index(op.f('ix_vehicle_positions_geohash'), table_name='vehicle_positions')
+    op.drop_table('vehicle_positions')
@@ -0,0 +1,30 @@
+"""vehicle name search index
+
+Revision ID: c256284ce1f4
+Revises: 562354bbac31
+Create Date: 2026-10-19 02:51:16.148062
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c256284ce1f4'
+down_revision: Union[str, Sequence[str], None] = '562354bbac31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index(op.f('ix_vehicles_name'), table_name='vehicles')
+    op.create_index('ix_vehicles_name_id', 'vehicles', ['name', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_vehicles_name_id', table_name='vehicles')
+    op.create_index(op.f('ix_vehicles_name'), 'vehicles', ['name'], unique=False)
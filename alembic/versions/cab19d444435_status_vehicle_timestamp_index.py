@@ -0,0 +1,33 @@
+"""status (vehicle_id, timestamp) index
+
+Revision ID: cab19d444435
+Revises: c9a8516ab1ca
+Create Date: 2026-10-19 09:12:40.118000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cab19d444435'
+down_revision: Union[str, Sequence[str], None] = 'c9a8516ab1ca'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_vehicle_status_vehicle_id_timestamp',
+        'vehicle_status',
+        ['vehicle_id', 'timestamp'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_vehicle_status_vehicle_id_timestamp', table_name='vehicle_status')
@@ -0,0 +1,51 @@
+"""insert time from the statement clock
+
+Revision ID: f2ff203c00ed
+Revises: c256284ce1f4
+Create Date: 2026-10-19 02:55:33.120349
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2ff203c00ed'
+down_revision: Union[str, Sequence[str], None] = 'c256284ce1f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_SQLITE_NOW = "(strftime('%Y-%m-%d %H:%M:%f', 'now'))"
+_POSTGRES_NOW = "TIMEZONE('utc', clock_timestamp())"
+_POSTGRES_TRANSACTION_START = "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Heure d'insertion fixée par la base pour le journal des véhicules ;
+    # sur PostgreSQL, heure de l'instruction plutôt que du début de la
+    # transaction. SQLite refuse de changer un défaut : table reconstruite
+    # (AUTOINCREMENT conservé).
+    if op.get_bind().dialect.name == "sqlite":
+        with op.batch_alter_table(
+            'vehicle_changes', recreate='always', table_kwargs={'sqlite_autoincrement': True}
+        ) as batch_op:
+            batch_op.alter_column('changed_at', server_default=sa.text(_SQLITE_NOW))
+    else:
+        op.alter_column('vehicle_changes', 'changed_at', server_default=sa.text(_POSTGRES_NOW))
+        op.alter_column('vehicle_status', 'created_at', server_default=sa.text(_POSTGRES_NOW))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "sqlite":
+        with op.batch_alter_table(
+            'vehicle_changes', recreate='always', table_kwargs={'sqlite_autoincrement': True}
+        ) as batch_op:
+            batch_op.alter_column('changed_at', server_default=None)
+    else:
+        op.alter_column('vehicle_status', 'created_at', server_default=sa.text(_POSTGRES_TRANSACTION_START))
+        op.alter_column('vehicle_changes', 'changed_at', server_default=None)
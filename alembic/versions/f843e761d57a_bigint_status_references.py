@@ -0,0 +1,47 @@
+"""bigint status references
+
+Revision ID: f843e761d57a
+Revises: 08bdebb29057
+Create Date: 2026-10-19 01:01:16.504657
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f843e761d57a'
+down_revision: Union[str, Sequence[str], None] = '08bdebb29057'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Colonnes qui référencent un id de statut : 64 bits, les shards
+# de télémétrie allouent leurs ids par plages (STATUS_SHARD_ID_STRIDE).
+COLUMNS = {
+    'vehicle_analytics': [('checkpoint_status_id', False)],
+    'segment_detector_state': [('checkpoint_status_id', False), ('last_status_id', True)],
+    'trips': [('start_status_id', False), ('end_status_id', False)],
+    'charging_sessions': [('start_status_id', False), ('end_status_id', False)],
+}
+
+
+def _alter(from_type, to_type) -> None:
+    # Mode batch : reconstruction de table sur SQLite, ALTER direct ailleurs
+    for table, columns in COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for name, nullable in columns:
+                batch_op.alter_column(name, existing_type=from_type, type_=to_type,
+                                      existing_nullable=nullable)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _alter(sa.INTEGER(), sa.BigInteger())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _alter(sa.BigInteger(), sa.INTEGER())
@@ -0,0 +1,125 @@
+# app/api/v1/negotiation.py
+"""
+Négociation de contenu pour les endpoints de télémétrie.
+
+Le format est choisi par `?format=json|columnar|binary` s'il est fourni,
+sinon d'après l'en-tête `Accept` (406 si aucun format pris en charge n'y
+est acceptable). Toutes les réponses négociées portent `Vary: Accept`
+pour les caches intermédiaires. La compression gzip est gérée
+globalement par `GZipMiddleware` (voir app/main.py).
+"""
+import json
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import Response
+
+from app.services.telemetry_formats import (
+    FORMAT_ALIASES,
+    MEDIA_BINARY,
+    MEDIA_COLUMNAR,
+    MEDIA_JSON,
+    encode_binary,
+    encode_columnar,
+)
+
+# Ordre de préférence à qualité égale
+SUPPORTED_MEDIA_TYPES = (MEDIA_JSON, MEDIA_COLUMNAR, MEDIA_BINARY)
+
+
+def _parse_accept(header: str) -> List[Tuple[str, float]]:
+    ranges = []
+    for part in header.split(","):
+        items = [p.strip() for p in part.split(";")]
+        if not items[0]:
+            continue
+        q = 1.0
+        for param in items[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        ranges.append((items[0].lower(), q))
+    return ranges
+
+
+def _quality(media_type: str, ranges: List[Tuple[str, float]]) -> float:
+    """
+    Qualité d'un type de média : celle de la plage la plus précise qui le
+    couvre (`type/sous-type`, puis `type/*`, puis `*/*`), 0 sinon.
+    """
+    main_type = media_type.split("/")[0]
+    specificity, quality = -1, 0.0
+    for media_range, q in ranges:
+        if media_range == media_type:
+            rank = 2
+        elif media_range == f"{main_type}/*":
+            rank = 1
+        elif media_range == "*/*":
+            rank = 0
+        else:
+            continue
+        if rank > specificity:
+            specificity, quality = rank, q
+    return quality
+
+
+def negotiate_media_type(request: Request, format: Optional[str] = None) -> str:
+    """
+    Retourne le type de média de la réponse : JSON sans `Accept`, sinon
+    le type pris en charge de plus haute qualité (JSON à égalité).
+    """
+    if format:
+        media_type = FORMAT_ALIASES.get(format.lower())
+        if media_type is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unsupported format '{format}'",
+            )
+        return media_type
+
+    header = request.headers.get("accept", "").strip()
+    if not header:
+        return MEDIA_JSON
+    ranges = _parse_accept(header)
+    best, best_q = None, 0.0
+    for media_type in SUPPORTED_MEDIA_TYPES:
+        q = _quality(media_type, ranges)
+        if q > best_q:
+            best, best_q = media_type, q
+    if best is None:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"Acceptable media types: {', '.join(SUPPORTED_MEDIA_TYPES)}",
+        )
+    return best
+
+
+def vary_on_accept(response: Response) -> Response:
+    """
+    Marque une réponse négociée (le corps dépend de l'en-tête `Accept`).
+    """
+    response.headers["Vary"] = "Accept"
+    return response
+
+
+def telemetry_response(
+    rows: Sequence[Any],
+    fields: Iterable[str],
+    media_type: str,
+    vehicle_id: Optional[int] = None,
+) -> Response:
+    """
+    Construit la réponse colonnaire ou binaire pour des lignes de télémétrie.
+    """
+    if media_type == MEDIA_BINARY:
+        content = encode_binary(rows, fields, vehicle_id=vehicle_id)
+    elif media_type == MEDIA_COLUMNAR:
+        content = json.dumps(
+            encode_columnar(rows, fields, vehicle_id=vehicle_id),
+            separators=(",", ":"),
+        )
+    else:
+        raise ValueError(f"Not a compact media type: {media_type}")
+    return vary_on_accept(Response(content=content, media_type=media_type))
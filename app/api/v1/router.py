@@ -1,8 +1,14 @@
 from fastapi import APIRouter
 
 from app.api.v1 import routes_vehicles
+from app.api.v1.routes_alerts import router as alerts_router
+from app.api.v1.routes_changes import router as changes_router
+from app.api.v1.routes_fleet import router as fleet_router
 from app.api.v1.routes_health import router as health_router
+from app.api.v1.routes_ingest import router as ingest_router
+from app.api.v1.routes_jobs import router as jobs_router
 from app.api.v1.routes_vehicles import router as vehicles_router
+from app.api.v1.routes_webhooks import router as webhooks_router
 
 # Routeur global pour /api/v1
 api_router = APIRouter()
@@ -14,3 +20,9 @@ api_router = APIRouter()
 # - Les préfixes sont donc centralisés ici.
 api_router.include_router(health_router,            tags=["health"],    prefix="/health")
 api_router.include_router(routes_vehicles.router,   tags=["vehicles"],  prefix="")
+api_router.include_router(ingest_router,            tags=["ingest"],    prefix="")
+api_router.include_router(jobs_router,              tags=["jobs"],      prefix="")
+api_router.include_router(fleet_router,             tags=["fleet"],     prefix="")
+api_router.include_router(changes_router,           tags=["changes"],   prefix="")
+api_router.include_router(alerts_router,            tags=["alerts"],    prefix="")
+api_router.include_router(webhooks_router,          tags=["webhooks"],  prefix="")
@@ -0,0 +1,125 @@
+# app/api/v1/routes_alerts.py
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db
+from app.schemas.alerts import AlertRead, AlertRuleCreate, AlertRuleRead
+from app.services import alerts as alert_service
+from app.services import vehicles as vehicle_service
+
+router = APIRouter()
+
+
+def _check_vehicle(db: Session, data: AlertRuleCreate) -> None:
+    if data.vehicle_id is not None and not vehicle_service.get_vehicle(db, vehicle_id=data.vehicle_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehicle not found",
+        )
+
+
+def _get_rule_or_404(db: Session, rule_id: int):
+    rule = alert_service.get_rule(db, rule_id=rule_id)
+    if not rule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Alert rule not found",
+        )
+    return rule
+
+
+@router.post(
+    "/alert-rules",
+    response_model=AlertRuleRead,
+    status_code=status.HTTP_201_CREATED,
+    summary="Créer une règle d'alerte",
+)
+def create_alert_rule_endpoint(
+    payload: AlertRuleCreate,
+    db: Session = Depends(get_db),
+):
+    """
+    Crée une règle (conditions en ET) pour un véhicule ou toute la flotte.
+    Elle est évaluée sur chaque statut ingéré à partir de sa création.
+    """
+    _check_vehicle(db, payload)
+    return alert_service.create_rule(db, data=payload)
+
+
+@router.get(
+    "/alert-rules",
+    response_model=List[AlertRuleRead],
+    summary="Lister les règles d'alerte",
+)
+def list_alert_rules_endpoint(
+    vehicle_id: Optional[int] = Query(None, description="Règles propres à ce véhicule"),
+    db: Session = Depends(get_db),
+):
+    return alert_service.list_rules(db, vehicle_id=vehicle_id)
+
+
+@router.get(
+    "/alert-rules/{rule_id}",
+    response_model=AlertRuleRead,
+    summary="Obtenir une règle d'alerte",
+)
+def get_alert_rule_endpoint(
+    rule_id: int,
+    db: Session = Depends(get_db),
+):
+    return _get_rule_or_404(db, rule_id)
+
+
+@router.put(
+    "/alert-rules/{rule_id}",
+    response_model=AlertRuleRead,
+    summary="Remplacer une règle d'alerte",
+)
+def update_alert_rule_endpoint(
+    rule_id: int,
+    payload: AlertRuleCreate,
+    db: Session = Depends(get_db),
+):
+    """
+    Remplace la définition d'une règle ; ses alertes ouvertes sont closes.
+    """
+    rule = _get_rule_or_404(db, rule_id)
+    _check_vehicle(db, payload)
+    return alert_service.update_rule(db, rule=rule, data=payload)
+
+
+@router.delete(
+    "/alert-rules/{rule_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Supprimer une règle d'alerte",
+)
+def delete_alert_rule_endpoint(
+    rule_id: int,
+    db: Session = Depends(get_db),
+):
+    """
+    Supprime une règle et l'historique de ses alertes.
+    """
+    rule = _get_rule_or_404(db, rule_id)
+    alert_service.delete_rule(db, rule=rule)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get(
+    "/alerts",
+    response_model=List[AlertRead],
+    summary="Lister les alertes déclenchées",
+)
+def list_alerts_endpoint(
+    vehicle_id: Optional[int] = Query(None),
+    rule_id: Optional[int] = Query(None),
+    open: bool = Query(False, description="Seulement les alertes non résolues"),
+    limit: Optional[int] = Query(None, ge=1, description="Nombre maximum d'alertes (plafonné)"),
+    db: Session = Depends(get_db),
+):
+    """
+    Alertes, de la plus récente à la plus ancienne.
+    """
+    return alert_service.list_alerts(db, vehicle_id=vehicle_id, rule_id=rule_id, open_only=open, limit=limit)
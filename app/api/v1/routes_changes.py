@@ -0,0 +1,33 @@
+# app/api/v1/routes_changes.py
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db
+from app.schemas.changes import ChangeFeedRead
+from app.services import changes as change_service
+
+router = APIRouter()
+
+
+@router.get(
+    "/changes",
+    response_model=ChangeFeedRead,
+    summary="Flux incrémental des changements",
+)
+def read_changes_endpoint(
+    cursor: Optional[str] = Query(None, description="Curseur opaque rendu par l'appel précédent (absent = début)"),
+    limit: Optional[int] = Query(None, ge=1, description="Changements maximum par journal (plafonné)"),
+    db: Session = Depends(get_db),
+):
+    """
+    Retourne les statuts insérés et les changements de véhicules (créations,
+    mises à jour, suppressions) depuis `cursor`, avec le curseur à repasser
+    à l'appel suivant.
+    `has_more` indique qu'une autre page est disponible immédiatement.
+    """
+    try:
+        return change_service.read_changes(db, cursor=cursor, limit=limit)
+    except change_service.InvalidCursorError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
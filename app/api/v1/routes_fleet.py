@@ -0,0 +1,45 @@
+# app/api/v1/routes_fleet.py
+from typing import List
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db
+from app.schemas.fleet import FleetSummary
+from app.schemas.vehicle import VehicleStatusRead
+from app.services import fleet_summary as fleet_summary_service
+from app.services import vehicles as vehicle_service
+
+router = APIRouter()
+
+
+@router.get(
+    "/fleet/status/latest",
+    response_model=List[VehicleStatusRead],
+    summary="Dernier statut de chaque véhicule",
+)
+def list_latest_statuses_endpoint(
+    db: Session = Depends(get_db),
+):
+    """
+    Retourne le dernier statut connu de chaque véhicule (trié par vehicle_id).
+    Avec le sharding de la télémétrie, les shards sont interrogés en parallèle.
+    """
+    return vehicle_service.list_latest_statuses(db)
+
+
+@router.get(
+    "/fleet/summary",
+    response_model=FleetSummary,
+    summary="Totaux de la flotte",
+)
+def get_fleet_summary_endpoint(
+    db: Session = Depends(get_db),
+):
+    """
+    Véhicules (actifs, verrouillés, vus dans la dernière heure) et
+    histogramme des niveaux de batterie, d'après le dernier statut de
+    chaque véhicule. Servi depuis des compteurs en mémoire mis à jour à
+    chaque écriture et réconciliés périodiquement avec la DB.
+    """
+    return fleet_summary_service.get_fleet_summary(db)
@@ -1,6 +1,11 @@
 # app/api/v1/routes_health.py
+import anyio.to_thread
 from fastapi import APIRouter
 
+from app.core.admission import admission_controller
+from app.db.session import engine
+from app.services.hot_store import hot_store
+
 router = APIRouter()
 
 
@@ -11,3 +16,36 @@ def health_check():
     Séparé dans un router dédié pour illustrer l'architecture modulaire.
     """
     return {"status": "ok"}
+
+
+@router.get("/admission", tags=["health"])
+async def admission_gauges():
+    """
+    Jauges de saturation (contrôle d'admission, pool de threads, pool DB),
+    utiles pour l'autoscaling.
+    """
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    pool = engine.pool
+    return {
+        **admission_controller.gauges(),
+        "threadpool": {
+            "size": limiter.total_tokens,
+            "busy": limiter.borrowed_tokens,
+        },
+        "db_pool": {
+            "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+            "size": pool.size() if hasattr(pool, "size") else None,
+            "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+        },
+    }
+
+
+@router.get("/hot-store", tags=["health"])
+def hot_store_metrics():
+    """
+    Taux de succès et occupation mémoire du stockage chaud
+    des statuts récents (propre à ce worker).
+    """
+    if hot_store is None:
+        return {"enabled": False}
+    return hot_store.stats()
@@ -0,0 +1,69 @@
+# app/api/v1/routes_ingest.py
+from fastapi import APIRouter, Body, Depends, HTTPException, WebSocket, status
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import get_db
+from app.schemas.vehicle import StatusBatchResult
+from app.services import ingest_hooks
+from app.services import telemetry_formats
+from app.services import vehicles as vehicle_service
+from app.services.status_stream import StatusStream
+
+router = APIRouter()
+
+
+@router.post(
+    "/statuses:binary",
+    response_model=StatusBatchResult,
+    status_code=status.HTTP_201_CREATED,
+    summary="Ingérer un lot binaire de statuts",
+)
+def ingest_status_batch_endpoint(
+    payload: bytes = Body(..., media_type=telemetry_formats.MEDIA_BINARY_BATCH),
+    db: Session = Depends(get_db),
+):
+    """
+    Insère un lot de statuts d'un véhicule au format binaire à taille fixe
+    (voir `telemetry_formats.encode_status_batch`), sans JSON ni modèle
+    pydantic par statut : décodage en bloc puis INSERT multi-lignes.
+    Les données dérivées sont rafraîchies en arrière-plan, une fois les
+    statuts stabilisés.
+    """
+    if len(payload) > telemetry_formats.status_batch_length(settings.STATUS_INGEST_MAX_RECORDS):
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=f"At most {settings.STATUS_INGEST_MAX_RECORDS} records per batch",
+        )
+    try:
+        vehicle_id, rows = telemetry_formats.decode_status_batch(payload)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+    v = vehicle_service.get_vehicle(db, vehicle_id=vehicle_id)
+    if not v:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehicle not found",
+        )
+
+    statuses = vehicle_service.create_statuses(db, rows=rows)
+    if statuses and ingest_hooks.derived_refresh_enabled():
+        ingest_hooks.derived_refresher.schedule([vehicle_id])
+    return StatusBatchResult(
+        vehicle_id=vehicle_id,
+        inserted=len(statuses),
+        first_id=statuses[0].id if statuses else None,
+        last_id=statuses[-1].id if statuses else None,
+    )
+
+
+@router.websocket("/statuses:stream")
+async def stream_statuses_endpoint(websocket: WebSocket):
+    """
+    Canal d'ingestion continue : authentification une fois (trame `hello`),
+    puis trames de statuts JSON ou binaires, écrites par lots et acquittées
+    par numéro de séquence (protocole : app/services/status_stream.py).
+    """
+    await websocket.accept()
+    await StatusStream(websocket).run()
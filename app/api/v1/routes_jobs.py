@@ -0,0 +1,108 @@
+# app/api/v1/routes_jobs.py
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db, use_primary
+from app.schemas.job import JobCreate, JobRead
+from app.services import jobs as job_service
+
+router = APIRouter()
+
+
+@router.post(
+    "/jobs",
+    response_model=JobRead,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Mettre un job de fond en file",
+)
+def create_job_endpoint(
+    payload: JobCreate,
+    db: Session = Depends(get_db),
+):
+    """
+    Enfile un job (export d'historique, résumé de flotte...).
+    Le suivi se fait via GET /jobs/{job_id}.
+    """
+    return job_service.create_job(db, data=payload)
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=JobRead,
+    summary="Obtenir l'avancement et le résultat d'un job",
+)
+def get_job_endpoint(
+    job_id: int,
+    db: Session = Depends(get_db),
+):
+    """
+    Retourne l'état, l'avancement (unités traitées / total) et le résultat d'un job.
+    """
+    # L'avancement est écrit sur le primaire : pas de lecture sur un réplica en retard
+    job = job_service.get_job(use_primary(db), job_id=job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found",
+        )
+    return job
+
+
+@router.get(
+    "/jobs/{job_id}/download",
+    summary="Télécharger le résultat d'un export",
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+def download_job_endpoint(
+    job_id: int,
+    db: Session = Depends(get_db),
+):
+    """
+    Flux JSON Lines de l'export (un statut par ligne, véhicule par véhicule).
+    Disponible une fois le job `export_statuses` terminé avec succès.
+    """
+    job = job_service.get_job(use_primary(db), job_id=job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found",
+        )
+    if job.kind != "export_statuses" or job.status != job_service.JOB_SUCCEEDED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Job has no downloadable result",
+        )
+    paths = job_service.export_files(job)
+    if paths is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export files not found",
+        )
+    return StreamingResponse(
+        job_service.iter_export(paths),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="job_{job_id}.jsonl"'},
+    )
+
+
+@router.post(
+    "/jobs/{job_id}/cancel",
+    response_model=JobRead,
+    summary="Annuler un job",
+)
+def cancel_job_endpoint(
+    job_id: int,
+    db: Session = Depends(get_db),
+):
+    """
+    Annule un job en file, ou demande l'arrêt d'un job en cours
+    (effectif à la fin de l'unité de travail courante).
+    """
+    job = job_service.cancel_job(db, job_id=job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found",
+        )
+    return job
@@ -1,16 +1,60 @@
 # app/api/v1/routes_vehicles.py
-from typing import List
+from datetime import datetime
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app.api.v1.negotiation import negotiate_media_type, telemetry_response, vary_on_accept
+from app.core.config import settings
 from app.db.session import get_db
-from app.schemas.vehicle import VehicleCreate, VehicleRead, VehicleStatusRead, VehicleStatusCreate
+from app.schemas.analytics import VehicleAnalyticsRead
+from app.schemas.segments import ChargingSessionRead, TripRead
+from app.schemas.fieldsets import InvalidFieldsetError, fieldset_encoder, parse_fieldset
+from app.schemas.vehicle import (
+    SeriesField,
+    StatusPurgeResult,
+    StatusSeries,
+    VehicleBulkResult,
+    VehicleCreate,
+    VehiclePositionRead,
+    VehicleRead,
+    VehicleStatusCreate,
+    VehicleStatusRead,
+)
+from app.services import analytics as analytics_service
+from app.services import geohash
+from app.services import ingest_hooks
+from app.services import segments as segment_service
 from app.services import vehicles as vehicle_service
+from app.services.telemetry_formats import MEDIA_JSON
 
 router = APIRouter()
 
 
+def _parse_fields(raw: Optional[str], model) -> Optional[tuple]:
+    """
+    Valide `?fields=` contre le schéma de réponse (422 si champ inconnu).
+    """
+    try:
+        return parse_fieldset(raw, model)
+    except InvalidFieldsetError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=str(exc),
+        )
+
+
+def _fieldset_response(rows, model, fields: tuple) -> JSONResponse:
+    """
+    Sérialise des lignes projetées avec l'encodeur mis en cache du fieldset.
+    """
+    encode = fieldset_encoder(model, fields)
+    return JSONResponse([encode(row) for row in rows])
+
+
 @router.post(
     "/vehicles",
     response_model=VehicleRead,
@@ -22,11 +66,52 @@ def create_vehicle_endpoint(
     db: Session = Depends(get_db),
 ):
     """
-    Crée un véhicule à partir des données fournies.
+    Crée un véhicule à partir des données fournies
+    (409 si le VIN ou l'external_id est déjà enregistré).
     """
-    # TODO : on pourrait gérer explicitement l'unicité de external_id / vin ici.
-    v = vehicle_service.create_vehicle(db, data=payload)
-    return v
+    try:
+        return vehicle_service.create_vehicle(db, data=payload)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A vehicle with this vin or external_id already exists",
+        )
+
+
+@router.post(
+    "/vehicles:bulk",
+    response_model=VehicleBulkResult,
+    summary="Enregistrer un lot de véhicules",
+)
+def upsert_vehicles_endpoint(
+    payload: List[VehicleCreate],
+    db: Session = Depends(get_db),
+):
+    """
+    Crée les véhicules du lot, ou met à jour ceux dont le VIN est déjà
+    enregistré, en une transaction (INSERT ... ON CONFLICT (vin) DO UPDATE).
+    Un résultat par élément : created, updated ou conflict.
+    """
+    if len(payload) > settings.VEHICLE_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=f"At most {settings.VEHICLE_BULK_MAX_ITEMS} vehicles per batch",
+        )
+    try:
+        items = vehicle_service.upsert_vehicles(db, items=payload)
+    except IntegrityError:
+        # Écrivain concurrent entre la détection des conflits et l'écriture
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Concurrent registration of the same vehicles, retry the batch",
+        )
+    return VehicleBulkResult(
+        created=sum(item.result == "created" for item in items),
+        updated=sum(item.result == "updated" for item in items),
+        conflicts=sum(item.result == "conflict" for item in items),
+        items=items,
+    )
 
 
 @router.get(
@@ -35,12 +120,175 @@ def create_vehicle_endpoint(
     summary="Lister les véhicules",
 )
 def list_vehicles_endpoint(
+    response: Response,
+    q: Optional[str] = Query(
+        None,
+        min_length=1,
+        description="Recherche par préfixe sur le nom ou le VIN.",
+    ),
+    after: Optional[str] = Query(
+        None,
+        description=(
+            "Curseur : id du dernier véhicule de la page précédente "
+            "(avec `q` : valeur opaque de X-Next-Cursor)."
+        ),
+    ),
+    limit: Optional[int] = Query(
+        None,
+        ge=1,
+        description="Taille de page (plafonnée par VEHICLE_PAGE_MAX_LIMIT).",
+    ),
+    fields: Optional[str] = Query(
+        None,
+        description="Champs à retourner, séparés par des virgules (ex: id,name).",
+    ),
     db: Session = Depends(get_db),
 ):
     """
-    Liste tous les véhicules actifs.
+    Liste les véhicules actifs, page par page (pagination par clé).
+    L'en-tête `X-Next-Cursor` contient la valeur de `after` pour la page suivante.
     """
-    return vehicle_service.list_vehicles(db)
+    try:
+        if after is None:
+            position = None
+        elif q:
+            position = vehicle_service.decode_search_cursor(after)
+        else:
+            position = int(after)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    fieldset = _parse_fields(fields, VehicleRead)
+    # Colonnes nécessaires pour calculer le curseur suivant
+    cursor_fields = ("id", "name", "vin") if q else ("id",)
+    query_fields = fieldset
+    if fieldset and not set(cursor_fields) <= set(fieldset):
+        query_fields = fieldset + tuple(name for name in cursor_fields if name not in fieldset)
+
+    vehicles = vehicle_service.list_vehicles(
+        db, q=q, after=position, limit=limit, fields=query_fields
+    )
+
+    page_size = vehicle_service.vehicle_page_size(limit)
+    next_cursor = None
+    if len(vehicles) == page_size:
+        last = vehicles[-1]
+        if q:
+            next_cursor = vehicle_service.encode_search_cursor(vehicle_service.search_cursor_after(last, q))
+        else:
+            next_cursor = str(last.id)
+
+    if fieldset:
+        encode = fieldset_encoder(VehicleRead, query_fields)
+        content = [encode(row) for row in vehicles]
+        for name in query_fields[len(fieldset):]:
+            for item in content:
+                del item[name]
+        result = JSONResponse(content)
+        if next_cursor:
+            result.headers["X-Next-Cursor"] = next_cursor
+        return result
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return vehicles
+
+
+@router.get(
+    "/vehicles/by-vin/{vin}",
+    response_model=VehicleRead,
+    summary="Obtenir un véhicule par son VIN",
+)
+def get_vehicle_by_vin_endpoint(
+    vin: str,
+    db: Session = Depends(get_db),
+):
+    """
+    Recherche directe par VIN (index unique + cache d'identifiants).
+    """
+    v = vehicle_service.get_vehicle_by_vin(db, vin=vin)
+    if not v:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehicle not found",
+        )
+    return v
+
+
+@router.get(
+    "/vehicles/by-external-id/{external_id}",
+    response_model=VehicleRead,
+    summary="Obtenir un véhicule par son identifiant externe",
+)
+def get_vehicle_by_external_id_endpoint(
+    external_id: str,
+    db: Session = Depends(get_db),
+):
+    """
+    Recherche directe par external_id (index unique + cache d'identifiants).
+    """
+    v = vehicle_service.get_vehicle_by_external_id(db, external_id=external_id)
+    if not v:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehicle not found",
+        )
+    return v
+
+
+@router.get(
+    "/vehicles/within",
+    response_model=List[VehiclePositionRead],
+    summary="Véhicules situés dans une zone",
+)
+def list_vehicles_within_endpoint(
+    bbox: str = Query(
+        ...,
+        description="Rectangle min_lon,min_lat,max_lon,max_lat (degrés ; min_lon > max_lon "
+        "pour traverser l'antiméridien).",
+    ),
+    limit: Optional[int] = Query(
+        None,
+        ge=1,
+        description="Nombre maximal de véhicules (plafonné par VEHICLE_PAGE_MAX_LIMIT).",
+    ),
+    db: Session = Depends(get_db),
+):
+    """
+    Véhicules dont la dernière position connue est dans le rectangle,
+    triés par vehicle_id. Répondu par des plages de l'index geohash,
+    sans calcul de distance.
+    """
+    try:
+        area = geohash.parse_bbox(bbox)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc),
+        )
+    return vehicle_service.list_vehicles_within(db, bbox=area, limit=limit)
+
+
+@router.get(
+    "/vehicles/nearest",
+    response_model=List[VehiclePositionRead],
+    summary="Véhicules les plus proches d'un point",
+)
+def list_nearest_vehicles_endpoint(
+    lat: float = Query(..., ge=-90.0, le=90.0, description="Latitude du point."),
+    lon: float = Query(..., ge=-180.0, le=180.0, description="Longitude du point."),
+    n: int = Query(
+        10,
+        ge=1,
+        description="Nombre de véhicules (plafonné par VEHICLE_PAGE_MAX_LIMIT).",
+    ),
+    db: Session = Depends(get_db),
+):
+    """
+    Les `n` véhicules dont la dernière position est la plus proche du
+    point, du plus proche au plus éloigné (`distance_km`).
+    """
+    return vehicle_service.list_nearest_vehicles(db, latitude=lat, longitude=lon, n=n)
 
 
 @router.get(
@@ -63,6 +311,30 @@ def get_vehicle_endpoint(
         )
     return v
 
+@router.delete(
+    "/vehicles/{vehicle_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Supprimer un véhicule et son historique",
+)
+def delete_vehicle_endpoint(
+    vehicle_id: int,
+    db: Session = Depends(get_db),
+):
+    """
+    Supprime un véhicule : l'historique est purgé par lots côté serveur,
+    puis les données dérivées sont supprimées par la base (cascade).
+    Si la requête est interrompue (deadline), les lots déjà supprimés
+    le restent : il suffit de relancer la suppression.
+    """
+    v = vehicle_service.get_vehicle(db, vehicle_id=vehicle_id)
+    if not v:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehicle not found",
+        )
+    vehicle_service.delete_vehicle(db, vehicle=v)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 @router.post(
     "/vehicles/{vehicle_id}/status",
     response_model=VehicleStatusRead,
@@ -76,6 +348,8 @@ def create_status_endpoint(
 ):
     """
     Crée un nouveau statut (télémétrie) pour un véhicule donné.
+    Les données dérivées (analytique, trajets, recharges) sont
+    rafraîchies en arrière-plan, une fois le statut stabilisé.
     """
     v = vehicle_service.get_vehicle(db, vehicle_id=vehicle_id)
     if not v:
@@ -89,21 +363,57 @@ def create_status_endpoint(
         vehicle_id=vehicle_id,
         data=payload,
     )
+    if ingest_hooks.derived_refresh_enabled():
+        ingest_hooks.derived_refresher.schedule([vehicle_id])
     return status_obj
 
 @router.get(
     "/vehicles/{vehicle_id}/statuses",
     response_model=List[VehicleStatusRead],
     summary="Lister les statuts d'un véhicule",
+    responses={
+        200: {
+            "content": {
+                "application/vnd.bluelink.columnar+json": {},
+                "application/vnd.bluelink.telemetry": {},
+            },
+        },
+    },
 )
 def list_statuses_endpoint(
     vehicle_id: int,
+    request: Request,
+    response: Response,
+    format: Optional[str] = Query(
+        None,
+        description="Format de réponse : json, columnar ou binary (sinon d'après Accept).",
+    ),
+    fields: Optional[str] = Query(
+        None,
+        description="Champs à retourner, séparés par des virgules (ex: timestamp,battery_level).",
+    ),
+    since: Optional[datetime] = Query(None, description="Début de la plage (inclus)."),
+    until: Optional[datetime] = Query(None, description="Fin de la plage (exclue)."),
+    order: Literal["asc", "desc"] = Query("desc", description="Tri par timestamp."),
+    limit: Optional[int] = Query(
+        None,
+        ge=1,
+        description="Nombre maximal de statuts (plafonné par STATUS_HISTORY_MAX_ROWS).",
+    ),
     db: Session = Depends(get_db),
 ):
     """
     Retourne l'historique des statuts pour un véhicule donné,
-    du plus récent au plus ancien.
+    du plus récent au plus ancien (par défaut), sur une plage
+    `since` / `until` optionnelle et toujours bornée en nombre de lignes.
+
+    Formats compacts disponibles par négociation de contenu
+    (JSON colonnaire ou binaire), voir app/services/telemetry_formats.py.
+    `?fields=` limite les colonnes lues en SQL et renvoyées.
     """
+    media_type = negotiate_media_type(request, format)
+    fieldset = _parse_fields(fields, VehicleStatusRead)
+
     v = vehicle_service.get_vehicle(db, vehicle_id=vehicle_id)
     if not v:
         raise HTTPException(
@@ -111,7 +421,90 @@ def list_statuses_endpoint(
             detail="Vehicle not found",
         )
 
-    return vehicle_service.list_statuses(db, vehicle_id=vehicle_id)
+    statuses = vehicle_service.list_statuses(
+        db,
+        vehicle_id=vehicle_id,
+        since=since,
+        until=until,
+        order=order,
+        limit=limit,
+        fields=fieldset,
+    )
+    if media_type == MEDIA_JSON:
+        if fieldset:
+            return vary_on_accept(_fieldset_response(statuses, VehicleStatusRead, fieldset))
+        vary_on_accept(response)
+        return statuses
+    return telemetry_response(
+        statuses,
+        fieldset or VehicleStatusRead.model_fields,
+        media_type,
+        vehicle_id=vehicle_id,
+    )
+
+@router.get(
+    "/vehicles/{vehicle_id}/statuses/downsample",
+    response_model=StatusSeries,
+    summary="Courbe sous-échantillonnée (LTTB) d'un champ",
+)
+def downsample_statuses_endpoint(
+    vehicle_id: int,
+    field: SeriesField = Query("battery_level", description="Champ tracé."),
+    points: int = Query(
+        1000,
+        ge=3,
+        description="Nombre maximal de points (plafonné par STATUS_DOWNSAMPLE_MAX_POINTS).",
+    ),
+    since: Optional[datetime] = Query(None, description="Début de la plage (inclus)."),
+    until: Optional[datetime] = Query(None, description="Fin de la plage (exclue)."),
+    db: Session = Depends(get_db),
+):
+    """
+    Réduit un historique de `field`, aussi long soit-il, à `points` points
+    pour un graphique (Largest-Triangle-Three-Buckets) : les pics et creux
+    sont conservés, contrairement à une moyenne par intervalle.
+    """
+    v = vehicle_service.get_vehicle(db, vehicle_id=vehicle_id)
+    if not v:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehicle not found",
+        )
+    total, series = vehicle_service.downsample_statuses(
+        db, vehicle_id=vehicle_id, field=field, points=points, since=since, until=until
+    )
+    return StatusSeries(
+        vehicle_id=vehicle_id,
+        field=field,
+        source_points=total,
+        points=[{"timestamp": ts, "value": value} for ts, value in series],
+    )
+
+@router.delete(
+    "/vehicles/{vehicle_id}/statuses",
+    response_model=StatusPurgeResult,
+    summary="Purger l'historique d'un véhicule",
+)
+def purge_statuses_endpoint(
+    vehicle_id: int,
+    before: Optional[datetime] = Query(
+        None,
+        description="Ne supprimer que les statuts antérieurs à cette date (sinon tout l'historique).",
+    ),
+    db: Session = Depends(get_db),
+):
+    """
+    Supprime l'historique d'un véhicule par lots (PURGE_CHUNK_SIZE statuts
+    par transaction), sans charger les lignes. Le véhicule est conservé.
+    """
+    v = vehicle_service.get_vehicle(db, vehicle_id=vehicle_id)
+    if not v:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehicle not found",
+        )
+    deleted = vehicle_service.purge_statuses(db, vehicle_id=vehicle_id, before=before)
+    return StatusPurgeResult(vehicle_id=vehicle_id, deleted=deleted)
 
 @router.get(
     "/vehicles/{vehicle_id}/status/latest",
@@ -124,11 +517,96 @@ def get_latest_status_endpoint(
 ):
     """
     Retourne le dernier statut connu pour un véhicule donné.
+    Servi depuis la table partagée entre workers quand elle est activée.
     """
-    status_obj = vehicle_service.get_latest_status(db, vehicle_id=vehicle_id)
+    status_obj = vehicle_service.get_latest_status_cached(db, vehicle_id=vehicle_id)
     if not status_obj:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No status found for this vehicle",
         )
     return status_obj
+
+@router.get(
+    "/vehicles/{vehicle_id}/analytics",
+    response_model=VehicleAnalyticsRead,
+    summary="Indicateurs énergétiques d'un véhicule",
+)
+def get_vehicle_analytics_endpoint(
+    vehicle_id: int,
+    db: Session = Depends(get_db),
+):
+    """
+    Consommation (kWh/100 km), perte de batterie à l'arrêt et distance
+    journalière. Lecture des cumuls persistés, en temps constant :
+    l'historique n'est jamais relu ici.
+    """
+    v = vehicle_service.get_vehicle(db, vehicle_id=vehicle_id)
+    if not v:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehicle not found",
+        )
+    return analytics_service.get_vehicle_analytics(db, vehicle_id=vehicle_id)
+
+
+@router.get(
+    "/vehicles/{vehicle_id}/charging-sessions",
+    response_model=List[ChargingSessionRead],
+    summary="Lister les recharges d'un véhicule",
+)
+def list_charging_sessions_endpoint(
+    vehicle_id: int,
+    since: Optional[datetime] = Query(None, description="Début de recharge minimal (inclus)."),
+    until: Optional[datetime] = Query(None, description="Début de recharge maximal (exclu)."),
+    limit: Optional[int] = Query(
+        None,
+        ge=1,
+        description="Nombre maximal de recharges (plafonné par STATUS_HISTORY_MAX_ROWS).",
+    ),
+    db: Session = Depends(get_db),
+):
+    """
+    Recharges détectées (batterie en hausse à l'arrêt), de la plus
+    récente à la plus ancienne. `limit=1` répond à "quand ai-je
+    rechargé pour la dernière fois ?".
+    """
+    v = vehicle_service.get_vehicle(db, vehicle_id=vehicle_id)
+    if not v:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehicle not found",
+        )
+    return segment_service.list_charging_sessions(
+        db, vehicle_id=vehicle_id, since=since, until=until, limit=limit
+    )
+
+
+@router.get(
+    "/vehicles/{vehicle_id}/trips",
+    response_model=List[TripRead],
+    summary="Lister les trajets d'un véhicule",
+)
+def list_trips_endpoint(
+    vehicle_id: int,
+    since: Optional[datetime] = Query(None, description="Début de trajet minimal (inclus)."),
+    until: Optional[datetime] = Query(None, description="Début de trajet maximal (exclu)."),
+    limit: Optional[int] = Query(
+        None,
+        ge=1,
+        description="Nombre maximal de trajets (plafonné par STATUS_HISTORY_MAX_ROWS).",
+    ),
+    db: Session = Depends(get_db),
+):
+    """
+    Trajets détectés (odomètre en hausse), du plus récent au plus ancien.
+    """
+    v = vehicle_service.get_vehicle(db, vehicle_id=vehicle_id)
+    if not v:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehicle not found",
+        )
+    return segment_service.list_trips(
+        db, vehicle_id=vehicle_id, since=since, until=until, limit=limit
+    )
@@ -0,0 +1,122 @@
+# app/api/v1/routes_webhooks.py
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db
+from app.schemas.webhooks import (
+    DeliveryState,
+    WebhookDeliveryRead,
+    WebhookEndpointCreate,
+    WebhookEndpointRead,
+    WebhookRetryResult,
+)
+from app.services import vehicles as vehicle_service
+from app.services import webhooks as webhook_service
+
+router = APIRouter()
+
+
+def _get_endpoint_or_404(db: Session, endpoint_id: int):
+    endpoint = webhook_service.get_endpoint(db, endpoint_id=endpoint_id)
+    if not endpoint:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Webhook endpoint not found",
+        )
+    return endpoint
+
+
+@router.post(
+    "/webhooks",
+    response_model=WebhookEndpointRead,
+    status_code=status.HTTP_201_CREATED,
+    summary="Enregistrer un destinataire de webhooks",
+)
+def create_webhook_endpoint(
+    payload: WebhookEndpointCreate,
+    db: Session = Depends(get_db),
+):
+    """
+    Enregistre une URL qui recevra, par lots signés, les statuts écrits
+    après son enregistrement (WEBHOOKS_ENABLED).
+    """
+    if payload.vehicle_id is not None and not vehicle_service.get_vehicle(db, vehicle_id=payload.vehicle_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehicle not found",
+        )
+    return webhook_service.create_endpoint(db, data=payload)
+
+
+@router.get(
+    "/webhooks",
+    response_model=List[WebhookEndpointRead],
+    summary="Lister les destinataires de webhooks",
+)
+def list_webhook_endpoints(
+    db: Session = Depends(get_db),
+):
+    return webhook_service.list_endpoints(db)
+
+
+@router.get(
+    "/webhooks/{endpoint_id}",
+    response_model=WebhookEndpointRead,
+    summary="Obtenir un destinataire de webhooks",
+)
+def get_webhook_endpoint(
+    endpoint_id: int,
+    db: Session = Depends(get_db),
+):
+    return _get_endpoint_or_404(db, endpoint_id)
+
+
+@router.delete(
+    "/webhooks/{endpoint_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Supprimer un destinataire de webhooks",
+)
+def delete_webhook_endpoint(
+    endpoint_id: int,
+    db: Session = Depends(get_db),
+):
+    """
+    Supprime le destinataire et ses livraisons en attente ou mortes.
+    """
+    endpoint = _get_endpoint_or_404(db, endpoint_id)
+    webhook_service.delete_endpoint(db, endpoint=endpoint)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get(
+    "/webhooks/{endpoint_id}/deliveries",
+    response_model=List[WebhookDeliveryRead],
+    summary="Lister les livraisons en attente ou mortes",
+)
+def list_webhook_deliveries(
+    endpoint_id: int,
+    state: DeliveryState = Query("dead", description="pending ou dead (lettres mortes)"),
+    limit: Optional[int] = Query(None, ge=1, description="Nombre maximum de livraisons (plafonné)"),
+    db: Session = Depends(get_db),
+):
+    _get_endpoint_or_404(db, endpoint_id)
+    return webhook_service.list_deliveries(db, endpoint_id=endpoint_id, state=state, limit=limit)
+
+
+@router.post(
+    "/webhooks/{endpoint_id}/deliveries:retry",
+    response_model=WebhookRetryResult,
+    summary="Remettre en file les lettres mortes",
+)
+def retry_webhook_deliveries(
+    endpoint_id: int,
+    db: Session = Depends(get_db),
+):
+    """
+    Remet les livraisons mortes du destinataire en file, essais remis à zéro.
+    """
+    _get_endpoint_or_404(db, endpoint_id)
+    requeued = webhook_service.retry_dead_deliveries(db, endpoint_id=endpoint_id)
+    return WebhookRetryResult(endpoint_id=endpoint_id, requeued=requeued)
@@ -0,0 +1,250 @@
+# app/core/admission.py
+"""
+Contrôle d'admission et délestage.
+
+Les endpoints sont des `def` synchrones : sans limite, une rafale remplit
+le pool de threads anyio puis la file du pool SQLAlchemy, et la latence
+explose pour tout le monde. Ici, avant même d'entrer dans FastAPI :
+
+- chaque groupe de routes (ingest = écritures, read = lectures) a une
+  limite de concurrence et une file d'attente bornée ;
+- file pleine (ou attente trop longue) -> 503 immédiat avec `Retry-After` ;
+- chaque client (adresse du pair TCP, jamais un en-tête fourni par le
+  client) a un token bucket -> 429 avec `Retry-After` si épuisé ;
+- les jauges de saturation sont exposées par /health/admission.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from starlette.requests import HTTPConnection
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+
+GROUP_INGEST = "ingest"
+GROUP_READ = "read"
+
+_WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class AdmissionGate:
+    """
+    Limite de concurrence + file d'attente bornée pour un groupe de routes.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted_total = 0
+        self.rejected_total = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _sem(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        return self._semaphore
+
+    async def acquire(self) -> bool:
+        """
+        Retourne True si la requête est admise (éventuellement après attente).
+        """
+        sem = self._sem()
+        if not sem.locked():
+            await sem.acquire()
+        else:
+            if self.queued >= self.max_queue:
+                self.rejected_total += 1
+                return False
+            self.queued += 1
+            try:
+                await asyncio.wait_for(sem.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected_total += 1
+                return False
+            finally:
+                self.queued -= 1
+        self.in_flight += 1
+        self.admitted_total += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._sem().release()
+
+    def gauges(self) -> Dict[str, float]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "saturation": round(
+                (self.in_flight + self.queued) / max(1, self.limit + self.max_queue), 3
+            ),
+            "admitted_total": self.admitted_total,
+            "rejected_total": self.rejected_total,
+        }
+
+
+class TokenBuckets:
+    """
+    Un token bucket par client (débit `rate`/s, rafale `burst`).
+
+    Un bucket inactif depuis `burst / rate` secondes est plein, donc
+    équivalent à un bucket absent : il est oublié. Les buckets sont rangés
+    par dernier usage, l'expiration ne regarde que les plus anciens ; au-delà
+    de `max_clients`, les moins récemment utilisés sont évincés.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        max_clients: int = 50_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.rejected_total = 0
+        self._clock = clock
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, client_key: str) -> float:
+        """
+        Consomme un jeton. Retourne 0 si accepté, sinon le délai (s)
+        avant qu'un jeton soit disponible.
+        """
+        now = self._clock()
+        with self._lock:
+            tokens, last = self._buckets.pop(client_key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._buckets[client_key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[client_key] = (tokens, now)
+                self.rejected_total += 1
+                wait = (1 - tokens) / self.rate
+            self._expire(now)
+        return wait
+
+    def _expire(self, now: float) -> None:
+        refill = self.burst / self.rate
+        while self._buckets:
+            key, (_, last) = next(iter(self._buckets.items()))
+            if now - last < refill and len(self._buckets) <= self.max_clients:
+                break
+            del self._buckets[key]
+
+
+def rate_limit_key(conn: HTTPConnection) -> str:
+    """
+    Clé du token bucket : adresse du pair. Pas d'en-tête fourni par le
+    client (X-Client-Id) : une valeur neuve par requête contournerait la limite.
+    """
+    return conn.client.host if conn.client else "anonymous"
+
+
+class AdmissionController:
+    def __init__(self):
+        self.gates = {
+            GROUP_INGEST: AdmissionGate(
+                GROUP_INGEST,
+                settings.ADMISSION_INGEST_CONCURRENCY,
+                settings.ADMISSION_QUEUE_SIZE,
+                settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+            ),
+            GROUP_READ: AdmissionGate(
+                GROUP_READ,
+                settings.ADMISSION_READ_CONCURRENCY,
+                settings.ADMISSION_QUEUE_SIZE,
+                settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+            ),
+        }
+        self.buckets = TokenBuckets(
+            settings.CLIENT_RATE_LIMIT_PER_SECOND,
+            settings.CLIENT_RATE_LIMIT_BURST,
+        )
+
+    @staticmethod
+    def classify(scope: Scope) -> Optional[str]:
+        """
+        Groupe de routes d'une requête, ou None si elle n'est pas limitée
+        (health, docs, ...).
+        """
+        path = scope.get("path", "")
+        prefix = settings.API_V1_STR
+        if not path.startswith(prefix) or path.startswith(prefix + "/health"):
+            return None
+        return GROUP_INGEST if scope.get("method") in _WRITE_METHODS else GROUP_READ
+
+    def gauges(self) -> Dict[str, object]:
+        return {
+            "groups": {name: gate.gauges() for name, gate in self.gates.items()},
+            "client_rate_limit": {
+                "enabled": self.buckets.enabled,
+                "rejected_total": self.buckets.rejected_total,
+            },
+        }
+
+
+admission_controller = AdmissionController()
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionControlMiddleware:
+    """
+    Middleware ASGI appliquant le contrôle d'admission aux requêtes HTTP.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        group = self.controller.classify(scope) if scope["type"] == "http" else None
+        if group is None or not settings.ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        buckets = self.controller.buckets
+        if buckets.enabled:
+            wait = buckets.take(rate_limit_key(HTTPConnection(scope)))
+            if wait > 0:
+                await _reject(429, "Rate limit exceeded", wait)(scope, receive, send)
+                return
+
+        gate = self.controller.gates[group]
+        if not await gate.acquire():
+            await _reject(
+                503, "Server busy, retry later", settings.ADMISSION_RETRY_AFTER_SECONDS
+            )(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
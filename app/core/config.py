@@ -1,5 +1,7 @@
 # app/core/config.py
 import os
+from typing import List
+
 from pydantic_settings import BaseSettings
 from pydantic import AnyUrl
 
@@ -17,6 +19,142 @@ class Settings(BaseSettings):
     # URL de la base de données (sqlite par défaut pour le dev local)
     DATABASE_URL: str = "sqlite:///./bluelink.db"
 
+    # Réplicas en lecture (liste d'URLs séparées par des virgules, vide = désactivé).
+    # Les lectures y sont envoyées en round-robin, les écritures restent sur le primaire.
+    DATABASE_REPLICA_URLS: str = ""
+    # Durée (s) pendant laquelle un réplica en erreur est retiré de la rotation
+    REPLICA_EJECT_SECONDS: float = 30.0
+    # Fenêtre "read-your-writes" : après une écriture, un client lit sur le primaire
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+
+    # Sharding de la télémétrie (URLs séparées par des virgules, vide = désactivé).
+    # vehicle_status est réparti par hachage cohérent de l'id du véhicule ;
+    # voir app/db/shards.py et `python -m app.db.shard_admin`.
+    STATUS_SHARD_URLS: str = ""
+    STATUS_SHARD_VNODES: int = 64
+    STATUS_SHARD_ID_STRIDE: int = 1 << 40  # plage d'ids de statuts par shard
+
+    # Table partagée (mmap) des derniers statuts, commune à tous les workers uvicorn.
+    # Désactivée par défaut ; chemin vide = /dev/shm (ou le dossier temporaire).
+    LATEST_STATUS_SHM_ENABLED: bool = False
+    LATEST_STATUS_SHM_PATH: str = ""
+    LATEST_STATUS_SHM_SLOTS: int = 65536
+
+    # Tampon mémoire des statuts récents par véhicule (app/services/hot_store.py),
+    # propre à chaque processus : sert les lectures d'historique récentes sans DB.
+    # Avec plusieurs workers, exige LATEST_STATUS_SHM_ENABLED (compteurs d'insertions).
+    HOT_STORE_ENABLED: bool = False
+    HOT_STORE_SAMPLES_PER_VEHICLE: int = 720
+    HOT_STORE_MEMORY_MB: float = 64.0  # au-delà, éviction LRU des véhicules
+
+    # Nombre maximal de statuts renvoyés par une lecture d'historique
+    # (aucun scan d'historique non borné via l'API publique)
+    STATUS_HISTORY_MAX_ROWS: int = 1000
+
+    # Sous-échantillonnage LTTB (GET /vehicles/{id}/statuses/downsample) : points rendus au plus
+    STATUS_DOWNSAMPLE_MAX_POINTS: int = 5000
+
+    # Lot d'ingestion binaire (POST /statuses:binary) : enregistrements par requête
+    STATUS_INGEST_MAX_RECORDS: int = 10000
+
+    # Canal WebSocket d'ingestion (WS /statuses:stream, app/services/status_stream.py)
+    INGEST_STREAM_TOKENS: str = ""  # jetons acceptés, séparés par des virgules ("" = pas de contrôle)
+    INGEST_STREAM_AUTH_TIMEOUT_SECONDS: float = 5.0
+    INGEST_STREAM_BATCH_SIZE: int = 500  # statuts par transaction
+    INGEST_STREAM_FLUSH_MS: int = 200  # attente maximale d'un lot incomplet
+    INGEST_STREAM_MAX_PENDING: int = 5000  # statuts en attente avant de suspendre la lecture
+
+    # Règles d'alerte évaluées à l'ingestion (app/services/alerts.py)
+    ALERTS_ENABLED: bool = True
+    ALERT_RULES_REFRESH_SECONDS: float = 10.0  # rechargement des règles modifiées par un autre processus
+
+    # Totaux de la flotte (GET /fleet/summary, app/services/fleet_summary.py) : compteurs
+    # incrémentaux propres à chaque processus, recalculés depuis la DB périodiquement
+    FLEET_SUMMARY_ENABLED: bool = True
+    FLEET_SUMMARY_RECONCILE_SECONDS: float = 60.0  # écritures des autres processus vues au plus tard après ce délai
+
+    # Webhooks partenaires : outbox écrite à l'ingestion + dispatcher (app/services/webhooks.py)
+    WEBHOOKS_ENABLED: bool = False
+    WEBHOOK_POLL_SECONDS: float = 1.0
+    WEBHOOK_BATCH_SIZE: int = 100  # événements par POST
+    WEBHOOK_CLAIM_LIMIT: int = 1000  # livraisons réclamées par cycle
+    WEBHOOK_TIMEOUT_SECONDS: float = 10.0
+    WEBHOOK_MAX_CONNECTIONS: int = 100  # pool httpx partagé par tous les destinataires
+    WEBHOOK_LEASE_SECONDS: float = 60.0  # livraisons réclamées invisibles pour les autres processus
+    WEBHOOK_MAX_ATTEMPTS: int = 8  # au-delà : lettre morte
+    WEBHOOK_RETRY_BASE_SECONDS: float = 5.0
+    WEBHOOK_RETRY_MAX_SECONDS: float = 3600.0
+
+    # Purge d'historique (DELETE /vehicles/...) : statuts supprimés par transaction
+    PURGE_CHUNK_SIZE: int = 5000
+
+    # Pagination de GET /vehicles
+    VEHICLE_PAGE_DEFAULT_LIMIT: int = 100
+    VEHICLE_PAGE_MAX_LIMIT: int = 1000
+
+    # Enregistrement en lot (POST /vehicles:bulk) : véhicules par requête
+    VEHICLE_BULK_MAX_ITEMS: int = 5000
+
+    # Positions GPS (GET /vehicles/within, /vehicles/nearest)
+    GEOHASH_PRECISION: int = 9  # cellules d'environ 5 m x 5 m
+    GEO_MAX_CELLS: int = 32  # cellules (plages de l'index) par rectangle recherché
+    GEO_NEAREST_START_RADIUS_KM: float = 1.0  # rayon initial, quadruplé tant que nécessaire
+
+    # Flux de changements (GET /changes)
+    CHANGES_PAGE_DEFAULT_LIMIT: int = 1000
+    CHANGES_PAGE_MAX_LIMIT: int = 10000
+    # Les lignes plus récentes ne sont pas encore servies : une transaction
+    # qui a obtenu un id plus petit mais valide plus tard n'est pas sautée
+    CHANGES_SETTLE_SECONDS: float = 2.0
+
+    # Cache des recherches par VIN / external_id
+    VEHICLE_ID_CACHE_SIZE: int = 10000
+    VEHICLE_ID_CACHE_TTL_SECONDS: float = 60.0
+
+    # Compression gzip des réponses (si le client l'accepte) au-delà de cette taille (octets)
+    GZIP_MINIMUM_SIZE: int = 1024
+
+    # Contrôle d'admission (voir app/core/admission.py).
+    # Par défaut, read + ingest = capacité du pool SQLAlchemy (5 + 10 overflow).
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_READ_CONCURRENCY: int = 10
+    ADMISSION_INGEST_CONCURRENCY: int = 5
+    ADMISSION_QUEUE_SIZE: int = 50
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 2.0
+    ADMISSION_RETRY_AFTER_SECONDS: float = 1.0
+    # Token bucket par client (0 = désactivé)
+    CLIENT_RATE_LIMIT_PER_SECOND: float = 0.0
+    CLIENT_RATE_LIMIT_BURST: float = 20.0
+    # Taille du pool de threads anyio qui exécute les endpoints `def`
+    THREADPOOL_SIZE: int = 40
+
+    # Deadline par requête (ms), surchargeable par l'en-tête X-Request-Timeout-Ms
+    # dans la limite de REQUEST_DEADLINE_MAX_MS (les deux à 0 = aucune deadline).
+    REQUEST_DEADLINE_MS: int = 30000
+    REQUEST_DEADLINE_MAX_MS: int = 120000
+
+    # Jobs de fond (exports, recalculs) exécutés dans un pool de processus ;
+    # un seul runner actif par JOBS_OUTPUT_DIR : le pool sert tout l'hôte.
+    JOBS_RUNNER_ENABLED: bool = True
+    JOBS_MAX_WORKERS: int = 0  # 0 = nombre de cœurs
+    JOBS_POLL_SECONDS: float = 2.0
+    JOBS_CHUNK_SIZE: int = 50  # véhicules par unité de travail
+    JOBS_HEARTBEAT_SECONDS: float = 30.0  # bien en deçà de JOBS_STALE_SECONDS
+    JOBS_STALE_SECONDS: float = 300.0
+    JOBS_STREAM_BATCH_SIZE: int = 5000
+    JOBS_OUTPUT_DIR: str = "./exports"
+
+    # Analytique énergétique incrémentale (GET /vehicles/{id}/analytics)
+    BATTERY_CAPACITY_KWH: float = 77.4  # capacité utile pour convertir les % en kWh
+    ANALYTICS_BATCH_SIZE: int = 5000  # statuts lus par lot lors d'un rafraîchissement
+    ANALYTICS_DAILY_DAYS: int = 30  # historique journalier renvoyé par l'API
+    ANALYTICS_REFRESH_ON_INGEST: bool = True  # rafraîchir après chaque statut stabilisé (sinon : job analytics_refresh)
+
+    # Détection des trajets / recharges (GET /vehicles/{id}/trips, /charging-sessions)
+    SEGMENTS_REFRESH_ON_INGEST: bool = True  # rafraîchir après chaque statut stabilisé (sinon : job segments_refresh)
+    SEGMENT_GAP_SECONDS: float = 900.0  # arrêt (ou absence de hausse) qui clôt un segment
+    SEGMENT_MAX_INTERVAL_SECONDS: float = 21600.0  # au-delà, trou de télémétrie : segments clos
+
     # Identifiants de connexion BlueLink
     MYBLUELINK_USERNAME: str = os.getenv("MYBLUELINK_USERNAME")
     MYBLUELINK_PASSWORD: str = os.getenv("MYBLUELINK_PASSWORD")
@@ -27,6 +165,27 @@ class Settings(BaseSettings):
     # On gardera ces champs pour plus tard (API externe, secrets, etc.)
     # BLUELINK_BASE_URL: AnyUrl | None = None
 
+    @property
+    def replica_urls(self) -> List[str]:
+        """
+        Liste normalisée des URLs de réplicas.
+        """
+        return [u.strip() for u in self.DATABASE_REPLICA_URLS.split(",") if u.strip()]
+
+    @property
+    def ingest_stream_tokens(self) -> List[str]:
+        """
+        Jetons acceptés par le canal WebSocket d'ingestion.
+        """
+        return [t.strip() for t in self.INGEST_STREAM_TOKENS.split(",") if t.strip()]
+
+    @property
+    def status_shard_urls(self) -> List[str]:
+        """
+        Liste normalisée des URLs de shards de télémétrie.
+        """
+        return [u.strip() for u in self.STATUS_SHARD_URLS.split(",") if u.strip()]
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -0,0 +1,118 @@
+# app/core/deadlines.py
+"""
+Deadlines de bout en bout.
+
+Chaque requête API reçoit un budget de temps (REQUEST_DEADLINE_MS, ou
+l'en-tête `X-Request-Timeout-Ms` plafonné par REQUEST_DEADLINE_MAX_MS).
+Le budget restant est propagé à la session DB sous forme de timeout
+de requête SQL (voir app/db/session.py), et la deadline est annulée dès
+que le client se déconnecte : la requête SQL en cours est interrompue et
+la connexion retourne rapidement au pool.
+"""
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+DEADLINE_HEADER = "x-request-timeout-ms"
+
+
+class DeadlineExceeded(Exception):
+    """
+    Le budget de temps de la requête est épuisé (ou le client est parti).
+    """
+
+
+class Deadline:
+    def __init__(self, timeout_seconds: float):
+        self.expires_at = time.monotonic() + timeout_seconds
+        self.cancelled = False
+
+    def remaining(self) -> float:
+        """
+        Secondes restantes (0 si expirée ou annulée).
+        """
+        if self.cancelled:
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def exhausted(self) -> bool:
+        return self.cancelled or time.monotonic() >= self.expires_at
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+# Deadline de la requête en cours (copiée dans les threads anyio)
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+def deadline_from_header(raw: Optional[str]) -> Optional[Deadline]:
+    """
+    Construit la deadline d'une requête à partir de la configuration
+    et de l'en-tête optionnel (en millisecondes).
+    """
+    budget_ms = settings.REQUEST_DEADLINE_MS
+    if raw:
+        try:
+            budget_ms = int(raw)
+        except ValueError:
+            pass
+    cap_ms = settings.REQUEST_DEADLINE_MAX_MS
+    if cap_ms > 0 and (budget_ms <= 0 or budget_ms > cap_ms):
+        budget_ms = cap_ms
+    if budget_ms <= 0:
+        return None
+    return Deadline(budget_ms / 1000.0)
+
+
+class DeadlineMiddleware:
+    """
+    Middleware ASGI : installe la deadline de la requête et surveille
+    la déconnexion du client pendant tout son traitement.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope.get("path", "").startswith(settings.API_V1_STR):
+            await self.app(scope, receive, send)
+            return
+
+        raw = None
+        for name, value in scope.get("headers", []):
+            if name.decode("latin-1") == DEADLINE_HEADER:
+                raw = value.decode("latin-1")
+                break
+        deadline = deadline_from_header(raw)
+        if deadline is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Une tâche lit en continu `receive` pour détecter http.disconnect ;
+        # l'application consomme les messages depuis une file.
+        queue: "asyncio.Queue[Message]" = asyncio.Queue()
+
+        async def pump() -> None:
+            while True:
+                message = await receive()
+                await queue.put(message)
+                if message["type"] == "http.disconnect":
+                    deadline.cancel()
+                    return
+
+        async def wrapped_receive() -> Message:
+            return await queue.get()
+
+        token = current_deadline.set(deadline)
+        pump_task = asyncio.ensure_future(pump())
+        try:
+            await self.app(scope, wrapped_receive, send)
+        finally:
+            pump_task.cancel()
+            current_deadline.reset(token)
@@ -1,5 +1,7 @@
-# app/db/base.py
+from sqlalchemy import DateTime
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.sql.functions import FunctionElement
 
 
 class Base(DeclarativeBase):
@@ -8,3 +10,66 @@ class Base(DeclarativeBase):
     On n'importe PAS les modèles ici pour éviter les imports circulaires.
     """
     pass
+
+
+class utcnow(FunctionElement):
+    """
+    Heure courante de la base, en UTC sans fuseau (comme les colonnes
+    DateTime de l'application). Utilisable en `server_default` ou en SELECT.
+    Sur PostgreSQL, heure de l'instruction (`clock_timestamp()`) et non du
+    début de la transaction (CURRENT_TIMESTAMP) : une ligne insérée tard
+    dans une longue transaction n'est pas datée de son début.
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _utcnow_default(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(utcnow, "sqlite")
+def _utcnow_sqlite(element, compiler, **kw):
+    # Millisecondes (CURRENT_TIMESTAMP s'arrête à la seconde)
+    return "(strftime('%Y-%m-%d %H:%M:%f', 'now'))"
+
+
+@compiles(utcnow, "postgresql")
+def _utcnow_postgresql(element, compiler, **kw):
+    return "TIMEZONE('utc', clock_timestamp())"
+
+
+class settle_horizon(FunctionElement):
+    """
+    Heure de référence du délai de stabilisation (CHANGES_SETTLE_SECONDS) :
+    l'heure de la base, reculée sur PostgreSQL au début de la plus ancienne
+    transaction d'écriture en cours (autre que la sienne) dans la base.
+    Une ligne qu'elle n'a pas encore validée est datée après ce début ;
+    les lignes insérées après elle aussi, et attendent donc sa fin, quelle
+    que soit sa durée. SQLite sérialise les écritures : rien à reculer.
+
+    Limites : les transactions des autres rôles ne sont visibles dans
+    `pg_stat_activity` qu'avec le rôle `pg_read_all_stats` (sans lui, seul
+    le délai protège de leurs validations tardives) ; la vue est figée au
+    premier accès de la transaction, les lecteurs lisent donc chaque page
+    dans une transaction courte.
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(settle_horizon)
+def _settle_horizon_default(element, compiler, **kw):
+    return compiler.process(utcnow(), **kw)
+
+
+@compiles(settle_horizon, "postgresql")
+def _settle_horizon_postgresql(element, compiler, **kw):
+    # LEAST ignore NULL : aucune écriture en cours = heure courante
+    return (
+        "LEAST(TIMEZONE('utc', clock_timestamp()), "
+        "(SELECT TIMEZONE('utc', min(xact_start)) FROM pg_stat_activity "
+        "WHERE datname = current_database() AND backend_xid IS NOT NULL "
+        "AND pid <> pg_backend_pid()))"
+    )
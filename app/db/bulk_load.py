@@ -0,0 +1,475 @@
+# app/db/bulk_load.py
+"""
+Chargement hors ligne d'historiques de télémétrie (JSONL / CSV).
+
+    python -m app.db.bulk_load statuses-2023.jsonl fleet.csv.gz [--checkpoint PATH]
+
+Une ligne = un statut : `vin` ou `external_id` (identifie le véhicule),
+`timestamp` (ISO 8601 ou epoch en secondes), et les champs de
+`VehicleStatusCreate` (`battery_level`, `doors_locked`, `odometer_km`,
+`latitude`, `longitude`).
+Les CSV ont une ligne d'en-tête et un enregistrement par ligne.
+
+- les fichiers sont lus en flux, par blocs de lignes ; l'analyse et la
+  validation des blocs se font dans un pool de processus ;
+- les véhicules sont résolus par VIN / external_id (cache local, une
+  requête par bloc pour les identifiants inconnus) ;
+- l'écriture se fait par INSERT multi-lignes, ou par COPY sur Postgres,
+  vers la base de statuts du véhicule (shard compris) ;
+- la position atteinte dans chaque fichier est enregistrée après chaque
+  bloc écrit (`--checkpoint`) : relancer la commande reprend au bloc
+  suivant. Le premier bloc repris ignore les statuts déjà présents (même
+  véhicule, même timestamp), au cas où l'arrêt a eu lieu entre l'écriture
+  et l'enregistrement du checkpoint.
+
+Après chaque bloc écrit, le slot de chaque véhicule touché dans la table
+partagée des derniers statuts est invalidé : les workers d'une API en
+marche relisent alors la base au lieu de leur stockage chaud. La
+dernière position des véhicules touchés est recalculée à la fin, ainsi
+que leurs données dérivées (analytique, trajets / recharges), une fois
+les derniers statuts écrits stabilisés (CHANGES_SETTLE_SECONDS) ;
+`--no-refresh` dispense de ces dernières (jobs `analytics_refresh` /
+`segments_refresh` ensuite).
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.db.models.vehicle import Vehicle
+from app.db.models.vehicle_status import VehicleStatus
+from app.db.session import SessionLocal, engine as primary_engine, status_shards
+from app.schemas.vehicle import VehicleStatusCreate
+from app.services.analytics import refresh_vehicle_analytics
+from app.services.latest_status_table import latest_status_table
+from app.services.segments import refresh_vehicle_segments
+from app.services.vehicles import refresh_vehicle_position, to_naive_utc
+
+logger = logging.getLogger("bulk_load")
+
+_TABLE = VehicleStatus.__table__
+_COLUMNS = (
+    "vehicle_id",
+    "timestamp",
+    "battery_level",
+    "doors_locked",
+    "odometer_km",
+    "latitude",
+    "longitude",
+)
+# Lignes par INSERT multi-lignes (7 paramètres par ligne, sous la limite de SQLite)
+_VALUES_PER_INSERT = 500
+_IDENTIFIERS = ("vin", "external_id")
+
+# Statut analysé : (n° de ligne, colonne d'identifiant, identifiant,
+# timestamp, batterie, portes, odomètre, latitude, longitude)
+Parsed = Tuple[
+    int, str, str, datetime, Optional[float], bool, Optional[float], Optional[float], Optional[float]
+]
+
+
+# =====================================================================
+# Analyse (processus du pool)
+# =====================================================================
+
+def _parse_timestamp(value: Any) -> datetime:
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.replace(".", "", 1).isdigit()):
+        return datetime.fromtimestamp(float(value), tz=timezone.utc).replace(tzinfo=None)
+    if not isinstance(value, str) or not value:
+        raise ValueError("missing timestamp")
+    return to_naive_utc(datetime.fromisoformat(value.replace("Z", "+00:00")))
+
+
+def _parse_record(line: int, record: Dict[str, Any]) -> Parsed:
+    for column in _IDENTIFIERS:
+        ident = record.get(column)
+        if ident not in (None, ""):
+            break
+    else:
+        raise ValueError("missing vin / external_id")
+    ts = _parse_timestamp(record.get("timestamp"))
+    data = VehicleStatusCreate.model_validate(
+        {k: v for k, v in record.items() if k in VehicleStatusCreate.model_fields and v not in (None, "")}
+    )
+    return (
+        line,
+        column,
+        str(ident),
+        ts,
+        data.battery_level,
+        data.doors_locked,
+        data.odometer_km,
+        data.latitude,
+        data.longitude,
+    )
+
+
+def parse_chunk(
+    fmt: str,
+    header: Optional[List[str]],
+    lines: List[bytes],
+    first_line: int,
+) -> Tuple[List[Parsed], List[Tuple[int, str]]]:
+    """
+    Analyse et valide un bloc de lignes. Retourne les statuts valides et
+    les erreurs `(numéro de ligne, message)`.
+    """
+    rows: List[Parsed] = []
+    errors: List[Tuple[int, str]] = []
+    for line_no, raw in enumerate(lines, first_line):
+        text = raw.decode("utf-8", errors="replace")
+        if not text.strip():
+            continue
+        try:
+            if fmt == "csv":
+                record = dict(zip(header, next(csv.reader([text]))))
+            else:
+                record = json.loads(text)
+                if not isinstance(record, dict):
+                    raise ValueError("not a JSON object")
+            rows.append(_parse_record(line_no, record))
+        except ValidationError as exc:
+            errors.append((line_no, "; ".join(e["msg"] for e in exc.errors())))
+        except (ValueError, TypeError, csv.Error) as exc:
+            errors.append((line_no, str(exc)))
+    return rows, errors
+
+
+# =====================================================================
+# Lecture en flux
+# =====================================================================
+
+def _format_of(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    return "csv" if name.endswith(".csv") else "jsonl"
+
+
+def _open(path: str):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def _read_chunks(fh, offset: int, line: int, chunk_size: int) -> Iterator[Tuple[int, int, List[bytes]]]:
+    """
+    Blocs de `chunk_size` lignes : (offset après le bloc, n° de sa première ligne, lignes).
+    """
+    fh.seek(offset)
+    lines: List[bytes] = []
+    for raw in fh:
+        offset += len(raw)
+        lines.append(raw)
+        if len(lines) == chunk_size:
+            yield offset, line, lines
+            line += len(lines)
+            lines = []
+    if lines:
+        yield offset, line, lines
+
+
+# =====================================================================
+# Checkpoints
+# =====================================================================
+
+class Checkpoints:
+    """
+    Position atteinte dans chaque fichier, persistée en JSON
+    (écriture atomique par renommage).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                self.files = json.load(fh).get("files", {})
+
+    def get(self, name: str) -> Optional[dict]:
+        return self.files.get(name)
+
+    def set(self, name: str, entry: dict) -> None:
+        self.files[name] = entry
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"files": self.files}, fh)
+        os.replace(tmp, self.path)
+
+
+# =====================================================================
+# Écriture
+# =====================================================================
+
+class Loader:
+    """
+    Résout les véhicules et écrit les statuts vers leur base.
+    """
+
+    def __init__(self, rejects=None):
+        self.vehicle_ids: Dict[Tuple[str, str], Optional[int]] = {}
+        self.touched = set()
+        self.rows = 0
+        self.rejected = 0
+        self.rejects = rejects
+        # Heure (monotonic) de la dernière écriture validée
+        self.last_write: Optional[float] = None
+
+    def reject(self, path: str, line: int, error: str) -> None:
+        self.rejected += 1
+        if self.rejects is not None:
+            self.rejects.write(json.dumps({"file": path, "line": line, "error": error}) + "\n")
+
+    def resolve(self, parsed: List[Parsed]) -> None:
+        for column in _IDENTIFIERS:
+            unknown = {p[2] for p in parsed if p[1] == column and (column, p[2]) not in self.vehicle_ids}
+            if not unknown:
+                continue
+            attr = getattr(Vehicle, column)
+            with primary_engine.connect() as conn:
+                found = dict(conn.execute(select(attr, Vehicle.id).where(attr.in_(unknown))).all())
+            for ident in unknown:
+                self.vehicle_ids[(column, ident)] = found.get(ident)
+
+    @staticmethod
+    def _engine_for(vehicle_id: int) -> Engine:
+        return primary_engine if status_shards is None else status_shards.engine_for(vehicle_id)
+
+    @staticmethod
+    def _drop_existing(conn, rows: List[dict]) -> List[dict]:
+        """
+        Retire les statuts déjà présents (reprise après interruption).
+        """
+        keys = {(r["vehicle_id"], r["timestamp"]) for r in rows}
+        existing = set()
+        key_list = list(keys)
+        for i in range(0, len(key_list), _VALUES_PER_INSERT):
+            existing.update(
+                conn.execute(
+                    select(VehicleStatus.vehicle_id, VehicleStatus.timestamp).where(
+                        tuple_(VehicleStatus.vehicle_id, VehicleStatus.timestamp).in_(key_list[i:i + _VALUES_PER_INSERT])
+                    )
+                ).all()
+            )
+        return [r for r in rows if (r["vehicle_id"], r["timestamp"]) not in existing]
+
+    @staticmethod
+    def _copy(conn, rows: List[dict]) -> None:
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for r in rows:
+            writer.writerow([
+                r["vehicle_id"],
+                r["timestamp"].isoformat(),
+                "" if r["battery_level"] is None else r["battery_level"],
+                "t" if r["doors_locked"] else "f",
+                "" if r["odometer_km"] is None else r["odometer_km"],
+                "" if r["latitude"] is None else r["latitude"],
+                "" if r["longitude"] is None else r["longitude"],
+            ])
+        buf.seek(0)
+        cursor = conn.connection.driver_connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {_TABLE.name} ({', '.join(_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                buf,
+            )
+        finally:
+            cursor.close()
+
+    def write(self, path: str, parsed: List[Parsed], dedupe: bool) -> int:
+        self.resolve(parsed)
+        by_engine: Dict[Engine, List[dict]] = {}
+        for line, column, ident, ts, battery, doors, odometer, latitude, longitude in parsed:
+            vehicle_id = self.vehicle_ids[(column, ident)]
+            if vehicle_id is None:
+                self.reject(path, line, f"unknown vehicle {column}={ident}")
+                continue
+            by_engine.setdefault(self._engine_for(vehicle_id), []).append({
+                "vehicle_id": vehicle_id,
+                "timestamp": ts,
+                "battery_level": battery,
+                "doors_locked": doors,
+                "odometer_km": odometer,
+                "latitude": latitude,
+                "longitude": longitude,
+            })
+
+        written = 0
+        for eng, rows in by_engine.items():
+            with eng.begin() as conn:
+                if dedupe:
+                    rows = self._drop_existing(conn, rows)
+                if not rows:
+                    continue
+                if conn.dialect.name == "postgresql":
+                    self._copy(conn, rows)
+                else:
+                    for i in range(0, len(rows), _VALUES_PER_INSERT):
+                        conn.execute(insert(_TABLE).values(rows[i:i + _VALUES_PER_INSERT]))
+            written += len(rows)
+            self.last_write = time.monotonic()
+            vehicle_ids = {r["vehicle_id"] for r in rows}
+            self.touched.update(vehicle_ids)
+            if latest_status_table is not None:
+                for vehicle_id in vehicle_ids:
+                    latest_status_table.invalidate(vehicle_id)
+        self.rows += written
+        return written
+
+
+def refresh_derived(loader: Loader) -> None:
+    """
+    Rafraîchit l'analytique et les trajets / recharges des véhicules
+    chargés, quels que soient ANALYTICS_REFRESH_ON_INGEST /
+    SEGMENTS_REFRESH_ON_INGEST, après le délai de stabilisation des
+    derniers statuts écrits (sinon ignorés par les rafraîchissements).
+    """
+    if loader.last_write is not None:
+        remaining = loader.last_write + settings.CHANGES_SETTLE_SECONDS - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+    db = SessionLocal()
+    try:
+        for vehicle_id in sorted(loader.touched):
+            try:
+                refresh_vehicle_analytics(db, vehicle_id)
+                refresh_vehicle_segments(db, vehicle_id)
+            except Exception:
+                db.rollback()
+                logger.exception("Derived data refresh failed for vehicle %s", vehicle_id)
+    finally:
+        db.close()
+
+
+# =====================================================================
+# Commande
+# =====================================================================
+
+def load_file(
+    path: str,
+    loader: Loader,
+    executor: ProcessPoolExecutor,
+    checkpoints: Checkpoints,
+    chunk_size: int,
+    window: int,
+    started: float,
+) -> None:
+    name = os.path.abspath(path)
+    state = checkpoints.get(name)
+    if state is not None and state["done"]:
+        logger.info("%s: already loaded, skipped", path)
+        return
+    # Fichier déjà entamé (même sans bloc enregistré) : dédoublonner la reprise
+    resuming = state is not None
+    state = state or {"offset": 0, "line": 1, "done": False}
+    fmt = _format_of(path)
+
+    with _open(path) as fh:
+        header = None
+        if fmt == "csv":
+            raw = fh.readline()
+            header = next(csv.reader([raw.decode("utf-8")]), [])
+            header = [h.strip() for h in header]
+            if not resuming:
+                state.update(offset=len(raw), line=2)
+        checkpoints.set(name, state)
+
+        pending = deque()
+        chunks = _read_chunks(fh, state["offset"], state["line"], chunk_size)
+        last_report = time.monotonic()
+        while True:
+            # Fenêtre de blocs en cours d'analyse (mémoire bornée, ordre conservé)
+            while len(pending) < window:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                end_offset, first_line, lines = chunk
+                future = executor.submit(parse_chunk, fmt, header, lines, first_line)
+                pending.append((end_offset, first_line + len(lines), future))
+            if not pending:
+                break
+
+            end_offset, next_line, future = pending.popleft()
+            parsed, errors = future.result()
+            for line, error in errors:
+                loader.reject(path, line, error)
+            loader.write(path, parsed, dedupe=resuming)
+            resuming = False
+            state.update(offset=end_offset, line=next_line)
+            checkpoints.set(name, state)
+
+            now = time.monotonic()
+            if now - last_report >= 5:
+                last_report = now
+                logger.info(
+                    "%s: line %s, %s rows loaded (%.0f rows/s), %s rejected",
+                    path, next_line, loader.rows, loader.rows / (now - started), loader.rejected,
+                )
+
+    state["done"] = True
+    checkpoints.set(name, state)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(prog="python -m app.db.bulk_load", description=__doc__.split("\n\n")[0])
+    parser.add_argument("files", nargs="+", help="JSONL or CSV files (optionally .gz)")
+    parser.add_argument("--checkpoint", default="bulk_load.checkpoint.json")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="lines per parsed / written chunk")
+    parser.add_argument("--workers", type=int, default=0, help="parsing processes (0 = number of cores)")
+    parser.add_argument("--rejects", help="write rejected lines (file, line, error) to this JSONL file")
+    parser.add_argument("--no-refresh", action="store_true", help="do not refresh derived data afterwards")
+    args = parser.parse_args(argv)
+
+    for path in args.files:
+        if not os.path.exists(path):
+            sys.exit(f"No such file: {path}")
+    if status_shards is not None:
+        status_shards.create_all()
+
+    workers = args.workers or os.cpu_count() or 1
+    checkpoints = Checkpoints(args.checkpoint)
+    rejects = open(args.rejects, "a", encoding="utf-8") if args.rejects else None
+    loader = Loader(rejects=rejects)
+    started = time.monotonic()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            for path in args.files:
+                load_file(path, loader, executor, checkpoints, max(1, args.chunk_size), workers * 2, started)
+    finally:
+        if rejects is not None:
+            rejects.close()
+
+    elapsed = time.monotonic() - started
+    print(
+        f"loaded {loader.rows} statuses for {len(loader.touched)} vehicles in {elapsed:.1f}s "
+        f"({loader.rows / elapsed if elapsed else 0:.0f} rows/s), {loader.rejected} rejected"
+    )
+
+    touched = sorted(loader.touched)
+    if touched:
+        db = SessionLocal()
+        try:
+            for vehicle_id in touched:
+                refresh_vehicle_position(db, vehicle_id)
+        finally:
+            db.close()
+    if touched and not args.no_refresh:
+        logger.info("Refreshing derived data for %s vehicles", len(touched))
+        refresh_derived(loader)
+
+
+if __name__ == "__main__":
+    main()
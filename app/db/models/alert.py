@@ -0,0 +1,80 @@
+# app/db/models/alert.py
+from datetime import datetime
+
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    text,
+)
+
+from app.db.base import Base
+
+
+class AlertRule(Base):
+    """
+    Règle d'alerte : conjonction de conditions sur les champs d'un statut,
+    pour un véhicule ou toute la flotte (`vehicle_id` NULL).
+    """
+    __tablename__ = "alert_rules"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id", ondelete="CASCADE"), nullable=True, index=True)
+    # [{"field": "battery_level", "op": "<", "value": 15}, ...]
+    conditions = Column(JSON, nullable=False)
+    is_active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Alert(Base):
+    """
+    Déclenchement d'une règle pour un véhicule (front montant), résolu au
+    premier statut qui ne la vérifie plus. Une seule alerte ouverte par
+    (règle, véhicule) : l'index unique partiel dédoublonne les écrivains
+    concurrents.
+    """
+    __tablename__ = "alerts"
+    __table_args__ = (
+        Index(
+            "ux_alerts_open",
+            "rule_id",
+            "vehicle_id",
+            unique=True,
+            sqlite_where=text("resolved_at IS NULL"),
+            postgresql_where=text("resolved_at IS NULL"),
+        ),
+        Index("ix_alerts_vehicle_id", "vehicle_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    rule_id = Column(Integer, ForeignKey("alert_rules.id", ondelete="CASCADE"), nullable=False)
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id", ondelete="CASCADE"), nullable=False)
+    # Statut (et son horodatage) qui a déclenché / résolu l'alerte
+    status_id = Column(BigInteger, nullable=False)
+    triggered_at = Column(DateTime, nullable=False)
+    resolved_status_id = Column(BigInteger, nullable=True)
+    resolved_at = Column(DateTime, nullable=True)
+
+
+class AlertFieldMark(Base):
+    """
+    Depuis quand un champ d'un véhicule garde la même valeur : tenu à jour
+    à l'ingestion pour les conditions `unchanged_for`.
+    """
+    __tablename__ = "alert_field_marks"
+
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id", ondelete="CASCADE"), primary_key=True)
+    field = Column(String(32), primary_key=True)
+    value = Column(Float, nullable=False)
+    # Premier et dernier statut vus avec cette valeur
+    since = Column(DateTime, nullable=False)
+    seen_at = Column(DateTime, nullable=False)
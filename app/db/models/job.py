@@ -0,0 +1,35 @@
+# app/db/models/job.py
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, JSON
+
+from app.db.base import Base
+
+
+class Job(Base):
+    """
+    Tâche de fond (export, recalcul...) persistée en base
+    pour survivre aux redémarrages.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    # queued -> running -> succeeded | failed | cancelled
+    status = Column(String, nullable=False, default="queued", index=True)
+    params = Column(JSON, nullable=False, default=dict)
+
+    # Avancement en unités de travail (lots de véhicules)
+    progress = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    # Mis à jour par le runner : un job "running" sans heartbeat récent
+    # appartient à un processus mort et peut être repris.
+    heartbeat_at = Column(DateTime, nullable=True)
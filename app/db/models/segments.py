@@ -0,0 +1,84 @@
+# app/db/models/segments.py
+from sqlalchemy import BigInteger, Column, Integer, DateTime, Float, Boolean, ForeignKey, Index
+
+from app.db.base import Base
+
+
+class ChargingSession(Base):
+    """
+    Recharge détectée dans le flux de statuts : batterie en hausse
+    alors que le véhicule est à l'arrêt.
+    """
+    __tablename__ = "charging_sessions"
+    __table_args__ = (
+        # Liste par véhicule, de la plus récente à la plus ancienne
+        Index("ix_charging_sessions_vehicle_id_started_at", "vehicle_id", "started_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id", ondelete="CASCADE"), nullable=False)
+
+    started_at = Column(DateTime, nullable=False)
+    ended_at = Column(DateTime, nullable=False)
+    start_battery_level = Column(Float, nullable=False)
+    end_battery_level = Column(Float, nullable=False)
+    odometer_km = Column(Float, nullable=True)
+
+    start_status_id = Column(BigInteger, nullable=False)
+    end_status_id = Column(BigInteger, nullable=False)
+    # Encore en cours : peut être prolongée par les prochains statuts
+    ongoing = Column(Boolean, nullable=False, default=True)
+
+    @property
+    def battery_gained_pct(self) -> float:
+        return self.end_battery_level - self.start_battery_level
+
+
+class Trip(Base):
+    """
+    Trajet détecté dans le flux de statuts : odomètre en hausse.
+    """
+    __tablename__ = "trips"
+    __table_args__ = (
+        Index("ix_trips_vehicle_id_started_at", "vehicle_id", "started_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id", ondelete="CASCADE"), nullable=False)
+
+    started_at = Column(DateTime, nullable=False)
+    ended_at = Column(DateTime, nullable=False)
+    start_odometer_km = Column(Float, nullable=False)
+    end_odometer_km = Column(Float, nullable=False)
+    start_battery_level = Column(Float, nullable=True)
+    end_battery_level = Column(Float, nullable=True)
+
+    start_status_id = Column(BigInteger, nullable=False)
+    end_status_id = Column(BigInteger, nullable=False)
+    ongoing = Column(Boolean, nullable=False, default=True)
+
+    @property
+    def distance_km(self) -> float:
+        return self.end_odometer_km - self.start_odometer_km
+
+
+class SegmentDetectorState(Base):
+    """
+    État du détecteur de trajets / recharges d'un véhicule :
+    dernier statut intégré et segments encore ouverts.
+    """
+    __tablename__ = "segment_detector_state"
+
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id", ondelete="CASCADE"), primary_key=True)
+    checkpoint_status_id = Column(BigInteger, nullable=False, default=0)
+
+    last_status_id = Column(BigInteger, nullable=True)
+    last_timestamp = Column(DateTime, nullable=True)
+    last_battery_level = Column(Float, nullable=True)
+    last_odometer_km = Column(Float, nullable=True)
+
+    open_trip_id = Column(Integer, nullable=True)
+    open_charge_id = Column(Integer, nullable=True)
+    # Temps passé depuis la fin du dernier déplacement / de la dernière hausse
+    trip_idle_seconds = Column(Float, nullable=False, default=0.0)
+    charge_idle_seconds = Column(Float, nullable=False, default=0.0)
@@ -1,5 +1,5 @@
 # app/db/models/vehicle.py
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import Boolean, Column, Index, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -7,6 +7,11 @@ from app.db.base import Base
 
 class Vehicle(Base):
     __tablename__ = "vehicles"
+    __table_args__ = (
+        # Recherche par préfixe du nom, paginée par (nom, id) ; le VIN est
+        # unique, son index suffit pour (VIN, id)
+        Index("ix_vehicles_name_id", "name", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     external_id = Column(String, unique=True, index=True, nullable=False)
@@ -14,8 +19,13 @@ class Vehicle(Base):
     vin = Column(String, unique=True, index=True, nullable=False)
     is_active = Column(Boolean, default=True)
 
+    # Historique potentiellement énorme : jamais chargé par l'ORM
+    # (write-only : `vehicle.statuses.select()` pour une requête explicite),
+    # et supprimé par la base (ON DELETE CASCADE) plutôt que ligne à ligne.
     statuses = relationship(
         "VehicleStatus",
         back_populates="vehicle",
         cascade="all, delete-orphan",
+        lazy="write_only",
+        passive_deletes=True,
     )
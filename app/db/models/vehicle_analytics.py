@@ -0,0 +1,44 @@
+# app/db/models/vehicle_analytics.py
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, Integer, DateTime, Date, Float, ForeignKey
+
+from app.db.base import Base
+
+
+class VehicleAnalytics(Base):
+    """
+    Indicateurs cumulés par véhicule, mis à jour incrémentalement
+    à partir des statuts insérés depuis `checkpoint_status_id`.
+    """
+    __tablename__ = "vehicle_analytics"
+
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id", ondelete="CASCADE"), primary_key=True)
+
+    # Dernier statut traité (les suivants restent à intégrer)
+    checkpoint_status_id = Column(BigInteger, nullable=False, default=0)
+    samples = Column(Integer, nullable=False, default=0)
+
+    # État du dernier échantillon, pour calculer les deltas du lot suivant
+    last_timestamp = Column(DateTime, nullable=True)
+    last_battery_level = Column(Float, nullable=True)
+    last_odometer_km = Column(Float, nullable=True)
+
+    # Cumuls
+    total_distance_km = Column(Float, nullable=False, default=0.0)
+    driving_battery_drop_pct = Column(Float, nullable=False, default=0.0)
+    idle_battery_drop_pct = Column(Float, nullable=False, default=0.0)
+    idle_seconds = Column(Float, nullable=False, default=0.0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class VehicleDailyDistance(Base):
+    """
+    Distance parcourue par véhicule et par jour (UTC).
+    """
+    __tablename__ = "vehicle_daily_distance"
+
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    distance_km = Column(Float, nullable=False, default=0.0)
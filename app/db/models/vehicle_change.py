@@ -0,0 +1,23 @@
+# app/db/models/vehicle_change.py
+from sqlalchemy import Column, DateTime, Integer, String
+
+from app.db.base import Base, utcnow
+
+
+class VehicleChange(Base):
+    """
+    Journal des créations, mises à jour et suppressions de véhicules, lu
+    par le flux de changements (GET /changes) dans l'ordre des ids.
+
+    Pas de clé étrangère : la suppression d'un véhicule reste journalisée.
+    """
+    __tablename__ = "vehicle_changes"
+    # Ids jamais réutilisés : ils servent de curseur aux consommateurs
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    vehicle_id = Column(Integer, nullable=False)
+    # created | updated | deleted
+    op = Column(String(16), nullable=False)
+    # Heure de la base, comparée à son horloge par le flux (délai de stabilisation)
+    changed_at = Column(DateTime, nullable=False, server_default=utcnow())
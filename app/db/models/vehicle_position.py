@@ -0,0 +1,20 @@
+# app/db/models/vehicle_position.py
+from sqlalchemy import BigInteger, Column, DateTime, Float, ForeignKey, Integer, String
+
+from app.db.base import Base
+
+
+class VehiclePosition(Base):
+    """
+    Dernière position connue de chaque véhicule, avec son geohash indexé :
+    les recherches par zone parcourent des plages de préfixes de cet index.
+    """
+    __tablename__ = "vehicle_positions"
+
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id", ondelete="CASCADE"), primary_key=True)
+    # Statut d'où vient la position
+    status_id = Column(BigInteger, nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    geohash = Column(String(12), nullable=False, index=True)
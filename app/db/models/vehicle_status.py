@@ -1,21 +1,36 @@
 # app/db/models/vehicle_status.py
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, DateTime, Float, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, DateTime, Float, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
-from app.db.base import Base
+from app.db.base import Base, utcnow
 
 
 class VehicleStatus(Base):
     __tablename__ = "vehicle_status"
+    __table_args__ = (
+        # Historique d'un véhicule par plage de temps (et dernier statut)
+        Index("ix_vehicle_status_vehicle_id_timestamp", "vehicle_id", "timestamp"),
+        # Ids jamais réutilisés après une purge : ils servent de curseur
+        # au flux de changements (GET /changes)
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    vehicle_id = Column(Integer, ForeignKey("vehicles.id"), nullable=False)
+    # Index simple : parcours d'un véhicule dans l'ordre des ids (analytique incrémentale)
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id", ondelete="CASCADE"), nullable=False, index=True)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    # Heure d'insertion selon l'horloge de la base (jamais celle du boîtier) :
+    # fenêtre de stabilisation des lecteurs incrémentaux (GET /changes,
+    # analytique, segments). NULL pour les lignes antérieures à la colonne.
+    created_at = Column(DateTime, server_default=utcnow(), nullable=True)
 
     battery_level = Column(Float, nullable=True)
     doors_locked = Column(Boolean, default=True)
     odometer_km = Column(Float, nullable=True)
+    # Position GPS (degrés WGS84), absente si non remontée
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
 
     vehicle = relationship("Vehicle", back_populates="statuses")
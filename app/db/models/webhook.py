@@ -0,0 +1,85 @@
+# app/db/models/webhook.py
+from datetime import datetime
+
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    text,
+)
+
+from app.db.base import Base
+
+
+class WebhookEndpoint(Base):
+    """
+    Destinataire de webhooks d'un partenaire : URL appelée en POST avec des
+    lots d'événements signés (HMAC-SHA256 de `secret`).
+    """
+    __tablename__ = "webhook_endpoints"
+
+    id = Column(Integer, primary_key=True)
+    url = Column(String(2000), nullable=False)
+    secret = Column(String(200), nullable=False)
+    # Véhicule suivi (NULL = toute la flotte)
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id", ondelete="CASCADE"), nullable=True, index=True)
+    # Lots envoyés en parallèle au plus vers ce destinataire
+    max_concurrency = Column(Integer, nullable=False, default=4)
+    is_active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class OutboxEvent(Base):
+    """
+    Événement à publier, écrit dans la transaction du statut qui le
+    produit (outbox transactionnelle). `dispatched_at` : réparti en
+    livraisons par le dispatcher ; l'événement est supprimé quand il n'a
+    plus de livraison en cours.
+    """
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        Index(
+            "ix_outbox_events_pending",
+            "id",
+            sqlite_where=text("dispatched_at IS NULL"),
+            postgresql_where=text("dispatched_at IS NULL"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    event_type = Column(String(32), nullable=False)
+    vehicle_id = Column(Integer, nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    dispatched_at = Column(DateTime, nullable=True)
+
+
+class WebhookDelivery(Base):
+    """
+    Livraison d'un événement à un destinataire : `pending` (à envoyer à
+    partir de `next_attempt_at`) ou `dead` (abandonnée après
+    WEBHOOK_MAX_ATTEMPTS essais). Supprimée une fois livrée. Réclamée,
+    `next_attempt_at` porte la fin du bail et `lease_token` son détenteur.
+    """
+    __tablename__ = "webhook_deliveries"
+    __table_args__ = (
+        Index("ix_webhook_deliveries_due", "state", "next_attempt_at"),
+        Index("ix_webhook_deliveries_endpoint_id", "endpoint_id", "state"),
+        Index("ix_webhook_deliveries_event_id", "event_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    endpoint_id = Column(Integer, ForeignKey("webhook_endpoints.id", ondelete="CASCADE"), nullable=False)
+    event_id = Column(Integer, ForeignKey("outbox_events.id", ondelete="CASCADE"), nullable=False)
+    state = Column(String(16), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)
+    last_error = Column(Text, nullable=True)
+    # Jeton de la dernière réclamation : seul son détenteur enregistre l'issue
+    lease_token = Column(String(32), nullable=True)
@@ -0,0 +1,109 @@
+# app/db/replicas.py
+import itertools
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class ReplicaRouter:
+    """
+    Choisit le réplica à utiliser pour les lectures.
+
+    - round-robin entre les réplicas sains ;
+    - un réplica dont la connexion est perdue est éjecté pendant
+      `eject_seconds`, puis remis en rotation ; les autres erreurs
+      (requête annulée par la deadline, statement_timeout, erreur SQL)
+      ne disent rien de sa santé et le laissent en rotation ;
+    - fenêtre "read-your-writes" : un client qui vient d'écrire est
+      renvoyé vers le primaire pendant `read_your_writes_seconds`.
+    """
+
+    # Au-delà de cette taille, on purge les entrées expirées de la fenêtre RYW
+    _MAX_TRACKED_WRITERS = 10_000
+
+    def __init__(
+        self,
+        engines: List[Engine],
+        eject_seconds: float = 30.0,
+        read_your_writes_seconds: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.engines = list(engines)
+        self.eject_seconds = eject_seconds
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self._clock = clock
+        self._counter = itertools.count()
+        self._ejected_until: Dict[int, float] = {}
+        self._recent_writers: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+        for idx, eng in enumerate(self.engines):
+            event.listen(eng, "handle_error", self._make_error_handler(idx))
+
+    # -----------------
+    # Santé des réplicas
+    # -----------------
+
+    def _make_error_handler(self, idx: int):
+        def _on_error(context):
+            if context.is_disconnect:
+                self.eject(idx)
+
+        return _on_error
+
+    def eject(self, idx: int) -> None:
+        """
+        Retire temporairement un réplica de la rotation.
+        """
+        with self._lock:
+            self._ejected_until[idx] = self._clock() + self.eject_seconds
+
+    def healthy_indexes(self) -> List[int]:
+        now = self._clock()
+        return [
+            i for i in range(len(self.engines))
+            if self._ejected_until.get(i, 0.0) <= now
+        ]
+
+    def pick(self) -> Optional[Engine]:
+        """
+        Retourne le prochain réplica sain (round-robin),
+        ou None si aucun n'est disponible (on retombe alors sur le primaire).
+        """
+        n = len(self.engines)
+        if n == 0:
+            return None
+        now = self._clock()
+        for _ in range(n):
+            idx = next(self._counter) % n
+            if self._ejected_until.get(idx, 0.0) <= now:
+                return self.engines[idx]
+        return None
+
+    # -----------------
+    # Read-your-writes
+    # -----------------
+
+    def mark_write(self, client_key: Optional[str]) -> None:
+        """
+        Épingle un client sur le primaire pour la durée de la fenêtre RYW.
+        """
+        if not client_key or self.read_your_writes_seconds <= 0:
+            return
+        now = self._clock()
+        with self._lock:
+            self._recent_writers[client_key] = now + self.read_your_writes_seconds
+            if len(self._recent_writers) > self._MAX_TRACKED_WRITERS:
+                self._recent_writers = {
+                    k: until for k, until in self._recent_writers.items()
+                    if until > now
+                }
+
+    def is_pinned(self, client_key: Optional[str]) -> bool:
+        if not client_key:
+            return False
+        until = self._recent_writers.get(client_key)
+        return until is not None and until > self._clock()
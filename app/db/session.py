@@ -1,22 +1,241 @@
 # app/db/session.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from typing import Any, Callable, List, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.requests import HTTPConnection
 
 from app.core.config import settings
+from app.core.deadlines import DeadlineExceeded, current_deadline
+from app.db.replicas import ReplicaRouter
+from app.db.shards import ShardSet
 
-# Pour SQLite, on a besoin de ce paramètre pour le multithreading de SQLAlchemy
-connect_args = {}
-if settings.DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    future=True,
-    echo=False,  # tu peux passer à True pour voir les requêtes SQL en dev
-    connect_args=connect_args,
-)
+def make_engine(url: str):
+    """
+    Construit un engine SQLAlchemy avec les options communes du projet.
+    """
+    # Pour SQLite, on a besoin de ce paramètre pour le multithreading de SQLAlchemy
+    connect_args = {}
+    if url.startswith("sqlite"):
+        connect_args = {"check_same_thread": False}
+
+    eng = create_engine(
+        url,
+        future=True,
+        echo=False,  # tu peux passer à True pour voir les requêtes SQL en dev
+        connect_args=connect_args,
+    )
+    if url.startswith("sqlite"):
+        event.listen(eng, "connect", _enable_sqlite_foreign_keys)
+        event.listen(eng, "checkin", _clear_progress_handler)
+    return eng
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite n'applique les clés étrangères (et ON DELETE CASCADE)
+    # que si on le demande, connexion par connexion.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _clear_progress_handler(dbapi_connection, connection_record):
+    # Une connexion SQLite rendue au pool ne doit plus porter la deadline
+    # de la requête précédente (None : connexion invalidée, déjà fermée).
+    if dbapi_connection is not None:
+        dbapi_connection.set_progress_handler(None, 0)
+
+
+# Engine primaire : toutes les écritures passent par lui
+engine = make_engine(settings.DATABASE_URL)
+
+# Réplicas en lecture (optionnels)
+replica_router: Optional[ReplicaRouter] = None
+if settings.replica_urls:
+    replica_router = ReplicaRouter(
+        [make_engine(url) for url in settings.replica_urls],
+        eject_seconds=settings.REPLICA_EJECT_SECONDS,
+        read_your_writes_seconds=settings.READ_YOUR_WRITES_SECONDS,
+    )
+
+# Shards de télémétrie (optionnels) : vehicle_status réparti par véhicule
+status_shards: Optional[ShardSet] = None
+if settings.status_shard_urls:
+    status_shards = ShardSet(
+        [make_engine(url) for url in settings.status_shard_urls],
+        vnodes=settings.STATUS_SHARD_VNODES,
+        id_stride=settings.STATUS_SHARD_ID_STRIDE,
+    )
+
+
+class RoutingSession(Session):
+    """
+    Session qui envoie les lectures vers un réplica et les écritures
+    vers le primaire.
+
+    Une fois qu'elle a écrit (flush), la session reste sur le primaire
+    jusqu'à sa fermeture, pour ne jamais relire ses propres écritures
+    sur un réplica en retard.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            replica_router is None
+            or self.info.get("use_primary")
+            or self._flushing
+            or (clause is not None and getattr(clause, "is_dml", False))
+        ):
+            return engine
+
+        # Un seul réplica par session : lectures cohérentes entre elles
+        replica = self.info.get("replica")
+        if replica is None:
+            replica = replica_router.pick()
+            if replica is None:
+                return engine
+            self.info["replica"] = replica
+        return replica
+
+    def close(self) -> None:
+        # Sessions ouvertes sur les shards de statuts (voir status_session)
+        for shard_db in self.info.pop("shard_sessions", {}).values():
+            shard_db.close()
+        super().close()
+
+
+class ShardSession(Session):
+    """
+    Session sur un shard de statuts (bind fixé à la création).
+    """
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _pin_to_primary_after_flush(session, flush_context):
+    session.info["use_primary"] = True
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _pin_to_primary_on_dml(orm_execute_state):
+    # INSERT / UPDATE / DELETE exécutés directement (hors flush ORM)
+    if (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        orm_execute_state.session.info["use_primary"] = True
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _record_write_for_client(session):
+    if not session.info.pop("wrote", False):
+        return
+    if replica_router is not None:
+        replica_router.mark_write(session.info.get("client_key"))
+
+
+# Nombre d'instructions de la VM SQLite entre deux vérifications de la deadline
+_SQLITE_PROGRESS_STEPS = 1000
+
+
+@event.listens_for(RoutingSession, "after_begin")
+@event.listens_for(ShardSession, "after_begin")
+def _apply_deadline(session, transaction, connection):
+    """
+    Propage le budget restant de la requête HTTP à la transaction :
+    `SET LOCAL statement_timeout` sur Postgres, interruption via
+    progress handler sur SQLite (aussi en cas de déconnexion du client).
+    """
+    deadline = session.info.get("deadline")
+    if deadline is None:
+        return
+    if deadline.exhausted():
+        raise DeadlineExceeded("Request deadline exceeded")
+
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        timeout_ms = max(1, int(deadline.remaining() * 1000))
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+    elif dialect == "sqlite":
+        connection.connection.driver_connection.set_progress_handler(
+            lambda: 1 if deadline.exhausted() else 0,
+            _SQLITE_PROGRESS_STEPS,
+        )
+
+
+def use_primary(db: Session) -> Session:
+    """
+    Force une session à lire sur le primaire (lectures critiques).
+    """
+    db.info["use_primary"] = True
+    return db
+
+
+def _shard_session(db: Session, index: int) -> ShardSession:
+    shard_db = ShardSession(bind=status_shards.engines[index], autoflush=False)
+    shard_db.info["deadline"] = db.info.get("deadline")
+    return shard_db
+
+
+def status_session(db: Session, vehicle_id: int) -> Session:
+    """
+    Session qui porte les statuts d'un véhicule : `db` lui-même sans
+    sharding, sinon une session sur le shard du véhicule, ouverte à la
+    demande et fermée avec `db`.
+    """
+    if status_shards is None:
+        return db
+    index = status_shards.shard_for(vehicle_id)
+    sessions = db.info.setdefault("shard_sessions", {})
+    shard_db = sessions.get(index)
+    if shard_db is None:
+        shard_db = sessions[index] = _shard_session(db, index)
+    return shard_db
+
+
+def release_status_session(db: Session, status_db: Session) -> None:
+    """
+    Termine la transaction (de lecture) ouverte sur un shard, pour ne pas
+    bloquer ses écrivains pendant un traitement long. Sans effet sans sharding.
+    """
+    if status_db is not db:
+        status_db.commit()
+
+
+def status_database_name(status_db: Session) -> str:
+    """
+    Nom de la base de statuts d'une session obtenue par `status_session`
+    ou `fan_out_statuses` : "main" sans sharding, sinon celui du shard.
+    """
+    if status_shards is None:
+        return "main"
+    return status_shards.names[status_shards.engines.index(status_db.bind)]
+
+
+def fan_out_statuses(db: Session, fn: Callable[[Session], Any]) -> List[Any]:
+    """
+    Applique `fn(session)` à chaque base de statuts et retourne la liste
+    des résultats : `db` seul sans sharding, sinon tous les shards
+    en parallèle (une session par shard).
+    """
+    if status_shards is None:
+        return [fn(db)]
+
+    def run(index: int) -> Any:
+        shard_db = _shard_session(db, index)
+        try:
+            return fn(shard_db)
+        finally:
+            shard_db.close()
+
+    return list(status_shards.executor.map(run, range(len(status_shards))))
+
 
 SessionLocal = sessionmaker(
+    class_=RoutingSession,
     autocommit=False,
     autoflush=False,
     bind=engine,
@@ -24,13 +243,37 @@ SessionLocal = sessionmaker(
 )
 
 
-def get_db():
+def client_key_for(conn: Optional[HTTPConnection]) -> Optional[str]:
+    """
+    Identifie un client pour la fenêtre read-your-writes :
+    en-tête `X-Client-Id` si présent, sinon l'adresse IP.
+    """
+    if conn is None:
+        return None
+    header = conn.headers.get("x-client-id")
+    if header:
+        return header
+    return conn.client.host if conn.client else None
+
+
+def get_db(conn: HTTPConnection):
     """
     Dépendance FastAPI qui fournit une session DB
     et s'assure qu'elle est fermée après usage.
     """
     db = SessionLocal()
+    key = client_key_for(conn)
+    db.info["client_key"] = key
+    if replica_router is not None and replica_router.is_pinned(key):
+        use_primary(db)
+    deadline = current_deadline.get()
+    db.info["deadline"] = deadline
     try:
         yield db
+    except OperationalError as exc:
+        # Requête SQL interrompue par la deadline (ou client déconnecté)
+        if deadline is not None and deadline.exhausted():
+            raise DeadlineExceeded("Request deadline exceeded") from exc
+        raise
     finally:
         db.close()
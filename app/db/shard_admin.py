@@ -0,0 +1,332 @@
+# app/db/shard_admin.py
+"""
+Administration hors ligne des shards de télémétrie (STATUS_SHARD_URLS).
+
+    python -m app.db.shard_admin init
+    python -m app.db.shard_admin status
+    python -m app.db.shard_admin rebalance [--source URL ...] [--journal PATH]
+
+`rebalance` déplace chaque véhicule mal placé vers le shard que lui
+attribue l'anneau actuel (après ajout / retrait d'un shard), ou importe
+l'historique d'une base non shardée (`--source DATABASE_URL`). À lancer
+API arrêtée.
+
+Les statuts d'un véhicule déplacé sont renumérotés dans la plage d'ids
+du shard cible (dans le même ordre), et les références vers ces ids
+(checkpoints de l'analytique et de la détection de trajets) sont
+ajustées. Chaque déplacement est journalisé (`--journal`) : une commande
+interrompue reprend là où elle s'était arrêtée.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.db.models.segments import ChargingSession, SegmentDetectorState, Trip
+from app.db.models.vehicle_analytics import VehicleAnalytics
+from app.db.session import engine as primary_engine, make_engine, status_shards
+from app.db.shards import ShardSet, shard_status_table
+from app.services.latest_status_table import latest_status_table
+
+logger = logging.getLogger("shard_admin")
+
+_STATUS_COLUMNS = [c for c in shard_status_table.c if c.name != "id"]
+
+# Colonnes de la base principale qui référencent un id de statut
+_STATUS_REFERENCES = [
+    (VehicleAnalytics, VehicleAnalytics.checkpoint_status_id),
+    (SegmentDetectorState, SegmentDetectorState.checkpoint_status_id),
+    (SegmentDetectorState, SegmentDetectorState.last_status_id),
+    (Trip, Trip.start_status_id),
+    (Trip, Trip.end_status_id),
+    (ChargingSession, ChargingSession.start_status_id),
+    (ChargingSession, ChargingSession.end_status_id),
+]
+
+
+# =====================================================================
+# Journal de reprise
+# =====================================================================
+
+class Journal:
+    """
+    Déplacements en cours, persistés dans un fichier JSON
+    (écriture atomique par renommage).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.moves: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                self.moves = json.load(fh).get("moves", {})
+
+    def save(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"moves": self.moves}, fh)
+        os.replace(tmp, self.path)
+
+    def set(self, vehicle_id: int, entry: dict) -> None:
+        self.moves[str(vehicle_id)] = entry
+        self.save()
+
+    def done(self, vehicle_id: int) -> None:
+        self.moves.pop(str(vehicle_id), None)
+        if self.moves:
+            self.save()
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# =====================================================================
+# Déplacement d'un véhicule
+# =====================================================================
+
+def _status_references(vehicle_id: int) -> List[int]:
+    ids = set()
+    with primary_engine.connect() as conn:
+        for model, column in _STATUS_REFERENCES:
+            ids.update(
+                conn.execute(
+                    select(column).where(model.vehicle_id == vehicle_id, column.isnot(None))
+                ).scalars()
+            )
+    return sorted(ids)
+
+
+def _copy_vehicle(
+    vehicle_id: int,
+    source: Engine,
+    target: Engine,
+    refs: List[int],
+    chunk_size: int,
+) -> Tuple[int, Dict[int, int]]:
+    """
+    Copie les statuts d'un véhicule vers le shard cible (nouveaux ids,
+    même ordre), en une transaction côté cible. Retourne le nombre de
+    lignes copiées et la correspondance ancien id -> nouvel id des
+    références (id du dernier statut copié dont l'ancien id est <= ref).
+    """
+    table = shard_status_table
+    mapping: Dict[int, int] = {}
+    pos = 0
+    last_new = 0
+    last_old = 0
+    copied = 0
+    with source.connect() as src, target.begin() as dst:
+        while True:
+            rows = src.execute(
+                select(table.c.id, *_STATUS_COLUMNS)
+                .where(table.c.vehicle_id == vehicle_id, table.c.id > last_old)
+                .order_by(table.c.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            new_ids = dst.execute(
+                insert(table).returning(table.c.id, sort_by_parameter_order=True),
+                [{c.name: getattr(row, c.name) for c in _STATUS_COLUMNS} for row in rows],
+            ).scalars().all()
+            for row, new_id in zip(rows, new_ids):
+                while pos < len(refs) and refs[pos] < row.id:
+                    mapping[refs[pos]] = last_new
+                    pos += 1
+                if pos < len(refs) and refs[pos] == row.id:
+                    mapping[refs[pos]] = new_id
+                    pos += 1
+                last_new = new_id
+            last_old = rows[-1].id
+            copied += len(rows)
+            src.rollback()
+    for ref in refs[pos:]:
+        mapping[ref] = last_new
+    return copied, mapping
+
+
+def _remap_references(vehicle_id: int, mapping: Dict[int, int]) -> None:
+    with primary_engine.begin() as conn:
+        for model, column in _STATUS_REFERENCES:
+            for old, new in mapping.items():
+                conn.execute(
+                    update(model)
+                    .where(model.vehicle_id == vehicle_id, column == old)
+                    .values({column.key: new})
+                )
+
+
+def _delete_vehicle_rows(engine: Engine, vehicle_id: int, chunk_size: int, above: int = 0) -> int:
+    table = shard_status_table
+    deleted = 0
+    while True:
+        with engine.begin() as conn:
+            chunk = (
+                select(table.c.id)
+                .where(table.c.vehicle_id == vehicle_id, table.c.id > above)
+                .limit(chunk_size)
+            )
+            res = conn.execute(delete(table).where(table.c.id.in_(chunk.scalar_subquery())))
+        deleted += res.rowcount
+        if res.rowcount < chunk_size:
+            return deleted
+
+
+def _max_vehicle_id(engine: Engine, vehicle_id: int) -> int:
+    table = shard_status_table
+    with engine.connect() as conn:
+        return conn.execute(
+            select(func.max(table.c.id)).where(table.c.vehicle_id == vehicle_id)
+        ).scalar() or 0
+
+
+def move_vehicle(
+    shards: ShardSet,
+    journal: Journal,
+    vehicle_id: int,
+    source_label: str,
+    source: Engine,
+    target_index: int,
+    chunk_size: int,
+) -> int:
+    """
+    Déplace l'historique d'un véhicule vers le shard `target_index`.
+    Étapes journalisées : copying -> copied -> remapped -> (supprimé).
+    """
+    target = shards.engines[target_index]
+    entry = journal.moves.get(str(vehicle_id))
+
+    if entry is None or entry["state"] == "copying":
+        if entry is None:
+            entry = {
+                "source": source_label,
+                "target": target_index,
+                "state": "copying",
+                # Lignes du véhicule déjà présentes sur la cible avant la copie
+                "target_floor": _max_vehicle_id(target, vehicle_id),
+            }
+            journal.set(vehicle_id, entry)
+        else:
+            # Copie interrompue : on retire ce qui a pu être committé
+            _delete_vehicle_rows(target, vehicle_id, chunk_size, above=entry["target_floor"])
+        copied, mapping = _copy_vehicle(
+            vehicle_id, source, target, _status_references(vehicle_id), chunk_size
+        )
+        entry.update(state="copied", copied=copied, mapping={str(k): v for k, v in mapping.items()})
+        journal.set(vehicle_id, entry)
+
+    if entry["state"] == "copied":
+        _remap_references(vehicle_id, {int(k): v for k, v in entry["mapping"].items()})
+        entry["state"] = "remapped"
+        journal.set(vehicle_id, entry)
+
+    _delete_vehicle_rows(source, vehicle_id, chunk_size)
+    if latest_status_table is not None:
+        latest_status_table.invalidate(vehicle_id)
+    journal.done(vehicle_id)
+    return entry.get("copied", 0)
+
+
+# =====================================================================
+# Commandes
+# =====================================================================
+
+def _require_shards() -> ShardSet:
+    if status_shards is None:
+        sys.exit("STATUS_SHARD_URLS is not set: sharding is disabled")
+    return status_shards
+
+
+def _vehicle_ids(engine: Engine) -> List[int]:
+    with engine.connect() as conn:
+        return conn.execute(
+            select(shard_status_table.c.vehicle_id).distinct().order_by(shard_status_table.c.vehicle_id)
+        ).scalars().all()
+
+
+def cmd_init(args) -> None:
+    shards = _require_shards()
+    shards.create_all()
+    for name, url in zip(shards.names, settings.status_shard_urls):
+        print(f"{name}: ready ({url})")
+
+
+def cmd_status(args) -> None:
+    shards = _require_shards()
+    for index, (name, eng) in enumerate(zip(shards.names, shards.engines)):
+        vehicle_ids = _vehicle_ids(eng)
+        with eng.connect() as conn:
+            rows = conn.execute(select(func.count()).select_from(shard_status_table)).scalar()
+        misplaced = sum(1 for vid in vehicle_ids if shards.shard_for(vid) != index)
+        print(f"{name}: {len(vehicle_ids)} vehicles, {rows} statuses, {misplaced} misplaced vehicles")
+
+
+def cmd_rebalance(args) -> None:
+    shards = _require_shards()
+    shards.create_all()
+    journal = Journal(args.journal)
+
+    sources: List[Tuple[str, Engine, Optional[int]]] = [
+        (name, eng, index) for index, (name, eng) in enumerate(zip(shards.names, shards.engines))
+    ]
+    for url in args.source:
+        eng = primary_engine if url == settings.DATABASE_URL else make_engine(url)
+        sources.append((url, eng, None))
+    by_label = {label: eng for label, eng, _ in sources}
+
+    # Reprise des déplacements interrompus
+    for vid, entry in list(journal.moves.items()):
+        source = by_label.get(entry["source"])
+        if source is None:
+            sys.exit(f"Interrupted move of vehicle {vid} needs source {entry['source']!r}")
+        logger.info("Resuming move of vehicle %s (%s)", vid, entry["state"])
+        move_vehicle(shards, journal, int(vid), entry["source"], source, entry["target"], args.chunk_size)
+
+    moved = rows = 0
+    for label, eng, index in sources:
+        for vid in _vehicle_ids(eng):
+            target = shards.shard_for(vid)
+            if target == index:
+                continue
+            if args.dry_run:
+                print(f"vehicle {vid}: {label} -> {shards.names[target]}")
+                moved += 1
+                continue
+            copied = move_vehicle(shards, journal, vid, label, eng, target, args.chunk_size)
+            logger.info("vehicle %s: %s -> %s (%s statuses)", vid, label, shards.names[target], copied)
+            moved += 1
+            rows += copied
+    print(f"{'would move' if args.dry_run else 'moved'} {moved} vehicles ({rows} statuses)")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(prog="python -m app.db.shard_admin", description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("init", help="create the status table on every shard").set_defaults(func=cmd_init)
+    sub.add_parser("status", help="rows and misplaced vehicles per shard").set_defaults(func=cmd_status)
+
+    rebalance = sub.add_parser("rebalance", help="move misplaced vehicles to their shard")
+    rebalance.add_argument(
+        "--source",
+        action="append",
+        default=[],
+        help="extra database to drain (removed shard, or DATABASE_URL to import an unsharded history)",
+    )
+    rebalance.add_argument("--journal", default="shard_rebalance.journal.json")
+    rebalance.add_argument("--chunk-size", type=int, default=settings.PURGE_CHUNK_SIZE)
+    rebalance.add_argument("--dry-run", action="store_true")
+    rebalance.set_defaults(func=cmd_rebalance)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# app/db/shards.py
+"""
+Sharding optionnel de la télémétrie (`vehicle_status`) par véhicule.
+
+- chaque shard est une base distincte (fichier SQLite ou Postgres) qui ne
+  contient que la table `vehicle_status` (sans clé étrangère : `vehicles`
+  reste sur la base principale) ;
+- un véhicule est affecté à un shard par hachage cohérent de son id
+  (anneau avec nœuds virtuels) : ajouter un shard ne déplace qu'environ
+  1/N des véhicules ;
+- chaque shard alloue ses ids de statuts dans sa propre plage
+  (`index * id_stride`), les ids restent donc uniques sur toute la flotte
+  (un véhicule déplacé par le rééquilibrage est renuméroté dans la plage
+  de son nouveau shard).
+
+Le routage des sessions est fait dans app/db/session.py
+(`status_session`, `fan_out_statuses`) ; le rééquilibrage hors ligne par
+`python -m app.db.shard_admin`.
+"""
+import bisect
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    MetaData,
+    Table,
+    inspect,
+    text,
+)
+from sqlalchemy.engine import Engine
+
+from app.db.base import utcnow
+
+# Schéma d'un shard : mêmes colonnes et index que VehicleStatus,
+# ids en BIGINT (plages par shard), AUTOINCREMENT sur SQLite pour que
+# la plage initiale soit respectée.
+shard_metadata = MetaData()
+shard_status_table = Table(
+    "vehicle_status",
+    shard_metadata,
+    Column("id", BigInteger().with_variant(Integer, "sqlite"), primary_key=True),
+    Column("vehicle_id", Integer, nullable=False, index=True),
+    Column("timestamp", DateTime, index=True),
+    Column("battery_level", Float, nullable=True),
+    Column("doors_locked", Boolean),
+    Column("odometer_km", Float, nullable=True),
+    Column("latitude", Float, nullable=True),
+    Column("longitude", Float, nullable=True),
+    Column("created_at", DateTime, server_default=utcnow(), nullable=True),
+    Index("ix_vehicle_status_vehicle_id_timestamp", "vehicle_id", "timestamp"),
+    sqlite_autoincrement=True,
+)
+
+
+def _hash64(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Anneau de hachage cohérent : `vnodes` points par shard.
+    """
+
+    def __init__(self, names: List[str], vnodes: int = 64):
+        points: List[Tuple[int, int]] = []
+        for index, name in enumerate(names):
+            for v in range(vnodes):
+                points.append((_hash64(f"{name}#{v}"), index))
+        points.sort()
+        self._keys = [p[0] for p in points]
+        self._owners = [p[1] for p in points]
+
+    def lookup(self, vehicle_id: int) -> int:
+        pos = bisect.bisect(self._keys, _hash64(str(vehicle_id)))
+        return self._owners[pos % len(self._owners)]
+
+
+class ShardSet:
+    """
+    Ensemble des engines de shards et affectation des véhicules.
+
+    Les shards sont nommés d'après leur position (`shard0`, `shard1`, ...) :
+    ajouter une URL en fin de liste conserve l'affectation des autres.
+    """
+
+    def __init__(self, engines: List[Engine], vnodes: int = 64, id_stride: int = 1 << 40):
+        if not engines:
+            raise ValueError("At least one shard is required")
+        self.engines = list(engines)
+        self.names = [f"shard{i}" for i in range(len(self.engines))]
+        self.id_stride = id_stride
+        self.ring = HashRing(self.names, vnodes=vnodes)
+        self.executor = ThreadPoolExecutor(
+            max_workers=len(self.engines), thread_name_prefix="shard"
+        )
+
+    def __len__(self) -> int:
+        return len(self.engines)
+
+    def shard_for(self, vehicle_id: int) -> int:
+        return self.ring.lookup(vehicle_id)
+
+    def engine_for(self, vehicle_id: int) -> Engine:
+        return self.engines[self.shard_for(vehicle_id)]
+
+    def id_range(self, index: int) -> Tuple[int, int]:
+        """
+        Plage [début, fin) des ids alloués par un shard.
+        """
+        return index * self.id_stride, (index + 1) * self.id_stride
+
+    # -----------------
+    # Schéma
+    # -----------------
+
+    def create_all(self) -> None:
+        """
+        Crée la table des statuts sur chaque shard (idempotent), y ajoute
+        les colonnes apparues depuis et aligne leurs défauts (les shards
+        n'ont pas de migrations Alembic ; nouvelles colonnes toujours
+        nullables) et place son
+        compteur d'ids au début de la plage du shard.
+        """
+        for index, eng in enumerate(self.engines):
+            shard_metadata.create_all(eng)
+            with eng.begin() as conn:
+                self._add_missing_columns(conn)
+                self._init_id_sequence(conn, index)
+
+    @staticmethod
+    def _add_missing_columns(conn) -> None:
+        existing = {c["name"] for c in inspect(conn).get_columns(shard_status_table.name)}
+        for column in shard_status_table.columns:
+            if column.name not in existing:
+                ddl = (
+                    f"ALTER TABLE {shard_status_table.name} ADD COLUMN {column.name} "
+                    f"{column.type.compile(dialect=conn.dialect)}"
+                )
+                # SQLite refuse un défaut non constant dans ADD COLUMN ; ses
+                # écritures sont sérialisées, aucun id n'y est validé en retard
+                if column.server_default is not None and conn.dialect.name != "sqlite":
+                    ddl += f" DEFAULT {column.server_default.arg.compile(dialect=conn.dialect)}"
+                conn.execute(text(ddl))
+            elif column.server_default is not None and conn.dialect.name != "sqlite":
+                # Défaut redéfini depuis (heure d'insertion : voir `utcnow`)
+                conn.execute(text(
+                    f"ALTER TABLE {shard_status_table.name} ALTER COLUMN {column.name} "
+                    f"SET DEFAULT {column.server_default.arg.compile(dialect=conn.dialect)}"
+                ))
+
+    def _init_id_sequence(self, conn, index: int) -> None:
+        start, _ = self.id_range(index)
+        if start == 0:
+            return
+        dialect = conn.dialect.name
+        if dialect == "sqlite":
+            current = conn.execute(
+                text("SELECT seq FROM sqlite_sequence WHERE name = 'vehicle_status'")
+            ).scalar()
+            if current is None:
+                conn.execute(
+                    text("INSERT INTO sqlite_sequence (name, seq) VALUES ('vehicle_status', :seq)"),
+                    {"seq": start},
+                )
+            elif current < start:
+                conn.execute(
+                    text("UPDATE sqlite_sequence SET seq = :seq WHERE name = 'vehicle_status'"),
+                    {"seq": start},
+                )
+        elif dialect == "postgresql":
+            sequence = conn.execute(
+                text("SELECT pg_get_serial_sequence('vehicle_status', 'id')")
+            ).scalar()
+            current = conn.execute(text(f"SELECT last_value FROM {sequence}")).scalar()
+            if current < start:
+                conn.execute(text("SELECT setval(:seq, :value)"), {"seq": sequence, "value": start})
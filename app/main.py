@@ -1,10 +1,73 @@
 # app/main.py
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+import anyio.to_thread
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
 
+from app.core.admission import AdmissionControlMiddleware
 from app.core.config import settings
+from app.core.deadlines import DeadlineExceeded, DeadlineMiddleware
 from app.api.v1.router import api_router
+from app.db.session import SessionLocal, status_shards
+from app.services.alerts import rule_index
+from app.services.fleet_summary import fleet_counters
+from app.services.hot_store import hot_store
+from app.services.ingest_hooks import derived_refresh_enabled, derived_refresher
+from app.services.jobs import job_runner
+from app.services.webhooks import webhook_dispatcher
+
+
+# =====================================================================
+# Démarrage / arrêt
+# =====================================================================
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Taille du pool de threads qui exécute les endpoints synchrones
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+
+    # Shards de télémétrie : schéma créé si besoin (idempotent)
+    if status_shards is not None:
+        status_shards.create_all()
+
+    # Stockage chaud : derniers statuts de chaque véhicule, en une requête
+    if hot_store is not None:
+        db = SessionLocal()
+        try:
+            await anyio.to_thread.run_sync(hot_store.warm, db)
+        finally:
+            db.close()
+
+    # Règles d'alerte compilées, puis rechargées périodiquement
+    if settings.ALERTS_ENABLED:
+        rule_index.start()
+    # Totaux de la flotte : calculés au démarrage, puis réconciliés périodiquement
+    if settings.FLEET_SUMMARY_ENABLED:
+        fleet_counters.start()
+    if settings.JOBS_RUNNER_ENABLED:
+        job_runner.start()
+    if settings.WEBHOOKS_ENABLED:
+        webhook_dispatcher.start()
+    # Données dérivées : rafraîchies une fois les statuts ingérés stabilisés
+    if derived_refresh_enabled():
+        derived_refresher.start()
+    try:
+        yield
+    finally:
+        if derived_refresh_enabled():
+            derived_refresher.stop()
+        if settings.WEBHOOKS_ENABLED:
+            webhook_dispatcher.stop()
+        if settings.JOBS_RUNNER_ENABLED:
+            job_runner.stop()
+        if settings.FLEET_SUMMARY_ENABLED:
+            fleet_counters.stop()
+        if settings.ALERTS_ENABLED:
+            rule_index.stop()
 
 
 # =====================================================================
@@ -16,6 +79,7 @@ app = FastAPI(
     version=getattr(settings, "VERSION", "0.1.0"),
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 
@@ -41,6 +105,27 @@ app.add_middleware(
 )
 
 
+# Compression gzip négociée (Accept-Encoding) pour les réponses volumineuses,
+# notamment l'historique de télémétrie.
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE)
+
+
+# Deadline par requête, propagée jusqu'aux requêtes SQL
+app.add_middleware(DeadlineMiddleware)
+
+# Contrôle d'admission : ajouté en dernier, donc exécuté en premier
+# (les requêtes rejetées ne coûtent ni thread ni connexion DB).
+app.add_middleware(AdmissionControlMiddleware)
+
+
+@app.exception_handler(DeadlineExceeded)
+def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={"detail": "Request deadline exceeded"},
+    )
+
+
 # =====================================================================
 # Routes de base
 # =====================================================================
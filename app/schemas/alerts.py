@@ -0,0 +1,67 @@
+# app/schemas/alerts.py
+from datetime import datetime
+from typing import List, Literal, Optional, Union
+
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+AlertField = Literal["battery_level", "odometer_km", "latitude", "longitude", "doors_locked"]
+AlertOp = Literal["<", "<=", ">", ">=", "==", "unchanged_for"]
+
+# Champs numériques (comparaisons, `unchanged_for`) ; doors_locked : `==` seulement
+NUMERIC_FIELDS = ("battery_level", "odometer_km", "latitude", "longitude")
+
+
+class AlertCondition(BaseModel):
+    """
+    Condition sur un champ du statut. `unchanged_for` : valeur en secondes
+    pendant lesquelles le champ n'a pas changé.
+    """
+    field: AlertField
+    op: AlertOp
+    value: Union[bool, float]
+
+    @model_validator(mode="after")
+    def _op_fits_field(self):
+        if self.field == "doors_locked":
+            if self.op != "==" or not isinstance(self.value, bool):
+                raise ValueError("doors_locked only supports '==' with a boolean value")
+        elif isinstance(self.value, bool):
+            raise ValueError(f"{self.field} needs a numeric value")
+        elif self.op == "unchanged_for" and self.value <= 0:
+            raise ValueError("unchanged_for needs a positive duration in seconds")
+        return self
+
+
+class AlertRuleCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    vehicle_id: Optional[int] = Field(
+        None,
+        description="Véhicule surveillé (absent = toute la flotte).",
+    )
+    conditions: List[AlertCondition] = Field(
+        ...,
+        min_length=1,
+        max_length=8,
+        description="Conditions, toutes requises (ET).",
+    )
+    is_active: bool = True
+
+
+class AlertRuleRead(AlertRuleCreate):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class AlertRead(BaseModel):
+    id: int
+    rule_id: int
+    vehicle_id: int
+    status_id: int
+    triggered_at: datetime
+    resolved_status_id: Optional[int] = None
+    resolved_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,38 @@
+# app/schemas/analytics.py
+from datetime import date, datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class DailyDistanceRead(BaseModel):
+    day: date
+    distance_km: float
+
+
+class VehicleAnalyticsRead(BaseModel):
+    """
+    Indicateurs énergétiques d'un véhicule, calculés incrémentalement.
+    """
+    vehicle_id: int
+    samples: int = Field(0, description="Nombre de statuts intégrés.")
+    checkpoint_status_id: int = Field(0, description="Dernier statut intégré.")
+    last_timestamp: Optional[datetime] = None
+    total_distance_km: float = 0.0
+    driving_battery_drop_pct: float = Field(
+        0.0, description="Baisse de batterie cumulée en roulant (points de %)."
+    )
+    idle_battery_drop_pct: float = Field(
+        0.0, description="Baisse de batterie cumulée à l'arrêt (points de %)."
+    )
+    idle_hours: float = 0.0
+    consumption_kwh_per_100km: Optional[float] = Field(
+        None, description="Consommation estimée (capacité BATTERY_CAPACITY_KWH)."
+    )
+    battery_pct_per_100km: Optional[float] = None
+    idle_drain_pct_per_day: Optional[float] = None
+    daily_distance: List[DailyDistanceRead] = Field(
+        default_factory=list,
+        description="Distance par jour (UTC) sur les ANALYTICS_DAILY_DAYS derniers jours.",
+    )
+    updated_at: Optional[datetime] = None
@@ -0,0 +1,36 @@
+# app/schemas/changes.py
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.schemas.vehicle import VehicleRead, VehicleStatusRead
+
+
+class VehicleChangeRead(BaseModel):
+    """
+    Entrée du journal des véhicules.
+    """
+    id: int
+    vehicle_id: int
+    op: str = Field(..., description="created | updated | deleted")
+    changed_at: datetime
+    vehicle: Optional[VehicleRead] = Field(
+        None,
+        description="État actuel du véhicule (absent s'il a été supprimé depuis).",
+    )
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ChangeFeedRead(BaseModel):
+    """
+    Page du flux de changements.
+    """
+    statuses: List[VehicleStatusRead]
+    vehicles: List[VehicleChangeRead]
+    next_cursor: str = Field(..., description="Curseur opaque à repasser pour la page suivante.")
+    has_more: bool = Field(
+        ...,
+        description="True si d'autres changements sont déjà disponibles (rappeler sans attendre).",
+    )
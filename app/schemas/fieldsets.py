@@ -0,0 +1,77 @@
+# app/schemas/fieldsets.py
+"""
+Sparse fieldsets (`?fields=timestamp,battery_level`).
+
+Les champs demandés sont validés contre le schéma de lecture, puis
+projetés en SQL (sélection de colonnes) par la couche service. La
+sérialisation passe par un encodeur compilé et mis en cache par
+fieldset, sans validation Pydantic ligne par ligne.
+"""
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+
+class InvalidFieldsetError(ValueError):
+    """
+    Levée quand `?fields=` contient un champ inconnu du schéma.
+    """
+
+
+def parse_fieldset(
+    raw: Optional[str],
+    model: Type[BaseModel],
+) -> Optional[Tuple[str, ...]]:
+    """
+    Transforme `"a, b,a"` en `("a", "b")` en validant contre `model`.
+    Retourne None si aucun fieldset n'est demandé.
+    """
+    if raw is None or not raw.strip():
+        return None
+
+    fields = []
+    for name in raw.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in model.model_fields:
+            raise InvalidFieldsetError(f"Unknown field '{name}'")
+        if name not in fields:
+            fields.append(name)
+    return tuple(fields)
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return None if value is None else value.isoformat()
+
+
+# Convertisseurs JSON par type déclaré dans le schéma
+_CONVERTERS: Dict[Any, Callable[[Any], Any]] = {
+    datetime: _iso,
+    Optional[datetime]: _iso,
+}
+
+
+@lru_cache(maxsize=256)
+def fieldset_encoder(
+    model: Type[BaseModel],
+    fields: Tuple[str, ...],
+) -> Callable[[Any], Dict[str, Any]]:
+    """
+    Construit (une seule fois par fieldset) une fonction qui transforme
+    une ligne SQL projetée (tuple dans l'ordre de `fields`) en dict JSON.
+    """
+    converters = [
+        (i, name, _CONVERTERS.get(model.model_fields[name].annotation))
+        for i, name in enumerate(fields)
+    ]
+
+    def encode(row) -> Dict[str, Any]:
+        return {
+            name: (conv(row[i]) if conv is not None else row[i])
+            for i, name, conv in converters
+        }
+
+    return encode
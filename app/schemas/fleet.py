@@ -0,0 +1,30 @@
+# app/schemas/fleet.py
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class BatteryBucket(BaseModel):
+    """
+    Tranche de l'histogramme des niveaux de batterie : [min, max[
+    (la dernière tranche inclut max).
+    """
+    min: float
+    max: float
+    vehicles: int
+
+
+class FleetSummary(BaseModel):
+    """
+    Totaux de la flotte, d'après le dernier statut de chaque véhicule.
+    """
+    vehicles: int
+    active_vehicles: int
+    reporting_vehicles: int  # véhicules ayant au moins un statut
+    locked_vehicles: int
+    locked_share: Optional[float] = None  # parmi les véhicules qui ont un statut
+    reported_last_hour: int
+    battery_histogram: List[BatteryBucket]
+    battery_unknown: int  # dernier statut sans niveau de batterie
+    reconciled_at: Optional[datetime] = None  # None : calculé à la demande
@@ -0,0 +1,37 @@
+# app/schemas/job.py
+from datetime import datetime
+from typing import Any, Dict, Literal, Optional
+
+from pydantic import BaseModel, Field, ConfigDict
+
+
+JobKind = Literal["export_statuses", "status_summary", "analytics_refresh", "segments_refresh"]
+
+
+class JobCreate(BaseModel):
+    kind: JobKind = Field(
+        ...,
+        description="Type de job : export_statuses, status_summary, analytics_refresh ou segments_refresh.",
+    )
+    params: Dict[str, Any] = Field(
+        default_factory=dict,
+        description="Paramètres du job (ex: {'vehicle_ids': [1, 2]}). "
+                    "Sans vehicle_ids, le job porte sur toute la flotte.",
+    )
+
+
+class JobRead(BaseModel):
+    id: int
+    kind: str
+    status: str
+    params: Dict[str, Any]
+    progress: int
+    total: int
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cancel_requested: bool
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
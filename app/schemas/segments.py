@@ -0,0 +1,34 @@
+# app/schemas/segments.py
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class ChargingSessionRead(BaseModel):
+    id: int
+    vehicle_id: int
+    started_at: datetime
+    ended_at: datetime
+    start_battery_level: float
+    end_battery_level: float
+    battery_gained_pct: float
+    odometer_km: Optional[float] = None
+    ongoing: bool = Field(..., description="True si la recharge peut encore se prolonger.")
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class TripRead(BaseModel):
+    id: int
+    vehicle_id: int
+    started_at: datetime
+    ended_at: datetime
+    start_odometer_km: float
+    end_odometer_km: float
+    distance_km: float
+    start_battery_level: Optional[float] = None
+    end_battery_level: Optional[float] = None
+    ongoing: bool = Field(..., description="True si le trajet peut encore se prolonger.")
+
+    model_config = ConfigDict(from_attributes=True)
@@ -1,8 +1,8 @@
 # app/schemas/vehicle.py
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, model_validator
 
 
 # -----------------
@@ -43,6 +43,25 @@ class VehicleRead(VehicleBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+# Issue de l'enregistrement d'un véhicule dans un lot (POST /vehicles:bulk)
+VehicleBulkOutcome = Literal["created", "updated", "conflict"]
+
+
+class VehicleBulkItemResult(BaseModel):
+    index: int = Field(..., description="Position de l'élément dans le lot.")
+    vin: str
+    result: VehicleBulkOutcome
+    id: Optional[int] = Field(None, description="Id du véhicule (absent en cas de conflit).")
+    detail: Optional[str] = Field(None, description="Cause du conflit.")
+
+
+class VehicleBulkResult(BaseModel):
+    created: int
+    updated: int
+    conflicts: int
+    items: List[VehicleBulkItemResult]
+
+
 # -------------------------
 # Schémas Statut Véhicule
 # -------------------------
@@ -54,6 +73,8 @@ class VehicleStatusRead(BaseModel):
     battery_level: Optional[float] = None
     doors_locked: bool
     odometer_km: Optional[float] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
     # Pydantic v2 : idem, permet la conversion depuis un objet SQLAlchemy
     model_config = ConfigDict(from_attributes=True)
@@ -72,3 +93,79 @@ class VehicleStatusCreate(BaseModel):
         None,
         description="Odomètre en kilomètres.",
     )
+    latitude: Optional[float] = Field(
+        None,
+        ge=-90.0,
+        le=90.0,
+        description="Latitude GPS (degrés WGS84).",
+    )
+    longitude: Optional[float] = Field(
+        None,
+        ge=-180.0,
+        le=180.0,
+        description="Longitude GPS (degrés WGS84).",
+    )
+
+    @model_validator(mode="after")
+    def _position_is_complete(self):
+        if (self.latitude is None) != (self.longitude is None):
+            raise ValueError("latitude and longitude must be given together")
+        return self
+
+
+class VehicleStatusFrame(VehicleStatusCreate):
+    """
+    Trame JSON du canal WebSocket d'ingestion : un statut d'un véhicule,
+    horodaté par le collecteur (heure de réception sinon).
+    """
+    vehicle_id: int
+    timestamp: Optional[datetime] = Field(
+        None,
+        description="Heure de mesure (UTC si sans fuseau).",
+    )
+
+
+class VehiclePositionRead(BaseModel):
+    """
+    Dernière position connue d'un véhicule.
+    """
+    vehicle_id: int
+    status_id: int
+    timestamp: datetime
+    latitude: float
+    longitude: float
+    geohash: str
+    distance_km: Optional[float] = Field(
+        None,
+        description="Distance au point de recherche (requêtes nearest uniquement).",
+    )
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class StatusBatchResult(BaseModel):
+    vehicle_id: int
+    inserted: int = Field(..., description="Nombre de statuts insérés.")
+    first_id: Optional[int] = Field(None, description="Id du premier statut inséré.")
+    last_id: Optional[int] = Field(None, description="Id du dernier statut inséré.")
+
+
+# Champs numériques d'un statut qui se tracent en courbe
+SeriesField = Literal["battery_level", "odometer_km"]
+
+
+class StatusSeriesPoint(BaseModel):
+    timestamp: datetime
+    value: float
+
+
+class StatusSeries(BaseModel):
+    vehicle_id: int
+    field: SeriesField
+    source_points: int = Field(..., description="Statuts de la plage portant une valeur pour `field`.")
+    points: List[StatusSeriesPoint] = Field(..., description="Points retenus, par timestamp croissant.")
+
+
+class StatusPurgeResult(BaseModel):
+    vehicle_id: int
+    deleted: int = Field(..., description="Nombre de statuts supprimés.")
@@ -0,0 +1,53 @@
+# app/schemas/webhooks.py
+from datetime import datetime
+from typing import Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+DeliveryState = Literal["pending", "dead"]
+
+
+class WebhookEndpointCreate(BaseModel):
+    url: str = Field(..., max_length=2000, pattern=r"^https?://", description="URL appelée en POST.")
+    secret: str = Field(
+        ...,
+        min_length=16,
+        max_length=200,
+        description="Clé HMAC-SHA256 des signatures (en-tête X-Bluelink-Signature).",
+    )
+    vehicle_id: Optional[int] = Field(
+        None,
+        description="Véhicule suivi (absent = toute la flotte).",
+    )
+    max_concurrency: int = Field(4, ge=1, le=32, description="Lots envoyés en parallèle au plus.")
+    is_active: bool = True
+
+
+class WebhookEndpointRead(BaseModel):
+    """
+    Destinataire, sans son secret.
+    """
+    id: int
+    url: str
+    vehicle_id: Optional[int] = None
+    max_concurrency: int
+    is_active: bool
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class WebhookDeliveryRead(BaseModel):
+    id: int
+    event_id: int
+    state: DeliveryState
+    attempts: int
+    next_attempt_at: datetime
+    last_error: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class WebhookRetryResult(BaseModel):
+    endpoint_id: int
+    requeued: int
@@ -0,0 +1,400 @@
+# app/services/alerts.py
+"""
+Règles d'alerte évaluées à l'ingestion.
+
+Une règle est une conjonction de conditions (`AlertCondition`) sur les
+champs d'un statut, pour un véhicule ou toute la flotte. Les règles
+actives sont compilées, dans chaque processus, en groupes de prédicats
+(flotte + un groupe par véhicule) indexés par champ :
+
+- comparaisons (`<`, `<=`, `>`, `>=`) et `unchanged_for` : seuils triés,
+  une recherche dichotomique donne la tranche des prédicats vérifiés ;
+- égalités : dictionnaire valeur -> prédicats.
+
+Un statut ne consulte que les groupes de son véhicule et les champs
+qu'il porte ; une règle est vérifiée quand tous ses prédicats le sont
+(comptage). Le coût est logarithmique en nombre de règles, plus le
+nombre de prédicats vérifiés.
+
+Les alertes sont déclenchées sur front montant : une alerte s'ouvre quand
+une règle devient vraie pour un véhicule et se résout au premier statut
+qui ne la vérifie plus. Une règle dont un champ manque dans le statut
+n'est pas évaluée. L'index unique partiel `ux_alerts_open` garantit une
+seule alerte ouverte par (règle, véhicule), même entre écrivains
+concurrents. Les statuts sont évalués dans l'ordre d'arrivée ; un statut
+antérieur au déclenchement ne résout pas l'alerte.
+
+Les règles compilées sont rechargées après chaque modification dans le
+processus qui l'a faite, et toutes les ALERT_RULES_REFRESH_SECONDS dans
+les autres (thread de fond démarré avec l'application).
+"""
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.alert import Alert, AlertFieldMark, AlertRule
+from app.db.session import SessionLocal
+from app.schemas.alerts import NUMERIC_FIELDS, AlertRuleCreate
+
+logger = logging.getLogger(__name__)
+
+_SORTED_OPS = ("<", "<=", ">", ">=", "unchanged_for")
+
+
+# =====================================================================
+# Compilation
+# =====================================================================
+
+class _FieldPredicates:
+    """
+    Prédicats d'un champ dans un groupe : seuils triés par opérateur,
+    règles par valeur pour les égalités.
+    """
+
+    __slots__ = ("sorted", "equal")
+
+    def __init__(self):
+        self.sorted: Dict[str, List[Tuple[float, int]]] = defaultdict(list)
+        self.equal: Dict[Any, List[int]] = defaultdict(list)
+
+    def add(self, rule_id: int, op: str, value: Any) -> None:
+        if op == "==":
+            self.equal[value].append(rule_id)
+        else:
+            self.sorted[op].append((float(value), rule_id))
+
+    def freeze(self) -> None:
+        self.sorted = {
+            op: ([bound for bound, _ in pairs], [rule_id for _, rule_id in pairs])
+            for op, pairs in ((op, sorted(pairs)) for op, pairs in self.sorted.items())
+        }
+        self.equal = dict(self.equal)
+
+    def matching(self, value: Any, elapsed: Optional[float]) -> Iterator[int]:
+        """
+        Règles dont un prédicat sur ce champ est vérifié.
+        """
+        yield from self.equal.get(value, ())
+        for op, (bounds, rule_ids) in self.sorted.items():
+            if op == "<":
+                yield from rule_ids[bisect_right(bounds, value):]
+            elif op == "<=":
+                yield from rule_ids[bisect_left(bounds, value):]
+            elif op == ">":
+                yield from rule_ids[:bisect_left(bounds, value)]
+            elif op == ">=":
+                yield from rule_ids[:bisect_right(bounds, value)]
+            elif elapsed is not None:  # unchanged_for : durée <= temps écoulé
+                yield from rule_ids[:bisect_right(bounds, elapsed)]
+
+
+class CompiledRules:
+    """
+    Règles actives compilées en groupes de prédicats (immuable : remplacé
+    en bloc au rechargement).
+    """
+
+    def __init__(self, rules: Iterable[Any]):
+        self.sizes: Dict[int, int] = {}
+        self.fields: Dict[int, FrozenSet[str]] = {}
+        self.fleet: Dict[str, _FieldPredicates] = defaultdict(_FieldPredicates)
+        self.by_vehicle: Dict[int, Dict[str, _FieldPredicates]] = defaultdict(lambda: defaultdict(_FieldPredicates))
+        # Champs suivis par `unchanged_for` : flotte / par véhicule
+        self.fleet_unchanged: Set[str] = set()
+        self.vehicle_unchanged: Dict[int, Set[str]] = defaultdict(set)
+
+        for rule in rules:
+            group = self.fleet if rule.vehicle_id is None else self.by_vehicle[rule.vehicle_id]
+            unchanged = self.fleet_unchanged if rule.vehicle_id is None else self.vehicle_unchanged[rule.vehicle_id]
+            self.sizes[rule.id] = len(rule.conditions)
+            self.fields[rule.id] = frozenset(c["field"] for c in rule.conditions)
+            for condition in rule.conditions:
+                group[condition["field"]].add(rule.id, condition["op"], condition["value"])
+                if condition["op"] == "unchanged_for":
+                    unchanged.add(condition["field"])
+
+        self.fleet = dict(self.fleet)
+        self.by_vehicle = {vid: dict(group) for vid, group in self.by_vehicle.items()}
+        self.vehicle_unchanged = dict(self.vehicle_unchanged)
+        for group in [self.fleet, *self.by_vehicle.values()]:
+            for predicates in group.values():
+                predicates.freeze()
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    def watches(self, vehicle_id: int) -> bool:
+        return bool(self.fleet) or vehicle_id in self.by_vehicle
+
+    def unchanged_fields(self, vehicle_id: int) -> Set[str]:
+        return self.fleet_unchanged | self.vehicle_unchanged.get(vehicle_id, set())
+
+    def match(self, vehicle_id: int, values: Dict[str, Any], elapsed: Dict[str, float]) -> Set[int]:
+        """
+        Règles vérifiées par un statut (valeurs par champ, None = absent).
+        """
+        counts: Counter = Counter()
+        for group in (self.fleet, self.by_vehicle.get(vehicle_id, {})):
+            for field, predicates in group.items():
+                value = values.get(field)
+                if value is not None:
+                    counts.update(predicates.matching(value, elapsed.get(field)))
+        return {rule_id for rule_id, n in counts.items() if n == self.sizes[rule_id]}
+
+    def evaluable(self, rule_id: int, values: Dict[str, Any]) -> bool:
+        """
+        Tous les champs de la règle sont présents dans le statut.
+        """
+        fields = self.fields.get(rule_id)
+        return fields is not None and all(values.get(field) is not None for field in fields)
+
+
+class AlertRuleIndex:
+    """
+    Règles compilées du processus, rechargées périodiquement.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.compiled = CompiledRules(())
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def reload(self, db: Session) -> int:
+        """
+        Recompile les règles actives. Retourne leur nombre.
+        """
+        if not settings.ALERTS_ENABLED:
+            return 0
+        rules = db.scalars(select(AlertRule).where(AlertRule.is_active.is_(True))).all()
+        self.compiled = CompiledRules(rules)
+        return len(self.compiled)
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="alert-rules", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def _loop(self) -> None:
+        while True:
+            db = SessionLocal()
+            try:
+                self.reload(db)
+            except Exception:
+                logger.exception("Alert rules reload failed")
+            finally:
+                db.close()
+            if self._stop.wait(self.refresh_seconds):
+                return
+
+
+rule_index = AlertRuleIndex(settings.ALERT_RULES_REFRESH_SECONDS)
+
+
+# =====================================================================
+# Évaluation à l'ingestion
+# =====================================================================
+
+_STATUS_FIELDS = (*NUMERIC_FIELDS, "doors_locked")
+
+
+def watches(vehicle_id: int) -> bool:
+    """
+    Des règles portent sur ce véhicule (sinon aucune évaluation).
+    """
+    return rule_index.compiled.watches(vehicle_id)
+
+
+def _advance_marks(marks: Dict[str, AlertFieldMark], status: Any, fields: Set[str], db: Session) -> Dict[str, float]:
+    """
+    Met à jour les marques `unchanged_for` d'un véhicule avec un statut ;
+    retourne le temps écoulé (s) depuis le dernier changement par champ.
+    """
+    elapsed = {}
+    for field in fields:
+        value = getattr(status, field)
+        if value is None:
+            continue
+        mark = marks.get(field)
+        if mark is None:
+            mark = marks[field] = AlertFieldMark(
+                vehicle_id=status.vehicle_id, field=field, value=value, since=status.timestamp, seen_at=status.timestamp
+            )
+            db.add(mark)
+        elif status.timestamp < mark.seen_at:
+            # Statut en retard : marque inchangée
+            same = mark.value == value and status.timestamp >= mark.since
+            elapsed[field] = (status.timestamp - mark.since).total_seconds() if same else 0.0
+            continue
+        elif mark.value != value:
+            mark.value, mark.since = value, status.timestamp
+        mark.seen_at = status.timestamp
+        elapsed[field] = (status.timestamp - mark.since).total_seconds()
+    return elapsed
+
+
+def evaluate_statuses(db: Session, statuses: Sequence[Any]) -> int:
+    """
+    Évalue les règles sur des statuts insérés (avec id), dans l'ordre
+    chronologique de chaque véhicule, dans la transaction en cours de `db`
+    (pas de commit). Retourne le nombre d'alertes déclenchées.
+    """
+    compiled = rule_index.compiled
+    by_vehicle: Dict[int, List[Any]] = defaultdict(list)
+    for status in sorted(statuses, key=lambda s: (s.timestamp, s.id)):
+        if compiled.watches(status.vehicle_id):
+            by_vehicle[status.vehicle_id].append(status)
+
+    triggered = 0
+    for vehicle_id, vehicle_statuses in by_vehicle.items():
+        open_alerts = {
+            alert.rule_id: alert
+            for alert in db.scalars(
+                select(Alert).where(Alert.vehicle_id == vehicle_id, Alert.resolved_at.is_(None))
+            )
+        }
+        unchanged = compiled.unchanged_fields(vehicle_id)
+        marks: Dict[str, AlertFieldMark] = {}
+        if unchanged:
+            marks = {
+                mark.field: mark
+                for mark in db.scalars(
+                    select(AlertFieldMark).where(
+                        AlertFieldMark.vehicle_id == vehicle_id, AlertFieldMark.field.in_(sorted(unchanged))
+                    )
+                )
+            }
+        new_alerts: List[Alert] = []
+
+        for status in vehicle_statuses:
+            values = {field: getattr(status, field) for field in _STATUS_FIELDS}
+            elapsed = _advance_marks(marks, status, unchanged, db) if unchanged else {}
+            matched = compiled.match(vehicle_id, values, elapsed)
+            for rule_id in matched - open_alerts.keys():
+                alert = Alert(rule_id=rule_id, vehicle_id=vehicle_id, status_id=status.id, triggered_at=status.timestamp)
+                open_alerts[rule_id] = alert
+                new_alerts.append(alert)
+            for rule_id, alert in list(open_alerts.items()):
+                if (
+                    rule_id not in matched
+                    and compiled.evaluable(rule_id, values)
+                    and status.timestamp >= alert.triggered_at
+                ):
+                    alert.resolved_status_id, alert.resolved_at = status.id, status.timestamp
+                    del open_alerts[rule_id]
+
+        for alert in new_alerts:
+            try:
+                with db.begin_nested():
+                    db.add(alert)
+            except IntegrityError:
+                # Déjà ouverte par un écrivain concurrent
+                continue
+            triggered += 1
+        db.flush()
+    return triggered
+
+
+# =====================================================================
+# CRUD des règles, lecture des alertes
+# =====================================================================
+
+def _reload_rules(db: Session) -> None:
+    try:
+        rule_index.reload(db)
+    except Exception:
+        # Le thread de fond rattrapera : la modification est déjà validée
+        logger.exception("Alert rules reload failed")
+
+
+def _resolve_open_alerts(db: Session, rule_id: int) -> None:
+    """
+    Clôt les alertes ouvertes d'une règle modifiée ou désactivée.
+    """
+    db.execute(
+        update(Alert)
+        .where(Alert.rule_id == rule_id, Alert.resolved_at.is_(None))
+        .values(resolved_at=datetime.utcnow())
+    )
+
+
+def create_rule(db: Session, data: AlertRuleCreate) -> AlertRule:
+    rule = AlertRule(
+        name=data.name,
+        vehicle_id=data.vehicle_id,
+        conditions=[c.model_dump() for c in data.conditions],
+        is_active=data.is_active,
+    )
+    db.add(rule)
+    db.commit()
+    _reload_rules(db)
+    return rule
+
+
+def list_rules(db: Session, vehicle_id: Optional[int] = None) -> List[AlertRule]:
+    stmt = select(AlertRule).order_by(AlertRule.id)
+    if vehicle_id is not None:
+        stmt = stmt.where(AlertRule.vehicle_id == vehicle_id)
+    return list(db.scalars(stmt))
+
+
+def get_rule(db: Session, rule_id: int) -> Optional[AlertRule]:
+    return db.get(AlertRule, rule_id)
+
+
+def update_rule(db: Session, rule: AlertRule, data: AlertRuleCreate) -> AlertRule:
+    """
+    Remplace une règle ; ses alertes ouvertes sont closes (elles portaient
+    sur l'ancienne définition).
+    """
+    rule.name = data.name
+    rule.vehicle_id = data.vehicle_id
+    rule.conditions = [c.model_dump() for c in data.conditions]
+    rule.is_active = data.is_active
+    _resolve_open_alerts(db, rule.id)
+    db.commit()
+    _reload_rules(db)
+    return rule
+
+
+def delete_rule(db: Session, rule: AlertRule) -> None:
+    """
+    Supprime une règle et ses alertes (ON DELETE CASCADE).
+    """
+    db.delete(rule)
+    db.commit()
+    _reload_rules(db)
+
+
+def list_alerts(
+    db: Session,
+    vehicle_id: Optional[int] = None,
+    rule_id: Optional[int] = None,
+    open_only: bool = False,
+    limit: Optional[int] = None,
+) -> List[Alert]:
+    """
+    Alertes, de la plus récente à la plus ancienne (par id).
+    """
+    stmt = select(Alert).order_by(Alert.id.desc())
+    if vehicle_id is not None:
+        stmt = stmt.where(Alert.vehicle_id == vehicle_id)
+    if rule_id is not None:
+        stmt = stmt.where(Alert.rule_id == rule_id)
+    if open_only:
+        stmt = stmt.where(Alert.resolved_at.is_(None))
+    limit = settings.VEHICLE_PAGE_DEFAULT_LIMIT if limit is None else min(limit, settings.VEHICLE_PAGE_MAX_LIMIT)
+    return list(db.scalars(stmt.limit(limit)))
@@ -0,0 +1,382 @@
+# app/services/analytics.py
+"""
+Analytique énergétique incrémentale par véhicule.
+
+Seuls les statuts insérés depuis le checkpoint du véhicule
+(`VehicleAnalytics.checkpoint_status_id`) sont lus, par lots ; chaque lot
+est chargé en colonnes (`array('d')`) puis intégré par des passes
+colonne par colonne (deltas entre échantillons successifs), sans objet
+ORM par ligne. Les cumuls et le checkpoint sont écrits dans la même
+transaction ; la lecture (`get_vehicle_analytics`) ne fait que des
+accès par clé primaire.
+
+Seuls les statuts stabilisés sont intégrés (même règle que le flux de
+changements, `settled_statuses`) : un id alloué par une transaction
+encore en cours n'est jamais dépassé par le checkpoint.
+
+Historique rattrapé : si un lot contient un statut antérieur au dernier
+échantillon intégré (ou des statuts hors ordre entre eux), le véhicule
+est recalculé depuis zéro dans l'ordre des timestamps, distances
+journalières comprises. Les indicateurs restent ainsi égaux à ceux d'un
+calcul complet, au prix d'une relecture de l'historique du véhicule.
+
+Mise à jour concurrente : l'écriture est conditionnée au checkpoint lu
+(verrouillage optimiste), un second rafraîchissement simultané
+abandonne simplement son lot.
+"""
+import math
+from array import array
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from itertools import accumulate, chain
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.vehicle_analytics import VehicleAnalytics, VehicleDailyDistance
+from app.db.models.vehicle_status import VehicleStatus
+from app.db.session import release_status_session, status_session, use_primary
+from app.services.changes import SETTLE_NOW, settled_statuses
+
+_EPOCH = datetime(1970, 1, 1)
+_NAN = float("nan")
+
+# En dessous de ce déplacement (km) entre deux échantillons, le véhicule est à l'arrêt
+MOVING_EPSILON_KM = 0.05
+
+
+@dataclass
+class AnalyticsState:
+    """
+    Cumuls + dernier échantillon connu (NaN = inconnu).
+    """
+    samples: int = 0
+    last_ts: float = _NAN
+    last_battery: float = _NAN
+    last_odometer: float = _NAN
+    total_distance_km: float = 0.0
+    driving_battery_drop_pct: float = 0.0
+    idle_battery_drop_pct: float = 0.0
+    idle_seconds: float = 0.0
+    daily_distance: Dict[date, float] = field(default_factory=dict)
+
+
+def _ffill(initial: float, col: array) -> array:
+    """
+    Propage la dernière valeur connue sur les NaN. Le résultat a un
+    élément de plus que `col` : la valeur précédant le lot.
+    """
+    return array("d", accumulate(chain((initial,), col), lambda prev, x: prev if x != x else x))
+
+
+def _deltas(filled: array) -> List[float]:
+    return [cur - prev for prev, cur in zip(filled, filled[1:])]
+
+
+def integrate_batch(state: AnalyticsState, ts: array, battery: array, odometer: array) -> None:
+    """
+    Intègre un lot de colonnes (timestamps epoch en secondes, batterie %,
+    odomètre km ; NaN = valeur absente) dans `state`.
+
+    Les échantillons arrivés en retard (timestamp antérieur au dernier
+    intégré) sont comptés mais ignorés pour les deltas.
+    """
+    state.samples += len(ts)
+
+    # Filtrage des échantillons hors ordre (max glissant des timestamps)
+    start = state.last_ts if not math.isnan(state.last_ts) else -math.inf
+    running_max = list(accumulate(chain((start,), ts), max))
+    keep = [t >= m for t, m in zip(ts, running_max)]
+    if not all(keep):
+        ts = array("d", (v for v, k in zip(ts, keep) if k))
+        battery = array("d", (v for v, k in zip(battery, keep) if k))
+        odometer = array("d", (v for v, k in zip(odometer, keep) if k))
+    if not ts:
+        return
+
+    t_all = array("d", chain((state.last_ts,), ts))
+    b_all = _ffill(state.last_battery, battery)
+    o_all = _ffill(state.last_odometer, odometer)
+
+    dt = _deltas(t_all)
+    d_batt = _deltas(b_all)
+    d_odo = _deltas(o_all)
+    # Les comparaisons avec NaN sont fausses : les intervalles incomplets sont ignorés
+    moving = [d > MOVING_EPSILON_KM for d in d_odo]
+
+    state.total_distance_km += sum(d for d, m in zip(d_odo, moving) if m)
+    state.driving_battery_drop_pct += sum(-b for b, m in zip(d_batt, moving) if m and b < 0)
+    state.idle_battery_drop_pct += sum(
+        -b for b, d in zip(d_batt, d_odo) if 0 <= d <= MOVING_EPSILON_KM and b < 0
+    )
+    state.idle_seconds += sum(
+        t for t, b, d in zip(dt, d_batt, d_odo)
+        if 0 <= d <= MOVING_EPSILON_KM and b <= 0 and t > 0
+    )
+
+    for d, m, t in zip(d_odo, moving, ts):
+        if m:
+            day = (_EPOCH + timedelta(seconds=t)).date()
+            state.daily_distance[day] = state.daily_distance.get(day, 0.0) + d
+
+    state.last_ts = ts[-1]
+    state.last_battery = b_all[-1]
+    state.last_odometer = o_all[-1]
+
+
+def _epoch_s(ts: Optional[datetime]) -> float:
+    return _NAN if ts is None else (ts - _EPOCH).total_seconds()
+
+
+def _opt(value: Optional[float]) -> float:
+    return _NAN if value is None else value
+
+
+def _unopt(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+def _state_from_row(row: Optional[VehicleAnalytics]) -> Tuple[AnalyticsState, int]:
+    if row is None:
+        return AnalyticsState(), 0
+    return AnalyticsState(
+        samples=row.samples,
+        last_ts=_epoch_s(row.last_timestamp),
+        last_battery=_opt(row.last_battery_level),
+        last_odometer=_opt(row.last_odometer_km),
+        total_distance_km=row.total_distance_km,
+        driving_battery_drop_pct=row.driving_battery_drop_pct,
+        idle_battery_drop_pct=row.idle_battery_drop_pct,
+        idle_seconds=row.idle_seconds,
+    ), row.checkpoint_status_id
+
+
+def _state_values(state: AnalyticsState, checkpoint: int) -> dict:
+    return {
+        "checkpoint_status_id": checkpoint,
+        "samples": state.samples,
+        "last_timestamp": None if math.isnan(state.last_ts) else _EPOCH + timedelta(seconds=state.last_ts),
+        "last_battery_level": _unopt(state.last_battery),
+        "last_odometer_km": _unopt(state.last_odometer),
+        "total_distance_km": state.total_distance_km,
+        "driving_battery_drop_pct": state.driving_battery_drop_pct,
+        "idle_battery_drop_pct": state.idle_battery_drop_pct,
+        "idle_seconds": state.idle_seconds,
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def _add_daily_distance(db: Session, vehicle_id: int, daily: Dict[date, float]) -> None:
+    if not daily:
+        return
+    existing = dict(
+        db.execute(
+            select(VehicleDailyDistance.day, VehicleDailyDistance.distance_km).where(
+                VehicleDailyDistance.vehicle_id == vehicle_id,
+                VehicleDailyDistance.day.in_(list(daily)),
+            )
+        ).all()
+    )
+    for day, distance in daily.items():
+        if day in existing:
+            db.execute(
+                update(VehicleDailyDistance)
+                .where(VehicleDailyDistance.vehicle_id == vehicle_id, VehicleDailyDistance.day == day)
+                .values(distance_km=existing[day] + distance)
+            )
+        else:
+            db.execute(
+                insert(VehicleDailyDistance).values(
+                    vehicle_id=vehicle_id, day=day, distance_km=distance
+                )
+            )
+
+
+def _in_order(last_ts: float, ts: array) -> bool:
+    """
+    True si les timestamps du lot suivent le dernier échantillon intégré
+    et ne reculent jamais (NaN ignorés).
+    """
+    running = -math.inf if math.isnan(last_ts) else last_ts
+    for t in ts:
+        if t < running:
+            return False
+        running = max(running, t)
+    return True
+
+
+def _recompute(status_db: Session, vehicle_id: int, upto_id: int) -> AnalyticsState:
+    """
+    Recalcule l'état d'un véhicule depuis zéro, statuts d'id <= `upto_id`
+    lus dans l'ordre des timestamps (par lots, en streaming).
+    """
+    state = AnalyticsState()
+    daily: Dict[date, float] = {}
+    result = status_db.execute(
+        select(VehicleStatus.timestamp, VehicleStatus.battery_level, VehicleStatus.odometer_km)
+        .where(VehicleStatus.vehicle_id == vehicle_id, VehicleStatus.id <= upto_id)
+        .order_by(VehicleStatus.timestamp, VehicleStatus.id)
+        .execution_options(yield_per=settings.ANALYTICS_BATCH_SIZE)
+    )
+    for part in result.partitions():
+        ts, battery, odometer = zip(*part)
+        state.daily_distance = {}
+        integrate_batch(
+            state,
+            array("d", map(_epoch_s, ts)),
+            array("d", map(_opt, battery)),
+            array("d", map(_opt, odometer)),
+        )
+        for day, distance in state.daily_distance.items():
+            daily[day] = daily.get(day, 0.0) + distance
+    state.daily_distance = daily
+    return state
+
+
+def _save_state(
+    db: Session,
+    vehicle_id: int,
+    exists: bool,
+    checkpoint: int,
+    state: AnalyticsState,
+    new_checkpoint: int,
+    replace_daily: bool,
+) -> bool:
+    """
+    Écrit l'état et les distances journalières du lot (ajoutées, ou
+    remplacées après un recalcul), conditionné au checkpoint lu.
+    False si un autre rafraîchissement est passé entre-temps.
+    """
+    values = _state_values(state, new_checkpoint)
+    try:
+        if exists:
+            res = db.execute(
+                update(VehicleAnalytics)
+                .where(
+                    VehicleAnalytics.vehicle_id == vehicle_id,
+                    VehicleAnalytics.checkpoint_status_id == checkpoint,
+                )
+                .values(**values)
+            )
+            if res.rowcount != 1:
+                # Un autre rafraîchissement a déjà intégré ce lot
+                db.rollback()
+                return False
+        else:
+            db.execute(insert(VehicleAnalytics).values(vehicle_id=vehicle_id, **values))
+        if replace_daily:
+            db.execute(delete(VehicleDailyDistance).where(VehicleDailyDistance.vehicle_id == vehicle_id))
+            if state.daily_distance:
+                db.execute(insert(VehicleDailyDistance), [
+                    {"vehicle_id": vehicle_id, "day": day, "distance_km": distance}
+                    for day, distance in state.daily_distance.items()
+                ])
+        else:
+            _add_daily_distance(db, vehicle_id, state.daily_distance)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
+
+
+def refresh_vehicle_analytics(db: Session, vehicle_id: int) -> int:
+    """
+    Intègre les statuts stabilisés insérés depuis le checkpoint du
+    véhicule (recalcul complet si l'un d'eux est antérieur à l'historique
+    déjà intégré). Retourne le nombre de statuts traités.
+    """
+    use_primary(db)
+    row = db.get(VehicleAnalytics, vehicle_id)
+    state, checkpoint = _state_from_row(row)
+    exists = row is not None
+    batch_size = settings.ANALYTICS_BATCH_SIZE
+    status_db = status_session(db, vehicle_id)
+    processed = 0
+
+    while True:
+        fetched = status_db.execute(
+            select(
+                VehicleStatus.id,
+                VehicleStatus.timestamp,
+                VehicleStatus.battery_level,
+                VehicleStatus.odometer_km,
+                VehicleStatus.created_at,
+                SETTLE_NOW,
+            )
+            .where(VehicleStatus.vehicle_id == vehicle_id, VehicleStatus.id > checkpoint)
+            .order_by(VehicleStatus.id)
+            .limit(batch_size)
+        ).all()
+        rows = settled_statuses(fetched)
+        release_status_session(db, status_db)
+        if not rows:
+            break
+
+        new_checkpoint = rows[-1].id
+        ts = array("d", (_epoch_s(r.timestamp) for r in rows))
+        replace_daily = not _in_order(state.last_ts, ts)
+        if replace_daily:
+            state = _recompute(status_db, vehicle_id, new_checkpoint)
+            release_status_session(db, status_db)
+        else:
+            state.daily_distance = {}
+            integrate_batch(
+                state,
+                ts,
+                array("d", (_opt(r.battery_level) for r in rows)),
+                array("d", (_opt(r.odometer_km) for r in rows)),
+            )
+        if not _save_state(db, vehicle_id, exists, checkpoint, state, new_checkpoint, replace_daily):
+            return processed
+
+        exists = True
+        checkpoint = new_checkpoint
+        processed += len(rows)
+        if len(rows) < batch_size:
+            break
+    return processed
+
+
+def get_vehicle_analytics(db: Session, vehicle_id: int) -> Dict[str, Any]:
+    """
+    Lit les indicateurs persistés (clé primaire + quelques lignes
+    journalières) et calcule les valeurs dérivées. Aucun statut n'est relu.
+    """
+    row = db.get(VehicleAnalytics, vehicle_id)
+    since = datetime.utcnow().date() - timedelta(days=settings.ANALYTICS_DAILY_DAYS)
+    daily = db.execute(
+        select(VehicleDailyDistance.day, VehicleDailyDistance.distance_km)
+        .where(VehicleDailyDistance.vehicle_id == vehicle_id, VehicleDailyDistance.day >= since)
+        .order_by(VehicleDailyDistance.day)
+    ).all()
+
+    result: Dict[str, Any] = {
+        "vehicle_id": vehicle_id,
+        "daily_distance": [{"day": d, "distance_km": km} for d, km in daily],
+    }
+    if row is None:
+        return result
+
+    distance = row.total_distance_km
+    idle_days = row.idle_seconds / 86400.0
+    result.update(
+        samples=row.samples,
+        checkpoint_status_id=row.checkpoint_status_id,
+        last_timestamp=row.last_timestamp,
+        total_distance_km=distance,
+        driving_battery_drop_pct=row.driving_battery_drop_pct,
+        idle_battery_drop_pct=row.idle_battery_drop_pct,
+        idle_hours=row.idle_seconds / 3600.0,
+        updated_at=row.updated_at,
+    )
+    if distance > 0:
+        pct_per_100 = row.driving_battery_drop_pct / distance * 100.0
+        result["battery_pct_per_100km"] = pct_per_100
+        result["consumption_kwh_per_100km"] = pct_per_100 / 100.0 * settings.BATTERY_CAPACITY_KWH
+    if idle_days > 0:
+        result["idle_drain_pct_per_day"] = row.idle_battery_drop_pct / idle_days
+    return result
@@ -0,0 +1,190 @@
+# app/services/changes.py
+"""
+Flux de changements pour les consommateurs en aval (entrepôt de données).
+
+Deux journaux, lus dans l'ordre des ids par plage de clé primaire :
+- les statuts insérés (`vehicle_status`) : une position par base de
+  statuts, shards compris ;
+- les créations, mises à jour et suppressions de véhicules (`vehicle_changes`).
+
+Le curseur rendu au client est opaque (JSON compact en base64url) : le
+coût d'un appel est proportionnel aux changements renvoyés, pas à la
+taille des tables. Les purges d'historique ne sont pas dans le flux.
+
+Les ids ne sont jamais réutilisés (AUTOINCREMENT sur SQLite, séquences
+sur Postgres). Mais un id est alloué avant la validation de sa
+transaction : les lignes insérées depuis moins de CHANGES_SETTLE_SECONDS
+ne sont servies qu'à l'appel suivant, pour ne pas sauter un id validé en
+retard. L'âge se mesure sur l'heure d'insertion fixée par la base
+(`created_at`, `changed_at`) et l'horloge de cette même base, jamais sur
+l'horodatage du boîtier : un statut daté dans le futur ne bloque pas le
+flux. Sur PostgreSQL, cette horloge recule derrière la plus ancienne
+transaction d'écriture en cours (`settle_horizon`) : une transaction
+plus longue que le délai n'est pas sautée non plus. Les mêmes règles servent aux lecteurs incrémentaux de
+l'analytique et des segments (`settled_statuses`).
+
+Après un rééquilibrage des shards, les statuts déplacés ont de nouveaux
+ids et sont renvoyés une seconde fois (livraison au moins une fois).
+"""
+import base64
+import heapq
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.vehicle import Vehicle
+from app.db.models.vehicle_change import VehicleChange
+from app.db.base import settle_horizon
+from app.db.models.vehicle_status import VehicleStatus
+from app.db.session import fan_out_statuses, status_database_name
+from app.schemas.changes import VehicleChangeRead
+from app.schemas.vehicle import VehicleRead
+
+
+class InvalidCursorError(ValueError):
+    """
+    Levée quand le curseur reçu n'a pas été produit par le flux.
+    """
+
+
+@dataclass
+class ChangeCursor:
+    """
+    Position dans le flux : dernier id de statut servi par base de
+    statuts ("main" ou nom du shard), dernier id du journal véhicules.
+    """
+    statuses: Dict[str, int] = field(default_factory=dict)
+    vehicles: int = 0
+
+
+def encode_cursor(cursor: ChangeCursor) -> str:
+    raw = json.dumps({"s": cursor.statuses, "v": cursor.vehicles}, separators=(",", ":"), sort_keys=True)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(raw: Optional[str]) -> ChangeCursor:
+    """
+    Curseur vide ou absent = début du flux.
+    """
+    if not raw:
+        return ChangeCursor()
+    try:
+        data = json.loads(base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)))
+        statuses = {str(name): int(last) for name, last in data["s"].items()}
+        return ChangeCursor(statuses=statuses, vehicles=int(data["v"]))
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise InvalidCursorError("invalid cursor")
+
+
+def change_page_size(limit: Optional[int] = None) -> int:
+    """
+    Nombre maximal de changements par journal et par page.
+    """
+    if limit is None:
+        return settings.CHANGES_PAGE_DEFAULT_LIMIT
+    return min(limit, settings.CHANGES_PAGE_MAX_LIMIT)
+
+
+def record_vehicle_change(db: Session, vehicle_id: int, op: str) -> None:
+    """
+    Journalise un changement de véhicule dans la transaction en cours.
+    """
+    db.add(VehicleChange(vehicle_id=vehicle_id, op=op))
+
+
+def _settled(rows: List[Any], ts, cutoff: datetime) -> List[Any]:
+    """
+    Préfixe des lignes (triées par id) antérieures à `cutoff`.
+    """
+    for i, row in enumerate(rows):
+        if ts(row) is not None and ts(row) > cutoff:
+            return rows[:i]
+    return rows
+
+
+# Heure de la base (reculée derrière les écritures en cours, voir
+# `settle_horizon`), lue avec chaque page (voir `settled_statuses`)
+SETTLE_NOW = settle_horizon().label("settle_now")
+
+
+def settled_statuses(rows: List[Any]) -> List[Any]:
+    """
+    Préfixe des statuts (triés par id, lus avec la colonne SETTLE_NOW)
+    insérés au moins CHANGES_SETTLE_SECONDS avant SETTLE_NOW. Un
+    `created_at` absent (ligne antérieure à la colonne) compte comme
+    stabilisé.
+    """
+    if not rows:
+        return rows
+    cutoff = rows[0].settle_now - timedelta(seconds=settings.CHANGES_SETTLE_SECONDS)
+    return _settled(rows, lambda row: row.created_at, cutoff)
+
+
+def read_changes(db: Session, cursor: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Page suivante du flux à partir d'un curseur (None = début) :
+    au plus `limit` statuts et `limit` changements de véhicules.
+
+    Chaque base de statuts est lue par `id > position` (plage de la clé
+    primaire). Avec le sharding, les pages des shards sont fusionnées
+    par horodatage, chaque shard restant servi dans l'ordre de ses ids.
+    """
+    position = decode_cursor(cursor)
+    limit = change_page_size(limit)
+
+    stmt = select(*VehicleStatus.__table__.c, SETTLE_NOW).order_by(VehicleStatus.id).limit(limit + 1)
+
+    def fetch(status_db: Session) -> Tuple[str, List[Any]]:
+        name = status_database_name(status_db)
+        rows = status_db.execute(stmt.where(VehicleStatus.id > position.statuses.get(name, 0))).all()
+        return name, settled_statuses(rows)
+
+    pages = dict(fan_out_statuses(db, fetch))
+    merged = heapq.merge(
+        *[[(name, row) for row in rows] for name, rows in pages.items()],
+        key=lambda item: (item[1].timestamp or datetime.min, item[1].id),
+    )
+    statuses = []
+    served = dict.fromkeys(pages, 0)
+    for name, row in islice(merged, limit):
+        statuses.append(row)
+        served[name] += 1
+        position.statuses[name] = row.id
+    has_more = any(len(rows) > served[name] for name, rows in pages.items())
+
+    rows = db.execute(
+        select(VehicleChange, Vehicle, SETTLE_NOW)
+        .outerjoin(Vehicle, Vehicle.id == VehicleChange.vehicle_id)
+        .where(VehicleChange.id > position.vehicles)
+        .order_by(VehicleChange.id)
+        .limit(limit + 1)
+    ).all()
+    if rows:
+        cutoff = rows[0].settle_now - timedelta(seconds=settings.CHANGES_SETTLE_SECONDS)
+        rows = _settled(rows, lambda row: row[0].changed_at, cutoff)
+    has_more = has_more or len(rows) > limit
+    vehicles = [
+        VehicleChangeRead(
+            id=change.id,
+            vehicle_id=change.vehicle_id,
+            op=change.op,
+            changed_at=change.changed_at,
+            vehicle=None if vehicle is None else VehicleRead.model_validate(vehicle),
+        )
+        for change, vehicle, _ in rows[:limit]
+    ]
+    if vehicles:
+        position.vehicles = vehicles[-1].id
+
+    return {
+        "statuses": statuses,
+        "vehicles": vehicles,
+        "next_cursor": encode_cursor(position),
+        "has_more": has_more,
+    }
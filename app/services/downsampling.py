@@ -0,0 +1,121 @@
+# app/services/downsampling.py
+"""
+Sous-échantillonnage visuel : Largest-Triangle-Three-Buckets (LTTB).
+
+LTTB garde le premier et le dernier point et découpe les autres en
+`n - 2` seaux de même effectif ; dans chaque seau, il retient le point qui
+forme le plus grand triangle avec le point retenu au seau précédent et la
+moyenne du seau suivant. Les pics et les creux survivent, là où une
+moyenne par seau les aplatirait.
+
+Version en une passe sur un flux trié par abscisse, à mémoire bornée :
+
+- le choix dans un seau attend la fin du seau suivant (sa moyenne) ;
+- pour A et C fixés, l'aire du triangle (A, B, C) est, au signe près, une
+  fonction linéaire de B : son maximum en valeur absolue est atteint sur
+  l'enveloppe convexe du seau. Chaque seau ne garde donc que son
+  enveloppe (chaîne monotone d'Andrew, incrémentale puisque les points
+  arrivent triés), en général quelques points quel que soit l'effectif.
+"""
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+# (abscisse, ordonnée, donnée d'origine)
+Point = Tuple[float, float, Any]
+
+
+def _cross(o: Point, a: Point, b: Point) -> float:
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+class _Bucket:
+    """
+    Seau en cours : enveloppe convexe (inférieure et supérieure) et somme
+    des coordonnées pour la moyenne.
+    """
+
+    __slots__ = ("lower", "upper", "sum_x", "sum_y", "count", "last")
+
+    def __init__(self):
+        self.lower: List[Point] = []
+        self.upper: List[Point] = []
+        self.sum_x = self.sum_y = 0.0
+        self.count = 0
+        self.last: Optional[Point] = None
+
+    def add(self, p: Point) -> None:
+        lower, upper = self.lower, self.upper
+        while len(lower) >= 2 and _cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+        while len(upper) >= 2 and _cross(upper[-2], upper[-1], p) >= 0:
+            upper.pop()
+        upper.append(p)
+        self.sum_x += p[0]
+        self.sum_y += p[1]
+        self.count += 1
+        self.last = p
+
+    def average(self) -> Tuple[float, float]:
+        return self.sum_x / self.count, self.sum_y / self.count
+
+    def pick(self, a: Point, c: Tuple[float, float]) -> Point:
+        """
+        Sommet de l'enveloppe qui maximise l'aire du triangle (a, sommet, c) ;
+        à aire égale, le plus ancien.
+        """
+        best, best_area = None, -1.0
+        for p in self.lower + self.upper:
+            area = abs((p[0] - a[0]) * (c[1] - a[1]) - (c[0] - a[0]) * (p[1] - a[1]))
+            if area > best_area or (area == best_area and p[0] < best[0]):
+                best, best_area = p, area
+        return best
+
+
+def _bucket_starts(total: int, n: int) -> List[int]:
+    """
+    Indice du premier point de chaque segment : le premier point, les
+    `n - 2` seaux, le dernier point.
+    """
+    every = (total - 2) / (n - 2)
+    return [0] + [int(i * every) + 1 for i in range(n - 2)] + [total - 1]
+
+
+def lttb(points: Iterable[Point], total: int, n: int) -> Iterator[Point]:
+    """
+    Sélectionne au plus `n` (>= 3) des `total` points de `points` (triés par
+    abscisse). Sous `n` points, tout est rendu. Si le flux est plus court
+    qu'annoncé, ses derniers points ferment la sélection.
+    """
+    if total <= n:
+        yield from points
+        return
+    starts = _bucket_starts(total, n)
+    segment = 0
+    current = _Bucket()
+    previous: Optional[_Bucket] = None  # seau complet en attente de son suivant
+    selected: Optional[Point] = None
+
+    for i, p in enumerate(points):
+        while segment + 1 < len(starts) and i >= starts[segment + 1]:
+            # Le segment courant est complet : il fixe le seau précédent
+            if segment == 0:
+                selected = current.last
+                yield selected
+            else:
+                if previous is not None:
+                    selected = previous.pick(selected, current.average())
+                    yield selected
+                previous = current
+            current = _Bucket()
+            segment += 1
+        current.add(p)
+
+    if current.count == 0:
+        return
+    if selected is None:
+        # Flux réduit au premier segment
+        yield current.last
+        return
+    if previous is not None:
+        yield previous.pick(selected, current.average())
+    yield current.last
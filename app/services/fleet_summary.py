@@ -0,0 +1,306 @@
+# app/services/fleet_summary.py
+"""
+Totaux de la flotte (GET /fleet/summary) tenus à jour incrémentalement.
+
+Chaque processus garde, par véhicule, la contribution de son dernier
+statut (horodatage, portes, tranche de batterie) et des compteurs
+agrégés : nombre de véhicules, actifs, verrouillés, histogramme des
+niveaux de batterie, et nombre de véhicules par minute de dernier
+statut (« vus dans la dernière heure » = somme des 60 dernières minutes).
+Une écriture retire l'ancienne contribution du véhicule et ajoute la
+nouvelle ; la lecture ne coûte que la copie des compteurs, quelle que
+soit la taille de la flotte.
+
+Les chemins d'écriture (`create_vehicle`, `create_status`,
+`create_statuses`, purges, `delete_vehicle`) notifient les compteurs
+après leur commit. Les écritures des autres processus (et du chargement
+hors ligne) ne sont vues qu'à la réconciliation : toutes les
+FLEET_SUMMARY_RECONCILE_SECONDS, un thread de fond recalcule l'état
+depuis la DB (véhicules + dernier statut de chaque véhicule, shards
+interrogés en parallèle) et le substitue. Les notifications reçues
+pendant ce recalcul sont rejouées sur le nouvel état : aucune n'est perdue.
+"""
+import logging
+import threading
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.vehicle import Vehicle
+from app.db.models.vehicle_status import VehicleStatus
+from app.db.session import SessionLocal, fan_out_statuses, use_primary
+from app.schemas.fleet import BatteryBucket, FleetSummary
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+_MINUTE = timedelta(minutes=1)
+_RECENT_MINUTES = 60
+
+# Histogramme : tranches de 10 points de 0 à 100 (les valeurs hors bornes
+# tombent dans la première ou la dernière tranche)
+_BATTERY_BUCKET_WIDTH = 10
+_BATTERY_BUCKETS = 100 // _BATTERY_BUCKET_WIDTH
+
+# Contribution d'un véhicule ; champs du statut à None sans statut connu
+_Entry = namedtuple("_Entry", ["active", "status_id", "timestamp", "locked", "battery_bucket"])
+
+
+def _battery_bucket(level: Optional[float]) -> Optional[int]:
+    if level is None:
+        return None
+    return min(max(int(level // _BATTERY_BUCKET_WIDTH), 0), _BATTERY_BUCKETS - 1)
+
+
+def _minute(ts: datetime) -> int:
+    return (ts - _EPOCH) // _MINUTE
+
+
+class _FleetState:
+    """
+    Contributions par véhicule et compteurs agrégés. Les opérations sont
+    idempotentes (rejouables après une réconciliation).
+    """
+
+    def __init__(self):
+        self.entries: Dict[int, _Entry] = {}
+        self.vehicles = 0
+        self.active = 0
+        self.reporting = 0
+        self.locked = 0
+        self.battery = [0] * _BATTERY_BUCKETS
+        self.battery_unknown = 0
+        self.minutes: Counter = Counter()
+
+    def _count(self, entry: _Entry, sign: int) -> None:
+        self.vehicles += sign
+        self.active += sign if entry.active else 0
+        if entry.timestamp is None:
+            return
+        self.reporting += sign
+        self.locked += sign if entry.locked else 0
+        if entry.battery_bucket is None:
+            self.battery_unknown += sign
+        else:
+            self.battery[entry.battery_bucket] += sign
+        minute = _minute(entry.timestamp)
+        self.minutes[minute] += sign
+        if not self.minutes[minute]:
+            del self.minutes[minute]
+
+    def _set(self, vehicle_id: int, entry: Optional[_Entry]) -> None:
+        old = self.entries.pop(vehicle_id, None)
+        if old is not None:
+            self._count(old, -1)
+        if entry is not None:
+            self.entries[vehicle_id] = entry
+            self._count(entry, 1)
+
+    # -----------------
+    # Opérations
+    # -----------------
+
+    def save_vehicle(self, vehicle_id: int, active: bool) -> None:
+        old = self.entries.get(vehicle_id)
+        if old is None:
+            self._set(vehicle_id, _Entry(bool(active), None, None, None, None))
+        elif old.active != bool(active):
+            self._set(vehicle_id, old._replace(active=bool(active)))
+
+    def remove_vehicle(self, vehicle_id: int) -> None:
+        self._set(vehicle_id, None)
+
+    def observe(self, status: Any) -> None:
+        """
+        Prend en compte un statut s'il est plus récent que le dernier connu
+        du véhicule (un véhicule inconnu est supposé actif).
+        """
+        old = self.entries.get(status.vehicle_id)
+        if old is not None and old.timestamp is not None and (old.timestamp, old.status_id) >= (status.timestamp, status.id):
+            return
+        self._set(status.vehicle_id, _Entry(
+            True if old is None else old.active,
+            status.id,
+            status.timestamp,
+            bool(status.doors_locked),
+            _battery_bucket(status.battery_level),
+        ))
+
+    def forget_statuses(self, vehicle_id: int, before: Optional[datetime]) -> None:
+        """
+        Après une purge des statuts antérieurs à `before` (tous si None) :
+        le dernier statut n'a disparu que s'il était lui-même antérieur.
+        """
+        old = self.entries.get(vehicle_id)
+        if old is None or old.timestamp is None or (before is not None and old.timestamp >= before):
+            return
+        self._set(vehicle_id, _Entry(old.active, None, None, None, None))
+
+    # -----------------
+    # Chargement / lecture
+    # -----------------
+
+    @classmethod
+    def load(cls, db: Session) -> "_FleetState":
+        """
+        État complet depuis la DB : une requête sur les véhicules, une
+        « plus grand timestamp par véhicule » par base de statuts.
+        """
+        use_primary(db)
+        state = cls()
+        for vehicle_id, active in db.execute(select(Vehicle.id, Vehicle.is_active)).all():
+            state.save_vehicle(vehicle_id, active is not False)
+
+        latest_ts = (
+            select(VehicleStatus.vehicle_id, func.max(VehicleStatus.timestamp).label("ts"))
+            .group_by(VehicleStatus.vehicle_id)
+            .subquery()
+        )
+        stmt = select(
+            VehicleStatus.id,
+            VehicleStatus.vehicle_id,
+            VehicleStatus.timestamp,
+            VehicleStatus.battery_level,
+            VehicleStatus.doors_locked,
+        ).join(
+            latest_ts,
+            and_(
+                VehicleStatus.vehicle_id == latest_ts.c.vehicle_id,
+                VehicleStatus.timestamp == latest_ts.c.ts,
+            ),
+        )
+        for rows in fan_out_statuses(db, lambda status_db: status_db.execute(stmt).all()):
+            for row in rows:
+                # Statuts d'un véhicule supprimé (shard pas encore purgé) : ignorés
+                if row.vehicle_id in state.entries:
+                    state.observe(row)
+        return state
+
+    def summary(self, now: datetime, reconciled_at: Optional[datetime]) -> FleetSummary:
+        current = _minute(now)
+        return FleetSummary(
+            vehicles=self.vehicles,
+            active_vehicles=self.active,
+            reporting_vehicles=self.reporting,
+            locked_vehicles=self.locked,
+            locked_share=self.locked / self.reporting if self.reporting else None,
+            reported_last_hour=sum(
+                self.minutes.get(minute, 0) for minute in range(current - _RECENT_MINUTES + 1, current + 1)
+            ),
+            battery_histogram=[
+                BatteryBucket(
+                    min=i * _BATTERY_BUCKET_WIDTH,
+                    max=(i + 1) * _BATTERY_BUCKET_WIDTH,
+                    vehicles=count,
+                )
+                for i, count in enumerate(self.battery)
+            ],
+            battery_unknown=self.battery_unknown,
+            reconciled_at=reconciled_at,
+        )
+
+
+class FleetCounters:
+    """
+    Compteurs de la flotte du processus, réconciliés périodiquement.
+    Avant la première réconciliation, les notifications sont ignorées.
+    """
+
+    def __init__(self, reconcile_seconds: float):
+        self.reconcile_seconds = reconcile_seconds
+        self.reconciled_at: Optional[datetime] = None
+        self._state: Optional[_FleetState] = None
+        # Notifications reçues pendant une réconciliation, à rejouer
+        self._journal: Optional[List[Tuple[str, tuple]]] = None
+        self._lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _apply(self, op: str, *args) -> None:
+        with self._lock:
+            if self._state is not None:
+                getattr(self._state, op)(*args)
+            if self._journal is not None:
+                self._journal.append((op, args))
+
+    def save_vehicle(self, vehicle_id: int, active: bool) -> None:
+        self._apply("save_vehicle", vehicle_id, active)
+
+    def remove_vehicle(self, vehicle_id: int) -> None:
+        self._apply("remove_vehicle", vehicle_id)
+
+    def observe(self, status: Any) -> None:
+        self._apply("observe", status)
+
+    def forget_statuses(self, vehicle_id: int, before: Optional[datetime] = None) -> None:
+        self._apply("forget_statuses", vehicle_id, before)
+
+    def reconcile(self, db: Session) -> int:
+        """
+        Recalcule l'état depuis la DB et le substitue à l'état courant.
+        Retourne le nombre de véhicules.
+        """
+        with self._reconcile_lock:
+            with self._lock:
+                self._journal = []
+            try:
+                state = _FleetState.load(db)
+                with self._lock:
+                    for op, args in self._journal:
+                        getattr(state, op)(*args)
+                    self._state = state
+                    self.reconciled_at = datetime.utcnow()
+            finally:
+                with self._lock:
+                    self._journal = None
+            return state.vehicles
+
+    def summary(self, db: Session) -> FleetSummary:
+        """
+        Totaux courants ; la première lecture du processus (thread de fond
+        pas encore passé) réconcilie d'abord.
+        """
+        if self._state is None:
+            self.reconcile(db)
+        with self._lock:
+            return self._state.summary(datetime.utcnow(), self.reconciled_at)
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="fleet-summary", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def _loop(self) -> None:
+        while True:
+            db = SessionLocal()
+            try:
+                self.reconcile(db)
+            except Exception:
+                logger.exception("Fleet summary reconciliation failed")
+            finally:
+                db.close()
+            if self._stop.wait(self.reconcile_seconds):
+                return
+
+
+fleet_counters = FleetCounters(settings.FLEET_SUMMARY_RECONCILE_SECONDS)
+
+
+def get_fleet_summary(db: Session) -> FleetSummary:
+    """
+    Totaux de la flotte : compteurs du processus (FLEET_SUMMARY_ENABLED),
+    sinon calculés à la demande depuis la DB.
+    """
+    if settings.FLEET_SUMMARY_ENABLED:
+        return fleet_counters.summary(db)
+    return _FleetState.load(db).summary(datetime.utcnow(), None)
@@ -0,0 +1,203 @@
+# app/services/geohash.py
+"""
+Geohash et découpage d'une zone en cellules, sans extension spatiale.
+
+Un geohash de précision p est une chaîne base 32 qui identifie une cellule
+de la grille (5 bits par caractère, alternativement longitude / latitude).
+Toutes les positions d'une cellule partagent le préfixe de la cellule :
+une zone rectangulaire se traduit donc en quelques plages de préfixes,
+parcourues par un index B-tree ordinaire (SQLite comme Postgres).
+"""
+import math
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+EARTH_RADIUS_KM = 6371.0088
+# Kilomètres par degré de latitude
+KM_PER_DEGREE = 111.32
+
+
+class BBox(NamedTuple):
+    """
+    Rectangle en degrés (ordre GeoJSON). `min_lon > max_lon` désigne
+    un rectangle qui traverse l'antiméridien.
+    """
+    min_lon: float
+    min_lat: float
+    max_lon: float
+    max_lat: float
+
+    def split(self) -> List["BBox"]:
+        """
+        Découpe un rectangle qui traverse l'antiméridien en deux.
+        """
+        if self.min_lon <= self.max_lon:
+            return [self]
+        return [
+            BBox(self.min_lon, self.min_lat, 180.0, self.max_lat),
+            BBox(-180.0, self.min_lat, self.max_lon, self.max_lat),
+        ]
+
+
+def parse_bbox(raw: str) -> BBox:
+    """
+    `"min_lon,min_lat,max_lon,max_lat"` -> BBox (ValueError si invalide).
+    """
+    parts = raw.split(",")
+    if len(parts) != 4:
+        raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+    bbox = BBox(*(float(p) for p in parts))
+    if not all(math.isfinite(v) for v in bbox):
+        raise ValueError("bbox values must be finite")
+    if not (-180.0 <= bbox.min_lon <= 180.0 and -180.0 <= bbox.max_lon <= 180.0):
+        raise ValueError("bbox longitudes must be within [-180, 180]")
+    if not (-90.0 <= bbox.min_lat <= bbox.max_lat <= 90.0):
+        raise ValueError("bbox latitudes must be within [-90, 90] with min_lat <= max_lat")
+    return bbox
+
+
+def encode(latitude: float, longitude: float, precision: int) -> str:
+    """
+    Geohash d'une position.
+    """
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if longitude >= mid:
+                value = value * 2 + 1
+                lon_lo = mid
+            else:
+                value *= 2
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                value = value * 2 + 1
+                lat_lo = mid
+            else:
+                value *= 2
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """
+    (hauteur, largeur) en degrés d'une cellule de précision donnée.
+    """
+    total = 5 * precision
+    lon_bits = (total + 1) // 2
+    lat_bits = total // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def _grid(bbox: BBox, precision: int) -> Tuple[range, range]:
+    height, width = cell_size(precision)
+    rows = range(
+        int((bbox.min_lat + 90.0) // height),
+        min(int((bbox.max_lat + 90.0) // height), (1 << (5 * precision // 2)) - 1) + 1,
+    )
+    cols = range(
+        int((bbox.min_lon + 180.0) // width),
+        min(int((bbox.max_lon + 180.0) // width), (1 << ((5 * precision + 1) // 2)) - 1) + 1,
+    )
+    return rows, cols
+
+
+def covering_cells(bbox: BBox, max_cells: int, max_precision: int) -> List[str]:
+    """
+    Préfixes geohash couvrant le rectangle : la précision la plus fine
+    (<= max_precision) qui tient en `max_cells` cellules, triés.
+    """
+    boxes = bbox.split()
+    best: List[str] = []
+    for precision in range(1, max_precision + 1):
+        cells = set()
+        count = 0
+        for box in boxes:
+            rows, cols = _grid(box, precision)
+            count += len(rows) * len(cols)
+            if count > max_cells:
+                break
+            height, width = cell_size(precision)
+            for row in rows:
+                for col in cols:
+                    cells.add(encode(-90.0 + (row + 0.5) * height, -180.0 + (col + 0.5) * width, precision))
+        if count > max_cells:
+            break
+        best = sorted(cells)
+    return best or [""]
+
+
+def _successor(prefix: str) -> Optional[str]:
+    """
+    Plus petit préfixe qui suit tous ceux commençant par `prefix`
+    (None si `prefix` est le dernier de la grille).
+    """
+    chars = list(prefix)
+    while chars:
+        index = _BASE32.index(chars[-1])
+        if index + 1 < len(_BASE32):
+            chars[-1] = _BASE32[index + 1]
+            return "".join(chars)
+        chars.pop()
+    return None
+
+
+def prefix_ranges(cells: Iterable[str]) -> List[Tuple[str, Optional[str]]]:
+    """
+    Plages `[début, fin)` de geohash disjointes et triées couvrant des
+    cellules : les cellules contiguës sont fusionnées, celles déjà
+    couvertes par une autre ignorées (fin None = sans borne haute).
+    """
+    ranges: List[Tuple[str, Optional[str]]] = []
+    for cell in sorted(set(cells)):
+        if ranges and ranges[-1][0] <= cell and (ranges[-1][1] is None or cell < ranges[-1][1]):
+            continue
+        upper = _successor(cell)
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1] = (ranges[-1][0], upper)
+        else:
+            ranges.append((cell, upper))
+    return ranges
+
+
+def bbox_around(latitude: float, longitude: float, radius_km: float) -> BBox:
+    """
+    Rectangle qui contient le disque de rayon `radius_km` autour d'un point.
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(-90.0, latitude - dlat), min(90.0, latitude + dlat)
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    dlon = 180.0 if cos_lat < 1e-9 else radius_km / (KM_PER_DEGREE * cos_lat)
+    if dlon >= 180.0:
+        return BBox(-180.0, min_lat, 180.0, max_lat)
+    min_lon, max_lon = longitude - dlon, longitude + dlon
+    if min_lon < -180.0:
+        min_lon += 360.0
+    if max_lon > 180.0:
+        max_lon -= 360.0
+    return BBox(min_lon, min_lat, max_lon, max_lat)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Distance orthodromique en kilomètres.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
@@ -0,0 +1,424 @@
+# app/services/hot_store.py
+"""
+Stockage "chaud" en mémoire des statuts récents de chaque véhicule.
+
+Un tampon circulaire de capacité fixe par véhicule, en colonnes
+`array` (ids, timestamps en µs, batterie, odomètre, position, portes :
+~49 octets par statut), sans objets ORM. Il est :
+
+- préchauffé au démarrage par une seule requête (les N derniers statuts
+  de chaque véhicule, fenêtre ROW_NUMBER), shard par shard ;
+- alimenté par `create_status` (et tout autre chemin d'ingestion) ;
+- consulté par `list_statuses` : une plage entièrement couverte par le
+  tampon est servie sans requête DB, sinon on retombe sur la DB.
+
+Couverture : chaque tampon mémorise `complete_from`, un timestamp à
+partir duquel *tous* les statuts du véhicule sont présents (None = tout
+l'historique). Évincer un statut remonte cette borne juste au-dessus de
+son timestamp. Un tampon créé après le préchauffage ne couvre que ce
+qui suit son premier statut, sauf s'il est prouvé qu'aucun statut du
+véhicule n'a été écrit ailleurs (voir ci-dessous).
+
+Le stockage est propre à chaque processus. Avec plusieurs workers
+uvicorn, il faut la table partagée des derniers statuts
+(LATEST_STATUS_SHM_ENABLED) : chaque tampon retient la valeur du
+compteur d'insertions du slot du véhicule qu'il reflète (lue avant la
+requête de préchauffage, puis avancée par ses propres insertions). Si
+le compteur de la table a une autre valeur, un autre worker a inséré ou
+purgé des statuts de ce véhicule (ou d'un véhicule du même slot) : le
+tampon est abandonné et la lecture passe par la DB. Sans cette table,
+ne l'activer qu'avec un seul worker.
+
+La mémoire est bornée par HOT_STORE_MEMORY_MB : au-delà, les véhicules
+les moins récemment utilisés sont évincés.
+"""
+import logging
+import math
+import threading
+from array import array
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.vehicle_status import VehicleStatus
+from app.db.session import fan_out_statuses, use_primary
+from app.services.latest_status_table import latest_status_table
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+_US = timedelta(microseconds=1)
+
+# ids + timestamps (q), batterie + odomètre + latitude + longitude (d), portes (b)
+_BYTES_PER_SAMPLE = 8 + 8 + 8 + 8 + 8 + 8 + 1
+# Surcoût approximatif d'un tampon (objets array, entrée du dictionnaire)
+_RING_OVERHEAD = 512
+
+_FIELDS = (
+    "id",
+    "vehicle_id",
+    "timestamp",
+    "battery_level",
+    "doors_locked",
+    "odometer_km",
+    "latitude",
+    "longitude",
+)
+
+# Ligne renvoyée pour une lecture complète (compatible avec VehicleStatusRead)
+HotStatus = namedtuple("HotStatus", _FIELDS)
+
+
+@lru_cache(maxsize=64)
+def _row_type(fields: Sequence[str]):
+    """
+    Type de ligne projetée pour un fieldset (accès par index et par nom,
+    comme une ligne SQL).
+    """
+    return namedtuple("HotStatusRow", fields)
+
+
+def _to_us(ts: datetime) -> int:
+    return (ts - _EPOCH) // _US
+
+
+def _from_us(us: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=us)
+
+
+def _opt(value: Optional[float]) -> float:
+    return math.nan if value is None else float(value)
+
+
+def _unopt(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+class _Ring:
+    """
+    Tampon circulaire des derniers statuts d'un véhicule.
+    """
+
+    __slots__ = (
+        "ids",
+        "ts",
+        "battery",
+        "odometer",
+        "latitude",
+        "longitude",
+        "doors",
+        "start",
+        "size",
+        "complete_from",
+        "inserts",
+    )
+
+    def __init__(self, capacity: int, complete_from: Optional[int], inserts: Optional[int] = None):
+        self.ids = array("q", bytes(8 * capacity))
+        self.ts = array("q", bytes(8 * capacity))
+        self.battery = array("d", bytes(8 * capacity))
+        self.odometer = array("d", bytes(8 * capacity))
+        self.latitude = array("d", bytes(8 * capacity))
+        self.longitude = array("d", bytes(8 * capacity))
+        self.doors = array("b", bytes(capacity))
+        self.start = 0
+        self.size = 0
+        self.complete_from = complete_from
+        # Compteur d'insertions de la table partagée reflété par le tampon
+        self.inserts = inserts
+
+    def push(
+        self,
+        status_id: int,
+        ts: int,
+        battery: float,
+        odometer: float,
+        latitude: float,
+        longitude: float,
+        doors: int,
+    ) -> None:
+        capacity = len(self.ids)
+        if self.size == capacity:
+            # Le plus ancien est écrasé : la couverture recule d'autant
+            evicted = self.ts[self.start]
+            if self.complete_from is None or self.complete_from <= evicted:
+                self.complete_from = evicted + 1
+            pos = self.start
+            self.start = (self.start + 1) % capacity
+        else:
+            pos = (self.start + self.size) % capacity
+            self.size += 1
+        self.ids[pos] = status_id
+        self.ts[pos] = ts
+        self.battery[pos] = battery
+        self.odometer[pos] = odometer
+        self.latitude[pos] = latitude
+        self.longitude[pos] = longitude
+        self.doors[pos] = doors
+
+    def covers(self, since: Optional[int]) -> bool:
+        if self.complete_from is None:
+            return True
+        return since is not None and since >= self.complete_from
+
+    def positions(self):
+        capacity = len(self.ids)
+        for i in range(self.size):
+            yield (self.start + i) % capacity
+
+    def sample(self, pos: int, vehicle_id: int) -> HotStatus:
+        return HotStatus(
+            self.ids[pos],
+            vehicle_id,
+            _from_us(self.ts[pos]),
+            _unopt(self.battery[pos]),
+            None if self.doors[pos] < 0 else bool(self.doors[pos]),
+            _unopt(self.odometer[pos]),
+            _unopt(self.latitude[pos]),
+            _unopt(self.longitude[pos]),
+        )
+
+    def latest(self, vehicle_id: int) -> HotStatus:
+        newest = max(self.positions(), key=lambda pos: (self.ts[pos], self.ids[pos]))
+        return self.sample(newest, vehicle_id)
+
+
+class HotStore:
+    """
+    Tampons circulaires par véhicule, bornés en mémoire, avec métriques.
+    """
+
+    def __init__(self, capacity: int, memory_bytes: int):
+        self.capacity = max(1, capacity)
+        per_vehicle = self.capacity * _BYTES_PER_SAMPLE + _RING_OVERHEAD
+        self.max_vehicles = max(1, memory_bytes // per_vehicle)
+        self._rings: "OrderedDict[int, _Ring]" = OrderedDict()
+        # Véhicules dont l'historique n'est plus suivi depuis le préchauffage
+        # (évincés, ignorés faute de mémoire, purgés)
+        self._untracked: Set[int] = set()
+        self._warmed = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    # -----------------
+    # Alimentation
+    # -----------------
+
+    def _ring_for(self, vehicle_id: int, first_ts: int, count: int, inserts: Optional[int]) -> _Ring:
+        ring = self._rings.get(vehicle_id)
+        if ring is not None and inserts is not None and ring.inserts != inserts - count:
+            # Un autre worker a écrit depuis la dernière synchronisation du tampon
+            self._drop(vehicle_id)
+            ring = None
+        if ring is None:
+            if (
+                self._warmed
+                and vehicle_id not in self._untracked
+                and (inserts is None or inserts == count)
+            ):
+                # Véhicule sans historique au préchauffage, et (avec la table
+                # partagée) aucune autre écriture sur son slot : tout est ici
+                complete_from = None
+            else:
+                complete_from = first_ts + 1
+            ring = _Ring(self.capacity, complete_from)
+            self._rings[vehicle_id] = ring
+            self._untracked.discard(vehicle_id)
+            while len(self._rings) > self.max_vehicles:
+                evicted, _ = self._rings.popitem(last=False)
+                self._untracked.add(evicted)
+        else:
+            self._rings.move_to_end(vehicle_id)
+        ring.inserts = inserts
+        return ring
+
+    def record(self, statuses: Sequence, inserts: Optional[int] = None) -> None:
+        """
+        Ajoute les statuts d'un véhicule qui viennent d'être insérés (ordre
+        chronologique). `inserts` : compteur d'insertions de la table
+        partagée rendu par `record_inserts` pour ces statuts.
+        """
+        if not statuses:
+            return
+        with self._lock:
+            ring = self._ring_for(
+                statuses[0].vehicle_id, _to_us(statuses[0].timestamp), len(statuses), inserts
+            )
+            for status in statuses:
+                ring.push(
+                    status.id,
+                    _to_us(status.timestamp),
+                    _opt(status.battery_level),
+                    _opt(status.odometer_km),
+                    _opt(status.latitude),
+                    _opt(status.longitude),
+                    -1 if status.doors_locked is None else int(status.doors_locked),
+                )
+
+    def _drop(self, vehicle_id: int) -> None:
+        self._rings.pop(vehicle_id, None)
+        self._untracked.add(vehicle_id)
+
+    def drop(self, vehicle_id: int) -> None:
+        """
+        Oublie un véhicule (historique purgé ou supprimé).
+        """
+        with self._lock:
+            self._drop(vehicle_id)
+
+    def warm(self, db: Session) -> int:
+        """
+        Charge les `capacity` derniers statuts de chaque véhicule
+        (une requête par base de statuts). Retourne le nombre de statuts chargés.
+        """
+        use_primary(db)
+        # Compteurs lus avant les requêtes : une insertion que le chargement
+        # ne voit pas les fera forcément différer
+        slot_inserts = None if latest_status_table is None else latest_status_table.insert_counts()
+        rank = (
+            func.row_number()
+            .over(
+                partition_by=VehicleStatus.vehicle_id,
+                order_by=(VehicleStatus.timestamp.desc(), VehicleStatus.id.desc()),
+            )
+            .label("rank")
+        )
+        recent = select(*VehicleStatus.__table__.c, rank).subquery()
+        stmt = (
+            select(*[recent.c[name] for name in _FIELDS])
+            .where(recent.c.rank <= self.capacity)
+            .order_by(recent.c.vehicle_id, recent.c.timestamp, recent.c.id)
+        )
+
+        def load(status_db: Session) -> int:
+            loaded = 0
+            counts: Dict[int, int] = {}
+            result = status_db.execute(stmt.execution_options(yield_per=5000))
+            for partition in result.partitions():
+                with self._lock:
+                    for row in partition:
+                        ts = _to_us(row.timestamp)
+                        ring = self._rings.get(row.vehicle_id)
+                        if ring is None:
+                            if len(self._rings) >= self.max_vehicles:
+                                self._untracked.add(row.vehicle_id)
+                                continue
+                            inserts = None if slot_inserts is None else slot_inserts[row.vehicle_id % len(slot_inserts)]
+                            ring = self._rings[row.vehicle_id] = _Ring(self.capacity, None, inserts)
+                        ring.push(
+                            row.id,
+                            ts,
+                            _opt(row.battery_level),
+                            _opt(row.odometer_km),
+                            _opt(row.latitude),
+                            _opt(row.longitude),
+                            -1 if row.doors_locked is None else int(row.doors_locked),
+                        )
+                        counts[row.vehicle_id] = counts.get(row.vehicle_id, 0) + 1
+                        loaded += 1
+            with self._lock:
+                for vehicle_id, count in counts.items():
+                    ring = self._rings.get(vehicle_id)
+                    if ring is not None and count >= self.capacity:
+                        # Tampon plein : des statuts plus anciens (éventuellement
+                        # au même timestamp que le plus ancien chargé) existent
+                        ring.complete_from = ring.ts[ring.start] + 1
+            return loaded
+
+        loaded = sum(fan_out_statuses(db, load))
+        with self._lock:
+            self._warmed = True
+            latest = [ring.latest(vehicle_id) for vehicle_id, ring in self._rings.items()]
+        if latest_status_table is not None:
+            # Référence commune aux workers pour détecter les tampons en retard
+            for status in latest:
+                latest_status_table.update(status)
+        logger.info("Hot store warmed: %s statuses for %s vehicles", loaded, len(self._rings))
+        return loaded
+
+    # -----------------
+    # Lecture
+    # -----------------
+
+    def query(
+        self,
+        vehicle_id: int,
+        since: Optional[datetime],
+        until: Optional[datetime],
+        order: str,
+        limit: int,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Optional[List[Any]]:
+        """
+        Statuts d'une plage `[since, until)` (timestamps UTC naïfs), triés
+        et bornés comme `list_statuses` ; None si la plage n'est pas
+        entièrement couverte par le tampon.
+        """
+        since_us = None if since is None else _to_us(since)
+        until_us = None if until is None else _to_us(until)
+
+        with self._lock:
+            ring = self._rings.get(vehicle_id)
+            if ring is None or not ring.covers(since_us):
+                self.misses += 1
+                return None
+            if latest_status_table is not None:
+                # Un autre worker a-t-il écrit depuis ? Le tampon ne peut plus
+                # redevenir complet : on l'abandonne
+                inserts = latest_status_table.inserts(vehicle_id)
+                if inserts != ring.inserts:
+                    if inserts is not None:
+                        self._drop(vehicle_id)
+                    self.stale += 1
+                    return None
+            self._rings.move_to_end(vehicle_id)
+            selected = [
+                pos
+                for pos in ring.positions()
+                if (since_us is None or ring.ts[pos] >= since_us)
+                and (until_us is None or ring.ts[pos] < until_us)
+            ]
+            selected.sort(key=lambda pos: (ring.ts[pos], ring.ids[pos]), reverse=order != "asc")
+            rows = [ring.sample(pos, vehicle_id) for pos in selected[:limit]]
+            self.hits += 1
+
+        if fields:
+            row_type = _row_type(tuple(fields))
+            rows = [row_type(*(getattr(row, name) for name in fields)) for row in rows]
+        return rows
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Taux de succès et occupation mémoire.
+        """
+        with self._lock:
+            samples = sum(ring.size for ring in self._rings.values())
+            lookups = self.hits + self.misses + self.stale
+            return {
+                "enabled": True,
+                "vehicles": len(self._rings),
+                "max_vehicles": self.max_vehicles,
+                "samples_per_vehicle": self.capacity,
+                "samples": samples,
+                "memory_bytes": len(self._rings) * (self.capacity * _BYTES_PER_SAMPLE + _RING_OVERHEAD),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
+
+
+# Instance globale (None si la fonctionnalité est désactivée)
+hot_store: Optional[HotStore] = None
+if settings.HOT_STORE_ENABLED:
+    hot_store = HotStore(
+        capacity=settings.HOT_STORE_SAMPLES_PER_VEHICLE,
+        memory_bytes=int(settings.HOT_STORE_MEMORY_MB * 1024 * 1024),
+    )
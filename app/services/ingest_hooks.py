@@ -0,0 +1,128 @@
+# app/services/ingest_hooks.py
+"""
+Traitements déclenchés après l'insertion de statuts (unitaire ou par lot).
+
+Tous les chemins d'ingestion programment le rafraîchissement des données
+dérivées (analytique, trajets / recharges) de chaque véhicule touché,
+hors du chemin critique de la requête : elles sont mises à jour
+incrémentalement à partir de leur checkpoint.
+
+Un statut n'est intégré qu'une fois stabilisé (inséré depuis au moins
+CHANGES_SETTLE_SECONDS, voir `changes.settled_statuses`) : rafraîchir
+juste après l'insertion n'intégrerait rien. Le `DerivedRefresher` (un
+thread par processus API) rafraîchit donc chaque véhicule une fois ce
+délai écoulé ; les insertions rapprochées d'un véhicule partagent un même
+rafraîchissement. Les véhicules encore en attente à l'arrêt du processus
+sont rattrapés par les jobs `analytics_refresh` / `segments_refresh`, ou
+par leur prochaine insertion.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.analytics import refresh_vehicle_analytics
+from app.services.segments import refresh_vehicle_segments
+
+logger = logging.getLogger(__name__)
+
+# Marge ajoutée au délai de stabilisation (horloges du processus et de la DB)
+_SETTLE_MARGIN_SECONDS = 0.25
+
+
+def derived_refresh_enabled() -> bool:
+    return settings.ANALYTICS_REFRESH_ON_INGEST or settings.SEGMENTS_REFRESH_ON_INGEST
+
+
+def refresh_derived(vehicle_ids: Iterable[int]) -> None:
+    """
+    Rafraîchit les données dérivées des véhicules donnés,
+    avec une session dédiée.
+    """
+    db = SessionLocal()
+    try:
+        for vehicle_id in vehicle_ids:
+            try:
+                if settings.ANALYTICS_REFRESH_ON_INGEST:
+                    refresh_vehicle_analytics(db, vehicle_id)
+                if settings.SEGMENTS_REFRESH_ON_INGEST:
+                    refresh_vehicle_segments(db, vehicle_id)
+            except Exception:
+                db.rollback()
+                logger.exception("Derived data refresh failed for vehicle %s", vehicle_id)
+    finally:
+        db.close()
+
+
+class DerivedRefresher:
+    """
+    Rafraîchissements programmés par véhicule, exécutés une fois leurs
+    statuts stabilisés. Un véhicule déjà programmé le reste à la même
+    échéance ; les insertions reçues entre-temps en programment un suivant
+    (pas de report indéfini sous un flux continu).
+    """
+
+    def __init__(self):
+        # Véhicule -> échéance du prochain rafraîchissement
+        self._due: Dict[int, float] = {}
+        # Véhicule -> échéance des insertions reçues depuis sa programmation
+        self._again: Dict[int, float] = {}
+        self._changed = threading.Condition()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, vehicle_ids: Iterable[int]) -> None:
+        due = time.monotonic() + settings.CHANGES_SETTLE_SECONDS + _SETTLE_MARGIN_SECONDS
+        with self._changed:
+            for vehicle_id in vehicle_ids:
+                if vehicle_id in self._due:
+                    self._again[vehicle_id] = due
+                else:
+                    self._due[vehicle_id] = due
+            self._changed.notify()
+
+    def pending(self) -> int:
+        with self._changed:
+            return len(self._due)
+
+    def start(self) -> None:
+        with self._changed:
+            self._stopping = False
+        self._thread = threading.Thread(target=self._loop, name="derived-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._changed:
+            self._stopping = True
+            self._changed.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def _next_ready(self) -> Optional[list]:
+        """
+        Attend les véhicules arrivés à échéance (None à l'arrêt).
+        """
+        with self._changed:
+            while not self._stopping:
+                now = time.monotonic()
+                ready = sorted(vid for vid, due in self._due.items() if due <= now)
+                if ready:
+                    for vehicle_id in ready:
+                        del self._due[vehicle_id]
+                        if vehicle_id in self._again:
+                            self._due[vehicle_id] = self._again.pop(vehicle_id)
+                    return ready
+                self._changed.wait(min(self._due.values()) - now if self._due else None)
+            return None
+
+    def _loop(self) -> None:
+        while True:
+            ready = self._next_ready()
+            if ready is None:
+                return
+            refresh_derived(ready)
+
+
+derived_refresher = DerivedRefresher()
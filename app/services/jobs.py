@@ -0,0 +1,469 @@
+# app/services/jobs.py
+"""
+Jobs de fond : exports d'historique complets, recalculs sur toute la flotte...
+
+- les jobs sont persistés dans la table `jobs` (ils survivent aux redémarrages :
+  un job "running" dont le heartbeat est trop ancien est remis en file) ;
+- le `JobRunner` (un thread par processus API) réclame les jobs en file
+  de façon atomique, les découpe en unités de travail (lots de véhicules)
+  et les exécute dans un `ProcessPoolExecutor` : le travail CPU utilise
+  tous les cœurs sans bloquer les threads qui servent l'API ;
+- un seul runner est actif par dossier d'exports (verrou `fcntl`, donc un
+  par hôte) : le pool est dimensionné pour l'hôte entier, pas multiplié
+  par le nombre de workers uvicorn. Les autres runners attendent le verrou
+  et prennent le relais si son détenteur s'arrête ;
+- le heartbeat et l'annulation sont vérifiés toutes les
+  JOBS_HEARTBEAT_SECONDS, y compris pendant une unité longue ;
+- le résultat d'un export se télécharge via GET /jobs/{job_id}/download.
+
+Les fonctions d'unité (`_export_unit`, `_summary_unit`, `_analytics_unit`, ...)
+s'exécutent dans les processus du pool : elles ouvrent leur propre session DB et ne
+renvoient que des structures simples (picklables).
+"""
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.job import Job
+from app.db.models.vehicle import Vehicle
+from app.db.models.vehicle_status import VehicleStatus
+from app.db.session import SessionLocal, fan_out_statuses, status_session, use_primary
+from app.schemas.job import JobCreate
+from app.services.analytics import refresh_vehicle_analytics
+from app.services.segments import refresh_vehicle_segments
+from app.services.telemetry_formats import to_epoch_ms
+
+try:  # POSIX uniquement ; sans fcntl on suppose un seul processus
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+
+# =====================================================================
+# API du service
+# =====================================================================
+
+def create_job(db: Session, data: JobCreate) -> Job:
+    """
+    Met un job en file. Il sera exécuté par le prochain runner disponible.
+    """
+    job = Job(kind=data.kind, params=data.params, status=JOB_QUEUED)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id: int) -> Optional[Job]:
+    """
+    Retourne un job (avancement, résultat) par son identifiant.
+    """
+    return db.get(Job, job_id)
+
+
+def cancel_job(db: Session, job_id: int) -> Optional[Job]:
+    """
+    Annule un job : immédiatement s'il est encore en file,
+    sinon à la fin de l'unité de travail en cours.
+    """
+    job = db.get(Job, job_id)
+    if job is None:
+        return None
+    if job.status == JOB_QUEUED:
+        job.status = JOB_CANCELLED
+        job.finished_at = datetime.utcnow()
+    elif job.status == JOB_RUNNING:
+        job.cancel_requested = True
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def export_files(job: Job) -> Optional[List[str]]:
+    """
+    Fichiers d'un export, dans l'ordre des véhicules
+    (None si son dossier n'existe pas ou plus).
+    """
+    directory = _export_dir(job.id)
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith(".jsonl")]
+    except FileNotFoundError:
+        return None
+    names.sort(key=lambda name: int(name[len("vehicle_"):-len(".jsonl")]))
+    return [os.path.join(directory, name) for name in names]
+
+
+def iter_export(paths: List[str], chunk_size: int = 1 << 16) -> Iterator[bytes]:
+    """
+    Concatène les fichiers JSON Lines d'un export (chaque ligne porte
+    son `vehicle_id`) : un seul flux, lu par blocs.
+    """
+    for path in paths:
+        with open(path, "rb") as fh:
+            while True:
+                chunk = fh.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+
+# =====================================================================
+# Unités de travail (exécutées dans les processus du pool)
+# =====================================================================
+
+def _export_dir(job_id: int) -> str:
+    return os.path.join(settings.JOBS_OUTPUT_DIR, f"job_{job_id}")
+
+
+def _export_unit(job_id: int, params: Dict[str, Any], vehicle_ids: List[int]) -> Dict[str, Any]:
+    """
+    Exporte l'historique complet de chaque véhicule du lot
+    dans un fichier JSON Lines, en streaming (mémoire bornée).
+    """
+    directory = _export_dir(job_id)
+    os.makedirs(directory, exist_ok=True)
+    rows = 0
+    db = SessionLocal()
+    try:
+        for vehicle_id in vehicle_ids:
+            stmt = (
+                select(
+                    VehicleStatus.id,
+                    VehicleStatus.timestamp,
+                    VehicleStatus.battery_level,
+                    VehicleStatus.doors_locked,
+                    VehicleStatus.odometer_km,
+                    VehicleStatus.latitude,
+                    VehicleStatus.longitude,
+                )
+                .where(VehicleStatus.vehicle_id == vehicle_id)
+                .order_by(VehicleStatus.timestamp)
+                .execution_options(yield_per=settings.JOBS_STREAM_BATCH_SIZE)
+            )
+            path = os.path.join(directory, f"vehicle_{vehicle_id}.jsonl")
+            with open(path, "w", encoding="utf-8") as fh:
+                for row in status_session(db, vehicle_id).execute(stmt):
+                    fh.write(json.dumps({
+                        "id": row.id,
+                        "vehicle_id": vehicle_id,
+                        "timestamp": to_epoch_ms(row.timestamp),
+                        "battery_level": row.battery_level,
+                        "doors_locked": row.doors_locked,
+                        "odometer_km": row.odometer_km,
+                        "latitude": row.latitude,
+                        "longitude": row.longitude,
+                    }, separators=(",", ":")))
+                    fh.write("\n")
+                    rows += 1
+    finally:
+        db.close()
+    return {"rows": rows, "files": len(vehicle_ids)}
+
+
+def _summary_unit(job_id: int, params: Dict[str, Any], vehicle_ids: List[int]) -> Dict[str, Any]:
+    """
+    Résumé par véhicule (nombre de statuts, bornes temporelles,
+    batterie et odomètre min / max) en une requête agrégée par lot.
+    """
+    stmt = (
+        select(
+            VehicleStatus.vehicle_id,
+            func.count(VehicleStatus.id),
+            func.min(VehicleStatus.timestamp),
+            func.max(VehicleStatus.timestamp),
+            func.min(VehicleStatus.battery_level),
+            func.max(VehicleStatus.battery_level),
+            func.min(VehicleStatus.odometer_km),
+            func.max(VehicleStatus.odometer_km),
+        )
+        .where(VehicleStatus.vehicle_id.in_(vehicle_ids))
+        .group_by(VehicleStatus.vehicle_id)
+    )
+    db = SessionLocal()
+    try:
+        summaries = {}
+        # Avec le sharding, chaque shard agrège ses véhicules (en parallèle)
+        parts = fan_out_statuses(db, lambda status_db: status_db.execute(stmt).all())
+        for vid, count, first, last, bmin, bmax, omin, omax in (r for rows in parts for r in rows):
+            summaries[str(vid)] = {
+                "count": count,
+                "first_timestamp": first.isoformat() if first else None,
+                "last_timestamp": last.isoformat() if last else None,
+                "battery_min": bmin,
+                "battery_max": bmax,
+                "distance_km": (omax - omin) if omin is not None and omax is not None else None,
+            }
+        return {"vehicles": summaries}
+    finally:
+        db.close()
+
+
+def _analytics_unit(job_id: int, params: Dict[str, Any], vehicle_ids: List[int]) -> Dict[str, Any]:
+    """
+    Rafraîchit l'analytique incrémentale de chaque véhicule du lot.
+    """
+    db = SessionLocal()
+    try:
+        processed = sum(refresh_vehicle_analytics(db, vid) for vid in vehicle_ids)
+    finally:
+        db.close()
+    return {"statuses": processed, "vehicles": len(vehicle_ids)}
+
+
+def _segments_unit(job_id: int, params: Dict[str, Any], vehicle_ids: List[int]) -> Dict[str, Any]:
+    """
+    Rattrape la détection des trajets / recharges de chaque véhicule du lot.
+    """
+    db = SessionLocal()
+    try:
+        processed = sum(refresh_vehicle_segments(db, vid) for vid in vehicle_ids)
+    finally:
+        db.close()
+    return {"statuses": processed, "vehicles": len(vehicle_ids)}
+
+
+def _merge_export(acc: Dict[str, Any], part: Dict[str, Any]) -> Dict[str, Any]:
+    acc["rows"] = acc.get("rows", 0) + part["rows"]
+    acc["files"] = acc.get("files", 0) + part["files"]
+    return acc
+
+
+def _merge_refresh(acc: Dict[str, Any], part: Dict[str, Any]) -> Dict[str, Any]:
+    acc["statuses"] = acc.get("statuses", 0) + part["statuses"]
+    acc["vehicles"] = acc.get("vehicles", 0) + part["vehicles"]
+    return acc
+
+
+def _merge_summary(acc: Dict[str, Any], part: Dict[str, Any]) -> Dict[str, Any]:
+    acc.setdefault("vehicles", {}).update(part["vehicles"])
+    return acc
+
+
+# kind -> (fonction d'unité, fusion des résultats partiels)
+JOB_KINDS: Dict[str, Tuple[Callable[..., Dict[str, Any]], Callable[..., Dict[str, Any]]]] = {
+    "export_statuses": (_export_unit, _merge_export),
+    "status_summary": (_summary_unit, _merge_summary),
+    "analytics_refresh": (_analytics_unit, _merge_refresh),
+    "segments_refresh": (_segments_unit, _merge_refresh),
+}
+
+
+def _plan_units(db: Session, params: Dict[str, Any]) -> List[List[int]]:
+    """
+    Découpe le périmètre du job en lots de véhicules.
+    """
+    vehicle_ids = params.get("vehicle_ids")
+    if not vehicle_ids:
+        vehicle_ids = db.execute(select(Vehicle.id).order_by(Vehicle.id)).scalars().all()
+    size = max(1, settings.JOBS_CHUNK_SIZE)
+    return [list(vehicle_ids[i:i + size]) for i in range(0, len(vehicle_ids), size)]
+
+
+# =====================================================================
+# Runner
+# =====================================================================
+
+class JobRunner:
+    """
+    Exécute les jobs en file dans un pool de processus.
+    """
+
+    def __init__(self, max_workers: int, poll_seconds: float, heartbeat_seconds: float, lock_path: str):
+        self.max_workers = max_workers
+        self.poll_seconds = poll_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.lock_path = lock_path
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock_fd: Optional[int] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="job-runner", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.release_lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def acquire_lock(self) -> bool:
+        """
+        Tente de devenir le runner actif de l'hôte (verrou non bloquant,
+        libéré par le système si le processus meurt).
+        """
+        if self._lock_fd is not None or fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def release_lock(self) -> None:
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if not self.acquire_lock():
+                    self._stop.wait(self.poll_seconds)
+                    continue
+                job_id = self.claim_next()
+                if job_id is None:
+                    # File vide : on en profite pour récupérer les jobs abandonnés
+                    self.requeue_stale()
+                    self._stop.wait(self.poll_seconds)
+                    continue
+                self.run_job(job_id)
+            except Exception:
+                logger.exception("Job runner iteration failed")
+                self._stop.wait(self.poll_seconds)
+
+    def requeue_stale(self) -> int:
+        """
+        Remet en file les jobs "running" abandonnés par un processus mort.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.JOBS_STALE_SECONDS)
+        db = SessionLocal()
+        try:
+            res = db.execute(
+                update(Job)
+                .where(Job.status == JOB_RUNNING, Job.heartbeat_at < cutoff)
+                .values(status=JOB_QUEUED, progress=0)
+            )
+            db.commit()
+            return res.rowcount
+        finally:
+            db.close()
+
+    def claim_next(self) -> Optional[int]:
+        """
+        Réclame atomiquement le plus ancien job en file (sûr avec plusieurs workers).
+        """
+        db = SessionLocal()
+        try:
+            candidates = db.execute(
+                select(Job.id).where(Job.status == JOB_QUEUED).order_by(Job.id).limit(5)
+            ).scalars().all()
+            for job_id in candidates:
+                now = datetime.utcnow()
+                res = db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == JOB_QUEUED)
+                    .values(status=JOB_RUNNING, started_at=now, heartbeat_at=now)
+                )
+                db.commit()
+                if res.rowcount == 1:
+                    return job_id
+            return None
+        finally:
+            db.close()
+
+    def run_job(self, job_id: int) -> None:
+        db = use_primary(SessionLocal())
+        pending: Set[Future] = set()
+        try:
+            job = db.get(Job, job_id)
+            unit_fn, merge_fn = JOB_KINDS[job.kind]
+            params = dict(job.params or {})
+            units = _plan_units(db, params)
+            job.total = len(units)
+            job.progress = 0
+            db.commit()
+
+            result: Dict[str, Any] = {}
+            if job.kind == "export_statuses":
+                result["download_url"] = f"{settings.API_V1_STR}/jobs/{job_id}/download"
+
+            pool = self._pool()
+            queue = list(units)
+            # On garde peu d'unités en vol pour que l'annulation soit réactive
+            max_in_flight = self.max_workers * 2
+
+            while queue or pending:
+                while queue and len(pending) < max_in_flight:
+                    fut = pool.submit(unit_fn, job_id, params, queue.pop(0))
+                    pending.add(fut)
+                # Réveil au moins toutes les heartbeat_seconds, même si
+                # aucune unité n'a fini : le job n'est pas pris pour abandonné
+                done, pending = wait(pending, timeout=self.heartbeat_seconds, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    result = merge_fn(result, fut.result())
+                    job.progress += 1
+                job.heartbeat_at = datetime.utcnow()
+                db.commit()
+
+                db.refresh(job, attribute_names=["cancel_requested"])
+                if job.cancel_requested or self._stop.is_set():
+                    for fut in pending:
+                        fut.cancel()
+                    job.status = JOB_CANCELLED if job.cancel_requested else JOB_QUEUED
+                    job.result = result
+                    job.finished_at = datetime.utcnow() if job.cancel_requested else None
+                    db.commit()
+                    return
+
+            job.status = JOB_SUCCEEDED
+            job.result = result
+            job.finished_at = datetime.utcnow()
+            db.commit()
+        except Exception as exc:
+            # Une unité en échec : les unités du job pas encore démarrées
+            # ne sont pas lancées (celles en cours finissent, ignorées)
+            for fut in pending:
+                fut.cancel()
+            db.rollback()
+            logger.exception("Job %s failed", job_id)
+            job = db.get(Job, job_id)
+            if job is not None:
+                job.status = JOB_FAILED
+                job.error = f"{type(exc).__name__}: {exc}"
+                job.finished_at = datetime.utcnow()
+                db.commit()
+        finally:
+            db.close()
+
+
+job_runner = JobRunner(
+    max_workers=settings.JOBS_MAX_WORKERS or os.cpu_count() or 1,
+    poll_seconds=settings.JOBS_POLL_SECONDS,
+    heartbeat_seconds=settings.JOBS_HEARTBEAT_SECONDS,
+    lock_path=os.path.join(settings.JOBS_OUTPUT_DIR, ".runner.lock"),
+)
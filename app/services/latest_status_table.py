@@ -0,0 +1,336 @@
+# app/services/latest_status_table.py
+"""
+Table des derniers statuts en mémoire partagée (mmap).
+
+Chaque worker uvicorn mappe le même fichier (par défaut dans /dev/shm) :
+une seule copie en mémoire pour tout l'hôte, visible immédiatement par
+tous les workers.
+
+Organisation :
+- un en-tête (magic, version, nombre de slots) ;
+- des slots de taille fixe, adressés directement par `vehicle_id % slots`.
+  Le slot mémorise le `vehicle_id` : en cas de collision, le lecteur voit
+  un autre véhicule et retombe simplement sur la DB.
+
+La version du format et le nombre de slots font partie du nom du
+fichier (`versioned_path`) : un changement de format ou de géométrie
+ouvre un nouveau fichier au lieu de tronquer celui que les workers d'un
+déploiement progressif ont encore mappé (SIGBUS, lectures incohérentes).
+Les fichiers des anciennes versions restent en place jusqu'au
+redémarrage de l'hôte (/dev/shm) ou à leur suppression manuelle.
+
+Chaque slot porte aussi un compteur d'insertions, avancé à chaque
+insertion (`record_inserts`) et à chaque invalidation, jamais remis à
+zéro (pas même quand un autre véhicule prend le slot) : un processus
+qui connaît la valeur du compteur au moment où il a lu l'historique
+d'un véhicule sait si un autre processus a écrit depuis (voir
+app/services/hot_store.py).
+
+Chaque slot est protégé par un seqlock : l'écrivain passe le compteur à
+une valeur impaire, écrit, puis le repasse à une valeur paire. Le lecteur
+ne prend aucun verrou ; il relit tant que le compteur est impair ou a
+changé pendant sa lecture. Les écrivains (rares, un par insertion) se
+sérialisent entre processus via un verrou `fcntl` sur la plage du slot.
+"""
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+
+try:  # POSIX uniquement ; sans fcntl on suppose un seul processus
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+_MAGIC = b"BLST"
+_VERSION = 3
+
+# magic, version, slots
+_HEADER = struct.Struct("<4sII")
+_HEADER_SIZE = 64
+
+# Compteur du seqlock
+_SEQ = struct.Struct("<Q")
+# vehicle_id, status_id, timestamp (µs epoch), battery, odometer, latitude,
+# longitude, doors_locked, compteur d'insertions
+_BODY = struct.Struct("<qqqddddB7xQ")
+_SLOT_SIZE = _SEQ.size + _BODY.size
+# Position du compteur d'insertions dans le slot
+_INSERTS = struct.Struct("<Q")
+_INSERTS_OFFSET = _SEQ.size + _BODY.size - _INSERTS.size
+
+_EPOCH = datetime(1970, 1, 1)
+_MAX_READ_RETRIES = 64
+
+
+@dataclass(frozen=True)
+class LatestStatus:
+    """
+    Instantané du dernier statut, compatible avec `VehicleStatusRead`.
+    """
+    id: int
+    vehicle_id: int
+    timestamp: datetime
+    battery_level: Optional[float]
+    doors_locked: bool
+    odometer_km: Optional[float]
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
+def _to_us(ts: datetime) -> int:
+    return (ts - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_us(us: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=us)
+
+
+def _opt(value: Optional[float]) -> float:
+    return math.nan if value is None else float(value)
+
+
+def _unopt(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+def default_path() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "bluelink_latest_status.bin")
+
+
+def versioned_path(path: str, slots: int) -> str:
+    """
+    Chemin réel du fichier : version du format et nombre de slots
+    insérés avant l'extension (ex : `..._status.v3-65536.bin`).
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}.v{_VERSION}-{slots}{ext}"
+
+
+class LatestStatusTable:
+    """
+    Table à slots fixes des derniers statuts, partagée entre processus.
+    """
+
+    def __init__(self, path: str, slots: int):
+        self.path = versioned_path(path, slots)
+        self.slots = slots
+        self.size = _HEADER_SIZE + slots * _SLOT_SIZE
+        self._fd: Optional[int] = None
+        self._mm: Optional[mmap.mmap] = None
+        self._open_lock = threading.Lock()
+        # Les verrous fcntl sont par processus : on sérialise aussi les threads
+        self._write_lock = threading.Lock()
+
+    # -----------------
+    # Ouverture
+    # -----------------
+
+    def _ensure_open(self) -> mmap.mmap:
+        if self._mm is not None:
+            return self._mm
+        with self._open_lock:
+            if self._mm is None:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    self._init_file(fd)
+                except BaseException:
+                    os.close(fd)
+                    raise
+                self._mm = mmap.mmap(fd, self.size)
+                self._fd = fd
+        return self._mm
+
+    def _init_file(self, fd: int) -> None:
+        self._lock(fd, 0, _HEADER_SIZE)
+        try:
+            if os.fstat(fd).st_size == 0:
+                # Fichier neuf : le premier processus l'initialise
+                os.ftruncate(fd, self.size)
+                os.pwrite(fd, _HEADER.pack(_MAGIC, _VERSION, self.slots), 0)
+            elif not self._header_ok(fd):
+                # Jamais tronqué : d'autres processus peuvent l'avoir mappé
+                raise RuntimeError(f"{self.path} is not a latest-status table of this layout")
+        finally:
+            self._unlock(fd, 0, _HEADER_SIZE)
+
+    def _header_ok(self, fd: int) -> bool:
+        if os.fstat(fd).st_size != self.size:
+            return False
+        raw = os.pread(fd, _HEADER.size, 0)
+        return raw == _HEADER.pack(_MAGIC, _VERSION, self.slots)
+
+    @staticmethod
+    def _lock(fd: int, start: int, length: int) -> None:
+        if fcntl is not None:
+            fcntl.lockf(fd, fcntl.LOCK_EX, length, start)
+
+    @staticmethod
+    def _unlock(fd: int, start: int, length: int) -> None:
+        if fcntl is not None:
+            fcntl.lockf(fd, fcntl.LOCK_UN, length, start)
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            os.close(self._fd)
+            self._mm = None
+            self._fd = None
+
+    def _offset(self, vehicle_id: int) -> int:
+        return _HEADER_SIZE + (vehicle_id % self.slots) * _SLOT_SIZE
+
+    # -----------------
+    # Écriture (seqlock)
+    # -----------------
+
+    def update(self, status) -> bool:
+        """
+        Publie un statut (lu en base, pas une insertion) s'il est plus
+        récent que celui du slot. Retourne True si le slot a été mis à jour.
+        """
+        return self._write(status, 0)[0]
+
+    def record_inserts(self, status, count: int = 1) -> int:
+        """
+        Publie le plus récent des `count` statuts qui viennent d'être
+        insérés pour un véhicule (comme `update`) et avance d'autant le
+        compteur d'insertions du slot. Retourne la nouvelle valeur du compteur.
+        """
+        return self._write(status, count)[1]
+
+    def _write(self, status, inserts: int) -> Tuple[bool, int]:
+        mm = self._ensure_open()
+        off = self._offset(status.vehicle_id)
+        ts_us = _to_us(status.timestamp)
+
+        with self._write_lock:
+            self._lock(self._fd, off, _SLOT_SIZE)
+            try:
+                return self._write_slot(mm, off, status, ts_us, inserts)
+            finally:
+                self._unlock(self._fd, off, _SLOT_SIZE)
+
+    @staticmethod
+    def _write_slot(mm: mmap.mmap, off: int, status, ts_us: int, inserts: int) -> Tuple[bool, int]:
+        seq = _SEQ.unpack_from(mm, off)[0]
+        body = _BODY.unpack_from(mm, off + _SEQ.size)
+        cur_vid, cur_id, cur_ts = body[:3]
+        counter = body[-1] + inserts
+        newer = cur_vid != status.vehicle_id or (cur_ts, cur_id) < (ts_us, status.id)
+        if not newer and not inserts:
+            return False, counter
+
+        _SEQ.pack_into(mm, off, seq + 1)  # impair : écriture en cours
+        if newer:
+            _BODY.pack_into(
+                mm,
+                off + _SEQ.size,
+                status.vehicle_id,
+                status.id,
+                ts_us,
+                _opt(status.battery_level),
+                _opt(status.odometer_km),
+                _opt(status.latitude),
+                _opt(status.longitude),
+                1 if status.doors_locked else 0,
+                counter,
+            )
+        else:
+            _INSERTS.pack_into(mm, off + _INSERTS_OFFSET, counter)
+        _SEQ.pack_into(mm, off, seq + 2)  # pair : slot stable
+        return newer, counter
+
+    def invalidate(self, vehicle_id: int) -> None:
+        """
+        Vide le slot d'un véhicule (ex : suppression du véhicule) et
+        avance son compteur d'insertions, même si le slot est occupé par
+        un autre véhicule : l'historique lu ailleurs n'est plus à jour.
+        """
+        mm = self._ensure_open()
+        off = self._offset(vehicle_id)
+        with self._write_lock:
+            self._lock(self._fd, off, _SLOT_SIZE)
+            try:
+                seq = _SEQ.unpack_from(mm, off)[0]
+                body = _BODY.unpack_from(mm, off + _SEQ.size)
+                _SEQ.pack_into(mm, off, seq + 1)
+                if body[0] == vehicle_id:
+                    mm[off + _SEQ.size: off + _INSERTS_OFFSET] = bytes(_INSERTS_OFFSET - _SEQ.size)
+                _INSERTS.pack_into(mm, off + _INSERTS_OFFSET, body[-1] + 1)
+                _SEQ.pack_into(mm, off, seq + 2)
+            finally:
+                self._unlock(self._fd, off, _SLOT_SIZE)
+
+    # -----------------
+    # Lecture sans verrou
+    # -----------------
+
+    @staticmethod
+    def _read_slot(mm: mmap.mmap, off: int) -> Optional[tuple]:
+        for _ in range(_MAX_READ_RETRIES):
+            seq1 = _SEQ.unpack_from(mm, off)[0]
+            if seq1 & 1:
+                continue
+            body = _BODY.unpack_from(mm, off + _SEQ.size)
+            if _SEQ.unpack_from(mm, off)[0] == seq1:
+                return body
+        return None  # écrivain trop actif : on laisse la DB répondre
+
+    def get(self, vehicle_id: int) -> Optional[LatestStatus]:
+        """
+        Lit le dernier statut d'un véhicule, ou None si absent du slot.
+        """
+        body = self._read_slot(self._ensure_open(), self._offset(vehicle_id))
+        if body is None:
+            return None
+
+        vid, status_id, ts_us, battery, odometer, latitude, longitude, doors, _ = body
+        if vid != vehicle_id or status_id == 0:
+            return None
+        return LatestStatus(
+            id=status_id,
+            vehicle_id=vid,
+            timestamp=_from_us(ts_us),
+            battery_level=_unopt(battery),
+            doors_locked=bool(doors),
+            odometer_km=_unopt(odometer),
+            latitude=_unopt(latitude),
+            longitude=_unopt(longitude),
+        )
+
+
+    def inserts(self, vehicle_id: int) -> Optional[int]:
+        """
+        Compteur d'insertions du slot d'un véhicule (None si illisible).
+        """
+        body = self._read_slot(self._ensure_open(), self._offset(vehicle_id))
+        return None if body is None else body[-1]
+
+    def insert_counts(self) -> List[Optional[int]]:
+        """
+        Compteurs d'insertions de tous les slots (index = `vehicle_id % slots`).
+        """
+        mm = self._ensure_open()
+        return [
+            None if body is None else body[-1]
+            for body in (self._read_slot(mm, _HEADER_SIZE + i * _SLOT_SIZE) for i in range(self.slots))
+        ]
+
+
+# Instance globale (None si la fonctionnalité est désactivée)
+latest_status_table: Optional[LatestStatusTable] = None
+if settings.LATEST_STATUS_SHM_ENABLED:
+    latest_status_table = LatestStatusTable(
+        path=settings.LATEST_STATUS_SHM_PATH or default_path(),
+        slots=settings.LATEST_STATUS_SHM_SLOTS,
+    )
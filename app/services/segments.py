@@ -0,0 +1,352 @@
+# app/services/segments.py
+"""
+Détection incrémentale des trajets et des recharges.
+
+Le flux de statuts d'un véhicule est découpé en intervalles entre deux
+échantillons successifs (valeurs absentes = dernière valeur connue) :
+
+- odomètre en hausse (> MOVING_EPSILON_KM) -> l'intervalle prolonge le
+  trajet ouvert (ou en ouvre un) ; un arrêt de SEGMENT_GAP_SECONDS ou une
+  recharge le clôt ;
+- batterie en hausse à l'arrêt -> l'intervalle prolonge la recharge
+  ouverte (ou en ouvre une) ; un déplacement, une baisse de batterie ou
+  SEGMENT_GAP_SECONDS sans hausse la clôt ;
+- un intervalle de plus de SEGMENT_MAX_INTERVAL_SECONDS (trou dans la
+  télémétrie) clôt les segments ouverts sans être attribué.
+
+Comme pour l'analytique (app/services/analytics.py), seuls les statuts
+stabilisés postérieurs au checkpoint du véhicule sont lus, et l'état du
+détecteur (segments ouverts, dernier échantillon) est écrit dans la même
+transaction que les segments, sous verrouillage optimiste.
+
+Un lot contenant un statut antérieur au dernier échantillon intégré
+(historique rattrapé) peut rouvrir, scinder ou fusionner des segments
+déjà clos : les segments du véhicule sont alors supprimés et redétectés
+depuis le début de son historique, dans l'ordre des timestamps.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.segments import ChargingSession, SegmentDetectorState, Trip
+from app.db.models.vehicle_status import VehicleStatus
+from app.db.session import release_status_session, status_session, use_primary
+from app.services.analytics import MOVING_EPSILON_KM
+from app.services.changes import SETTLE_NOW, settled_statuses
+from app.services.vehicles import to_naive_utc
+
+_STATE_FIELDS = (
+    "last_status_id",
+    "last_timestamp",
+    "last_battery_level",
+    "last_odometer_km",
+    "open_trip_id",
+    "open_charge_id",
+    "trip_idle_seconds",
+    "charge_idle_seconds",
+)
+
+
+class _Detector:
+    """
+    Machine à états d'un véhicule, alimentée statut par statut.
+    """
+
+    def __init__(self, db: Session, vehicle_id: int, state: Optional[SegmentDetectorState]):
+        self.db = db
+        self.vehicle_id = vehicle_id
+        self.gap = settings.SEGMENT_GAP_SECONDS
+        self.max_interval = settings.SEGMENT_MAX_INTERVAL_SECONDS
+        for name in _STATE_FIELDS:
+            setattr(self, name, getattr(state, name) if state is not None else None)
+        self.trip_idle_seconds = self.trip_idle_seconds or 0.0
+        self.charge_idle_seconds = self.charge_idle_seconds or 0.0
+        self._trip: Optional[Trip] = None
+        self._charge: Optional[ChargingSession] = None
+
+    # --- segments ouverts -------------------------------------------------
+
+    def _open_trip(self) -> Optional[Trip]:
+        if self._trip is None and self.open_trip_id is not None:
+            self._trip = self.db.get(Trip, self.open_trip_id)
+        return self._trip
+
+    def _open_charge(self) -> Optional[ChargingSession]:
+        if self._charge is None and self.open_charge_id is not None:
+            self._charge = self.db.get(ChargingSession, self.open_charge_id)
+        return self._charge
+
+    def _close_trip(self) -> None:
+        trip = self._open_trip()
+        if trip is not None:
+            trip.ongoing = False
+        self._trip, self.open_trip_id, self.trip_idle_seconds = None, None, 0.0
+
+    def _close_charge(self) -> None:
+        charge = self._open_charge()
+        if charge is not None:
+            charge.ongoing = False
+        self._charge, self.open_charge_id, self.charge_idle_seconds = None, None, 0.0
+
+    # --- intégration ------------------------------------------------------
+
+    def feed(self, status_id: int, ts: datetime, battery: Optional[float], odometer: Optional[float]) -> None:
+        if self.last_timestamp is not None and ts < self.last_timestamp:
+            # Échantillon arrivé en retard : ignoré
+            return
+        battery = battery if battery is not None else self.last_battery_level
+        odometer = odometer if odometer is not None else self.last_odometer_km
+
+        if self.last_timestamp is not None:
+            self._interval(status_id, ts, battery, odometer)
+
+        self.last_status_id = status_id
+        self.last_timestamp = ts
+        self.last_battery_level = battery
+        self.last_odometer_km = odometer
+
+    def _interval(self, status_id: int, ts: datetime, battery: Optional[float], odometer: Optional[float]) -> None:
+        dt = (ts - self.last_timestamp).total_seconds()
+        if dt > self.max_interval:
+            # Trou dans la télémétrie : on ne sait pas ce qui s'est passé
+            self._close_trip()
+            self._close_charge()
+            return
+        d_odo = None if odometer is None or self.last_odometer_km is None else odometer - self.last_odometer_km
+        d_batt = None if battery is None or self.last_battery_level is None else battery - self.last_battery_level
+        moving = d_odo is not None and d_odo > MOVING_EPSILON_KM
+        charging = not moving and d_batt is not None and d_batt > 0
+
+        if moving:
+            self._close_charge()
+            trip = self._open_trip()
+            if trip is None:
+                trip = Trip(
+                    vehicle_id=self.vehicle_id,
+                    started_at=self.last_timestamp,
+                    start_odometer_km=self.last_odometer_km,
+                    start_battery_level=self.last_battery_level,
+                    start_status_id=self.last_status_id,
+                    ongoing=True,
+                )
+                self._trip = trip
+            trip.ended_at = ts
+            trip.end_odometer_km = odometer
+            trip.end_battery_level = battery
+            trip.end_status_id = status_id
+            if trip.id is None:
+                self.db.add(trip)
+                self.db.flush()
+            self.open_trip_id = trip.id
+            self.trip_idle_seconds = 0.0
+            return
+
+        if self.open_trip_id is not None:
+            self.trip_idle_seconds += dt
+            if charging or self.trip_idle_seconds >= self.gap:
+                self._close_trip()
+
+        if charging:
+            charge = self._open_charge()
+            if charge is None:
+                charge = ChargingSession(
+                    vehicle_id=self.vehicle_id,
+                    started_at=self.last_timestamp,
+                    start_battery_level=self.last_battery_level,
+                    odometer_km=self.last_odometer_km,
+                    start_status_id=self.last_status_id,
+                    ongoing=True,
+                )
+                self._charge = charge
+            charge.ended_at = ts
+            charge.end_battery_level = battery
+            charge.end_status_id = status_id
+            if charge.id is None:
+                self.db.add(charge)
+                self.db.flush()
+            self.open_charge_id = charge.id
+            self.charge_idle_seconds = 0.0
+        elif self.open_charge_id is not None:
+            self.charge_idle_seconds += dt
+            if (d_batt is not None and d_batt < 0) or self.charge_idle_seconds >= self.gap:
+                self._close_charge()
+
+    def values(self, checkpoint: int) -> Dict[str, Any]:
+        values = {name: getattr(self, name) for name in _STATE_FIELDS}
+        values["checkpoint_status_id"] = checkpoint
+        return values
+
+
+def _in_order(last_timestamp: Optional[datetime], rows: List[Any]) -> bool:
+    """
+    True si les statuts du lot suivent le dernier échantillon intégré
+    et ne reculent jamais.
+    """
+    running = last_timestamp
+    for row in rows:
+        if running is not None and row.timestamp < running:
+            return False
+        running = row.timestamp
+    return True
+
+
+def _redetect(db: Session, status_db: Session, vehicle_id: int, upto_id: int) -> _Detector:
+    """
+    Supprime les segments du véhicule et les redétecte à partir de ses
+    statuts d'id <= `upto_id`, dans l'ordre des timestamps (en streaming).
+    """
+    # "fetch" : les segments supprimés quittent aussi la session (leurs ids
+    # peuvent être réattribués par la redétection)
+    for model in (Trip, ChargingSession):
+        db.execute(
+            delete(model)
+            .where(model.vehicle_id == vehicle_id)
+            .execution_options(synchronize_session="fetch")
+        )
+    detector = _Detector(db, vehicle_id, None)
+    replay = status_db.execute(
+        select(
+            VehicleStatus.id,
+            VehicleStatus.timestamp,
+            VehicleStatus.battery_level,
+            VehicleStatus.odometer_km,
+        )
+        .where(VehicleStatus.vehicle_id == vehicle_id, VehicleStatus.id <= upto_id)
+        .order_by(VehicleStatus.timestamp, VehicleStatus.id)
+        .execution_options(yield_per=settings.ANALYTICS_BATCH_SIZE)
+    )
+    for row in replay:
+        detector.feed(*row)
+    return detector
+
+
+def refresh_vehicle_segments(db: Session, vehicle_id: int) -> int:
+    """
+    Intègre dans les trajets / recharges les statuts stabilisés insérés
+    depuis le checkpoint du véhicule (redétection complète si l'un d'eux
+    est antérieur à l'historique déjà intégré). Retourne le nombre de
+    statuts traités.
+    """
+    use_primary(db)
+    state = db.get(SegmentDetectorState, vehicle_id)
+    exists = state is not None
+    checkpoint = state.checkpoint_status_id if exists else 0
+    detector = _Detector(db, vehicle_id, state)
+    batch_size = settings.ANALYTICS_BATCH_SIZE
+    status_db = status_session(db, vehicle_id)
+    processed = 0
+
+    while True:
+        fetched = status_db.execute(
+            select(
+                VehicleStatus.id,
+                VehicleStatus.timestamp,
+                VehicleStatus.battery_level,
+                VehicleStatus.odometer_km,
+                VehicleStatus.created_at,
+                SETTLE_NOW,
+            )
+            .where(VehicleStatus.vehicle_id == vehicle_id, VehicleStatus.id > checkpoint)
+            .order_by(VehicleStatus.id)
+            .limit(batch_size)
+        ).all()
+        rows = settled_statuses(fetched)
+        release_status_session(db, status_db)
+        if not rows:
+            break
+
+        try:
+            new_checkpoint = rows[-1].id
+            if _in_order(detector.last_timestamp, rows):
+                for row in rows:
+                    detector.feed(row.id, row.timestamp, row.battery_level, row.odometer_km)
+            else:
+                detector = _redetect(db, status_db, vehicle_id, new_checkpoint)
+                release_status_session(db, status_db)
+            values = detector.values(new_checkpoint)
+            if exists:
+                res = db.execute(
+                    update(SegmentDetectorState)
+                    .where(
+                        SegmentDetectorState.vehicle_id == vehicle_id,
+                        SegmentDetectorState.checkpoint_status_id == checkpoint,
+                    )
+                    .values(**values)
+                )
+                if res.rowcount != 1:
+                    # Un autre rafraîchissement a déjà intégré ce lot
+                    db.rollback()
+                    return processed
+            else:
+                db.execute(insert(SegmentDetectorState).values(vehicle_id=vehicle_id, **values))
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return processed
+
+        exists = True
+        checkpoint = new_checkpoint
+        processed += len(rows)
+        if len(rows) < batch_size:
+            break
+    return processed
+
+
+def _list_segments(
+    db: Session,
+    model,
+    vehicle_id: int,
+    since: Optional[datetime],
+    until: Optional[datetime],
+    limit: Optional[int],
+) -> List[Any]:
+    """
+    Segments d'un véhicule du plus récent au plus ancien, sur l'index
+    (vehicle_id, started_at) ; toujours bornés en nombre de lignes.
+    """
+    max_rows = settings.STATUS_HISTORY_MAX_ROWS
+    limit = max_rows if limit is None else min(limit, max_rows)
+
+    conditions = [model.vehicle_id == vehicle_id]
+    if since is not None:
+        conditions.append(model.started_at >= to_naive_utc(since))
+    if until is not None:
+        conditions.append(model.started_at < to_naive_utc(until))
+
+    stmt = (
+        select(model)
+        .where(*conditions)
+        .order_by(model.started_at.desc())
+        .limit(limit)
+    )
+    return db.execute(stmt).scalars().all()
+
+
+def list_charging_sessions(
+    db: Session,
+    vehicle_id: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: Optional[int] = None,
+) -> List[ChargingSession]:
+    """
+    Recharges d'un véhicule, de la plus récente à la plus ancienne.
+    """
+    return _list_segments(db, ChargingSession, vehicle_id, since, until, limit)
+
+
+def list_trips(
+    db: Session,
+    vehicle_id: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: Optional[int] = None,
+) -> List[Trip]:
+    """
+    Trajets d'un véhicule, du plus récent au plus ancien.
+    """
+    return _list_segments(db, Trip, vehicle_id, since, until, limit)
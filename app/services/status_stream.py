@@ -0,0 +1,255 @@
+# app/services/status_stream.py
+"""
+Canal WebSocket d'ingestion continue (collecteurs, véhicules connectés).
+
+Une connexion s'authentifie une fois, puis pousse des trames de statuts
+sans payer une requête HTTP, une session et un commit par statut :
+
+1. le client envoie `{"type": "hello", "token": "..."}` ; le serveur répond
+   `{"type": "ready", ...}` (ou ferme avec le code 1008) ;
+2. chaque trame de données reçoit un numéro de séquence implicite (1, 2,
+   3... dans l'ordre d'envoi) :
+   - texte : un statut JSON (`VehicleStatusFrame`),
+   - binaire : un lot d'ingestion (`telemetry_formats.encode_status_batch`) ;
+3. les trames sont regroupées en lots écrits en une transaction par base
+   de statuts (`INGEST_STREAM_BATCH_SIZE` statuts, ou toutes les
+   `INGEST_STREAM_FLUSH_MS`) ;
+4. après chaque lot, `{"type": "ack", "seq": n}` confirme toutes les trames
+   jusqu'à `n` ; une trame rejetée (invalide, véhicule inconnu) est
+   signalée avant son acquittement par `{"type": "error", "seq": n, ...}`.
+
+Contre-pression : au-delà de `INGEST_STREAM_MAX_PENDING` statuts en
+attente d'écriture, la connexion n'est plus lue ; le contrôle de flux TCP
+ralentit alors le client. Une erreur d'écriture ferme la connexion (1011) :
+le client renvoie les trames non acquittées (livraison au moins une fois).
+"""
+import asyncio
+import hmac
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import anyio.to_thread
+from pydantic import ValidationError
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.schemas.vehicle import VehicleStatusFrame
+from app.services import ingest_hooks
+from app.services import telemetry_formats
+from app.services import vehicles as vehicle_service
+
+logger = logging.getLogger(__name__)
+
+# Codes de fermeture WebSocket (RFC 6455)
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_INTERNAL_ERROR = 1011
+
+
+@dataclass
+class Frame:
+    """
+    Trame reçue : statuts prêts pour l'insertion, ou erreur de décodage.
+    """
+    seq: int
+    rows: List[Dict[str, Any]]
+    error: Optional[str] = None
+
+
+def token_is_valid(token: Any) -> bool:
+    tokens = settings.ingest_stream_tokens
+    if not tokens:
+        return True
+    return isinstance(token, str) and any(hmac.compare_digest(token, t) for t in tokens)
+
+
+def decode_frame(seq: int, message: Dict[str, Any]) -> Frame:
+    """
+    Décode une trame texte (JSON) ou binaire (lot d'ingestion).
+    """
+    try:
+        if message.get("bytes") is not None:
+            payload = message["bytes"]
+            if len(payload) > telemetry_formats.status_batch_length(settings.STATUS_INGEST_MAX_RECORDS):
+                raise ValueError(f"At most {settings.STATUS_INGEST_MAX_RECORDS} records per batch")
+            _, rows = telemetry_formats.decode_status_batch(payload)
+            return Frame(seq, rows)
+
+        data = VehicleStatusFrame.model_validate_json(message.get("text") or "")
+        now = datetime.utcnow()
+        timestamp = now if data.timestamp is None else vehicle_service.to_naive_utc(data.timestamp)
+        if timestamp > now + telemetry_formats.MAX_CLOCK_SKEW:
+            raise ValueError(f"timestamp in the future: {data.timestamp.isoformat()}")
+        return Frame(seq, [{
+            "vehicle_id": data.vehicle_id,
+            "timestamp": timestamp,
+            "battery_level": data.battery_level,
+            "doors_locked": data.doors_locked,
+            "odometer_km": data.odometer_km,
+            "latitude": data.latitude,
+            "longitude": data.longitude,
+        }])
+    except ValidationError as exc:
+        return Frame(seq, [], error=str(exc.errors(include_url=False, include_context=False)))
+    except ValueError as exc:
+        return Frame(seq, [], error=str(exc))
+
+
+def write_frames(frames: List[Frame], known: Set[int]) -> Tuple[List[Tuple[int, str]], Set[int]]:
+    """
+    Écrit les statuts d'un lot de trames (thread de travail, session
+    dédiée). Les trames d'un véhicule inconnu sont rejetées entières ;
+    `known` (véhicules déjà vérifiés sur cette connexion) est complété.
+    Retourne les rejets (seq, motif) et les véhicules touchés.
+    """
+    rejected = [(frame.seq, frame.error) for frame in frames if frame.error is not None]
+    frames = [frame for frame in frames if frame.error is None and frame.rows]
+    db = SessionLocal()
+    try:
+        unknown = {row["vehicle_id"] for frame in frames for row in frame.rows} - known
+        if unknown:
+            known |= vehicle_service.existing_vehicle_ids(db, unknown)
+        rows = []
+        for frame in frames:
+            if all(row["vehicle_id"] in known for row in frame.rows):
+                rows += frame.rows
+            else:
+                rejected.append((frame.seq, "Vehicle not found"))
+        vehicle_service.create_statuses(db, rows)
+    finally:
+        db.close()
+    rejected.sort()
+    return rejected, {row["vehicle_id"] for row in rows}
+
+
+class StatusStream:
+    """
+    Une connexion d'ingestion : lecture, mise en lots et acquittements.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.pending: List[Frame] = []
+        self.pending_rows = 0
+        self.closed = False
+        self.last_seq = 0
+        self.known_vehicles: Set[int] = set()
+        self._changed = asyncio.Condition()
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        async with self._send_lock:
+            await self.websocket.send_json(message)
+
+    async def authenticate(self) -> bool:
+        """
+        Attend la trame `hello` et vérifie son jeton.
+        """
+        try:
+            message = await asyncio.wait_for(
+                self.websocket.receive_text(), settings.INGEST_STREAM_AUTH_TIMEOUT_SECONDS
+            )
+            hello = json.loads(message)
+        except WebSocketDisconnect:
+            return False
+        except (asyncio.TimeoutError, ValueError, KeyError):
+            hello = None
+        if not isinstance(hello, dict) or hello.get("type") != "hello" or not token_is_valid(hello.get("token")):
+            await self.websocket.close(code=CLOSE_POLICY_VIOLATION)
+            return False
+        await self.send({
+            "type": "ready",
+            "batch_size": settings.INGEST_STREAM_BATCH_SIZE,
+            "flush_ms": settings.INGEST_STREAM_FLUSH_MS,
+            "max_pending": settings.INGEST_STREAM_MAX_PENDING,
+        })
+        return True
+
+    async def run(self) -> None:
+        if not await self.authenticate():
+            return
+        writer = asyncio.create_task(self._write_loop())
+        try:
+            await self._read_loop()
+        finally:
+            async with self._changed:
+                self.closed = True
+                self._changed.notify_all()
+            await writer
+
+    async def _read_loop(self) -> None:
+        while True:
+            async with self._changed:
+                # Contre-pression : plus de lecture tant que l'écriture est en retard
+                await self._changed.wait_for(
+                    lambda: self.closed or self.pending_rows < settings.INGEST_STREAM_MAX_PENDING
+                )
+                if self.closed:
+                    return
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            self.last_seq += 1
+            frame = decode_frame(self.last_seq, message)
+            async with self._changed:
+                self.pending.append(frame)
+                self.pending_rows += len(frame.rows)
+                self._changed.notify_all()
+
+    async def _next_batch(self) -> List[Frame]:
+        """
+        Attend un lot complet, ou l'échéance de INGEST_STREAM_FLUSH_MS
+        après la première trame en attente.
+        """
+        loop = asyncio.get_running_loop()
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.closed or self.pending)
+            deadline = loop.time() + settings.INGEST_STREAM_FLUSH_MS / 1000
+            while not self.closed and self.pending_rows < settings.INGEST_STREAM_BATCH_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch, rows = [], 0
+            while self.pending and (not batch or rows + len(self.pending[0].rows) <= settings.INGEST_STREAM_BATCH_SIZE):
+                frame = self.pending.pop(0)
+                batch.append(frame)
+                rows += len(frame.rows)
+            self.pending_rows -= rows
+            self._changed.notify_all()
+            return batch
+
+    async def _write_loop(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            if not batch:
+                return
+            try:
+                rejected, touched = await anyio.to_thread.run_sync(write_frames, batch, self.known_vehicles)
+            except Exception:
+                logger.exception("Status stream write failed")
+                async with self._changed:
+                    self.closed = True
+                    self._changed.notify_all()
+                try:
+                    await self.websocket.close(code=CLOSE_INTERNAL_ERROR)
+                except RuntimeError:
+                    pass
+                return
+            if touched and ingest_hooks.derived_refresh_enabled():
+                # Données dérivées : rafraîchies hors de la boucle d'écriture
+                ingest_hooks.derived_refresher.schedule(touched)
+            try:
+                for seq, detail in rejected:
+                    await self.send({"type": "error", "seq": seq, "detail": detail})
+                await self.send({"type": "ack", "seq": batch[-1].seq})
+            except (WebSocketDisconnect, RuntimeError):
+                # Client parti : les lots restants sont tout de même écrits
+                pass
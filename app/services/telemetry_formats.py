@@ -0,0 +1,289 @@
+# app/services/telemetry_formats.py
+"""
+Formats compacts pour l'historique de télémétrie.
+
+- JSON colonnaire : un tableau par champ, timestamps en millisecondes epoch,
+  `vehicle_id` (constant) sorti en scalaire.
+- Binaire : en-tête + descripteurs de colonnes + une colonne contiguë
+  (little-endian) par champ, construite avec `array` sans objet par ligne.
+- Lot d'ingestion binaire (sens montant) : en-tête + enregistrements de
+  taille fixe, décodés en bloc par `struct.iter_unpack`.
+
+Les lignes en entrée sont des objets exposant les attributs demandés
+(modèles ORM, `LatestStatus`, lignes SQLAlchemy...).
+"""
+import math
+import struct
+import sys
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+MEDIA_JSON = "application/json"
+MEDIA_COLUMNAR = "application/vnd.bluelink.columnar+json"
+MEDIA_BINARY = "application/vnd.bluelink.telemetry"
+MEDIA_BINARY_BATCH = "application/vnd.bluelink.telemetry-batch"
+
+# Alias acceptés par le paramètre `?format=`
+FORMAT_ALIASES = {
+    "json": MEDIA_JSON,
+    "columnar": MEDIA_COLUMNAR,
+    "binary": MEDIA_BINARY,
+}
+
+_EPOCH = datetime(1970, 1, 1)
+_MS = timedelta(milliseconds=1)
+
+# Type de colonne (code `array`) par champ de `VehicleStatusRead`.
+# Les flottants absents sont encodés en NaN.
+STATUS_COLUMN_TYPES: Dict[str, str] = {
+    "id": "q",
+    "vehicle_id": "q",
+    "timestamp": "q",
+    "battery_level": "d",
+    "doors_locked": "B",
+    "odometer_km": "d",
+    "latitude": "d",
+    "longitude": "d",
+}
+
+BINARY_MAGIC = b"BLTC"
+BINARY_VERSION = 1
+# magic, version, nb de colonnes, réservé, vehicle_id, nb de lignes
+_BINARY_HEADER = struct.Struct("<4sBBHqI")
+_NAN = float("nan")
+
+
+def to_epoch_ms(ts: Optional[datetime]) -> Optional[int]:
+    if ts is None:
+        return None
+    if ts.tzinfo is not None:
+        ts = ts.replace(tzinfo=None) - ts.utcoffset()
+    return (ts - _EPOCH) // _MS
+
+
+def _column_values(rows: Sequence[Any], field: str) -> List[Any]:
+    values = [getattr(r, field) for r in rows]
+    if field == "timestamp":
+        return [to_epoch_ms(v) for v in values]
+    return values
+
+
+def encode_columnar(
+    rows: Sequence[Any],
+    fields: Iterable[str],
+    vehicle_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Encode des lignes en JSON colonnaire :
+    `{"vehicle_id": 1, "count": n, "timestamp": [...], "battery_level": [...]}`.
+    """
+    out: Dict[str, Any] = {}
+    if vehicle_id is not None:
+        out["vehicle_id"] = vehicle_id
+    out["count"] = len(rows)
+    for field in fields:
+        if field == "vehicle_id" and vehicle_id is not None:
+            continue
+        out[field] = _column_values(rows, field)
+    return out
+
+
+def _column_array(rows: Sequence[Any], field: str) -> array:
+    typecode = STATUS_COLUMN_TYPES[field]
+    values = _column_values(rows, field)
+    if typecode == "d":
+        col = array("d", [_NAN if v is None else v for v in values])
+    elif typecode == "B":
+        col = array("B", [1 if v else 0 for v in values])
+    else:
+        col = array("q", [0 if v is None else v for v in values])
+    if sys.byteorder == "big":
+        col.byteswap()
+    return col
+
+
+def _pad8(buf: bytearray) -> None:
+    buf.extend(b"\0" * (-len(buf) % 8))
+
+
+def encode_binary(
+    rows: Sequence[Any],
+    fields: Iterable[str],
+    vehicle_id: Optional[int] = None,
+) -> bytes:
+    """
+    Encode des lignes au format binaire colonnaire (version 1) :
+
+    - en-tête `<4sBBHqI` : b"BLTC", version, nb de colonnes, 0, vehicle_id, nb de lignes ;
+    - pour chaque colonne : longueur du nom (u8), nom ASCII, code de type (`q`, `d`, `B`) ;
+    - bourrage jusqu'à un multiple de 8 octets ;
+    - puis chaque colonne, contiguë, little-endian, chacune alignée sur 8 octets
+      (lisible directement en `Float64Array` / `BigInt64Array` côté client).
+    """
+    fields = [f for f in fields if not (f == "vehicle_id" and vehicle_id is not None)]
+    buf = bytearray(
+        _BINARY_HEADER.pack(
+            BINARY_MAGIC, BINARY_VERSION, len(fields), 0, vehicle_id or 0, len(rows)
+        )
+    )
+    for field in fields:
+        name = field.encode("ascii")
+        buf.append(len(name))
+        buf.extend(name)
+        buf.extend(STATUS_COLUMN_TYPES[field].encode("ascii"))
+    _pad8(buf)
+
+    for field in fields:
+        buf.extend(_column_array(rows, field).tobytes())
+        _pad8(buf)
+    return bytes(buf)
+
+
+def decode_binary(data: bytes) -> Dict[str, Any]:
+    """
+    Décodeur de référence du format binaire (tests, clients Python).
+    """
+    magic, version, ncols, _, vehicle_id, count = _BINARY_HEADER.unpack_from(data, 0)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError("Unsupported telemetry binary payload")
+
+    pos = _BINARY_HEADER.size
+    columns = []
+    for _ in range(ncols):
+        n = data[pos]
+        name = data[pos + 1: pos + 1 + n].decode("ascii")
+        typecode = chr(data[pos + 1 + n])
+        columns.append((name, typecode))
+        pos += n + 2
+    pos += -pos % 8
+
+    out: Dict[str, Any] = {"vehicle_id": vehicle_id, "count": count}
+    for name, typecode in columns:
+        col = array(typecode)
+        size = col.itemsize * count
+        col.frombytes(data[pos: pos + size])
+        if sys.byteorder == "big":
+            col.byteswap()
+        out[name] = col.tolist()
+        pos += size + (-size % 8)
+    return out
+
+
+# =====================================================================
+# Lot d'ingestion binaire
+# =====================================================================
+
+BATCH_MAGIC = b"BLTI"
+BATCH_VERSION = 1
+# magic, version, réservé, taille d'un enregistrement, vehicle_id, nb d'enregistrements
+_BATCH_HEADER = struct.Struct("<4sBBHqI")
+# timestamp (ms epoch UTC), batterie, odomètre, latitude, longitude, drapeaux
+_BATCH_RECORD = struct.Struct("<qddddB")
+BATCH_FLAG_DOORS_LOCKED = 0x01
+# Timestamps acceptés (horloge d'un boîtier déréglée)
+_BATCH_MIN_MS = 0
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+
+def status_batch_length(count: int) -> int:
+    """
+    Taille en octets d'un lot de `count` enregistrements.
+    """
+    return _BATCH_HEADER.size + count * _BATCH_RECORD.size
+
+
+def encode_status_batch(vehicle_id: int, rows: Iterable[Any]) -> bytes:
+    """
+    Encodeur de référence du lot d'ingestion (version 1), pour les
+    boîtiers, les tests et le benchmark :
+
+    - en-tête `<4sBBHqI` : b"BLTI", version, 0, taille d'un enregistrement
+      (41), vehicle_id, nb d'enregistrements ;
+    - puis les enregistrements `<qddddB`, little-endian, sans bourrage :
+      timestamp en millisecondes epoch UTC, battery_level, odometer_km,
+      latitude, longitude (NaN = absent), drapeaux (bit 0 : portes
+      verrouillées, autres bits réservés à 0).
+
+    Les lignes exposent les attributs de `VehicleStatusCreate` et un
+    `timestamp`.
+    """
+    records = [
+        _BATCH_RECORD.pack(
+            to_epoch_ms(r.timestamp),
+            _NAN if r.battery_level is None else r.battery_level,
+            _NAN if r.odometer_km is None else r.odometer_km,
+            _NAN if r.latitude is None else r.latitude,
+            _NAN if r.longitude is None else r.longitude,
+            BATCH_FLAG_DOORS_LOCKED if r.doors_locked else 0,
+        )
+        for r in rows
+    ]
+    header = _BATCH_HEADER.pack(BATCH_MAGIC, BATCH_VERSION, 0, _BATCH_RECORD.size, vehicle_id, len(records))
+    return header + b"".join(records)
+
+
+def _check_record(ts_ms: int, battery: float, odometer: float, lat: float, lon: float, max_ms: int) -> None:
+    if not _BATCH_MIN_MS <= ts_ms <= max_ms:
+        raise ValueError(f"timestamp out of range: {ts_ms}")
+    if math.isinf(battery) or math.isinf(odometer):
+        raise ValueError("battery_level and odometer_km must be finite")
+    if (lat != lat) != (lon != lon):
+        raise ValueError("latitude and longitude must be given together")
+    if lat == lat and not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        raise ValueError(f"position out of range: {lat}, {lon}")
+
+
+def decode_status_batch(data: bytes) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Décode et valide un lot d'ingestion : (vehicle_id, lignes prêtes pour
+    un INSERT multi-lignes de `vehicle_status`).
+
+    Les enregistrements sont lus en bloc (`struct.iter_unpack` sur une
+    `memoryview`, sans copie) et validés colonne par colonne (mêmes
+    contrôles que `VehicleStatusCreate`) ; l'enregistrement fautif n'est
+    recherché qu'en cas d'erreur. Lève ValueError si le lot est invalide.
+    """
+    view = memoryview(data)
+    if len(view) < _BATCH_HEADER.size:
+        raise ValueError("Truncated status batch header")
+    magic, version, _, record_size, vehicle_id, count = _BATCH_HEADER.unpack_from(view, 0)
+    if magic != BATCH_MAGIC or version != BATCH_VERSION or record_size != _BATCH_RECORD.size:
+        raise ValueError("Unsupported status batch payload")
+    if len(view) != status_batch_length(count):
+        raise ValueError(f"Status batch length does not match its record count ({count})")
+    records = list(_BATCH_RECORD.iter_unpack(view[_BATCH_HEADER.size:]))
+    if not records:
+        return vehicle_id, []
+
+    max_ms = to_epoch_ms(datetime.utcnow() + MAX_CLOCK_SKEW)
+    ts_col, battery_col, odometer_col, lat_col, lon_col, _ = zip(*records)
+    # NaN (absent) n'est ni dans les bornes ni égal à lui-même : exclu par `v == v`
+    located = [(lat, lon) for lat, lon in zip(lat_col, lon_col) if lat == lat or lon == lon]
+    valid = (
+        _BATCH_MIN_MS <= min(ts_col) and max(ts_col) <= max_ms
+        and math.inf not in battery_col and -math.inf not in battery_col
+        and math.inf not in odometer_col and -math.inf not in odometer_col
+        and all(-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0 for lat, lon in located)
+    )
+    if not valid:
+        for i, record in enumerate(records):
+            try:
+                _check_record(*record[:5], max_ms)
+            except ValueError as exc:
+                raise ValueError(f"Invalid status batch record {i}: {exc}")
+
+    epoch, ms = _EPOCH, _MS
+    rows = [
+        {
+            "vehicle_id": vehicle_id,
+            "timestamp": epoch + ts_ms * ms,
+            "battery_level": battery if battery == battery else None,
+            "doors_locked": flags & BATCH_FLAG_DOORS_LOCKED != 0,
+            "odometer_km": odometer if odometer == odometer else None,
+            "latitude": lat if lat == lat else None,
+            "longitude": lon if lon == lon else None,
+        }
+        for ts_ms, battery, odometer, lat, lon, flags in records
+    ]
+    return vehicle_id, rows
@@ -1,16 +1,67 @@
 # app/services/vehicles.py
-from typing import List, Optional
+import base64
+import json
+import math
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
 
+from sqlalchemy import and_, delete, func, insert, not_, or_, select, tuple_, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.db.models.vehicle import Vehicle
+from app.db.models.vehicle_position import VehiclePosition
 from app.db.models.vehicle_status import VehicleStatus
-from app.schemas.vehicle import VehicleCreate, VehicleStatusCreate
+from app.db.session import fan_out_statuses, release_status_session, status_session
+from app.schemas.vehicle import (
+    VehicleBulkItemResult,
+    VehicleCreate,
+    VehiclePositionRead,
+    VehicleRead,
+    VehicleStatusCreate,
+)
+from app.services import alerts, downsampling, geohash, webhooks
+from app.services.changes import record_vehicle_change
+from app.services.fleet_summary import fleet_counters
+from app.services.hot_store import hot_store
+from app.services.identifier_cache import IdentifierCache
+from app.services.latest_status_table import LatestStatus, latest_status_table
+from app.services.telemetry_formats import to_epoch_ms
+
+
+# Cache VIN / external_id -> véhicule (voir get_vehicle_by_vin)
+identifier_cache: IdentifierCache[VehicleRead] = IdentifierCache(
+    maxsize=settings.VEHICLE_ID_CACHE_SIZE,
+    ttl_seconds=settings.VEHICLE_ID_CACHE_TTL_SECONDS,
+)
+
+
+def _columns(model, fields: Sequence[str]):
+    """
+    Colonnes SQL correspondant à un fieldset (déjà validé contre le schéma).
+    """
+    return [getattr(model, name) for name in fields]
+
+
+def to_naive_utc(ts: datetime) -> datetime:
+    """
+    Les timestamps sont stockés en UTC naïf (datetime.utcnow) :
+    on convertit les datetimes "aware" reçus en paramètre.
+    """
+    if ts.tzinfo is None:
+        return ts
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
 
 
 def create_vehicle(db: Session, data: VehicleCreate) -> Vehicle:
     """
-    Crée un nouveau véhicule à partir des données fournies.
+    Crée un nouveau véhicule à partir des données fournies
+    (journalisé pour le flux de changements).
     """
     v = Vehicle(
         external_id=data.external_id,
@@ -19,16 +70,229 @@ def create_vehicle(db: Session, data: VehicleCreate) -> Vehicle:
         is_active=True,
     )
     db.add(v)
+    db.flush()
+    record_vehicle_change(db, v.id, "created")
     db.commit()
     db.refresh(v)
+    fleet_counters.save_vehicle(v.id, v.is_active)
     return v
 
 
-def list_vehicles(db: Session) -> List[Vehicle]:
+# Lignes par INSERT multi-lignes de véhicules (4 paramètres par ligne)
+_VEHICLE_VALUES_PER_INSERT = 1000
+
+
+def upsert_vehicles(db: Session, items: Sequence[VehicleCreate]) -> List[VehicleBulkItemResult]:
+    """
+    Enregistre un lot de véhicules : création, ou mise à jour du nom et de
+    l'external_id du véhicule qui a déjà ce VIN.
+
+    Une lecture des véhicules existants (par VIN ou external_id) écarte
+    d'abord les conflits : VIN ou external_id en double dans le lot,
+    external_id déjà porté par un autre véhicule. Le reste est écrit par
+    `INSERT ... ON CONFLICT (vin) DO UPDATE` multi-lignes (SQLite et
+    Postgres), journalisé (véhicules créés, et mis à jour s'ils ont
+    changé) et validé en une seule transaction. Un conflit apparu entre
+    la lecture et l'écriture (écrivain concurrent) lève IntegrityError,
+    sans rien écrire. Un résultat par élément, dans l'ordre du lot.
+    """
+    results: List[Optional[VehicleBulkItemResult]] = [None] * len(items)
+    vins = {item.vin for item in items}
+    external_ids = {item.external_id for item in items}
+    existing = db.execute(
+        select(Vehicle.id, Vehicle.vin, Vehicle.external_id, Vehicle.name)
+        .where(or_(Vehicle.vin.in_(vins), Vehicle.external_id.in_(external_ids)))
+    ).all() if items else []
+    by_vin = {row.vin: row for row in existing}
+    by_external_id = {row.external_id: row for row in existing}
+
+    accepted: Dict[str, int] = {}  # vin -> index dans le lot
+    claimed: Dict[str, str] = {}  # external_id -> vin, dans le lot
+    for index, item in enumerate(items):
+        detail = None
+        owner = by_external_id.get(item.external_id)
+        if item.vin in accepted:
+            detail = "duplicate vin in request"
+        elif claimed.get(item.external_id, item.vin) != item.vin:
+            detail = "duplicate external_id in request"
+        elif owner is not None and owner.vin != item.vin:
+            detail = "external_id already registered to another vehicle"
+        if detail is not None:
+            results[index] = VehicleBulkItemResult(index=index, vin=item.vin, result="conflict", detail=detail)
+            continue
+        accepted[item.vin] = index
+        claimed[item.external_id] = item.vin
+
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    rows = [
+        {"external_id": items[i].external_id, "name": items[i].name, "vin": items[i].vin, "is_active": True}
+        for i in accepted.values()
+    ]
+    ids: Dict[str, int] = {}
+    try:
+        for start in range(0, len(rows), _VEHICLE_VALUES_PER_INSERT):
+            stmt = dialect_insert(Vehicle.__table__).values(rows[start:start + _VEHICLE_VALUES_PER_INSERT])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Vehicle.vin],
+                set_={"name": stmt.excluded.name, "external_id": stmt.excluded.external_id},
+            ).returning(Vehicle.id, Vehicle.vin)
+            ids.update((vin, vehicle_id) for vehicle_id, vin in db.execute(stmt))
+
+        created = []
+        for vin, index in accepted.items():
+            item, old = items[index], by_vin.get(vin)
+            if old is None:
+                created.append(ids[vin])
+                record_vehicle_change(db, ids[vin], "created")
+            elif (old.name, old.external_id) != (item.name, item.external_id):
+                record_vehicle_change(db, ids[vin], "updated")
+            results[index] = VehicleBulkItemResult(
+                index=index, vin=vin, result="updated" if old is not None else "created", id=ids[vin]
+            )
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise
+
+    for row in existing:
+        invalidate_vehicle_identifiers(row)
+    for vehicle_id in created:
+        fleet_counters.save_vehicle(vehicle_id, True)
+    return results
+
+
+# Point de code suivant un préfixe (les substituts UTF-16 ne sont pas encodables)
+_SURROGATES = (0xD800, 0xDFFF)
+
+
+def _prefix_range(column, prefix: str, start: Optional[str] = None):
+    """
+    Prédicat `column LIKE 'prefix%'` écrit comme une plage
+    (>= prefix, < prefix suivant), utilisable par un index B-tree
+    sur SQLite comme sur Postgres. Le LIKE reste en filtre résiduel :
+    il écarte ce que la plage laisserait passer selon la collation.
+    `start` (une valeur du préfixe) resserre le début de la plage.
+    """
+    criteria = [column >= (start or prefix), column.startswith(prefix, autoescape=True)]
+    # Les derniers caractères à U+10FFFF n'ont pas de suivant : on incrémente
+    # le précédent (plus de borne haute si le préfixe n'est fait que d'eux)
+    stem = prefix.rstrip(chr(sys.maxunicode))
+    if stem:
+        following = ord(stem[-1]) + 1
+        if _SURROGATES[0] <= following <= _SURROGATES[1]:
+            following = _SURROGATES[1] + 1
+        criteria.append(column < stem[:-1] + chr(following))
+    return and_(*criteria)
+
+
+def vehicle_page_size(limit: Optional[int] = None) -> int:
+    """
+    Taille de page effective pour `list_vehicles`.
+    """
+    if limit is None:
+        return settings.VEHICLE_PAGE_DEFAULT_LIMIT
+    return min(limit, settings.VEHICLE_PAGE_MAX_LIMIT)
+
+
+# Recherche par préfixe : d'abord les correspondances sur le nom, puis
+# celles sur le VIN seul, chacune dans l'ordre de son index (colonne, id)
+SEARCH_COLUMNS = ("name", "vin")
+
+
+@dataclass(frozen=True)
+class VehicleSearchCursor:
     """
-    Retourne la liste de tous les véhicules actifs.
+    Position dans une recherche `q` : colonne parcourue, valeur et id du
+    dernier véhicule servi.
     """
-    return db.query(Vehicle).filter(Vehicle.is_active == True).all()  # noqa: E712
+    column: str
+    key: str
+    id: int
+
+
+def encode_search_cursor(cursor: VehicleSearchCursor) -> str:
+    raw = json.dumps([cursor.column, cursor.key, cursor.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_search_cursor(raw: str) -> VehicleSearchCursor:
+    """
+    Lève ValueError si le curseur n'a pas été produit par `search_cursor_after`.
+    """
+    try:
+        column, key, vehicle_id = json.loads(base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor")
+    if column not in SEARCH_COLUMNS or not isinstance(key, str) or type(vehicle_id) is not int:
+        raise ValueError("invalid cursor")
+    return VehicleSearchCursor(column, key, vehicle_id)
+
+
+def search_cursor_after(row, q: str) -> VehicleSearchCursor:
+    """
+    Curseur de la page suivante d'une recherche, d'après sa dernière ligne
+    (qui doit contenir `id`, `name` et `vin`).
+    """
+    column = "name" if row.name.startswith(q) else "vin"
+    return VehicleSearchCursor(column, getattr(row, column), row.id)
+
+
+def list_vehicles(
+    db: Session,
+    q: Optional[str] = None,
+    after: Union[int, VehicleSearchCursor, None] = None,
+    limit: Optional[int] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[Vehicle]:
+    """
+    Retourne une page de véhicules actifs.
+
+    - sans `q` : triés par identifiant, pagination par clé (`after` =
+      dernier id de la page précédente) ;
+    - `q` : recherche par préfixe sur le nom ou le VIN ; les véhicules
+      trouvés par leur nom viennent d'abord, triés par (nom, id), puis ceux
+      trouvés par leur seul VIN, triés par (VIN, id). Chaque partie est
+      une plage de son index, reprise après `after` (`VehicleSearchCursor`,
+      voir `search_cursor_after`) : ni tri des correspondances, ni relecture
+      des pages précédentes ;
+    - la taille de page est plafonnée par `settings.VEHICLE_PAGE_MAX_LIMIT` ;
+    - si `fields` est fourni, seules ces colonnes sont lues (lignes SQL
+      projetées, dans l'ordre de `fields`, au lieu d'entités complètes).
+    """
+    limit = vehicle_page_size(limit)
+    columns = _columns(Vehicle, fields) if fields else [Vehicle]
+
+    def fetch(stmt):
+        if fields:
+            return db.execute(stmt).all()
+        return db.execute(stmt).scalars().all()
+
+    active = Vehicle.is_active == True  # noqa: E712
+    if not q:
+        criteria = [active]
+        if after is not None:
+            criteria.append(Vehicle.id > after)
+        return fetch(select(*columns).where(*criteria).order_by(Vehicle.id).limit(limit))
+
+    rows = []
+    start = 0 if after is None else SEARCH_COLUMNS.index(after.column)
+    for name in SEARCH_COLUMNS[start:]:
+        column = getattr(Vehicle, name)
+        if after is not None and after.column == name:
+            # Reprise dans l'index : la plage commence à la dernière valeur servie
+            criteria = [active, _prefix_range(column, q, start=after.key)]
+            criteria.append(tuple_(column, Vehicle.id) > tuple_(after.key, after.id))
+        else:
+            criteria = [active, _prefix_range(column, q)]
+        if name != SEARCH_COLUMNS[0]:
+            # Déjà servis par la recherche sur le nom
+            criteria.append(not_(_prefix_range(Vehicle.name, q)))
+        rows.extend(fetch(
+            select(*columns).where(*criteria).order_by(column, Vehicle.id).limit(limit - len(rows))
+        ))
+        if len(rows) == limit:
+            break
+    return rows
 
 
 def get_vehicle(db: Session, vehicle_id: int) -> Optional[Vehicle]:
@@ -38,17 +302,119 @@ def get_vehicle(db: Session, vehicle_id: int) -> Optional[Vehicle]:
     return db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
 
 
+def _get_vehicle_by(db: Session, column, value: str) -> Optional[VehicleRead]:
+    key = (column.key, value)
+    cached = identifier_cache.get(key)
+    if cached is not None:
+        return cached
+
+    v = db.execute(select(Vehicle).where(column == value)).scalar_one_or_none()
+    if v is None:
+        return None
+    snapshot = VehicleRead.model_validate(v)
+    identifier_cache.set(key, snapshot)
+    return snapshot
+
+
+def get_vehicle_by_vin(db: Session, vin: str) -> Optional[VehicleRead]:
+    """
+    Retourne un véhicule par son VIN (index unique, fronté par un cache).
+    """
+    return _get_vehicle_by(db, Vehicle.vin, vin)
+
+
+def get_vehicle_by_external_id(db: Session, external_id: str) -> Optional[VehicleRead]:
+    """
+    Retourne un véhicule par son identifiant externe (index unique, fronté par un cache).
+    """
+    return _get_vehicle_by(db, Vehicle.external_id, external_id)
+
+
+def invalidate_vehicle_identifiers(v: Union[Vehicle, VehicleRead]) -> None:
+    """
+    Retire un véhicule du cache d'identifiants (après modification / suppression).
+    """
+    identifier_cache.discard(("vin", v.vin))
+    identifier_cache.discard(("external_id", v.external_id))
+
+
 def get_latest_status(db: Session, vehicle_id: int) -> Optional[VehicleStatus]:
     """
     Retourne le dernier statut connu pour un véhicule donné.
     """
     return (
-        db.query(VehicleStatus)
+        status_session(db, vehicle_id)
+        .query(VehicleStatus)
         .filter(VehicleStatus.vehicle_id == vehicle_id)
         .order_by(VehicleStatus.timestamp.desc())
         .first()
     )
 
+
+def get_latest_status_cached(
+    db: Session,
+    vehicle_id: int,
+) -> Optional[Union[LatestStatus, VehicleStatus]]:
+    """
+    Comme `get_latest_status`, mais servi depuis la table partagée
+    entre workers quand elle est activée (aucune requête DB sur un hit).
+    """
+    if latest_status_table is None:
+        return get_latest_status(db, vehicle_id=vehicle_id)
+
+    cached = latest_status_table.get(vehicle_id)
+    if cached is not None:
+        return cached
+
+    status_obj = get_latest_status(db, vehicle_id=vehicle_id)
+    if status_obj is not None:
+        latest_status_table.update(status_obj)
+    return status_obj
+
+
+def list_latest_statuses(db: Session) -> List[Row]:
+    """
+    Dernier statut de chaque véhicule de la flotte, trié par vehicle_id.
+
+    Une requête par base de statuts, en recherches dans l'index
+    (vehicle_id, timestamp) : une CTE récursive saute d'un vehicle_id au
+    suivant (plus petit vehicle_id supérieur), puis lit le dernier statut
+    de chacun (une recherche, LIMIT 1). Le coût suit le nombre de
+    véhicules, pas la taille de l'historique. Avec le sharding, les shards
+    sont interrogés en parallèle et les résultats fusionnés.
+    """
+    step = VehicleStatus.__table__.alias("step")
+    fleet = select(func.min(step.c.vehicle_id).label("vehicle_id")).cte("fleet", recursive=True)
+    following = select(func.min(step.c.vehicle_id)).where(step.c.vehicle_id > fleet.c.vehicle_id).scalar_subquery()
+    fleet = fleet.union_all(select(following).where(fleet.c.vehicle_id.is_not(None)))
+
+    # Ex aequo sur le timestamp : le plus grand id l'emporte
+    last = VehicleStatus.__table__.alias("last")
+    latest_id = (
+        select(last.c.id)
+        .where(last.c.vehicle_id == fleet.c.vehicle_id)
+        .order_by(last.c.timestamp.desc(), last.c.id.desc())
+        .limit(1)
+        .correlate(fleet)
+        .scalar_subquery()
+    )
+    stmt = select(*VehicleStatus.__table__.c).select_from(fleet).join(VehicleStatus, VehicleStatus.id == latest_id)
+
+    def query(status_db: Session) -> List[Row]:
+        # Lignes simples (pas d'entités) : utilisables après la fermeture
+        # de la session du shard
+        return status_db.execute(stmt).all()
+
+    # Un véhicule n'a de statuts que sur un shard (hors rééquilibrage en cours)
+    latest = {}
+    for rows in fan_out_statuses(db, query):
+        for row in rows:
+            current = latest.get(row.vehicle_id)
+            if current is None or (row.timestamp, row.id) > (current.timestamp, current.id):
+                latest[row.vehicle_id] = row
+    return [latest[vid] for vid in sorted(latest)]
+
+
 def create_status(
     db: Session,
     vehicle_id: int,
@@ -62,23 +428,424 @@ def create_status(
         battery_level=data.battery_level,
         doors_locked=data.doors_locked,
         odometer_km=data.odometer_km,
+        latitude=data.latitude,
+        longitude=data.longitude,
     )
-    db.add(status_obj)
-    db.commit()
-    db.refresh(status_obj)
+    status_db = status_session(db, vehicle_id)
+    status_db.add(status_obj)
+    watched = alerts.watches(vehicle_id)
+    if status_obj.latitude is not None or watched or settings.WEBHOOKS_ENABLED:
+        # id et timestamp attribués : position, alertes et événement partent dans
+        # la même transaction (sans sharding), sans expirer le statut par un second commit
+        status_db.flush()
+        if status_obj.latitude is not None:
+            _advance_position(db, status_obj)
+        if watched:
+            alerts.evaluate_statuses(db, [status_obj])
+        if settings.WEBHOOKS_ENABLED:
+            webhooks.record_status_events(db, [status_obj])
+    status_db.commit()
+    if db is not status_db:
+        db.commit()
+    status_db.refresh(status_obj)
+
+    inserts = None
+    if latest_status_table is not None:
+        inserts = latest_status_table.record_inserts(status_obj)
+    if hot_store is not None:
+        hot_store.record([status_obj], inserts)
+    fleet_counters.observe(status_obj)
     return status_obj
 
+
+# Lignes par INSERT multi-lignes (7 paramètres par ligne, sous la limite de SQLite)
+_STATUS_VALUES_PER_INSERT = 500
+
+
+def existing_vehicle_ids(db: Session, vehicle_ids: Iterable[int]) -> Set[int]:
+    """
+    Sous-ensemble des ids donnés qui désignent un véhicule existant.
+    """
+    ids = sorted(set(vehicle_ids))
+    if not ids:
+        return set()
+    return set(db.scalars(select(Vehicle.id).where(Vehicle.id.in_(ids))))
+
+
+def create_statuses(db: Session, rows: List[dict]) -> List[LatestStatus]:
+    """
+    Insère un lot de statuts, d'un ou plusieurs véhicules (colonnes de
+    `vehicle_status`, timestamps fournis), par INSERT multi-lignes : une
+    transaction par base de statuts, ids rendus dans l'ordre des lignes.
+    La position, la table partagée et les totaux de la flotte reçoivent
+    le statut le plus récent de chaque véhicule, dans la même transaction
+    pour la position (comme `create_status`), le stockage chaud tous les
+    statuts ; les règles d'alerte sont évaluées
+    et les événements de webhooks écrits pour chaque statut, dans l'ordre
+    chronologique.
+    """
+    if not rows:
+        return []
+    groups: Dict[Session, List[int]] = {}
+    for i, row in enumerate(rows):
+        groups.setdefault(status_session(db, row["vehicle_id"]), []).append(i)
+
+    ids: List[int] = [0] * len(rows)
+    for status_db, indexes in groups.items():
+        for start in range(0, len(indexes), _STATUS_VALUES_PER_INSERT):
+            chunk = indexes[start:start + _STATUS_VALUES_PER_INSERT]
+            # Une requête INSERT ... VALUES (...), (...) par tranche : les ids
+            # sont attribués dans l'ordre des VALUES (rowid / séquence)
+            new_ids = sorted(status_db.scalars(
+                insert(VehicleStatus.__table__)
+                .values([rows[i] for i in chunk])
+                .returning(VehicleStatus.id)
+            ))
+            for i, status_id in zip(chunk, new_ids):
+                ids[i] = status_id
+    statuses = [LatestStatus(id=status_id, **row) for status_id, row in zip(ids, rows)]
+
+    chronological = sorted(statuses, key=lambda s: (s.timestamp, s.id))
+    by_vehicle: Dict[int, List[LatestStatus]] = {}
+    for status in chronological:
+        by_vehicle.setdefault(status.vehicle_id, []).append(status)
+    located = {s.vehicle_id: s for s in chronological if s.latitude is not None}
+    for status in located.values():
+        _advance_position(db, status)
+    alerts.evaluate_statuses(db, chronological)
+    if settings.WEBHOOKS_ENABLED:
+        webhooks.record_status_events(db, chronological)
+    for status_db in groups:
+        if status_db is not db:
+            status_db.commit()
+    db.commit()
+
+    for vehicle_statuses in by_vehicle.values():
+        inserts = None
+        if latest_status_table is not None:
+            inserts = latest_status_table.record_inserts(vehicle_statuses[-1], len(vehicle_statuses))
+        if hot_store is not None:
+            # Dans l'ordre des timestamps : le tampon garde les plus récents
+            hot_store.record(vehicle_statuses, inserts)
+        fleet_counters.observe(vehicle_statuses[-1])
+    return statuses
+
+
+def _position_values(status) -> dict:
+    return {
+        "status_id": status.id,
+        "timestamp": status.timestamp,
+        "latitude": status.latitude,
+        "longitude": status.longitude,
+        "geohash": geohash.encode(status.latitude, status.longitude, settings.GEOHASH_PRECISION),
+    }
+
+
+def _advance_position(db: Session, status) -> None:
+    """
+    Publie la position d'un statut s'il est plus récent que la position
+    connue du véhicule (un statut arrivé en retard ne la fait pas reculer).
+    Ne valide pas la transaction.
+    """
+    values = _position_values(status)
+    newer = or_(
+        VehiclePosition.timestamp < status.timestamp,
+        and_(VehiclePosition.timestamp == status.timestamp, VehiclePosition.status_id < status.id),
+    )
+    res = db.execute(
+        update(VehiclePosition)
+        .where(VehiclePosition.vehicle_id == status.vehicle_id, newer)
+        .values(**values)
+    )
+    if res.rowcount == 0:
+        # Pas encore de position, ou une position plus récente (doublon)
+        try:
+            with db.begin_nested():
+                db.execute(insert(VehiclePosition).values(vehicle_id=status.vehicle_id, **values))
+        except IntegrityError:
+            pass
+
+
+def refresh_vehicle_position(db: Session, vehicle_id: int) -> bool:
+    """
+    Recalcule la position d'un véhicule depuis son historique (dernier
+    statut géolocalisé) : après une purge ou un chargement en masse.
+    Retourne False si le véhicule n'a plus de position.
+    """
+    status_db = status_session(db, vehicle_id)
+    latest = status_db.execute(
+        select(
+            VehicleStatus.id,
+            VehicleStatus.vehicle_id,
+            VehicleStatus.timestamp,
+            VehicleStatus.latitude,
+            VehicleStatus.longitude,
+        )
+        .where(VehicleStatus.vehicle_id == vehicle_id, VehicleStatus.latitude.is_not(None))
+        .order_by(VehicleStatus.timestamp.desc(), VehicleStatus.id.desc())
+        .limit(1)
+    ).first()
+    release_status_session(db, status_db)
+
+    if latest is None:
+        db.execute(delete(VehiclePosition).where(VehiclePosition.vehicle_id == vehicle_id))
+        db.commit()
+        return False
+
+    values = _position_values(latest)
+    res = db.execute(
+        update(VehiclePosition).where(VehiclePosition.vehicle_id == vehicle_id).values(**values)
+    )
+    if res.rowcount == 0:
+        db.execute(insert(VehiclePosition).values(vehicle_id=vehicle_id, **values))
+    db.commit()
+    return True
+
+
+def _positions_in(db: Session, bbox: geohash.BBox, limit: Optional[int] = None) -> List[VehiclePosition]:
+    """
+    Positions dans un rectangle, triées par (geohash, vehicle_id).
+
+    Le rectangle est couvert par des cellules geohash, fusionnées en
+    plages de l'index : une sous-requête par plage (UNION ALL), chacune
+    lue dans l'ordre de l'index, puis fusionnées sans tri. Le filtre
+    exact sur latitude / longitude ne porte que sur les lignes trouvées.
+    """
+    ranges = geohash.prefix_ranges(
+        cell
+        for box in bbox.split()
+        for cell in geohash.covering_cells(box, settings.GEO_MAX_CELLS, settings.GEOHASH_PRECISION)
+    )
+
+    criteria = [VehiclePosition.latitude.between(bbox.min_lat, bbox.max_lat)]
+    if bbox.min_lon <= bbox.max_lon:
+        criteria.append(VehiclePosition.longitude.between(bbox.min_lon, bbox.max_lon))
+    else:
+        criteria.append(or_(VehiclePosition.longitude >= bbox.min_lon, VehiclePosition.longitude <= bbox.max_lon))
+
+    parts = []
+    for lower, upper in ranges:
+        part = select(VehiclePosition).where(VehiclePosition.geohash >= lower, *criteria)
+        if upper is not None:
+            part = part.where(VehiclePosition.geohash < upper)
+        parts.append(part)
+    stmt = parts[0] if len(parts) == 1 else union_all(*parts)
+    stmt = stmt.order_by(stmt.selected_columns.geohash, stmt.selected_columns.vehicle_id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return db.execute(select(VehiclePosition).from_statement(stmt)).scalars().all()
+
+
+def list_vehicles_within(
+    db: Session,
+    bbox: geohash.BBox,
+    limit: Optional[int] = None,
+) -> List[VehiclePosition]:
+    """
+    Véhicules dont la dernière position est dans le rectangle, triés par
+    cellule geohash (proximité spatiale) puis vehicle_id ; taille
+    plafonnée comme `list_vehicles`.
+    """
+    return _positions_in(db, bbox, limit=vehicle_page_size(limit))
+
+
+def list_nearest_vehicles(
+    db: Session,
+    latitude: float,
+    longitude: float,
+    n: int,
+) -> List[VehiclePositionRead]:
+    """
+    Les `n` véhicules les plus proches d'un point, du plus proche au plus
+    éloigné (`n` plafonné par VEHICLE_PAGE_MAX_LIMIT).
+
+    Recherche par rayon croissant : chaque passe ne lit que le rectangle
+    englobant le disque (index geohash) et ne calcule de distance que
+    pour ses lignes. Le rayon est quadruplé tant qu'il y a moins de `n`
+    candidats ; dès qu'il y en a assez, une dernière passe au rayon du
+    n-ième candidat garantit le résultat.
+    """
+    n = min(n, settings.VEHICLE_PAGE_MAX_LIMIT)
+    radius = settings.GEO_NEAREST_START_RADIUS_KM
+    whole_earth = math.pi * geohash.EARTH_RADIUS_KM
+
+    while True:
+        positions = _positions_in(db, geohash.bbox_around(latitude, longitude, radius))
+        ranked = sorted(
+            (
+                (geohash.haversine_km(latitude, longitude, p.latitude, p.longitude), p.vehicle_id, p)
+                for p in positions
+            ),
+            key=lambda item: item[:2],
+        )
+        if radius >= whole_earth or (len(ranked) >= n and ranked[n - 1][0] <= radius):
+            break
+        radius = ranked[n - 1][0] if len(ranked) >= n else radius * 4
+
+    return [
+        VehiclePositionRead.model_validate(p).model_copy(update={"distance_km": distance})
+        for distance, _, p in ranked[:n]
+    ]
+
 def list_statuses(
     db: Session,
     vehicle_id: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    order: str = "desc",
+    limit: Optional[int] = None,
+    fields: Optional[Sequence[str]] = None,
 ) -> List[VehicleStatus]:
     """
     Retourne l'historique des statuts pour un véhicule donné,
-    du plus récent au plus ancien.
+    du plus récent au plus ancien (ou l'inverse avec `order="asc"`).
+
+    - `since` (inclus) / `until` (exclu) deviennent un prédicat de plage
+      sur l'index (vehicle_id, timestamp) ;
+    - le nombre de lignes est toujours borné par
+      `settings.STATUS_HISTORY_MAX_ROWS`, même si `limit` est plus grand ;
+    - si `fields` est fourni, seules ces colonnes sont sélectionnées
+      (lignes SQL projetées au lieu d'entités `VehicleStatus`) ;
+    - une plage entièrement couverte par le stockage chaud
+      (HOT_STORE_ENABLED) est servie depuis la mémoire.
     """
-    return (
-        db.query(VehicleStatus)
-        .filter(VehicleStatus.vehicle_id == vehicle_id)
-        .order_by(VehicleStatus.timestamp.desc())
-        .all()
-    )
\ No newline at end of file
+    max_rows = settings.STATUS_HISTORY_MAX_ROWS
+    limit = max_rows if limit is None else min(limit, max_rows)
+
+    if hot_store is not None:
+        rows = hot_store.query(
+            vehicle_id,
+            since=None if since is None else to_naive_utc(since),
+            until=None if until is None else to_naive_utc(until),
+            order=order,
+            limit=limit,
+            fields=fields,
+        )
+        if rows is not None:
+            return rows
+
+    criteria = [VehicleStatus.vehicle_id == vehicle_id]
+    if since is not None:
+        criteria.append(VehicleStatus.timestamp >= to_naive_utc(since))
+    if until is not None:
+        criteria.append(VehicleStatus.timestamp < to_naive_utc(until))
+
+    sort = VehicleStatus.timestamp.asc() if order == "asc" else VehicleStatus.timestamp.desc()
+    columns = _columns(VehicleStatus, fields) if fields else [VehicleStatus]
+    stmt = select(*columns).where(*criteria).order_by(sort).limit(limit)
+
+    status_db = status_session(db, vehicle_id)
+    if fields:
+        return status_db.execute(stmt).all()
+    return status_db.execute(stmt).scalars().all()
+
+
+# Lignes lues par aller-retour lors du sous-échantillonnage
+_DOWNSAMPLE_FETCH_ROWS = 5000
+
+
+def downsample_statuses(
+    db: Session,
+    vehicle_id: int,
+    field: str,
+    points: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Tuple[int, List[Tuple[datetime, float]]]:
+    """
+    Courbe de `field` réduite à au plus `points` points par LTTB
+    (app/services/downsampling.py) : un COUNT sur l'index (vehicle_id,
+    timestamp) fixe les seaux, puis une seule passe sur un curseur trié par
+    cet index, lu par lots, en mémoire bornée. Retourne le nombre de
+    statuts de la plage et les (timestamp, valeur) retenus.
+    """
+    points = max(3, min(points, settings.STATUS_DOWNSAMPLE_MAX_POINTS))
+    column = getattr(VehicleStatus, field)
+    criteria = [VehicleStatus.vehicle_id == vehicle_id, column.is_not(None)]
+    if since is not None:
+        criteria.append(VehicleStatus.timestamp >= to_naive_utc(since))
+    if until is not None:
+        criteria.append(VehicleStatus.timestamp < to_naive_utc(until))
+
+    status_db = status_session(db, vehicle_id)
+    total = status_db.scalar(select(func.count()).select_from(VehicleStatus).where(*criteria))
+    if not total:
+        return 0, []
+    # Borné au comptage : des statuts insérés entre-temps ne décalent pas les seaux
+    rows = status_db.execute(
+        select(VehicleStatus.timestamp, column)
+        .where(*criteria)
+        .order_by(VehicleStatus.timestamp.asc())
+        .limit(total)
+        .execution_options(yield_per=_DOWNSAMPLE_FETCH_ROWS)
+    )
+    stream = ((to_epoch_ms(ts), value, ts) for ts, value in rows)
+    return total, [(ts, value) for _, value, ts in downsampling.lttb(stream, total, points)]
+
+
+def purge_statuses(
+    db: Session,
+    vehicle_id: int,
+    before: Optional[datetime] = None,
+) -> int:
+    """
+    Supprime l'historique d'un véhicule (tout, ou les statuts antérieurs
+    à `before`) côté serveur, par lots de `settings.PURGE_CHUNK_SIZE` :
+    aucune ligne n'est chargée en mémoire et chaque lot est une courte
+    transaction (verrous brefs, progression conservée si la requête
+    est interrompue). La dernière position du véhicule est ensuite
+    recalculée. Retourne le nombre de statuts supprimés.
+    """
+    deleted = _purge_statuses(db, vehicle_id, before)
+    if deleted:
+        refresh_vehicle_position(db, vehicle_id)
+    return deleted
+
+
+def _purge_statuses(db: Session, vehicle_id: int, before: Optional[datetime]) -> int:
+    chunk_size = max(1, settings.PURGE_CHUNK_SIZE)
+    criteria = [VehicleStatus.vehicle_id == vehicle_id]
+    if before is not None:
+        criteria.append(VehicleStatus.timestamp < to_naive_utc(before))
+
+    status_db = status_session(db, vehicle_id)
+    deleted = 0
+    while True:
+        chunk = select(VehicleStatus.id).where(*criteria).limit(chunk_size)
+        res = status_db.execute(
+            delete(VehicleStatus)
+            .where(VehicleStatus.id.in_(chunk.scalar_subquery()))
+            .execution_options(synchronize_session=False)
+        )
+        status_db.commit()
+        deleted += res.rowcount
+        if res.rowcount < chunk_size:
+            break
+
+    if latest_status_table is not None:
+        latest_status_table.invalidate(vehicle_id)
+    if hot_store is not None:
+        hot_store.drop(vehicle_id)
+    fleet_counters.forget_statuses(vehicle_id, to_naive_utc(before) if before is not None else None)
+    return deleted
+
+
+def delete_vehicle(db: Session, vehicle: Vehicle) -> int:
+    """
+    Supprime un véhicule et tout ce qui lui est rattaché.
+
+    L'historique est d'abord purgé par lots (comme `purge_statuses`), puis la
+    ligne du véhicule est supprimée : la base supprime les données
+    dérivées (ON DELETE CASCADE), sans passer par l'ORM.
+    Retourne le nombre de statuts supprimés.
+    """
+    snapshot = VehicleRead.model_validate(vehicle)
+    invalidate_vehicle_identifiers(snapshot)
+    deleted = _purge_statuses(db, snapshot.id, None)
+    db.execute(delete(Vehicle).where(Vehicle.id == snapshot.id))
+    record_vehicle_change(db, snapshot.id, "deleted")
+    db.commit()
+    fleet_counters.remove_vehicle(snapshot.id)
+    # Une lecture concurrente a pu remettre le véhicule en cache entre-temps
+    invalidate_vehicle_identifiers(snapshot)
+    return deleted
@@ -0,0 +1,546 @@
+# app/services/webhooks.py
+"""
+Webhooks partenaires : outbox transactionnelle et dispatcher.
+
+- Chaque statut écrit produit un événement `status.created` dans
+  `outbox_events`, dans la même transaction que la position du véhicule
+  (`record_status_events`) : aucun appel réseau sur le chemin
+  d'ingestion, et pas d'événement pour un statut annulé. Avec le sharding
+  de la télémétrie, l'événement est validé juste après le statut, comme
+  la position.
+- Le `WebhookDispatcher` (un thread par processus API, avec sa boucle
+  asyncio) répartit les événements en livraisons par destinataire, puis
+  sert chaque destinataire dans sa propre tâche (un destinataire lent ou
+  en panne ne retarde pas les autres) : lots d'au plus WEBHOOK_BATCH_SIZE
+  événements par POST, sur un pool de connexions httpx partagé, avec au
+  plus `max_concurrency` lots en vol par destinataire.
+- Échec (réseau, délai, statut HTTP hors 2xx) : nouvel essai avec un délai
+  exponentiel (WEBHOOK_RETRY_BASE_SECONDS, plafonné, avec gigue), puis
+  état `dead` après WEBHOOK_MAX_ATTEMPTS essais ; les lettres mortes se
+  consultent et se remettent en file via l'API.
+
+Les livraisons sont réclamées de façon atomique (UPDATE ... RETURNING, bail
+de WEBHOOK_LEASE_SECONDS, jeton de réclamation) : plusieurs processus
+peuvent tourner ensemble. Une réclamation ne prend pas plus de lots que
+le destinataire ne peut en recevoir pendant le bail, même si tous les
+envois expirent ; un bail dépassé malgré tout fait ignorer le bilan
+(la livraison a été réclamée à nouveau ailleurs). Livraison au moins une fois, sans ordre garanti entre lots : le
+destinataire dédoublonne par `id` d'événement.
+
+Corps d'un lot : `{"events": [{"id", "type", "created_at", "data"}]}` ;
+signature `X-Bluelink-Signature: sha256=<hex>`, HMAC-SHA256 du secret sur
+`<X-Bluelink-Timestamp>.<corps>` (voir `verify_signature`).
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from sqlalchemy import delete, exists, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.webhook import OutboxEvent, WebhookDelivery, WebhookEndpoint
+from app.db.session import SessionLocal
+from app.schemas.webhooks import WebhookEndpointCreate
+
+logger = logging.getLogger(__name__)
+
+EVENT_STATUS_CREATED = "status.created"
+
+DELIVERY_PENDING = "pending"
+DELIVERY_DEAD = "dead"
+
+SIGNATURE_HEADER = "X-Bluelink-Signature"
+TIMESTAMP_HEADER = "X-Bluelink-Timestamp"
+
+# Lignes par INSERT multi-lignes (sous la limite de paramètres de SQLite)
+_ROWS_PER_INSERT = 500
+
+_outbox = OutboxEvent.__table__
+_deliveries = WebhookDelivery.__table__
+
+
+# =====================================================================
+# Outbox (chemin d'ingestion)
+# =====================================================================
+
+def _status_payload(status: Any) -> Dict[str, Any]:
+    return {
+        "id": status.id,
+        "vehicle_id": status.vehicle_id,
+        "timestamp": status.timestamp.isoformat(),
+        "battery_level": status.battery_level,
+        "doors_locked": status.doors_locked,
+        "odometer_km": status.odometer_km,
+        "latitude": status.latitude,
+        "longitude": status.longitude,
+    }
+
+
+def record_status_events(db: Session, statuses: Sequence[Any]) -> None:
+    """
+    Écrit un événement `status.created` par statut inséré (avec id), dans
+    la transaction en cours de `db` (pas de commit).
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            "event_type": EVENT_STATUS_CREATED,
+            "vehicle_id": status.vehicle_id,
+            "payload": _status_payload(status),
+            "created_at": now,
+        }
+        for status in statuses
+    ]
+    for start in range(0, len(rows), _ROWS_PER_INSERT):
+        db.execute(insert(_outbox).values(rows[start:start + _ROWS_PER_INSERT]))
+
+
+# =====================================================================
+# Signature
+# =====================================================================
+
+def sign_payload(secret: str, timestamp: int, body: bytes) -> str:
+    digest = hmac.new(secret.encode(), str(timestamp).encode() + b"." + body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def verify_signature(secret: str, timestamp: str, body: bytes, signature: str, tolerance: float = 300.0) -> bool:
+    """
+    Vérification côté destinataire : signature valide et horodatage récent
+    (à `tolerance` secondes près, contre le rejeu).
+    """
+    try:
+        sent_at = int(timestamp)
+    except (TypeError, ValueError):
+        return False
+    if abs(time.time() - sent_at) > tolerance:
+        return False
+    return hmac.compare_digest(sign_payload(secret, sent_at, body), signature or "")
+
+
+# =====================================================================
+# Destinataires, livraisons (API)
+# =====================================================================
+
+def create_endpoint(db: Session, data: WebhookEndpointCreate) -> WebhookEndpoint:
+    endpoint = WebhookEndpoint(**data.model_dump())
+    db.add(endpoint)
+    db.commit()
+    db.refresh(endpoint)
+    return endpoint
+
+
+def list_endpoints(db: Session) -> List[WebhookEndpoint]:
+    return list(db.scalars(select(WebhookEndpoint).order_by(WebhookEndpoint.id)))
+
+
+def get_endpoint(db: Session, endpoint_id: int) -> Optional[WebhookEndpoint]:
+    return db.get(WebhookEndpoint, endpoint_id)
+
+
+def delete_endpoint(db: Session, endpoint: WebhookEndpoint) -> None:
+    """
+    Supprime un destinataire, ses livraisons (ON DELETE CASCADE) et les
+    événements qui ne sont plus attendus par personne.
+    """
+    db.delete(endpoint)
+    db.flush()
+    db.execute(
+        delete(_outbox).where(
+            _outbox.c.dispatched_at.is_not(None),
+            ~exists().where(_deliveries.c.event_id == _outbox.c.id),
+        )
+    )
+    db.commit()
+
+
+def list_deliveries(
+    db: Session,
+    endpoint_id: int,
+    state: str = DELIVERY_DEAD,
+    limit: Optional[int] = None,
+) -> List[WebhookDelivery]:
+    limit = settings.VEHICLE_PAGE_DEFAULT_LIMIT if limit is None else min(limit, settings.VEHICLE_PAGE_MAX_LIMIT)
+    return list(db.scalars(
+        select(WebhookDelivery)
+        .where(WebhookDelivery.endpoint_id == endpoint_id, WebhookDelivery.state == state)
+        .order_by(WebhookDelivery.id)
+        .limit(limit)
+    ))
+
+
+def retry_dead_deliveries(db: Session, endpoint_id: int) -> int:
+    """
+    Remet en file les lettres mortes d'un destinataire (essais remis à zéro).
+    """
+    res = db.execute(
+        update(_deliveries)
+        .where(_deliveries.c.endpoint_id == endpoint_id, _deliveries.c.state == DELIVERY_DEAD)
+        .values(state=DELIVERY_PENDING, attempts=0, next_attempt_at=datetime.utcnow())
+    )
+    db.commit()
+    return res.rowcount
+
+
+# =====================================================================
+# Dispatcher
+# =====================================================================
+
+@dataclass
+class _Batch:
+    endpoint_id: int
+    url: str
+    secret: str
+    max_concurrency: int
+    lease_token: str
+    deliveries: List[Tuple[int, int, int]]  # (id, event_id, essais)
+    body: bytes
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    Délai avant l'essai suivant, après `attempts` échecs : exponentiel,
+    plafonné, avec gigue (les destinataires en panne ne reçoivent pas tous
+    les essais en même temps à leur retour).
+    """
+    delay = min(settings.WEBHOOK_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.WEBHOOK_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def fan_out_events(db: Session) -> int:
+    """
+    Répartit les événements non encore traités en livraisons, une par
+    destinataire actif concerné ; les événements sans destinataire sont
+    supprimés. Retourne le nombre de livraisons créées.
+    """
+    now = datetime.utcnow()
+    pending = (
+        select(_outbox.c.id)
+        .where(_outbox.c.dispatched_at.is_(None))
+        .order_by(_outbox.c.id)
+        .limit(settings.WEBHOOK_CLAIM_LIMIT)
+        .scalar_subquery()
+    )
+    events = db.execute(
+        update(_outbox)
+        .where(_outbox.c.id.in_(pending), _outbox.c.dispatched_at.is_(None))
+        .values(dispatched_at=now)
+        .returning(_outbox.c.id, _outbox.c.vehicle_id)
+    ).all()
+    if not events:
+        db.commit()
+        return 0
+
+    endpoints = db.execute(
+        select(WebhookEndpoint.id, WebhookEndpoint.vehicle_id).where(WebhookEndpoint.is_active.is_(True))
+    ).all()
+    rows, unwanted = [], []
+    for event_id, vehicle_id in events:
+        targets = [ep.id for ep in endpoints if ep.vehicle_id is None or ep.vehicle_id == vehicle_id]
+        if not targets:
+            unwanted.append(event_id)
+        rows += [
+            {"endpoint_id": endpoint_id, "event_id": event_id, "state": DELIVERY_PENDING, "attempts": 0, "next_attempt_at": now}
+            for endpoint_id in targets
+        ]
+    for start in range(0, len(rows), _ROWS_PER_INSERT):
+        db.execute(insert(_deliveries).values(rows[start:start + _ROWS_PER_INSERT]))
+    if unwanted:
+        db.execute(delete(_outbox).where(_outbox.c.id.in_(unwanted)))
+    db.commit()
+    return len(rows)
+
+
+def due_endpoints(db: Session) -> List[int]:
+    """
+    Destinataires qui ont des livraisons échues.
+    """
+    now = datetime.utcnow()
+    return list(db.scalars(
+        select(_deliveries.c.endpoint_id)
+        .where(_deliveries.c.state == DELIVERY_PENDING, _deliveries.c.next_attempt_at <= now)
+        .distinct()
+    ))
+
+
+def claim_batches(db: Session, endpoint_id: int) -> List[_Batch]:
+    """
+    Réclame les livraisons échues d'un destinataire (bail de
+    WEBHOOK_LEASE_SECONDS, au plus ce qu'il peut recevoir pendant le bail)
+    et les regroupe en lots, corps signés prêts à l'envoi.
+    """
+    endpoint = db.get(WebhookEndpoint, endpoint_id)
+    if endpoint is None:
+        db.commit()
+        return []
+    size = settings.WEBHOOK_BATCH_SIZE
+    # Lots envoyables pendant le bail, même si chaque envoi va jusqu'au délai
+    rounds = max(1, int(settings.WEBHOOK_LEASE_SECONDS // settings.WEBHOOK_TIMEOUT_SECONDS))
+    limit = min(settings.WEBHOOK_CLAIM_LIMIT, size * endpoint.max_concurrency * rounds)
+
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    due = (
+        select(_deliveries.c.id)
+        .where(
+            _deliveries.c.endpoint_id == endpoint_id,
+            _deliveries.c.state == DELIVERY_PENDING,
+            _deliveries.c.next_attempt_at <= now,
+        )
+        .order_by(_deliveries.c.next_attempt_at, _deliveries.c.id)
+        .limit(limit)
+        .scalar_subquery()
+    )
+    claimed = db.execute(
+        update(_deliveries)
+        .where(
+            _deliveries.c.id.in_(due),
+            _deliveries.c.state == DELIVERY_PENDING,
+            _deliveries.c.next_attempt_at <= now,
+        )
+        .values(next_attempt_at=now + timedelta(seconds=settings.WEBHOOK_LEASE_SECONDS), lease_token=token)
+        .returning(_deliveries.c.id, _deliveries.c.event_id, _deliveries.c.attempts)
+    ).all()
+    db.commit()
+    if not claimed:
+        return []
+
+    events = {
+        ev.id: ev
+        for ev in db.execute(
+            select(_outbox.c.id, _outbox.c.event_type, _outbox.c.created_at, _outbox.c.payload)
+            .where(_outbox.c.id.in_(sorted({c.event_id for c in claimed})))
+        )
+    }
+    deliveries = [d for d in sorted(claimed, key=lambda c: c.event_id) if d.event_id in events]
+
+    batches = []
+    for start in range(0, len(deliveries), size):
+        chunk = deliveries[start:start + size]
+        body = json.dumps(
+            {
+                "events": [
+                    {
+                        "id": d.event_id,
+                        "type": events[d.event_id].event_type,
+                        "created_at": events[d.event_id].created_at.isoformat(),
+                        "data": events[d.event_id].payload,
+                    }
+                    for d in chunk
+                ]
+            },
+            separators=(",", ":"),
+        ).encode()
+        batches.append(_Batch(
+            endpoint_id=endpoint_id,
+            url=endpoint.url,
+            secret=endpoint.secret,
+            max_concurrency=endpoint.max_concurrency,
+            lease_token=token,
+            deliveries=[(d.id, d.event_id, d.attempts) for d in chunk],
+            body=body,
+        ))
+    return batches
+
+
+def record_results(db: Session, results: Sequence[Tuple[_Batch, Optional[str]]]) -> None:
+    """
+    Enregistre l'issue des envois : livraisons réussies supprimées (et leurs
+    événements s'ils ne sont plus attendus), échecs reprogrammés ou passés
+    en lettres mortes. Seules les livraisons dont ce processus détient
+    toujours le bail (même jeton) sont touchées.
+    """
+    # Un DELETE / UPDATE par (jeton, ...) : en pratique une seule réclamation
+    delivered: Dict[str, List[Tuple[int, int, int]]] = defaultdict(list)
+    for batch, error in results:
+        if error is None:
+            delivered[batch.lease_token] += batch.deliveries
+    for token, deliveries in delivered.items():
+        db.execute(
+            delete(_deliveries).where(
+                _deliveries.c.id.in_([d[0] for d in deliveries]),
+                _deliveries.c.lease_token == token,
+            )
+        )
+    if delivered:
+        db.execute(
+            delete(_outbox).where(
+                _outbox.c.id.in_(sorted({d[1] for deliveries in delivered.values() for d in deliveries})),
+                ~exists().where(_deliveries.c.event_id == _outbox.c.id),
+            )
+        )
+
+    # Un UPDATE par (jeton, erreur, nombre d'essais)
+    failed: Dict[Tuple[str, str, int], List[int]] = defaultdict(list)
+    for batch, error in results:
+        if error is not None:
+            for delivery_id, _, attempts in batch.deliveries:
+                failed[(batch.lease_token, error, attempts + 1)].append(delivery_id)
+    now = datetime.utcnow()
+    for (token, error, attempts), ids in failed.items():
+        if attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+            values = {"state": DELIVERY_DEAD}
+        else:
+            values = {"next_attempt_at": now + timedelta(seconds=retry_delay(attempts))}
+        db.execute(
+            update(_deliveries)
+            .where(_deliveries.c.id.in_(ids), _deliveries.c.lease_token == token)
+            .values(attempts=attempts, last_error=error[:1000], lease_token=None, **values)
+        )
+    db.commit()
+
+
+def prepare_cycle(db: Session) -> List[int]:
+    """
+    Début d'un cycle : répartition des nouveaux événements, puis
+    destinataires à servir.
+    """
+    fan_out_events(db)
+    return due_endpoints(db)
+
+
+def _in_session(fn: Callable[..., Any], *args: Any) -> Any:
+    # Session ouverte et fermée dans le thread qui l'utilise : une tâche
+    # annulée (arrêt) n'abandonne jamais une transaction en cours de route
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+class WebhookDispatcher:
+    """
+    Livre les événements de l'outbox, depuis un thread dédié qui porte sa
+    propre boucle asyncio et son pool de connexions.
+    """
+
+    def __init__(self, poll_seconds: float):
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Sémaphores par destinataire (max_concurrency)
+        self._limits: Dict[int, Tuple[int, asyncio.Semaphore]] = {}
+        # Tâche en cours par destinataire (boucle de fond)
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="webhook-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=settings.WEBHOOK_TIMEOUT_SECONDS + 5)
+
+    def _loop(self) -> None:
+        asyncio.run(self._main())
+
+    @staticmethod
+    def client() -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=settings.WEBHOOK_MAX_CONNECTIONS),
+            follow_redirects=False,
+        )
+
+    async def _main(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._limits.clear()
+        self._tasks.clear()
+        async with self.client() as client:
+            try:
+                while not self._stop.is_set():
+                    try:
+                        endpoint_ids = await asyncio.to_thread(_in_session, prepare_cycle)
+                    except Exception:
+                        logger.exception("Webhook dispatcher iteration failed")
+                        endpoint_ids = []
+                    started = 0
+                    for endpoint_id in endpoint_ids:
+                        if endpoint_id not in self._tasks:
+                            self._tasks[endpoint_id] = asyncio.create_task(self._serve(client, endpoint_id))
+                            started += 1
+                    if not started:
+                        await loop.run_in_executor(None, self._stop.wait, self.poll_seconds)
+            finally:
+                # Envois en vol abandonnés : repris à l'expiration du bail
+                for task in self._tasks.values():
+                    task.cancel()
+                await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def _serve(self, client: httpx.AsyncClient, endpoint_id: int) -> None:
+        """
+        Sert un destinataire tant qu'il a des livraisons échues.
+        """
+        try:
+            while not self._stop.is_set():
+                if not await self.dispatch_endpoint(client, endpoint_id):
+                    break
+        except Exception:
+            logger.exception("Webhook dispatch to endpoint %s failed", endpoint_id)
+        finally:
+            self._tasks.pop(endpoint_id, None)
+
+    def _semaphore(self, batch: _Batch) -> asyncio.Semaphore:
+        current = self._limits.get(batch.endpoint_id)
+        if current is None or current[0] != batch.max_concurrency:
+            current = self._limits[batch.endpoint_id] = (batch.max_concurrency, asyncio.Semaphore(batch.max_concurrency))
+        return current[1]
+
+    async def _send(self, client: httpx.AsyncClient, batch: _Batch) -> Optional[str]:
+        """
+        Envoie un lot ; retourne l'erreur, ou None s'il est accepté (2xx).
+        """
+        async with self._semaphore(batch):
+            sent_at = int(time.time())
+            headers = {
+                "Content-Type": "application/json",
+                TIMESTAMP_HEADER: str(sent_at),
+                SIGNATURE_HEADER: sign_payload(batch.secret, sent_at, batch.body),
+            }
+            try:
+                response = await client.post(batch.url, content=batch.body, headers=headers)
+            except httpx.HTTPError as exc:
+                return f"{type(exc).__name__}: {exc}"
+            if not response.is_success:
+                return f"HTTP {response.status_code}"
+            return None
+
+    async def dispatch_endpoint(self, client: httpx.AsyncClient, endpoint_id: int) -> int:
+        """
+        Un cycle pour un destinataire : réclamation, envois concurrents,
+        bilan. Retourne le nombre de lots envoyés.
+        """
+        batches = await asyncio.to_thread(_in_session, claim_batches, endpoint_id)
+        if not batches:
+            return 0
+        errors = await asyncio.gather(*(self._send(client, batch) for batch in batches))
+        await asyncio.to_thread(_in_session, record_results, list(zip(batches, errors)))
+        return len(batches)
+
+    async def run_once(self, client: httpx.AsyncClient) -> int:
+        """
+        Un cycle complet, attendu jusqu'au bout : répartition, puis un
+        cycle par destinataire échu, en parallèle. Retourne le nombre de
+        lots envoyés.
+        """
+        endpoint_ids = await asyncio.to_thread(_in_session, prepare_cycle)
+        sent = await asyncio.gather(*(self.dispatch_endpoint(client, endpoint_id) for endpoint_id in endpoint_ids))
+        return sum(sent)
+
+
+webhook_dispatcher = WebhookDispatcher(poll_seconds=settings.WEBHOOK_POLL_SECONDS)
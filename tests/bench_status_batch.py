@@ -0,0 +1,89 @@
+# tests/bench_status_batch.py
+"""
+Benchmark : décodage d'un lot de statuts, JSON + pydantic contre le lot
+binaire (`telemetry_formats.decode_status_batch`). Hors suite pytest.
+
+    python tests/bench_status_batch.py [--records 10000] [--repeat 5]
+
+Mesure le CPU de décodage / validation seul (sans base de données),
+jusqu'aux lignes prêtes pour l'INSERT multi-lignes.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas.vehicle import VehicleStatusCreate  # noqa: E402
+from app.services.telemetry_formats import decode_status_batch, encode_status_batch  # noqa: E402
+
+
+def _statuses(count: int):
+    start = datetime(2026, 1, 1)
+    rnd = random.Random(42)
+    for k in range(count):
+        located = k % 4 == 0
+        yield SimpleNamespace(
+            timestamp=start + timedelta(seconds=10 * k),
+            battery_level=round(rnd.uniform(5, 100), 1),
+            doors_locked=rnd.random() < 0.9,
+            odometer_km=round(10000 + k * 0.05, 2),
+            latitude=round(rnd.uniform(43, 50), 6) if located else None,
+            longitude=round(rnd.uniform(-1, 7), 6) if located else None,
+        )
+
+
+def decode_json(payload: bytes, vehicle_id: int):
+    """
+    Chemin JSON : un objet par statut, validé par `VehicleStatusCreate`.
+    """
+    rows = []
+    for item in json.loads(payload):
+        data = VehicleStatusCreate.model_validate(item)
+        rows.append({
+            "vehicle_id": vehicle_id,
+            "timestamp": datetime.fromisoformat(item["timestamp"]),
+            **data.model_dump(),
+        })
+    return rows
+
+
+def _best(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return min(timings)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    statuses = list(_statuses(args.records))
+    json_payload = json.dumps([
+        {**{k: v for k, v in vars(s).items() if k != "timestamp"}, "timestamp": s.timestamp.isoformat()}
+        for s in statuses
+    ]).encode()
+    binary_payload = encode_status_batch(1, statuses)
+    assert len(decode_json(json_payload, 1)) == len(decode_status_batch(binary_payload)[1]) == args.records
+
+    json_s = _best(lambda: decode_json(json_payload, 1), args.repeat)
+    binary_s = _best(lambda: decode_status_batch(binary_payload), args.repeat)
+    print(f"{args.records} statuts, meilleur de {args.repeat}")
+    print(f"{'format':<8} {'octets':>10} {'ms':>9} {'statuts/s':>12}")
+    for name, size, seconds in (("json", len(json_payload), json_s), ("binary", len(binary_payload), binary_s)):
+        print(f"{name:<8} {size:>10} {seconds * 1000:>9.1f} {args.records / seconds:>12.0f}")
+    print(f"binaire : x{json_s / binary_s:.1f} plus rapide, {len(binary_payload) / len(json_payload):.0%} de la taille JSON")
+
+
+if __name__ == "__main__":
+    main()
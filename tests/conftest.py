@@ -0,0 +1,185 @@
+# tests/conftest.py
+"""
+Base SQLite de test, données de référence et capture des requêtes SQL.
+
+La configuration est lue à l'import de `app.core.config` : les variables
+d'environnement sont donc posées avant tout import de l'application.
+Les données dérivées ne sont pas rafraîchies après ingestion (tâches de
+fond désactivées) pour que les budgets de requêtes ne mesurent que la route ;
+la fixture `derived_refresher` les réactive pour un test.
+"""
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, List, Optional, Tuple
+
+import pytest
+
+_TMP_DIR = tempfile.mkdtemp(prefix="bluelink-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}"
+os.environ["ANALYTICS_REFRESH_ON_INGEST"] = "false"
+os.environ["SEGMENTS_REFRESH_ON_INGEST"] = "false"
+os.environ["JOBS_RUNNER_ENABLED"] = "false"
+os.environ["JOBS_OUTPUT_DIR"] = os.path.join(_TMP_DIR, "exports")
+for name in ("MYBLUELINK_USERNAME", "MYBLUELINK_PASSWORD", "MYBLUELINK_PIN", "MYBLUELINK_VIN"):
+    os.environ.setdefault(name, "test")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event, insert  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.models import job, segments, vehicle_analytics  # noqa: E402,F401
+from app.db.models.vehicle import Vehicle  # noqa: E402
+from app.db.models.vehicle_status import VehicleStatus  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import ingest_hooks  # noqa: E402
+from app.services import vehicles as vehicle_service  # noqa: E402
+
+SEED_VEHICLES = 50
+SEED_STATUSES_PER_VEHICLE = 200
+SEED_START = datetime(2026, 1, 1)
+
+
+def seed_position(vehicle_id: int) -> Tuple[float, float]:
+    """
+    Position (fixe) d'un véhicule de référence : grille de 10 x 5 points
+    espacés de 0,01° autour de Paris.
+    """
+    return 48.80 + (vehicle_id - 1) % 10 * 0.01, 2.30 + (vehicle_id - 1) // 10 * 0.01
+
+
+class StatementLog:
+    """
+    Requêtes SQL exécutées sur l'engine principal : (SQL, paramètres, executemany).
+    """
+
+    def __init__(self):
+        self.statements: List[Tuple[str, Any, bool]] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters, executemany))
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def sql(self) -> List[str]:
+        return [statement for statement, _, _ in self.statements]
+
+
+@contextmanager
+def record_statements():
+    log = StatementLog()
+    event.listen(engine, "before_cursor_execute", log)
+    try:
+        yield log
+    finally:
+        event.remove(engine, "before_cursor_execute", log)
+
+
+def explain(statement: str, parameters: Optional[Any] = None) -> List[str]:
+    """
+    `EXPLAIN QUERY PLAN` d'une requête capturée (colonne `detail` de chaque étape).
+    """
+    with engine.connect() as conn:
+        cursor = conn.connection.driver_connection.cursor()
+        try:
+            rows = cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters or ()).fetchall()
+        finally:
+            cursor.close()
+    return [row[3] for row in rows]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def seeded_database():
+    """
+    Schéma complet et flotte de référence : SEED_VEHICLES véhicules,
+    SEED_STATUSES_PER_VEHICLE statuts géolocalisés chacun (un par minute)
+    et la dernière position de chaque véhicule.
+    """
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Vehicle),
+            [
+                {"id": i, "external_id": f"ext-{i}", "name": f"car-{i:03d}", "vin": f"VIN{i:05d}", "is_active": True}
+                for i in range(1, SEED_VEHICLES + 1)
+            ],
+        )
+        conn.execute(
+            insert(VehicleStatus),
+            [
+                {
+                    "vehicle_id": vehicle_id,
+                    "timestamp": SEED_START + timedelta(minutes=k),
+                    "battery_level": 90.0 - k * 0.1,
+                    "doors_locked": True,
+                    "odometer_km": 1000.0 + k,
+                    "latitude": seed_position(vehicle_id)[0],
+                    "longitude": seed_position(vehicle_id)[1],
+                }
+                for vehicle_id in range(1, SEED_VEHICLES + 1)
+                for k in range(SEED_STATUSES_PER_VEHICLE)
+            ],
+        )
+    with SessionLocal() as db:
+        for vehicle_id in range(1, SEED_VEHICLES + 1):
+            vehicle_service.refresh_vehicle_position(db, vehicle_id)
+    yield
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    vehicle_service.identifier_cache.clear()
+    yield
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def statements():
+    """
+    Fabrique de contextes de capture : `with statements() as log: ...`.
+    """
+    return record_statements
+
+
+def wait_for(predicate, timeout: float = 10.0):
+    """
+    Attend (sondage) que `predicate()` soit vrai ; retourne sa dernière valeur.
+    """
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return predicate()
+
+
+@pytest.fixture
+def derived_refresher(monkeypatch):
+    """
+    Rafraîchissement des données dérivées après ingestion, comme en
+    production (thread de fond), avec un délai de stabilisation court.
+    Le test active ANALYTICS_REFRESH_ON_INGEST / SEGMENTS_REFRESH_ON_INGEST.
+    """
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0.5)
+    refresher = ingest_hooks.DerivedRefresher()
+    monkeypatch.setattr(ingest_hooks, "derived_refresher", refresher)
+    refresher.start()
+    yield refresher
+    refresher.stop()
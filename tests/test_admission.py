@@ -0,0 +1,114 @@
+# tests/test_admission.py
+"""
+Contrôle d'admission : 429 par adresse de client (en-têtes ignorés),
+expiration et plafond des buckets, 503 quand la file d'un groupe est
+pleine ou trop lente, `Retry-After` dans les deux cas.
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from app.core import admission
+from app.core.admission import AdmissionControlMiddleware, AdmissionController, AdmissionGate, TokenBuckets
+from app.core.config import settings
+
+API = "/api/v1"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_rate_limit_is_per_peer_address(client, monkeypatch):
+    monkeypatch.setattr(admission.admission_controller, "buckets", TokenBuckets(rate=0.5, burst=2))
+    codes = [
+        client.get(f"{API}/vehicles/1", headers={"X-Client-Id": f"client-{k}"}).status_code
+        for k in range(3)
+    ]
+    # Un X-Client-Id neuf à chaque requête ne donne pas de nouveau bucket
+    assert codes == [200, 200, 429]
+    response = client.get(f"{API}/vehicles/1")
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Rate limit exceeded"}
+    assert int(response.headers["Retry-After"]) == 2
+    # Routes de santé hors limite
+    assert client.get(f"{API}/health").status_code == 200
+    assert len(admission.admission_controller.buckets) == 1
+
+
+def test_idle_buckets_expire_and_are_capped():
+    clock = Clock()
+    buckets = TokenBuckets(rate=1.0, burst=5, max_clients=3, clock=clock)
+    for k in range(3):
+        assert buckets.take(f"10.0.0.{k}") == 0
+    assert len(buckets) == 3
+
+    # Plus de clients que le plafond : le moins récemment utilisé est évincé
+    buckets.take("10.0.0.0")
+    buckets.take("10.0.0.9")
+    assert len(buckets) == 3 and "10.0.0.1" not in buckets._buckets
+
+    # Buckets redevenus pleins (inactifs burst / rate secondes) : oubliés
+    clock.now += 5
+    buckets.take("10.0.0.5")
+    assert list(buckets._buckets) == ["10.0.0.5"]
+
+    # Un bucket vide attend le jeton suivant
+    for _ in range(4):
+        buckets.take("10.0.0.5")
+    assert buckets.take("10.0.0.5") == pytest.approx(1.0)
+    assert buckets.rejected_total == 1
+
+
+def test_gate_rejects_when_queue_is_full_or_too_slow():
+    async def scenario():
+        gate = AdmissionGate("read", limit=1, max_queue=1, queue_timeout=0.05)
+        assert await gate.acquire()
+        waiter = asyncio.ensure_future(gate.acquire())
+        await asyncio.sleep(0)
+        assert gate.queued == 1
+        assert not await gate.acquire()  # file pleine : rejet immédiat
+        assert not await waiter  # attente plus longue que queue_timeout
+        gate.release()
+        assert await gate.acquire()
+        return gate.gauges()
+
+    gauges = asyncio.run(scenario())
+    assert (gauges["rejected_total"], gauges["admitted_total"], gauges["in_flight"], gauges["queued"]) == (2, 2, 1, 0)
+
+
+def test_saturated_group_returns_503(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_SIZE", 0)
+    monkeypatch.setattr(settings, "ADMISSION_READ_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "ADMISSION_RETRY_AFTER_SECONDS", 3.0)
+    controller = AdmissionController()
+    release = asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=AdmissionControlMiddleware(slow_app, controller))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            first = asyncio.ensure_future(http.get(f"{API}/vehicles"))
+            while controller.gates["read"].in_flight == 0:
+                await asyncio.sleep(0.001)
+            busy = await http.get(f"{API}/vehicles")
+            # Les écritures ont leur propre groupe
+            writes = controller.gates["ingest"].gauges()["in_flight"]
+            release.set()
+            return busy, await first, writes
+
+    busy, first, writes = asyncio.run(scenario())
+    assert busy.status_code == 503
+    assert busy.headers["Retry-After"] == "3"
+    assert first.status_code == 200
+    assert writes == 0
+    assert controller.gates["read"].gauges()["rejected_total"] == 1
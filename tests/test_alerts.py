@@ -0,0 +1,190 @@
+# tests/test_alerts.py
+"""
+Règles d'alerte : index compilé (comparé à une évaluation naïve), fronts
+montants / descendants, `unchanged_for`, lots d'ingestion et API.
+Véhicules réservés : 31-34.
+"""
+import operator
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.schemas.alerts import AlertRuleCreate
+from app.schemas.vehicle import VehicleStatusCreate
+from app.services import alerts as alert_service
+from app.services import vehicles as vehicle_service
+
+API = "/api/v1"
+
+_OPS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge, "==": operator.eq}
+
+
+def _row(vehicle_id, timestamp, battery_level=50.0, doors_locked=True, odometer_km=1000.0):
+    return {
+        "vehicle_id": vehicle_id,
+        "timestamp": timestamp,
+        "battery_level": battery_level,
+        "doors_locked": doors_locked,
+        "odometer_km": odometer_km,
+        "latitude": None,
+        "longitude": None,
+    }
+
+
+def _alerts(db, vehicle_id):
+    return sorted(alert_service.list_alerts(db, vehicle_id=vehicle_id), key=lambda a: a.id)
+
+
+def test_compiled_rules_match_naive_evaluation():
+    rng = random.Random(46)
+    rules = []
+    for rule_id in range(1, 2001):
+        conditions = []
+        for field in rng.sample(["battery_level", "odometer_km", "doors_locked"], rng.randint(1, 2)):
+            if field == "doors_locked":
+                conditions.append({"field": field, "op": "==", "value": rng.random() < 0.5})
+            else:
+                conditions.append({"field": field, "op": rng.choice("< <= > >= ==".split()),
+                                   "value": float(rng.randint(0, 20))})
+        rules.append(SimpleNamespace(id=rule_id, vehicle_id=rng.choice([None, 1, 2]), conditions=conditions))
+    compiled = alert_service.CompiledRules(rules)
+
+    for _ in range(200):
+        vehicle_id = rng.choice([1, 2, 3])
+        values = {
+            "battery_level": float(rng.randint(0, 20)),
+            "odometer_km": rng.choice([None, float(rng.randint(0, 20))]),
+            "doors_locked": rng.random() < 0.5,
+        }
+        expected = {
+            rule.id
+            for rule in rules
+            if rule.vehicle_id in (None, vehicle_id)
+            and all(
+                values[c["field"]] is not None and _OPS[c["op"]](values[c["field"]], c["value"])
+                for c in rule.conditions
+            )
+        }
+        assert compiled.match(vehicle_id, values, {}) == expected
+
+
+def test_alert_is_edge_triggered_deduplicated_and_resolved(db, client):
+    response = client.post(f"{API}/alert-rules", json={
+        "name": "low battery, unlocked",
+        "vehicle_id": 31,
+        "conditions": [
+            {"field": "battery_level", "op": "<", "value": 15},
+            {"field": "doors_locked", "op": "==", "value": False},
+        ],
+    })
+    assert response.status_code == 201, response.text
+    rule_id = response.json()["id"]
+
+    def post(battery_level, doors_locked):
+        return vehicle_service.create_status(
+            db, 31, VehicleStatusCreate(battery_level=battery_level, doors_locked=doors_locked)
+        )
+
+    post(10.0, True)
+    assert _alerts(db, 31) == []
+
+    first = post(10.0, False)
+    post(9.0, False)
+    alerts = _alerts(db, 31)
+    assert [(a.rule_id, a.status_id, a.resolved_at) for a in alerts] == [(rule_id, first.id, None)]
+
+    resolving = post(50.0, False)
+    post(8.0, False)
+    alerts = _alerts(db, 31)
+    db.refresh(alerts[0])
+    assert len(alerts) == 2
+    assert alerts[0].resolved_status_id == resolving.id
+    assert alerts[1].resolved_at is None
+
+    response = client.get(f"{API}/alerts", params={"vehicle_id": 31, "open": True})
+    assert [alert["id"] for alert in response.json()] == [alerts[1].id]
+
+
+def test_unchanged_for_and_batch_ingestion(db):
+    rule = alert_service.create_rule(db, AlertRuleCreate(
+        name="parked",
+        vehicle_id=32,
+        conditions=[{"field": "odometer_km", "op": "unchanged_for", "value": 3600}],
+    ))
+    start = datetime(2026, 3, 1)
+    rows = [
+        _row(32, start, odometer_km=1000.0),
+        _row(32, start + timedelta(minutes=30), odometer_km=1000.0),
+        _row(32, start + timedelta(minutes=61), odometer_km=1000.0),
+        _row(32, start + timedelta(minutes=90), odometer_km=1000.0),
+        _row(32, start + timedelta(minutes=95), odometer_km=1004.0),
+    ]
+    # Ordre d'arrivée quelconque : l'évaluation suit les timestamps
+    shuffled = [rows[i] for i in (3, 0, 4, 2, 1)]
+    statuses = {s.timestamp: s for s in vehicle_service.create_statuses(db, shuffled)}
+
+    [alert] = _alerts(db, 32)
+    assert alert.rule_id == rule.id
+    assert alert.status_id == statuses[start + timedelta(minutes=61)].id
+    assert alert.resolved_status_id == statuses[start + timedelta(minutes=95)].id
+
+    # Le véhicule repart de la nouvelle valeur : pas de nouveau déclenchement
+    vehicle_service.create_statuses(db, [_row(32, start + timedelta(minutes=120), odometer_km=1004.0)])
+    assert len(_alerts(db, 32)) == 1
+
+
+def test_rule_changes_close_open_alerts(db, client):
+    rule = alert_service.create_rule(db, AlertRuleCreate(
+        name="low battery",
+        vehicle_id=33,
+        conditions=[{"field": "battery_level", "op": "<=", "value": 20}],
+    ))
+    vehicle_service.create_status(db, 33, VehicleStatusCreate(battery_level=20.0))
+    assert [a.resolved_at for a in _alerts(db, 33)] == [None]
+
+    response = client.put(f"{API}/alert-rules/{rule.id}", json={
+        "name": "low battery",
+        "vehicle_id": 33,
+        "conditions": [{"field": "battery_level", "op": "<", "value": 10}],
+    })
+    assert response.status_code == 200, response.text
+    [alert] = _alerts(db, 33)
+    db.refresh(alert)
+    assert alert.resolved_at is not None
+
+    vehicle_service.create_status(db, 33, VehicleStatusCreate(battery_level=15.0))
+    assert len(_alerts(db, 33)) == 1
+
+    assert client.delete(f"{API}/alert-rules/{rule.id}").status_code == 204
+    assert _alerts(db, 33) == []
+    assert client.get(f"{API}/alert-rules/{rule.id}").status_code == 404
+
+
+def test_fleet_rule_applies_to_every_vehicle(db, client):
+    rule = alert_service.create_rule(db, AlertRuleCreate(
+        name="fleet: odometer",
+        conditions=[{"field": "odometer_km", "op": ">", "value": 10 ** 6}],
+    ))
+    try:
+        vehicle_service.create_status(db, 34, VehicleStatusCreate(odometer_km=2e6))
+        vehicle_service.create_status(db, 34, VehicleStatusCreate(battery_level=50.0))
+        # Odomètre absent : la règle n'est pas évaluée, l'alerte reste ouverte
+        assert [(a.rule_id, a.resolved_at) for a in _alerts(db, 34)] == [(rule.id, None)]
+    finally:
+        alert_service.delete_rule(db, rule)
+    assert not alert_service.rule_index.compiled.watches(34)
+
+
+def test_invalid_rules_are_rejected(client):
+    bad = [
+        {"field": "doors_locked", "op": "<", "value": 1},
+        {"field": "battery_level", "op": "==", "value": True},
+        {"field": "odometer_km", "op": "unchanged_for", "value": 0},
+    ]
+    for condition in bad:
+        response = client.post(f"{API}/alert-rules", json={"name": "bad", "conditions": [condition]})
+        assert response.status_code == 422, condition
+    response = client.post(f"{API}/alert-rules", json={
+        "name": "ghost", "vehicle_id": 10 ** 6, "conditions": [{"field": "battery_level", "op": "<", "value": 5}],
+    })
+    assert response.status_code == 404
@@ -0,0 +1,142 @@
+# tests/test_analytics.py
+"""
+Analytique incrémentale : égale à un recalcul complet (lots, historique
+rattrapé après coup, distances journalières), statuts non stabilisés
+laissés au rafraîchissement suivant, rafraîchissement après ingestion par
+l'API.
+"""
+from array import array
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.models.vehicle_analytics import VehicleAnalytics, VehicleDailyDistance
+from app.db.models.vehicle_status import VehicleStatus
+from app.schemas.vehicle import VehicleCreate
+from app.services import vehicles as vehicle_service
+from app.services.analytics import AnalyticsState, _epoch_s, _opt, integrate_batch, refresh_vehicle_analytics
+from app.services.latest_status_table import LatestStatus
+from app.services.telemetry_formats import MEDIA_BINARY_BATCH, encode_status_batch
+from conftest import wait_for
+
+START = datetime(2026, 3, 1, 22, 0)
+
+
+def _drive(vehicle_id, minutes):
+    """
+    Trajet par tranches de 10 minutes : 1 km et 0,5 % de batterie par
+    minute, un arrêt (batterie en baisse lente) une tranche sur quatre.
+    """
+    rows = []
+    odometer, battery = 1000.0, 90.0
+    for k in minutes:
+        moving = (k // 10) % 4 != 3
+        odometer += 1.0 if moving else 0.0
+        battery -= 0.5 if moving else 0.05
+        rows.append({
+            "vehicle_id": vehicle_id, "timestamp": START + timedelta(minutes=k), "battery_level": battery,
+            "doors_locked": True, "odometer_km": odometer, "latitude": None, "longitude": None,
+        })
+    return rows
+
+
+def _from_scratch(db, vehicle_id):
+    rows = db.execute(
+        select(VehicleStatus.timestamp, VehicleStatus.battery_level, VehicleStatus.odometer_km)
+        .where(VehicleStatus.vehicle_id == vehicle_id)
+        .order_by(VehicleStatus.timestamp, VehicleStatus.id)
+    ).all()
+    state = AnalyticsState()
+    integrate_batch(
+        state,
+        array("d", (_epoch_s(r.timestamp) for r in rows)),
+        array("d", (_opt(r.battery_level) for r in rows)),
+        array("d", (_opt(r.odometer_km) for r in rows)),
+    )
+    return state
+
+
+def _assert_matches_full_recompute(db, vehicle_id):
+    db.expire_all()
+    expected = _from_scratch(db, vehicle_id)
+    row = db.get(VehicleAnalytics, vehicle_id)
+    assert row.samples == expected.samples
+    assert row.total_distance_km == pytest.approx(expected.total_distance_km)
+    assert row.driving_battery_drop_pct == pytest.approx(expected.driving_battery_drop_pct)
+    assert row.idle_battery_drop_pct == pytest.approx(expected.idle_battery_drop_pct)
+    assert row.idle_seconds == pytest.approx(expected.idle_seconds)
+    assert _epoch_s(row.last_timestamp) == expected.last_ts
+    daily = dict(db.execute(
+        select(VehicleDailyDistance.day, VehicleDailyDistance.distance_km).where(VehicleDailyDistance.vehicle_id == vehicle_id)
+    ).all())
+    assert daily == pytest.approx(expected.daily_distance)
+    assert len(daily) == 2  # trajet à cheval sur minuit
+
+
+@pytest.fixture
+def vehicle_id(db, monkeypatch):
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0.0)
+    monkeypatch.setattr(settings, "ANALYTICS_BATCH_SIZE", 7)
+    name = f"analytics-{datetime.utcnow().timestamp()}"
+    return vehicle_service.create_vehicle(db, VehicleCreate(external_id=name, name=name, vin=name)).id
+
+
+def test_incremental_refresh_matches_full_recompute(db, vehicle_id):
+    minutes = list(range(0, 240, 3))
+    vehicle_service.create_statuses(db, _drive(vehicle_id, minutes[:30]))
+    assert refresh_vehicle_analytics(db, vehicle_id) == 30
+    vehicle_service.create_statuses(db, _drive(vehicle_id, minutes)[30:])
+    assert refresh_vehicle_analytics(db, vehicle_id) == len(minutes) - 30
+    assert refresh_vehicle_analytics(db, vehicle_id) == 0
+    _assert_matches_full_recompute(db, vehicle_id)
+
+
+def test_backfilled_history_is_recomputed(db, vehicle_id):
+    everything = _drive(vehicle_id, range(0, 240, 3))
+    # Le boîtier renvoie d'abord un statut sur deux, puis le reste après coup
+    vehicle_service.create_statuses(db, everything[::2])
+    refresh_vehicle_analytics(db, vehicle_id)
+    partial = db.get(VehicleAnalytics, vehicle_id).samples
+
+    vehicle_service.create_statuses(db, everything[1::2])
+    assert refresh_vehicle_analytics(db, vehicle_id) == len(everything) - partial
+    _assert_matches_full_recompute(db, vehicle_id)
+
+    # Retour à l'incrémental ensuite
+    vehicle_service.create_statuses(db, _drive(vehicle_id, [300]))
+    assert refresh_vehicle_analytics(db, vehicle_id) == 1
+    row = db.get(VehicleAnalytics, vehicle_id)
+    assert row.samples == len(everything) + 1
+
+
+def test_unsettled_statuses_wait_for_the_next_refresh(db, vehicle_id, monkeypatch):
+    vehicle_service.create_statuses(db, _drive(vehicle_id, range(0, 30, 3)))
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 3600.0)
+    assert refresh_vehicle_analytics(db, vehicle_id) == 0
+    assert db.get(VehicleAnalytics, vehicle_id) is None
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0.0)
+    assert refresh_vehicle_analytics(db, vehicle_id) == 10
+
+
+def test_statuses_posted_through_the_api_reach_analytics(client, db, vehicle_id, derived_refresher, monkeypatch):
+    monkeypatch.setattr(settings, "ANALYTICS_REFRESH_ON_INGEST", True)
+    rows = [LatestStatus(id=0, **row) for row in _drive(vehicle_id, range(0, 240, 3))]
+    response = client.post(
+        "/api/v1/statuses:binary",
+        content=encode_status_batch(vehicle_id, rows),
+        headers={"content-type": MEDIA_BINARY_BATCH},
+    )
+    assert response.status_code == 201, response.text
+
+    def analytics():
+        return client.get(f"/api/v1/vehicles/{vehicle_id}/analytics").json()
+
+    # Intégrés une fois stabilisés, sans job
+    assert wait_for(lambda: analytics()["samples"] == len(rows))
+    _assert_matches_full_recompute(db, vehicle_id)
+
+    # Statut unitaire : même chemin
+    assert client.post(f"/api/v1/vehicles/{vehicle_id}/status", json={"odometer_km": 2000.0}).status_code == 201
+    assert wait_for(lambda: analytics()["samples"] == len(rows) + 1)
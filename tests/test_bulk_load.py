@@ -0,0 +1,222 @@
+# tests/test_bulk_load.py
+"""
+Chargement hors ligne (`app.db.bulk_load`) : analyse des blocs JSONL /
+CSV, résolution des véhicules par VIN / external_id, INSERT multi-lignes
+par paquets, reprise sur checkpoint sans doublon, invalidation de la
+table partagée par bloc et rafraîchissement des données dérivées.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.db import bulk_load
+from app.db.models.segments import Trip
+from app.db.models.vehicle_analytics import VehicleAnalytics
+from app.db.models.vehicle_status import VehicleStatus
+from app.schemas.vehicle import VehicleCreate
+from app.services import vehicles as vehicle_service
+from app.services.latest_status_table import LatestStatusTable
+
+START = datetime(2026, 8, 1, 6, 0)
+
+
+@pytest.fixture
+def vehicle(db):
+    """
+    Véhicule neuf : (id, vin, external_id).
+    """
+    stamp = datetime.utcnow().timestamp()
+    vin, external_id = f"BULK{stamp}", f"bulk-{stamp}"
+    vehicle_id = vehicle_service.create_vehicle(db, VehicleCreate(external_id=external_id, name=vin, vin=vin)).id
+    return vehicle_id, vin, external_id
+
+
+def _count(db, vehicle_id):
+    return db.scalar(select(func.count()).select_from(VehicleStatus).where(VehicleStatus.vehicle_id == vehicle_id))
+
+
+def _jsonl(records):
+    return [json.dumps(r).encode() + b"\n" for r in records]
+
+
+def test_parse_jsonl_chunk():
+    lines = _jsonl([
+        {"vin": "V1", "timestamp": "2026-08-01T06:00:00Z", "battery_level": 80, "odometer_km": 10.5},
+        {"external_id": "e-2", "timestamp": 1785564000, "doors_locked": False},  # epoch (s)
+        {"vin": "V3", "timestamp": "2026-08-01T08:00:00+02:00", "latitude": 48.8, "longitude": 2.3},
+        {"vin": "V4", "timestamp": "1785564000.5"},  # epoch en texte
+    ]) + [b"\n", b"not json\n", b"[1, 2]\n"] + _jsonl([
+        {"timestamp": "2026-08-01T06:00:00"},
+        {"vin": "V5"},
+        {"vin": "V6", "timestamp": "2026-08-01T06:00:00", "latitude": 123.0},
+    ])
+    rows, errors = bulk_load.parse_chunk("jsonl", None, lines, 10)
+
+    assert rows == [
+        (10, "vin", "V1", START, 80.0, True, 10.5, None, None),
+        (11, "external_id", "e-2", datetime(2026, 8, 1, 6, 0), None, False, None, None, None),
+        (12, "vin", "V3", START, None, True, None, 48.8, 2.3),
+        (13, "vin", "V4", datetime(2026, 8, 1, 6, 0, 0, 500000), None, True, None, None, None),
+    ]
+    # Ligne vide ignorée (14) ; les rejets gardent leur numéro de ligne
+    assert [line for line, _ in errors] == [15, 16, 17, 18, 19]
+    assert errors[1][1] == "not a JSON object"
+    assert errors[2][1] == "missing vin / external_id"
+    assert errors[3][1] == "missing timestamp"
+    assert "less than or equal to 90" in errors[4][1]
+
+
+def test_parse_csv_chunk():
+    header = ["vin", "external_id", "timestamp", "battery_level", "doors_locked", "odometer_km", "latitude", "longitude"]
+    lines = [
+        b"V1,,2026-08-01T06:00:00,55.5,false,,,\n",
+        b",e-2,1785564000,,true,12,48.5,-2.25\n",
+        b"V3,,yesterday,,,,,\n",
+        b"V4,,2026-08-01T06:00:00,full,,,,\n",
+    ]
+    rows, errors = bulk_load.parse_chunk("csv", header, lines, 2)
+    assert rows == [
+        (2, "vin", "V1", START, 55.5, False, None, None, None),
+        (3, "external_id", "e-2", START, None, True, 12.0, 48.5, -2.25),
+    ]
+    assert [line for line, _ in errors] == [4, 5]
+
+
+def test_vehicles_are_resolved_by_vin_or_external_id(db, vehicle, tmp_path):
+    vehicle_id, vin, external_id = vehicle
+    rejects = open(tmp_path / "rejects.jsonl", "w+", encoding="utf-8")
+    loader = bulk_load.Loader(rejects=rejects)
+    parsed = [
+        (1, "vin", vin, START, 50.0, True, None, None, None),
+        (2, "external_id", external_id, START + timedelta(minutes=1), 49.0, True, None, None, None),
+        (3, "vin", "UNKNOWN-VIN", START, 50.0, True, None, None, None),
+        (4, "external_id", "unknown-ext", START, 50.0, True, None, None, None),
+    ]
+    assert loader.write("a.jsonl", parsed, dedupe=False) == 2
+    assert loader.touched == {vehicle_id}
+    assert _count(db, vehicle_id) == 2
+
+    # Identifiants (connus ou non) résolus une seule fois
+    assert loader.vehicle_ids[("vin", "UNKNOWN-VIN")] is None
+    rejects.seek(0)
+    assert [json.loads(line) for line in rejects] == [
+        {"file": "a.jsonl", "line": 3, "error": "unknown vehicle vin=UNKNOWN-VIN"},
+        {"file": "a.jsonl", "line": 4, "error": "unknown vehicle external_id=unknown-ext"},
+    ]
+    assert loader.rejected == 2
+    rejects.close()
+
+
+def test_rows_are_inserted_in_multi_row_chunks(db, vehicle, statements, monkeypatch):
+    vehicle_id, vin, _ = vehicle
+    monkeypatch.setattr(bulk_load, "_VALUES_PER_INSERT", 3)
+    parsed = [(k, "vin", vin, START + timedelta(minutes=k), 50.0, True, None, None, None) for k in range(7)]
+    loader = bulk_load.Loader()
+    loader.resolve(parsed)
+    with statements() as log:
+        assert loader.write("a.jsonl", parsed, dedupe=False) == 7
+    inserts = [(sql, params) for sql, params, _ in log.statements if sql.startswith("INSERT INTO vehicle_status")]
+    assert [len(params) // len(bulk_load._COLUMNS) for _, params in inserts] == [3, 3, 1]
+    assert _count(db, vehicle_id) == 7
+
+
+def test_resume_from_checkpoint_skips_rows_already_written(db, vehicle, tmp_path, monkeypatch):
+    vehicle_id, vin, _ = vehicle
+    path = tmp_path / "history.jsonl"
+    path.write_bytes(b"".join(_jsonl([
+        {"vin": vin, "timestamp": (START + timedelta(minutes=k)).isoformat(), "battery_level": 90 - k}
+        for k in range(10)
+    ])))
+    checkpoint = str(tmp_path / "checkpoint.json")
+
+    # Arrêt après l'écriture du 2e bloc, avant son checkpoint
+    real_set = bulk_load.Checkpoints.set
+    calls = []
+
+    def crash_on_third_set(self, name, entry):
+        calls.append(dict(entry))
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        real_set(self, name, entry)
+
+    monkeypatch.setattr(bulk_load.Checkpoints, "set", crash_on_third_set)
+    with ThreadPoolExecutor(1) as executor:
+        with pytest.raises(KeyboardInterrupt):
+            bulk_load.load_file(str(path), bulk_load.Loader(), executor, bulk_load.Checkpoints(checkpoint), 4, 1, 0.0)
+    assert _count(db, vehicle_id) == 8
+    monkeypatch.setattr(bulk_load.Checkpoints, "set", real_set)
+
+    loader = bulk_load.Loader()
+    with ThreadPoolExecutor(1) as executor:
+        bulk_load.load_file(str(path), loader, executor, bulk_load.Checkpoints(checkpoint), 4, 1, 0.0)
+    # Le bloc réécrit est dédoublonné, les suivants sont insérés
+    assert loader.rows == 2
+    assert _count(db, vehicle_id) == 10
+    assert bulk_load.Checkpoints(checkpoint).get(str(path))["done"]
+
+    # Fichier terminé : ignoré
+    loader = bulk_load.Loader()
+    with ThreadPoolExecutor(1) as executor:
+        bulk_load.load_file(str(path), loader, executor, bulk_load.Checkpoints(checkpoint), 4, 1, 0.0)
+    assert loader.rows == 0
+
+
+def test_first_chunk_is_deduplicated_after_an_early_crash(db, vehicle, tmp_path, monkeypatch):
+    vehicle_id, vin, _ = vehicle
+    path = tmp_path / "history.jsonl"
+    path.write_bytes(b"".join(_jsonl([
+        {"vin": vin, "timestamp": (START + timedelta(minutes=k)).isoformat()} for k in range(3)
+    ])))
+    checkpoint = str(tmp_path / "checkpoint.json")
+    real_write = bulk_load.Loader.write
+
+    def crash_after_write(self, *args, **kwargs):
+        real_write(self, *args, **kwargs)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(bulk_load.Loader, "write", crash_after_write)
+    with ThreadPoolExecutor(1) as executor:
+        with pytest.raises(KeyboardInterrupt):
+            bulk_load.load_file(str(path), bulk_load.Loader(), executor, bulk_load.Checkpoints(checkpoint), 10, 1, 0.0)
+    monkeypatch.setattr(bulk_load.Loader, "write", real_write)
+
+    with ThreadPoolExecutor(1) as executor:
+        bulk_load.load_file(str(path), bulk_load.Loader(), executor, bulk_load.Checkpoints(checkpoint), 10, 1, 0.0)
+    assert _count(db, vehicle_id) == 3
+
+
+def test_shared_table_is_invalidated_per_chunk(vehicle, tmp_path, monkeypatch):
+    vehicle_id, vin, _ = vehicle
+    table = LatestStatusTable(str(tmp_path / "latest.bin"), slots=64)
+    monkeypatch.setattr(bulk_load, "latest_status_table", table)
+    try:
+        loader = bulk_load.Loader()
+        counts = [table.inserts(vehicle_id)]
+        for k in range(2):
+            loader.write("a.jsonl", [(k, "vin", vin, START + timedelta(minutes=k), 50.0, True, None, None, None)], dedupe=False)
+            counts.append(table.inserts(vehicle_id))
+        # Chaque bloc avance le compteur d'insertions du slot (stockage chaud périmé)
+        assert counts[0] < counts[1] < counts[2]
+    finally:
+        table.close()
+
+
+def test_derived_data_is_refreshed_whatever_the_ingest_settings(db, vehicle, monkeypatch):
+    vehicle_id, vin, _ = vehicle
+    assert not settings.ANALYTICS_REFRESH_ON_INGEST and not settings.SEGMENTS_REFRESH_ON_INGEST
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0.3)
+    parsed = [
+        (k, "vin", vin, START + timedelta(minutes=k), 80.0 - k, False, 100.0 + k, None, None) for k in range(6)
+    ]
+    loader = bulk_load.Loader()
+    loader.write("a.jsonl", parsed, dedupe=False)
+    # Attend la stabilisation des statuts qui viennent d'être écrits
+    bulk_load.refresh_derived(loader)
+    db.expire_all()
+    assert db.get(VehicleAnalytics, vehicle_id).samples == 6
+    trips = db.scalars(select(Trip).where(Trip.vehicle_id == vehicle_id)).all()
+    assert [(trip.distance_km, trip.ongoing) for trip in trips] == [(5.0, True)]
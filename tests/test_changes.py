@@ -0,0 +1,177 @@
+# tests/test_changes.py
+"""
+Flux de changements : reprise par curseur, fenêtre de stabilisation (et
+transactions plus longues qu'elle), journal des véhicules et plans
+d'exécution (plages de clé primaire).
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from app.core.config import settings
+from app.db.models.vehicle_change import VehicleChange
+from app.db.models.vehicle_status import VehicleStatus
+from app.db.session import SessionLocal
+from app.schemas.vehicle import VehicleCreate, VehicleStatusCreate
+from app.services import changes as change_service
+from app.services import vehicles as vehicle_service
+
+from conftest import explain
+
+API = "/api/v1"
+
+
+def _drain(db, cursor=None, limit=1000):
+    statuses, vehicles = [], []
+    while True:
+        page = change_service.read_changes(db, cursor=cursor, limit=limit)
+        statuses += page["statuses"]
+        vehicles += page["vehicles"]
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            return statuses, vehicles, cursor
+
+
+def _statuses(vehicle_id, start, count):
+    return [
+        {"vehicle_id": vehicle_id, "timestamp": start + timedelta(minutes=k), "battery_level": 50.0,
+         "doors_locked": True, "odometer_km": None, "latitude": None, "longitude": None}
+        for k in range(count)
+    ]
+
+
+def _new_vehicle(db, name):
+    return vehicle_service.create_vehicle(db, VehicleCreate(external_id=f"feed-{name}", name=name, vin=f"FEED{name.upper()}")).id
+
+
+def test_cursor_resumes_without_gaps_or_duplicates(db, monkeypatch):
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0.0)
+    _, _, cursor = _drain(db)
+    vehicle_id = _new_vehicle(db, "resume")
+    created = vehicle_service.create_statuses(db, _statuses(vehicle_id, datetime(2026, 2, 1), 250))
+
+    first = change_service.read_changes(db, cursor=cursor, limit=100)
+    assert len(first["statuses"]) == 100
+    assert first["has_more"]
+    rest, _, _ = _drain(db, cursor=first["next_cursor"], limit=70)
+    ids = [row.id for row in first["statuses"] + rest if row.vehicle_id == vehicle_id]
+    assert ids == sorted(status.id for status in created)
+
+
+def test_future_dated_statuses_do_not_stall_the_feed(db, monkeypatch):
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0.0)
+    _, _, cursor = _drain(db)
+    vehicle_id = _new_vehicle(db, "future")
+    # Horloge du boîtier en avance : seule l'heure d'insertion compte
+    future = vehicle_service.create_statuses(db, _statuses(vehicle_id, datetime.utcnow() + timedelta(days=1), 2))
+    present = vehicle_service.create_status(db, vehicle_id, VehicleStatusCreate(battery_level=40.0))
+
+    statuses, _, next_cursor = _drain(db, cursor=cursor)
+    assert [row.id for row in statuses] == [future[0].id, future[1].id, present.id]
+    assert next_cursor != cursor
+    assert change_service.read_changes(db, cursor=next_cursor)["statuses"] == []
+
+
+def test_recent_rows_wait_for_the_settle_window(db, monkeypatch):
+    # Curseur après tous les statuts existants, même récents (autres tests)
+    settle = settings.CHANGES_SETTLE_SECONDS
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0.0)
+    _, _, cursor = _drain(db)
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", settle)
+    status = vehicle_service.create_status(db, 24, VehicleStatusCreate(battery_level=33.0))
+
+    page = change_service.read_changes(db, cursor=cursor)
+    assert page["statuses"] == []
+    assert page["next_cursor"] == cursor
+
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0.0)
+    page = change_service.read_changes(db, cursor=cursor)
+    assert [row.id for row in page["statuses"]] == [status.id]
+
+
+def test_recent_vehicle_changes_wait_for_the_settle_window(db, monkeypatch):
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0.0)
+    _, _, cursor = _drain(db)
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 3600.0)
+    vehicle_id = _new_vehicle(db, "settle")
+    # Heure d'insertion fixée par la base
+    change = db.query(VehicleChange).filter(VehicleChange.vehicle_id == vehicle_id).one()
+    assert abs(change.changed_at - datetime.utcnow()) < timedelta(minutes=1)
+    assert change_service.read_changes(db, cursor=cursor)["vehicles"] == []
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0.0)
+    assert [c.id for c in change_service.read_changes(db, cursor=cursor)["vehicles"]] == [change.id]
+
+
+def test_transaction_longer_than_the_settle_window_is_not_skipped(db, monkeypatch):
+    """
+    Limite documentée (`settle_horizon`) : SQLite sérialise les écritures,
+    aucun id plus grand ne peut être validé pendant la transaction longue ;
+    le curseur l'attend donc, quelle que soit sa durée.
+    """
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0.0)
+    _, _, cursor = _drain(db)
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0.1)
+    slow = SessionLocal()
+    try:
+        row = VehicleStatus(vehicle_id=24, timestamp=datetime.utcnow(), battery_level=12.0, doors_locked=True)
+        slow.add(row)
+        slow.flush()  # id alloué, transaction ouverte
+        time.sleep(0.3)
+        page = change_service.read_changes(db, cursor=cursor)
+        assert page["statuses"] == [] and page["next_cursor"] == cursor
+        db.rollback()
+        slow.commit()
+        status_id = row.id
+    finally:
+        slow.close()
+    time.sleep(0.2)
+    assert [r.id for r in change_service.read_changes(db, cursor=cursor)["statuses"]] == [status_id]
+
+
+def test_postgres_insert_times_and_horizon_follow_in_flight_writes():
+    dialect = postgresql.dialect()
+    # Heure de l'instruction, pas du début de la transaction
+    for table in (VehicleStatus.__table__, VehicleChange.__table__):
+        ddl = str(CreateTable(table).compile(dialect=dialect))
+        assert "DEFAULT TIMEZONE('utc', clock_timestamp())" in ddl
+        assert "CURRENT_TIMESTAMP" not in ddl
+    # Horizon reculé au début de la plus ancienne écriture en cours
+    horizon = str(change_service.SETTLE_NOW.compile(dialect=dialect))
+    assert "LEAST(TIMEZONE('utc', clock_timestamp())" in horizon
+    assert "min(xact_start)) FROM pg_stat_activity" in horizon
+    assert "backend_xid IS NOT NULL" in horizon
+
+
+def test_vehicle_creation_and_deletion_are_logged(db, monkeypatch):
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0.0)
+    _, _, cursor = _drain(db)
+    vehicle = vehicle_service.create_vehicle(db, VehicleCreate(external_id="feed-new", name="feed", vin="FEEDNEW"))
+    vehicle_id = vehicle.id
+    vehicle_service.delete_vehicle(db, vehicle)
+
+    _, vehicles, _ = _drain(db, cursor=cursor)
+    assert [(change.vehicle_id, change.op) for change in vehicles] == [(vehicle_id, "created"), (vehicle_id, "deleted")]
+    # Le véhicule supprimé n'est plus joint
+    assert vehicles[0].vehicle is None
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get(f"{API}/changes", params={"cursor": "bm90LWpzb24"})
+    assert response.status_code == 400
+    with pytest.raises(change_service.InvalidCursorError):
+        change_service.decode_cursor("e30")  # {}
+
+
+def test_feed_reads_primary_key_ranges(db, statements):
+    cursor = change_service.read_changes(db, limit=10)["next_cursor"]
+    with statements() as log:
+        change_service.read_changes(db, cursor=cursor, limit=10)
+    plans = [explain(sql, params) for sql, params, _ in log.statements]
+    assert len(plans) == 2
+    assert any("SEARCH vehicle_status USING INTEGER PRIMARY KEY (rowid>?)" in step for step in plans[0])
+    assert any("SEARCH vehicle_changes USING INTEGER PRIMARY KEY (rowid>?)" in step for step in plans[1])
+    for plan in plans:
+        assert not any("TEMP B-TREE" in step for step in plan), plan
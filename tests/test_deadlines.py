@@ -0,0 +1,133 @@
+# tests/test_deadlines.py
+"""
+Deadlines de bout en bout : budget lu dans l'en-tête et plafonné,
+propagé à la transaction (progress handler SQLite, statement_timeout
+Postgres), 504 à l'expiration, annulation à la déconnexion du client.
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.deadlines import Deadline, deadline_from_header
+from app.db.session import _apply_deadline
+from app.main import app
+from app.services import vehicles as vehicle_service
+
+API = "/api/v1"
+
+# Requête sans fin : seule l'interruption par la deadline l'arrête
+ENDLESS = text("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n")
+
+
+def _endless_get_vehicle(seen):
+    def get_vehicle(db, vehicle_id):
+        seen.append(db.info["deadline"])
+        db.execute(ENDLESS)
+
+    return get_vehicle
+
+
+def test_budget_from_header_is_clamped(monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_DEADLINE_MS", 30000)
+    monkeypatch.setattr(settings, "REQUEST_DEADLINE_MAX_MS", 2000)
+
+    def budget(raw):
+        deadline = deadline_from_header(raw)
+        return None if deadline is None else round(deadline.remaining(), 1)
+
+    assert budget("500") == 0.5
+    # Au-delà du plafond, nul, négatif ou sans en-tête valide : plafonné
+    assert budget("999999999") == budget("0") == budget("-5") == 2.0
+    assert budget("abc") == budget(None) == 2.0
+
+    monkeypatch.setattr(settings, "REQUEST_DEADLINE_MAX_MS", 0)
+    assert budget("abc") == 30.0
+    assert budget("45000") == 45.0  # sans plafond, l'en-tête peut dépasser le défaut
+    monkeypatch.setattr(settings, "REQUEST_DEADLINE_MS", 0)
+    assert budget(None) is None
+
+
+def test_exceeded_deadline_interrupts_sql_and_returns_504(client, monkeypatch):
+    seen = []
+    monkeypatch.setattr(vehicle_service, "get_vehicle", _endless_get_vehicle(seen))
+    started = time.monotonic()
+    response = client.get(f"{API}/vehicles/1", headers={"X-Request-Timeout-Ms": "100"})
+    assert response.status_code == 504
+    assert response.json() == {"detail": "Request deadline exceeded"}
+    assert time.monotonic() - started < 5
+    assert seen[0].exhausted() and not seen[0].cancelled
+
+    # La connexion rendue au pool n'emporte pas le progress handler
+    monkeypatch.undo()
+    assert client.get(f"{API}/vehicles/1").status_code == 200
+
+
+def test_header_cannot_exceed_configured_maximum(client, monkeypatch):
+    seen = []
+    monkeypatch.setattr(vehicle_service, "get_vehicle", _endless_get_vehicle(seen))
+    monkeypatch.setattr(settings, "REQUEST_DEADLINE_MAX_MS", 200)
+    started = time.monotonic()
+    response = client.get(f"{API}/vehicles/1", headers={"X-Request-Timeout-Ms": "3600000"})
+    assert response.status_code == 504
+    assert time.monotonic() - started < 5
+
+
+def test_deadline_spent_before_first_query_returns_504(client, monkeypatch):
+    def get_vehicle(db, vehicle_id):
+        time.sleep(0.15)
+        db.execute(text("SELECT 1"))
+
+    monkeypatch.setattr(vehicle_service, "get_vehicle", get_vehicle)
+    response = client.get(f"{API}/vehicles/1", headers={"X-Request-Timeout-Ms": "100"})
+    assert response.status_code == 504
+
+
+def test_postgres_transaction_gets_statement_timeout():
+    executed = []
+    connection = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"), exec_driver_sql=executed.append)
+    session = SimpleNamespace(info={"deadline": Deadline(2.0)})
+    _apply_deadline(session, None, connection)
+    assert len(executed) == 1
+    prefix, timeout_ms = executed[0].rsplit(" ", 1)
+    assert prefix == "SET LOCAL statement_timeout ="
+    assert 1900 < int(timeout_ms) <= 2000
+
+    # Pas de deadline : transaction inchangée
+    _apply_deadline(SimpleNamespace(info={}), None, connection)
+    assert len(executed) == 1
+
+
+def test_client_disconnect_cancels_running_query(monkeypatch):
+    seen = []
+    monkeypatch.setattr(vehicle_service, "get_vehicle", _endless_get_vehicle(seen))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": f"{API}/vehicles/1", "raw_path": f"{API}/vehicles/1".encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"test"), (b"x-request-timeout-ms", b"60000")],
+        "client": ("10.0.0.1", 1234), "server": ("test", 80),
+    }
+    sent = []
+
+    async def scenario():
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.sleep(0.2)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        await asyncio.wait_for(app(scope, receive, send), timeout=10)
+
+    started = time.monotonic()
+    asyncio.run(scenario())
+    # Déconnexion bien avant les 60 s de budget : la requête SQL s'arrête
+    assert time.monotonic() - started < 5
+    assert seen[0].cancelled
+    assert sent[0]["status"] == 504
@@ -0,0 +1,114 @@
+# tests/test_downsampling.py
+"""
+Sous-échantillonnage LTTB : identité avec l'algorithme de référence (qui
+charge toute la série), conservation des pics, enveloppe bornée et API.
+Véhicule réservé : 38.
+"""
+import math
+import random
+from datetime import timedelta
+
+from app.services import downsampling
+from app.services import vehicles as vehicle_service
+
+from conftest import SEED_START, SEED_STATUSES_PER_VEHICLE
+
+API = "/api/v1"
+
+
+def _reference_lttb(data, n):
+    """
+    LTTB classique, série entière en mémoire.
+    """
+    total = len(data)
+    if total <= n:
+        return list(data)
+    every = (total - 2) / (n - 2)
+    out, a = [data[0]], 0
+    for i in range(n - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1 if i < n - 3 else total - 1
+        next_start, next_end = (end, min(int((i + 2) * every) + 1, total)) if i < n - 3 else (total - 1, total)
+        cx = sum(p[0] for p in data[next_start:next_end]) / (next_end - next_start)
+        cy = sum(p[1] for p in data[next_start:next_end]) / (next_end - next_start)
+        ax, ay = data[a][0], data[a][1]
+        areas = [abs((data[j][0] - ax) * (cy - ay) - (cx - ax) * (data[j][1] - ay)) for j in range(start, end)]
+        a = start + areas.index(max(areas))
+        out.append(data[a])
+    out.append(data[-1])
+    return out
+
+
+def test_streaming_lttb_matches_reference():
+    rng = random.Random(48)
+    for _ in range(200):
+        total, n = rng.randint(3, 2000), rng.randint(3, 150)
+        x, data = 0.0, []
+        for k in range(total):
+            x += rng.choice([1, 1, 2, 5])
+            y = rng.choice([rng.random() * 100, math.sin(k / 30) * 50, float(rng.randint(0, 5))])
+            data.append((x, y, k))
+        streamed = list(downsampling.lttb(iter(data), total, n))
+        assert [p[2] for p in streamed] == [p[2] for p in _reference_lttb(data, n)]
+        assert len(streamed) == min(total, n)
+
+
+def test_peaks_and_troughs_survive():
+    # Plateau avec un pic et un creux d'un seul point chacun
+    data = [(float(k), 50.0, k) for k in range(10000)]
+    data[3333] = (3333.0, 99.0, 3333)
+    data[6666] = (6666.0, 1.0, 6666)
+    values = [p[1] for p in downsampling.lttb(iter(data), len(data), 20)]
+    assert max(values) == 99.0 and min(values) == 1.0
+
+
+def test_buckets_only_keep_their_convex_hull():
+    rng = random.Random(0)
+    bucket = downsampling._Bucket()
+    for k in range(100000):
+        bucket.add((float(k), rng.random(), k))
+    assert bucket.count == 100000
+    assert len(bucket.lower) + len(bucket.upper) < 200
+
+
+def test_downsample_endpoint(client):
+    response = client.get(f"{API}/vehicles/1/statuses/downsample", params={"points": 20})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["source_points"] == SEED_STATUSES_PER_VEHICLE
+    assert len(body["points"]) == 20
+    timestamps = [p["timestamp"] for p in body["points"]]
+    assert timestamps == sorted(timestamps)
+    assert timestamps[0] == SEED_START.isoformat()
+    assert timestamps[-1] == (SEED_START + timedelta(minutes=SEED_STATUSES_PER_VEHICLE - 1)).isoformat()
+
+    response = client.get(f"{API}/vehicles/1/statuses/downsample", params={
+        "field": "odometer_km", "points": 500, "since": (SEED_START + timedelta(minutes=150)).isoformat(),
+    })
+    assert [p["value"] for p in response.json()["points"]] == [1000.0 + k for k in range(150, SEED_STATUSES_PER_VEHICLE)]
+
+    assert client.get(f"{API}/vehicles/1/statuses/downsample", params={"points": 2}).status_code == 422
+    assert client.get(f"{API}/vehicles/1/statuses/downsample", params={"field": "latitude"}).status_code == 422
+    assert client.get(f"{API}/vehicles/100000/statuses/downsample").status_code == 404
+
+
+def test_statuses_without_the_field_are_skipped(db, client):
+    start = SEED_START + timedelta(days=30)
+    rows = [
+        {
+            "vehicle_id": 38,
+            "timestamp": start + timedelta(minutes=k),
+            "battery_level": None if k % 2 else 80.0 - (30.0 if k == 500 else 0.0),
+            "doors_locked": True,
+            "odometer_km": None,
+            "latitude": None,
+            "longitude": None,
+        }
+        for k in range(1000)
+    ]
+    vehicle_service.create_statuses(db, rows)
+    response = client.get(f"{API}/vehicles/38/statuses/downsample", params={"points": 10, "since": start.isoformat()})
+    body = response.json()
+    assert body["source_points"] == 500
+    assert len(body["points"]) == 10
+    assert 50.0 in [p["value"] for p in body["points"]]
@@ -0,0 +1,62 @@
+# tests/test_fieldsets.py
+"""
+Sparse fieldsets (`?fields=`) : seuls les champs demandés sont renvoyés
+et sélectionnés en SQL, un champ inconnu est refusé (422).
+"""
+import re
+
+import pytest
+
+API = "/api/v1"
+
+
+def _selected_columns(log, table):
+    """
+    Colonnes des SELECT capturés qui lisent `table`.
+    """
+    selects = []
+    for sql, _, _ in log.statements:
+        match = re.match(r"SELECT (.*?)\s+FROM (\w+)", sql, re.S)
+        if match and match.group(2) == table:
+            selects.append([column.strip() for column in match.group(1).split(",")])
+    return selects
+
+
+def test_statuses_return_only_requested_fields(client):
+    rows = client.get(f"{API}/vehicles/3/statuses", params={"fields": "battery_level, timestamp,battery_level"}).json()
+    assert len(rows) > 0
+    # Dans l'ordre demandé, sans doublon
+    assert all(list(row) == ["battery_level", "timestamp"] for row in rows)
+    full = client.get(f"{API}/vehicles/3/statuses").json()
+    assert rows == [{"battery_level": row["battery_level"], "timestamp": row["timestamp"]} for row in full]
+
+
+def test_vehicles_return_only_requested_fields(client):
+    response = client.get(f"{API}/vehicles", params={"fields": "vin", "limit": 3})
+    assert [list(item) for item in response.json()] == [["vin"]] * 3
+    # L'id du curseur est lu mais pas renvoyé
+    assert response.headers["X-Next-Cursor"].isdigit()
+
+
+def test_only_requested_columns_are_selected(client, statements):
+    with statements() as log:
+        assert client.get(f"{API}/vehicles/3/statuses", params={"fields": "timestamp,battery_level"}).status_code == 200
+    assert _selected_columns(log, "vehicle_status") == [["vehicle_status.timestamp", "vehicle_status.battery_level"]]
+
+    with statements() as log:
+        client.get(f"{API}/vehicles/3/statuses")
+    # Sans fieldset : l'entité complète
+    assert len(_selected_columns(log, "vehicle_status")[0]) > 2
+
+    with statements() as log:
+        assert client.get(f"{API}/vehicles", params={"fields": "vin,name", "limit": 3}).status_code == 200
+    # Plus l'id, nécessaire au curseur de page
+    assert _selected_columns(log, "vehicles") == [["vehicles.vin", "vehicles.name", "vehicles.id"]]
+
+
+@pytest.mark.parametrize("path", ["/vehicles", "/vehicles/3/statuses"])
+@pytest.mark.parametrize("fields", ["id,unknown", "password", "timestamp;id", "Id"])
+def test_unknown_fields_are_rejected(client, path, fields):
+    response = client.get(f"{API}{path}", params={"fields": fields})
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith("Unknown field '")
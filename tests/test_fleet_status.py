@@ -0,0 +1,39 @@
+# tests/test_fleet_status.py
+"""
+Dernier statut de chaque véhicule (`GET /fleet/status/latest`) : même
+résultat que la lecture véhicule par véhicule, ex aequo et historique
+rattrapé compris.
+"""
+from datetime import datetime, timedelta
+
+from app.schemas.vehicle import VehicleCreate
+from app.services import vehicles as vehicle_service
+
+API = "/api/v1"
+START = datetime(2026, 7, 1, 12, 0)
+
+
+def _status(vehicle_id, minutes):
+    return {
+        "vehicle_id": vehicle_id, "timestamp": START + timedelta(minutes=minutes), "battery_level": 50.0,
+        "doors_locked": True, "odometer_km": None, "latitude": None, "longitude": None,
+    }
+
+
+def test_latest_status_of_every_vehicle(client, db):
+    name = f"fleet-latest-{datetime.utcnow().timestamp()}"
+    vehicle_id = vehicle_service.create_vehicle(db, VehicleCreate(external_id=name, name=name, vin=name)).id
+    # Deux statuts ex aequo, puis un statut plus ancien reçu en retard
+    tied = vehicle_service.create_statuses(db, [_status(vehicle_id, 5), _status(vehicle_id, 5)])
+    vehicle_service.create_statuses(db, [_status(vehicle_id, 1)])
+    # Véhicule sans statut : absent
+    name = f"{name}-empty"
+    empty_id = vehicle_service.create_vehicle(db, VehicleCreate(external_id=name, name=name, vin=name)).id
+
+    body = client.get(f"{API}/fleet/status/latest").json()
+    assert [item["vehicle_id"] for item in body] == sorted(item["vehicle_id"] for item in body)
+    latest = {item["vehicle_id"]: item["id"] for item in body}
+    assert latest[vehicle_id] == tied[-1].id
+    assert empty_id not in latest
+    for vid in (1, 25, 50, vehicle_id):
+        assert latest[vid] == vehicle_service.get_latest_status(db, vid).id
@@ -0,0 +1,104 @@
+# tests/test_fleet_summary.py
+"""
+Totaux de la flotte : compteurs incrémentaux identiques à un recalcul
+complet après chaque écriture, lecture sans requête SQL, notifications
+rejouées après une réconciliation. Véhicules réservés : 39-40.
+"""
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.schemas.vehicle import VehicleStatusCreate
+from app.services import fleet_summary
+from app.services import vehicles as vehicle_service
+from app.services.fleet_summary import fleet_counters
+
+API = "/api/v1"
+
+
+def _fresh(db):
+    """
+    Totaux recalculés depuis la DB, sans la date de réconciliation.
+    """
+    return fleet_summary._FleetState.load(db).summary(datetime.utcnow(), None).model_dump(exclude={"reconciled_at"})
+
+
+def _summary(client, statements):
+    with statements() as log:
+        response = client.get(f"{API}/fleet/summary")
+    assert response.status_code == 200, response.text
+    assert len(log) == 0
+    body = response.json()
+    del body["reconciled_at"]
+    return body
+
+
+def test_counters_follow_writes(db, client, statements):
+    fleet_counters.reconcile(db)
+    before = _summary(client, statements)
+    assert before == _fresh(db)
+    assert sum(b["vehicles"] for b in before["battery_histogram"]) + before["battery_unknown"] == before["reporting_vehicles"]
+
+    vehicle_id = client.post(f"{API}/vehicles", json={"external_id": "fleet-new", "name": "fleet", "vin": "FLEETNEW"}).json()["id"]
+    after = _summary(client, statements)
+    assert (after["vehicles"], after["active_vehicles"]) == (before["vehicles"] + 1, before["active_vehicles"] + 1)
+    assert after["reporting_vehicles"] == before["reporting_vehicles"]
+
+    vehicle_service.create_status(db, 39, VehicleStatusCreate(battery_level=15.0, doors_locked=False))
+    now = datetime.utcnow()
+    vehicle_service.create_statuses(db, [
+        {"vehicle_id": vehicle_id, "timestamp": now - timedelta(minutes=k), "battery_level": level,
+         "doors_locked": True, "odometer_km": None, "latitude": None, "longitude": None}
+        for k, level in ((5, None), (90, 99.0))
+    ])
+    after = _summary(client, statements)
+    assert after == _fresh(db)
+    assert after["reporting_vehicles"] == before["reporting_vehicles"] + 1
+    assert after["reported_last_hour"] == before["reported_last_hour"] + 2
+    assert after["battery_unknown"] == before["battery_unknown"] + 1
+
+    # Statut plus ancien que le dernier connu : sans effet
+    vehicle_service.create_statuses(db, [
+        {"vehicle_id": 39, "timestamp": now - timedelta(days=1), "battery_level": 50.0,
+         "doors_locked": True, "odometer_km": None, "latitude": None, "longitude": None}
+    ])
+    assert _summary(client, statements) == after
+
+    # Purge partielle (dernier statut conservé), puis totale
+    assert client.delete(f"{API}/vehicles/40/statuses", params={"before": "2026-01-01T01:00:00"}).status_code == 200
+    assert _summary(client, statements) == after
+    assert client.delete(f"{API}/vehicles/40/statuses").status_code == 200
+    after = _summary(client, statements)
+    assert after == _fresh(db)
+    assert after["reporting_vehicles"] == before["reporting_vehicles"]
+
+    assert client.delete(f"{API}/vehicles/{vehicle_id}").status_code == 204
+    after = _summary(client, statements)
+    assert after == _fresh(db)
+    assert after["vehicles"] == before["vehicles"]
+
+
+def test_writes_during_reconciliation_are_replayed(db, monkeypatch):
+    load = fleet_summary._FleetState.load
+
+    def load_then_write(session):
+        # Écriture validée après la lecture de la DB, avant la substitution
+        state = load(session)
+        vehicle_service.create_status(db, 39, VehicleStatusCreate(battery_level=2.0, doors_locked=True))
+        return state
+
+    monkeypatch.setattr(fleet_summary._FleetState, "load", staticmethod(load_then_write))
+    fleet_counters.reconcile(db)
+    monkeypatch.undo()
+
+    summary = fleet_counters.summary(db).model_dump(exclude={"reconciled_at"})
+    assert summary == _fresh(db)
+    assert fleet_counters._state.entries[39].battery_bucket == 0
+
+
+def test_computed_on_demand_when_disabled(client, statements, monkeypatch):
+    monkeypatch.setattr(settings, "FLEET_SUMMARY_ENABLED", False)
+    with statements() as log:
+        body = client.get(f"{API}/fleet/summary").json()
+    assert len(log) == 2
+    assert body["reconciled_at"] is None
+    assert body["vehicles"] >= 40
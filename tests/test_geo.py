@@ -0,0 +1,163 @@
+# tests/test_geo.py
+"""
+Recherches géographiques (`list_vehicles_within`, `list_nearest_vehicles`)
+comparées à un parcours exhaustif des positions : points sur les bords de
+cellules geohash, rectangle traversant l'antiméridien, ordre des plus
+proches, positions qui changent de cellule et statuts reçus en retard.
+"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.models.vehicle_position import VehiclePosition
+from app.schemas.vehicle import VehicleCreate
+from app.services import geohash
+from app.services import vehicles as vehicle_service
+
+API = "/api/v1"
+START = datetime(2026, 9, 15, 10, 0)
+
+
+def _vehicle(db):
+    name = f"geo-{datetime.utcnow().timestamp()}"
+    return vehicle_service.create_vehicle(db, VehicleCreate(external_id=name, name=name, vin=name)).id
+
+
+def _locate(db, vehicle_id, latitude, longitude, minutes=0):
+    vehicle_service.create_statuses(db, [{
+        "vehicle_id": vehicle_id, "timestamp": START + timedelta(minutes=minutes), "battery_level": 50.0,
+        "doors_locked": True, "odometer_km": None, "latitude": latitude, "longitude": longitude,
+    }])
+
+
+def _place(db, points):
+    """
+    Un véhicule neuf par point : {vehicle_id: (lat, lon)}.
+    """
+    placed = {}
+    for latitude, longitude in points:
+        vehicle_id = _vehicle(db)
+        _locate(db, vehicle_id, latitude, longitude)
+        placed[vehicle_id] = (latitude, longitude)
+    return placed
+
+
+def _brute_force_within(db, bbox):
+    inside = set()
+    for p in db.scalars(select(VehiclePosition)):
+        if not bbox.min_lat <= p.latitude <= bbox.max_lat:
+            continue
+        if bbox.min_lon <= bbox.max_lon:
+            ok = bbox.min_lon <= p.longitude <= bbox.max_lon
+        else:
+            ok = p.longitude >= bbox.min_lon or p.longitude <= bbox.max_lon
+        if ok:
+            inside.add(p.vehicle_id)
+    return inside
+
+
+def _within(db, bbox):
+    positions = vehicle_service.list_vehicles_within(db, bbox, limit=settings.VEHICLE_PAGE_MAX_LIMIT)
+    ids = [p.vehicle_id for p in positions]
+    assert len(ids) == len(set(ids))
+    return set(ids)
+
+
+@pytest.mark.parametrize("max_cells", [1, 4, 32])
+def test_points_on_cell_edges(db, monkeypatch, max_cells):
+    monkeypatch.setattr(settings, "GEO_MAX_CELLS", max_cells)
+    # Rectangle calé sur la grille : ses bords sont des bords de cellules
+    height, width = geohash.cell_size(5)
+    lat0 = -90.0 + int((-40.0 + 90.0) // height) * height
+    lon0 = -180.0 + int((-30.0 + 180.0) // width) * width
+    lat1, lon1 = lat0 + 2 * height, lon0 + 3 * width
+    inside = _place(db, [
+        (lat0, lon0), (lat1, lon1), (lat0, lon1), (lat1, lon0),  # coins
+        (lat0 + height, lon0 + width),  # coin intérieur de quatre cellules
+        (lat1, lon0 + 1.5 * width), (lat0 + height / 2, lon1),  # milieux de bords
+    ])
+    outside = _place(db, [
+        (lat1 + 1e-9, lon0), (lat0 - 1e-9, lon1), (lat0, lon0 - 1e-9), (lat1, lon1 + 1e-9),
+        (lat1 + height, lon0 + width),
+    ])
+
+    bbox = geohash.BBox(lon0, lat0, lon1, lat1)
+    found = _within(db, bbox)
+    assert set(inside) <= found
+    assert not set(outside) & found
+    assert found == _brute_force_within(db, bbox)
+
+
+def test_bbox_crossing_the_antimeridian(client, db):
+    inside = _place(db, [
+        (-19.5, 179.7), (-19.5, -179.8), (-20.0, 180.0), (-19.0, -180.0), (-19.25, 179.5), (-19.75, -179.5),
+    ])
+    outside = _place(db, [(-19.5, 179.4), (-19.5, -179.4), (-18.9, 179.9), (-20.1, -179.9), (-19.5, 0.0)])
+
+    bbox = geohash.BBox(179.5, -20.0, -179.5, -19.0)
+    found = _within(db, bbox)
+    assert set(inside) <= found
+    assert not set(outside) & found
+    assert found == _brute_force_within(db, bbox)
+
+    response = client.get(f"{API}/vehicles/within", params={"bbox": "179.5,-20,-179.5,-19"})
+    assert response.status_code == 200
+    assert {item["vehicle_id"] for item in response.json()} == found
+
+
+@pytest.mark.parametrize("latitude, longitude", [(-45.0, 100.0), (-60.0, 179.95)])
+def test_nearest_matches_brute_force(client, db, latitude, longitude):
+    rng = random.Random(f"{latitude},{longitude}")
+    points = []
+    for _ in range(25):
+        # Distances réparties de quelques mètres à quelques centaines de km
+        spread = rng.choice((0.0001, 0.01, 0.3, 3.0))
+        lon = longitude + rng.uniform(-spread, spread)
+        points.append((latitude + rng.uniform(-spread, spread), lon - 360.0 if lon > 180.0 else lon))
+    points.append(points[0])  # à égale distance : départagés par vehicle_id
+    _place(db, points)
+
+    ranked = sorted(
+        (geohash.haversine_km(latitude, longitude, p.latitude, p.longitude), p.vehicle_id)
+        for p in db.scalars(select(VehiclePosition))
+    )
+    for n in (1, 5, 26, 40):
+        nearest = vehicle_service.list_nearest_vehicles(db, latitude, longitude, n)
+        assert [p.vehicle_id for p in nearest] == [vehicle_id for _, vehicle_id in ranked[:n]]
+        assert [p.distance_km for p in nearest] == pytest.approx([distance for distance, _ in ranked[:n]])
+
+    body = client.get(f"{API}/vehicles/nearest", params={"lat": latitude, "lon": longitude, "n": 10}).json()
+    assert [item["vehicle_id"] for item in body] == [vehicle_id for _, vehicle_id in ranked[:10]]
+
+
+def test_position_moves_between_cells_and_ignores_late_statuses(db):
+    vehicle_id = _vehicle(db)
+    first, second = (-33.0, 18.0), (-34.0, 19.0)
+    first_box = geohash.BBox(17.99, -33.01, 18.01, -32.99)
+    second_box = geohash.BBox(18.99, -34.01, 19.01, -33.99)
+
+    _locate(db, vehicle_id, *first, minutes=10)
+    assert vehicle_id in _within(db, first_box)
+    assert vehicle_id not in _within(db, second_box)
+
+    # Statut plus récent : la position change de cellule
+    _locate(db, vehicle_id, *second, minutes=20)
+    assert vehicle_id not in _within(db, first_box)
+    assert vehicle_id in _within(db, second_box)
+    assert vehicle_service.list_nearest_vehicles(db, *second, 1)[0].vehicle_id == vehicle_id
+
+    # Statuts plus anciens reçus en retard : ignorés
+    _locate(db, vehicle_id, *first, minutes=15)
+    _locate(db, vehicle_id, *first, minutes=5)
+    assert vehicle_id not in _within(db, first_box)
+    assert vehicle_id in _within(db, second_box)
+    position = db.get(VehiclePosition, vehicle_id)
+    db.refresh(position)
+    assert (position.latitude, position.longitude, position.timestamp) == (*second, START + timedelta(minutes=20))
+    assert position.geohash == geohash.encode(*second, settings.GEOHASH_PRECISION)
+    # Classé à la distance de sa dernière position
+    nearest = {p.vehicle_id: p.distance_km for p in vehicle_service.list_nearest_vehicles(db, *first, 5)}
+    assert nearest[vehicle_id] == pytest.approx(geohash.haversine_km(*first, *second))
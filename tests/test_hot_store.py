@@ -0,0 +1,149 @@
+# tests/test_hot_store.py
+"""
+Stockage chaud : couverture des tampons (préchauffage, évictions,
+véhicules apparus ensuite), éviction LRU des véhicules, et détection des
+écritures des autres workers par le compteur d'insertions de la table
+partagée.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services import hot_store as hot_store_module
+from app.services import vehicles as vehicle_service
+from app.services.hot_store import HotStore, _BYTES_PER_SAMPLE, _RING_OVERHEAD
+from app.services.latest_status_table import LatestStatus, LatestStatusTable
+from conftest import SEED_START, SEED_STATUSES_PER_VEHICLE, SEED_VEHICLES
+
+START = datetime(2026, 6, 1)
+NEW_VEHICLE = 900001
+
+
+def _status(vehicle_id, k):
+    return LatestStatus(
+        id=vehicle_id * 1000 + k, vehicle_id=vehicle_id, timestamp=START + timedelta(minutes=k),
+        battery_level=float(k), doors_locked=True, odometer_km=float(k),
+    )
+
+
+def _insert(store, *statuses, table=None):
+    """
+    Insertion par un worker : compteur de la table partagée, puis tampon.
+    """
+    inserts = None if table is None else table.record_inserts(statuses[-1], len(statuses))
+    if store is not None:
+        store.record(list(statuses), inserts)
+
+
+def _ids(store, vehicle_id, since=None, order="asc", limit=100):
+    rows = store.query(vehicle_id, since=since, until=None, order=order, limit=limit)
+    return None if rows is None else [row.id for row in rows]
+
+
+def _minute(k):
+    return START + timedelta(minutes=k)
+
+
+@pytest.fixture
+def table(tmp_path, monkeypatch):
+    table = LatestStatusTable(str(tmp_path / "latest.bin"), slots=1024)
+    monkeypatch.setattr(hot_store_module, "latest_status_table", table)
+    yield table
+    table.close()
+
+
+def test_coverage_follows_evicted_statuses():
+    store = HotStore(capacity=3, memory_bytes=1 << 20)
+    v = NEW_VEHICLE
+    _insert(store, _status(v, 1), _status(v, 2))
+    # Avant le préchauffage : rien ne prouve qu'il n'y a pas plus ancien
+    assert _ids(store, v) is None
+    assert _ids(store, v, since=_minute(1)) is None
+    assert _ids(store, v, since=_minute(1) + timedelta(seconds=1)) == [v * 1000 + 2]
+
+    # Tampon plein : chaque statut écrasé remonte la couverture
+    for k in (3, 4, 5):
+        _insert(store, _status(v, k))
+    assert _ids(store, v, since=_minute(2)) is None
+    assert _ids(store, v, since=_minute(3)) == [v * 1000 + k for k in (3, 4, 5)]
+    assert _ids(store, v, since=_minute(3), order="desc", limit=2) == [v * 1000 + 5, v * 1000 + 4]
+    rows = store.query(v, since=_minute(4), until=_minute(5), order="asc", limit=10, fields=("id", "battery_level"))
+    assert [tuple(row) for row in rows] == [(v * 1000 + 4, 4.0)]
+    assert (store.hits, store.misses) == (4, 3)
+
+
+def test_warm_up_then_new_vehicles(db):
+    store = HotStore(capacity=5, memory_bytes=1 << 20)
+    assert store.warm(db) >= SEED_VEHICLES * 5
+    # Historique plus long que le tampon : seuls les 5 derniers statuts sont couverts
+    assert _ids(store, 3) is None
+    oldest = SEED_START + timedelta(minutes=SEED_STATUSES_PER_VEHICLE - 5)
+    # D'autres statuts peuvent partager le timestamp du plus ancien chargé
+    assert _ids(store, 3, since=oldest) is None
+    since = oldest + timedelta(minutes=1)
+    expected = [row.id for row in vehicle_service.list_statuses(db, 3, since=since, order="asc", limit=100)]
+    assert len(expected) == 4
+    assert _ids(store, 3, since=since) == expected
+
+    # Véhicule sans historique au préchauffage, un seul worker : tout est ici
+    _insert(store, _status(NEW_VEHICLE, 1))
+    assert _ids(store, NEW_VEHICLE) == [NEW_VEHICLE * 1000 + 1]
+
+
+def test_least_recently_used_vehicles_are_evicted():
+    store = HotStore(capacity=4, memory_bytes=2 * (4 * _BYTES_PER_SAMPLE + _RING_OVERHEAD))
+    assert store.max_vehicles == 2
+    store._warmed = True  # flotte vide au préchauffage
+    a, b, c = NEW_VEHICLE, NEW_VEHICLE + 1, NEW_VEHICLE + 2
+    _insert(store, _status(a, 1))
+    _insert(store, _status(b, 1))
+    assert _ids(store, a) == [a * 1000 + 1]  # `a` devient le plus récemment utilisé
+    _insert(store, _status(c, 1))
+    assert store.stats()["vehicles"] == 2
+    assert _ids(store, b) is None
+    assert _ids(store, a) == [a * 1000 + 1]
+
+    # Revenu après éviction : son historique antérieur n'est plus couvert
+    _insert(store, _status(b, 2))
+    _insert(store, _status(b, 3))
+    assert _ids(store, b) is None
+    assert _ids(store, b, since=_minute(2)) is None
+    assert _ids(store, b, since=_minute(3)) == [b * 1000 + 3]
+    assert _ids(store, c) is None  # évincé à son tour
+
+
+def test_writes_from_other_workers_are_detected(db, table):
+    first, second = HotStore(capacity=4, memory_bytes=1 << 20), HotStore(capacity=4, memory_bytes=1 << 20)
+    first.warm(db)
+    second.warm(db)
+    v = NEW_VEHICLE
+    recent = SEED_START + timedelta(minutes=SEED_STATUSES_PER_VEHICLE - 2)
+
+    _insert(first, _status(v, 1), table=table)
+    assert _ids(first, v) == [v * 1000 + 1]
+    # L'autre worker insère : son tampon ne couvre pas s1, celui du premier n'est plus complet
+    _insert(second, _status(v, 2), table=table)
+    assert _ids(second, v) is None
+    assert _ids(first, v) is None
+    # Nouvelle insertion du premier : jamais s1 et s3 sans s2
+    _insert(first, _status(v, 3), table=table)
+    _insert(first, _status(v, 4), table=table)
+    assert _ids(first, v) is None
+    assert _ids(first, v, since=_minute(1)) is None
+    assert _ids(first, v, since=_minute(4)) == [v * 1000 + 4]
+
+    # Préchauffage : compteurs lus avant la requête, tampons à jour
+    assert _ids(first, 3, since=recent) == _ids(second, 3, since=recent)
+    assert len(_ids(first, 3, since=recent)) == 2
+    # Insertion (même rattrapée) ou purge par un autre worker
+    _insert(second, LatestStatus(id=10 ** 9, vehicle_id=3, timestamp=SEED_START, battery_level=None,
+                                 doors_locked=True, odometer_km=None), table=table)
+    assert _ids(first, 3, since=recent) is None
+    assert _ids(second, 3, since=recent) is not None
+    table.invalidate(4)
+    assert _ids(first, 4, since=recent) is None
+    # Slot partagé avec un autre véhicule : retour (prudent) à la DB
+    _insert(None, _status(5 + table.slots, 1), table=table)
+    assert _ids(first, 5, since=recent) is None
+    assert _ids(first, 6, since=recent) is not None
+    assert first.stats()["stale"] == 4
@@ -0,0 +1,135 @@
+# tests/test_jobs.py
+"""
+Jobs de fond : export exécuté dans le pool de processus puis téléchargé,
+heartbeat et annulation pendant une unité longue, unités restantes
+annulées quand une unité échoue, un seul runner actif par dossier
+d'exports.
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.db.models.job import Job
+from app.schemas.job import JobCreate
+from app.services import jobs as job_service
+from app.services.jobs import JobRunner
+
+API = "/api/v1"
+
+
+def _runner(tmp_path, **overrides):
+    options = dict(max_workers=1, poll_seconds=0.05, heartbeat_seconds=0.05, lock_path=str(tmp_path / "runner.lock"))
+    options.update(overrides)
+    return JobRunner(**options)
+
+
+def test_export_runs_in_process_pool_and_downloads(client, tmp_path):
+    job_id = client.post(f"{API}/jobs", json={"kind": "export_statuses", "params": {"vehicle_ids": [2, 1]}}).json()["id"]
+    assert client.get(f"{API}/jobs/{job_id}/download").status_code == 409
+
+    runner = _runner(tmp_path)
+    try:
+        runner.run_job(job_id)
+    finally:
+        runner.stop()
+
+    job = client.get(f"{API}/jobs/{job_id}").json()
+    assert job["status"] == "succeeded", job["error"]
+    assert job["result"] == {"download_url": f"{API}/jobs/{job_id}/download", "rows": 400, "files": 2}
+
+    response = client.get(job["result"]["download_url"])
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == f'attachment; filename="job_{job_id}.jsonl"'
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 400
+    assert [row["vehicle_id"] for row in rows] == [1] * 200 + [2] * 200
+    assert all(a["timestamp"] < b["timestamp"] for a, b in zip(rows[:199], rows[1:200]))
+
+    assert client.get(f"{API}/jobs/999999/download").status_code == 404
+
+
+def test_heartbeat_and_cancel_during_a_long_unit(db, tmp_path, monkeypatch):
+    release = threading.Event()
+
+    def slow_unit(job_id, params, vehicle_ids):
+        release.wait(10)
+        return {"statuses": 0, "vehicles": len(vehicle_ids)}
+
+    monkeypatch.setitem(job_service.JOB_KINDS, "analytics_refresh", (slow_unit, job_service._merge_refresh))
+    job = job_service.create_job(db, JobCreate(kind="analytics_refresh", params={"vehicle_ids": [1]}))
+    job.status = job_service.JOB_RUNNING  # réclamé par ce runner
+    db.commit()
+    runner = _runner(tmp_path)
+    runner._executor = ThreadPoolExecutor(max_workers=1)
+    worker = threading.Thread(target=runner.run_job, args=(job.id,))
+    worker.start()
+    try:
+        # Le heartbeat avance alors que l'unique unité n'est pas terminée
+        beats = set()
+        deadline = time.monotonic() + 5
+        while len(beats) < 3 and time.monotonic() < deadline:
+            beats.add(db.get(Job, job.id).heartbeat_at)
+            beats.discard(None)
+            db.rollback()  # ne pas garder la base verrouillée en lecture
+            time.sleep(0.03)
+        assert len(beats) >= 3
+        assert db.get(Job, job.id).progress == 0
+        db.rollback()
+
+        # L'annulation est prise en compte sans attendre la fin de l'unité
+        job_service.cancel_job(db, job.id)
+        worker.join(timeout=5)
+        assert not worker.is_alive()
+        db.rollback()
+        assert db.get(Job, job.id).status == "cancelled"
+    finally:
+        release.set()
+        worker.join()
+        runner.stop()
+
+
+def test_failed_unit_cancels_the_pending_units(db, tmp_path, monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def unit(job_id, params, vehicle_ids):
+        calls.append(vehicle_ids)
+        if vehicle_ids == [1]:
+            raise RuntimeError("unit failed")
+        release.wait(10)  # occupe l'unique thread du pool
+        return {"statuses": 0, "vehicles": len(vehicle_ids)}
+
+    monkeypatch.setitem(job_service.JOB_KINDS, "analytics_refresh", (unit, job_service._merge_refresh))
+    monkeypatch.setattr(job_service.settings, "JOBS_CHUNK_SIZE", 1)
+    job = job_service.create_job(db, JobCreate(kind="analytics_refresh", params={"vehicle_ids": [1, 2, 3, 4]}))
+    job.status = job_service.JOB_RUNNING
+    db.commit()
+    # Quatre unités en vol pour un seul thread : 3 et 4 attendent dans le pool
+    runner = _runner(tmp_path, max_workers=2)
+    executor = runner._executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        runner.run_job(job.id)
+        db.expire_all()
+        failed = db.get(Job, job.id)
+        assert failed.status == "failed"
+        assert failed.error == "RuntimeError: unit failed"
+    finally:
+        release.set()
+        executor.shutdown(wait=True)
+        runner.stop()
+    # L'unité 2 a pu démarrer avant l'échec ; 3 et 4 n'ont jamais été lancées
+    assert calls in ([[1]], [[1], [2]])
+
+
+def test_single_active_runner_per_lock(tmp_path):
+    first, second = _runner(tmp_path), _runner(tmp_path)
+    assert first.acquire_lock()
+    assert first.acquire_lock()  # déjà détenteur
+    assert not second.acquire_lock()
+
+    # Le détenteur s'arrête : un autre runner prend le relais
+    first.stop()
+    assert second.acquire_lock()
+    second.stop()
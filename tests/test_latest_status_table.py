@@ -0,0 +1,159 @@
+# tests/test_latest_status_table.py
+"""
+Table partagée des derniers statuts : écritures « plus récent gagne »,
+collisions de slots, compteur d'insertions, seqlock, écrivains et
+lecteurs dans plusieurs processus, fichier propre à chaque format.
+"""
+import multiprocessing
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services import latest_status_table as lst
+from app.services.latest_status_table import LatestStatus, LatestStatusTable
+
+START = datetime(2026, 3, 1)
+
+
+def _status(vehicle_id, k, **overrides):
+    values = dict(
+        id=k, vehicle_id=vehicle_id, timestamp=START + timedelta(seconds=k),
+        battery_level=float(k), doors_locked=k % 2 == 0, odometer_km=float(k), latitude=None, longitude=None,
+    )
+    values.update(overrides)
+    return LatestStatus(**values)
+
+
+@pytest.fixture
+def table(tmp_path):
+    table = LatestStatusTable(str(tmp_path / "latest.bin"), slots=8)
+    yield table
+    table.close()
+
+
+def test_newest_status_wins(table):
+    assert table.get(3) is None
+    assert table.update(_status(3, 10))
+    assert table.get(3) == _status(3, 10)
+    # Plus ancien, ou identique : ignoré
+    assert not table.update(_status(3, 5))
+    assert not table.update(_status(3, 10, battery_level=1.0))
+    # Même timestamp, id plus grand : gagne
+    assert table.update(_status(3, 11, timestamp=START + timedelta(seconds=10)))
+    assert table.get(3).id == 11
+
+    table.invalidate(3)
+    assert table.get(3) is None
+
+
+def test_slot_collisions_fall_back(table):
+    # 3 et 11 partagent un slot (11 % 8 == 3) : le dernier écrit l'occupe
+    table.update(_status(3, 10))
+    table.update(_status(11, 1))
+    assert table.get(3) is None
+    assert table.get(11) == _status(11, 1)
+    # L'invalidation d'un autre véhicule ne vide pas le slot
+    table.invalidate(3)
+    assert table.get(11) == _status(11, 1)
+
+
+def test_insert_counter_tracks_every_write_to_a_slot(table):
+    assert table.inserts(3) == 0
+    # Statut lu en base : pas une insertion
+    table.update(_status(3, 10))
+    assert table.inserts(3) == 0
+    assert table.record_inserts(_status(3, 12), count=2) == 2
+    # Insertion plus ancienne (historique rattrapé) : comptée, slot inchangé
+    assert table.record_inserts(_status(3, 4)) == 3
+    assert table.get(3).id == 12
+
+    # Le compteur appartient au slot : jamais remis à zéro, même quand
+    # un autre véhicule le prend ou que le véhicule est invalidé
+    table.update(_status(11, 1))
+    assert table.inserts(3) == table.inserts(11) == 3
+    table.invalidate(3)
+    assert table.inserts(11) == 4 and table.get(11) == _status(11, 1)
+    table.invalidate(11)
+    assert table.get(11) is None
+    assert table.insert_counts()[3] == 5
+    assert table.record_inserts(_status(3, 20)) == 6
+
+
+def test_reader_retries_while_a_write_is_in_progress(table):
+    table.update(_status(4, 7))
+    off = table._offset(4)
+    seq = lst._SEQ.unpack_from(table._mm, off)[0]
+    lst._SEQ.pack_into(table._mm, off, seq + 1)  # écrivain arrêté au milieu d'une écriture
+    assert table.get(4) is None
+    lst._SEQ.pack_into(table._mm, off, seq + 2)
+    assert table.get(4) == _status(4, 7)
+
+
+def _write_many(path, slots, vehicle_ids, worker, rounds):
+    table = LatestStatusTable(path, slots=slots)
+    for k in range(rounds):
+        for vehicle_id in vehicle_ids:
+            # Ids entrelacés entre écrivains, timestamps croissants pour chacun
+            status_id = k * 10 + worker + 1
+            table.update(_status(vehicle_id, status_id, battery_level=float(status_id), odometer_km=float(status_id)))
+    table.close()
+
+
+def _read_many(path, slots, vehicle_ids, stop, torn):
+    table = LatestStatusTable(path, slots=slots)
+    while not stop.is_set():
+        for vehicle_id in vehicle_ids:
+            status = table.get(vehicle_id)
+            if status is not None and not (
+                status.battery_level == status.odometer_km == float(status.id)
+                and status.timestamp == START + timedelta(seconds=status.id)
+            ):
+                torn.value += 1
+    table.close()
+
+
+def test_writers_and_readers_in_several_processes(tmp_path):
+    path = str(tmp_path / "shared.bin")
+    vehicle_ids = list(range(1, 9))
+    ctx = multiprocessing.get_context("fork")
+    stop, torn = ctx.Event(), ctx.Value("i", 0)
+    reader = ctx.Process(target=_read_many, args=(path, 16, vehicle_ids, stop, torn))
+    reader.start()
+    writers = [ctx.Process(target=_write_many, args=(path, 16, vehicle_ids, worker, 300)) for worker in range(4)]
+    for process in writers:
+        process.start()
+    for process in writers:
+        process.join()
+        assert process.exitcode == 0
+    stop.set()
+    reader.join()
+
+    assert torn.value == 0
+    table = LatestStatusTable(path, slots=16)
+    # Le plus récent de tous les écrivains : dernier tour, dernier écrivain
+    assert {table.get(vehicle_id).id for vehicle_id in vehicle_ids} == {299 * 10 + 4}
+    table.close()
+
+
+def test_each_layout_has_its_own_file(tmp_path):
+    path = str(tmp_path / "latest.bin")
+    small = LatestStatusTable(path, slots=8)
+    small.update(_status(1, 5))
+    # Autre géométrie (ou version) : autre fichier, l'ancien mapping reste valide
+    large = LatestStatusTable(path, slots=32)
+    large.update(_status(1, 6))
+    assert small.path != large.path
+    assert small.get(1).id == 5 and large.get(1).id == 6
+    assert os.path.getsize(small.path) == small.size
+    assert f".v{lst._VERSION}-8.bin" in small.path
+
+    # Fichier étranger au chemin attendu : refusé, jamais tronqué
+    foreign = LatestStatusTable(str(tmp_path / "foreign.bin"), slots=8)
+    with open(foreign.path, "wb") as fh:
+        fh.write(b"x" * 100)
+    with pytest.raises(RuntimeError):
+        foreign.get(1)
+    assert os.path.getsize(foreign.path) == 100
+    small.close()
+    large.close()
@@ -0,0 +1,145 @@
+# tests/test_negotiation.py
+"""
+Négociation de contenu de l'historique des statuts : formats colonnaire
+et binaire, qualités de l'en-tête `Accept`, priorité de `?format=`, 406,
+`Vary: Accept` sur toutes les réponses et seuil de compression gzip.
+"""
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.schemas.vehicle import VehicleCreate
+from app.services import vehicles as vehicle_service
+from app.services.telemetry_formats import (
+    MEDIA_BINARY,
+    MEDIA_COLUMNAR,
+    MEDIA_JSON,
+    decode_binary,
+    to_epoch_ms,
+)
+
+API = "/api/v1"
+START = datetime(2026, 9, 1, 8, 0)
+
+
+@pytest.fixture
+def vehicle_id(db):
+    """
+    Véhicule neuf avec trois statuts, dont un sans niveau de batterie.
+    """
+    name = f"nego-{datetime.utcnow().timestamp()}"
+    vehicle_id = vehicle_service.create_vehicle(db, VehicleCreate(external_id=name, name=name, vin=name)).id
+    vehicle_service.create_statuses(db, [
+        {
+            "vehicle_id": vehicle_id, "timestamp": START + timedelta(minutes=k),
+            "battery_level": level, "doors_locked": k % 2 == 0, "odometer_km": 100.0 + k,
+            "latitude": None, "longitude": None,
+        }
+        for k, level in enumerate((80.0, None, 78.5))
+    ])
+    return vehicle_id
+
+
+def _get(client, vehicle_id, accept=None, **params):
+    headers = {} if accept is None else {"Accept": accept}
+    params.setdefault("order", "asc")
+    return client.get(f"{API}/vehicles/{vehicle_id}/statuses", params=params, headers=headers)
+
+
+def _media_type(response):
+    return response.headers["content-type"].split(";")[0]
+
+
+def test_columnar_shape(client, vehicle_id):
+    response = _get(client, vehicle_id, accept=MEDIA_COLUMNAR, fields="timestamp,battery_level,doors_locked")
+    assert response.status_code == 200
+    assert _media_type(response) == MEDIA_COLUMNAR
+    assert response.json() == {
+        "vehicle_id": vehicle_id,
+        "count": 3,
+        "timestamp": [to_epoch_ms(START + timedelta(minutes=k)) for k in range(3)],
+        "battery_level": [80.0, None, 78.5],
+        "doors_locked": [True, False, True],
+    }
+
+
+def test_binary_round_trip(client, vehicle_id):
+    response = _get(client, vehicle_id, accept=MEDIA_BINARY)
+    assert response.status_code == 200
+    assert _media_type(response) == MEDIA_BINARY
+    decoded = decode_binary(response.content)
+    expected = _get(client, vehicle_id).json()
+
+    assert decoded["vehicle_id"] == vehicle_id
+    assert decoded["count"] == 3
+    # vehicle_id sorti en scalaire, pas en colonne
+    assert list(decoded)[2:] == ["id", "timestamp", "battery_level", "doors_locked", "odometer_km", "latitude", "longitude"]
+    assert decoded["id"] == [row["id"] for row in expected]
+    assert decoded["timestamp"] == [to_epoch_ms(START + timedelta(minutes=k)) for k in range(3)]
+    assert decoded["doors_locked"] == [1, 0, 1]
+    assert decoded["odometer_km"] == [100.0, 101.0, 102.0]
+    # Valeurs absentes : NaN dans les colonnes flottantes
+    assert decoded["battery_level"][0] == 80.0 and decoded["battery_level"][2] == 78.5
+    assert math.isnan(decoded["battery_level"][1])
+    assert all(math.isnan(value) for value in decoded["latitude"] + decoded["longitude"])
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, MEDIA_JSON),
+    ("*/*", MEDIA_JSON),
+    (MEDIA_COLUMNAR, MEDIA_COLUMNAR),
+    (f"{MEDIA_JSON};q=0.5, {MEDIA_BINARY};q=0.8", MEDIA_BINARY),
+    (f"{MEDIA_BINARY};q=0.4, {MEDIA_COLUMNAR};q=0.9, */*;q=0.1", MEDIA_COLUMNAR),
+    (f"{MEDIA_COLUMNAR}, application/*", MEDIA_JSON),  # à égalité : JSON
+    (f"{MEDIA_JSON};q=0, */*", MEDIA_COLUMNAR),  # la plage la plus précise l'emporte
+    (f"text/html, {MEDIA_BINARY};q=0.3", MEDIA_BINARY),
+    (f"{MEDIA_BINARY};q=abc, {MEDIA_COLUMNAR};q=0.1", MEDIA_COLUMNAR),  # qualité illisible : 0
+])
+def test_accept_quality_values(client, vehicle_id, accept, expected):
+    response = _get(client, vehicle_id, accept=accept, limit=1)
+    assert response.status_code == 200
+    assert _media_type(response) == expected
+    assert response.headers["vary"].split(", ")[0] == "Accept"
+
+
+def test_format_parameter_overrides_accept(client, vehicle_id):
+    assert _media_type(_get(client, vehicle_id, accept=MEDIA_BINARY, format="json")) == MEDIA_JSON
+    assert _media_type(_get(client, vehicle_id, accept=MEDIA_JSON, format="COLUMNAR")) == MEDIA_COLUMNAR
+    # Y compris un Accept qui n'accepte rien de pris en charge
+    assert _media_type(_get(client, vehicle_id, accept="text/csv", format="binary")) == MEDIA_BINARY
+    assert _get(client, vehicle_id, format="csv").status_code == 400
+
+
+def test_not_acceptable(client, vehicle_id):
+    for accept in ("text/csv", f"{MEDIA_JSON};q=0, text/*", "*/*;q=0"):
+        response = _get(client, vehicle_id, accept=accept)
+        assert response.status_code == 406
+        assert MEDIA_COLUMNAR in response.json()["detail"]
+    # En-tête vide : JSON par défaut
+    assert _media_type(_get(client, vehicle_id, accept="")) == MEDIA_JSON
+
+
+def test_every_negotiated_response_varies_on_accept(client, vehicle_id):
+    for params in ({}, {"fields": "id,timestamp"}, {"format": "columnar"}, {"format": "binary"}):
+        response = _get(client, vehicle_id, **params)
+        assert response.status_code == 200
+        assert "Accept" in response.headers["vary"].split(", ")
+
+
+def test_gzip_only_above_minimum_size(client):
+    # Réponses non compressées de part et d'autre du seuil
+    small = _get(client, 1, limit=1, fields="id")
+    large = _get(client, 1, limit=200)
+    assert len(small.content) < settings.GZIP_MINIMUM_SIZE < len(large.content)
+    for response in (small, large):
+        assert response.request.headers["accept-encoding"].startswith("gzip")
+
+    assert "content-encoding" not in small.headers
+    assert large.headers["content-encoding"] == "gzip"
+    # Compression négociée : variation sur les deux en-têtes
+    assert large.headers["vary"] == "Accept, Accept-Encoding"
+    response = client.get(f"{API}/vehicles/1/statuses", params={"limit": 200, "order": "asc"}, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == large.json()
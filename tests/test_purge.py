@@ -0,0 +1,128 @@
+# tests/test_purge.py
+"""
+Purge de l'historique et suppression d'un véhicule : lots plus petits que
+l'historique, borne `before` exclue, données dérivées supprimées par la
+base (ON DELETE CASCADE) et relation `Vehicle.statuses` jamais chargée.
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.db.models.segments import ChargingSession, SegmentDetectorState, Trip
+from app.db.models.vehicle import Vehicle
+from app.db.models.vehicle_analytics import VehicleAnalytics, VehicleDailyDistance
+from app.db.models.vehicle_position import VehiclePosition
+from app.db.models.vehicle_status import VehicleStatus
+from app.schemas.vehicle import VehicleCreate
+from app.services import vehicles as vehicle_service
+from app.services.analytics import refresh_vehicle_analytics
+from app.services.segments import refresh_vehicle_segments
+
+API = "/api/v1"
+START = datetime(2026, 9, 20, 7, 0)
+
+
+def _vehicle(db, count):
+    """
+    Véhicule neuf avec `count` statuts géolocalisés, un par minute,
+    en trajet (odomètre croissant, batterie décroissante).
+    """
+    name = f"purge-{datetime.utcnow().timestamp()}"
+    vehicle_id = vehicle_service.create_vehicle(db, VehicleCreate(external_id=name, name=name, vin=name)).id
+    vehicle_service.create_statuses(db, [
+        {
+            "vehicle_id": vehicle_id, "timestamp": START + timedelta(minutes=k), "battery_level": 90.0 - k / 10,
+            "doors_locked": False, "odometer_km": 500.0 + k, "latitude": 45.0 + k / 1000, "longitude": 4.0,
+        }
+        for k in range(count)
+    ])
+    return vehicle_id
+
+
+def _count(db, model, vehicle_id):
+    return db.scalar(select(func.count()).select_from(model).where(model.vehicle_id == vehicle_id))
+
+
+def _deletes(log, table):
+    return [sql for sql, _, _ in log.statements if sql.startswith(f"DELETE FROM {table}")]
+
+
+@pytest.mark.parametrize("count, chunks", [(23, 5), (25, 6)])
+def test_purge_in_chunks_smaller_than_the_history(client, db, statements, monkeypatch, count, chunks):
+    monkeypatch.setattr(settings, "PURGE_CHUNK_SIZE", 5)
+    vehicle_id = _vehicle(db, count)
+    with statements() as log:
+        response = client.delete(f"{API}/vehicles/{vehicle_id}/statuses")
+    assert response.json() == {"vehicle_id": vehicle_id, "deleted": count}
+    # Lots pleins, puis un lot partiel (ou vide) qui arrête la boucle
+    assert len(_deletes(log, "vehicle_status")) == chunks
+    assert _count(db, VehicleStatus, vehicle_id) == 0
+    # Plus de statut géolocalisé : plus de position
+    assert _count(db, VehiclePosition, vehicle_id) == 0
+    # Le véhicule est conservé
+    assert db.get(Vehicle, vehicle_id) is not None
+
+
+def test_before_is_exclusive(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "PURGE_CHUNK_SIZE", 3)
+    vehicle_id = _vehicle(db, 10)
+    before = START + timedelta(minutes=4)
+    assert vehicle_service.purge_statuses(db, vehicle_id, before=before) == 4
+    remaining = db.scalars(
+        select(VehicleStatus.timestamp).where(VehicleStatus.vehicle_id == vehicle_id).order_by(VehicleStatus.timestamp)
+    ).all()
+    assert remaining == [START + timedelta(minutes=k) for k in range(4, 10)]
+
+    # Borne avec fuseau (ramenée en UTC) ; déjà purgé : rien à supprimer
+    local = (before + timedelta(minutes=2, hours=2)).replace(tzinfo=timezone(timedelta(hours=2)))
+    response = client.delete(f"{API}/vehicles/{vehicle_id}/statuses", params={"before": local.isoformat()})
+    assert response.json()["deleted"] == 2
+    assert client.delete(f"{API}/vehicles/{vehicle_id}/statuses", params={"before": before.isoformat()}).json()["deleted"] == 0
+    # La position reste celle du dernier statut
+    position = db.get(VehiclePosition, vehicle_id)
+    db.refresh(position)
+    assert position.timestamp == START + timedelta(minutes=9)
+
+
+def test_delete_cascades_to_derived_data_in_the_database(client, db, statements, monkeypatch):
+    monkeypatch.setattr(settings, "PURGE_CHUNK_SIZE", 4)
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0.1)
+    vehicle_id = _vehicle(db, 10)
+    time.sleep(0.3)
+    refresh_vehicle_analytics(db, vehicle_id)
+    refresh_vehicle_segments(db, vehicle_id)
+    derived = (VehiclePosition, VehicleAnalytics, VehicleDailyDistance, Trip, SegmentDetectorState)
+    assert all(_count(db, model, vehicle_id) > 0 for model in derived)
+
+    with statements() as log:
+        assert client.delete(f"{API}/vehicles/{vehicle_id}").status_code == 204
+    # Historique par lots, puis une seule suppression : celle du véhicule
+    assert len(_deletes(log, "vehicle_status")) == 3
+    assert [sql for sql, _, _ in log.statements if sql.startswith("DELETE") and "vehicle_status" not in sql] == [
+        "DELETE FROM vehicles WHERE vehicles.id = ?"
+    ]
+    db.expire_all()
+    assert db.get(Vehicle, vehicle_id) is None
+    for model in derived + (VehicleStatus, ChargingSession):
+        assert _count(db, model, vehicle_id) == 0, model.__name__
+
+
+def test_statuses_relationship_is_never_loaded(db, statements):
+    vehicle_id = _vehicle(db, 5)
+    vehicle = db.get(Vehicle, vehicle_id)
+    with statements() as log:
+        statuses = vehicle.statuses
+        # Requête explicite seulement
+        query = statuses.select().order_by(VehicleStatus.timestamp.desc()).limit(1)
+    assert log.statements == []
+    assert db.scalars(query).one().timestamp == START + timedelta(minutes=4)
+
+    # Suppression par l'ORM : l'historique n'est ni chargé ni supprimé ligne à ligne
+    with statements() as log:
+        db.delete(vehicle)
+        db.commit()
+    assert not [sql for sql, _, _ in log.statements if "vehicle_status" in sql]
+    assert _count(db, VehicleStatus, vehicle_id) == 0
@@ -0,0 +1,184 @@
+# tests/test_query_budgets.py
+"""
+Budget exact de requêtes SQL par route de l'API.
+
+Chaque route est appelée via le client de test et les requêtes émises sur
+l'engine sont comptées : une requête supplémentaire (N+1, relecture,
+chargement paresseux...) fait échouer le test. Si un changement modifie
+volontairement le nombre de requêtes d'une route, ajuster son budget ici.
+"""
+from datetime import timedelta
+
+import pytest
+
+from app.db.session import SessionLocal
+from app.main import app
+from app.services.fleet_summary import fleet_counters
+from app.services.latest_status_table import LatestStatus
+from app.services.telemetry_formats import MEDIA_BINARY_BATCH, encode_status_batch
+
+from conftest import SEED_START, seed_position
+
+API = "/api/v1"
+
+# Lot binaire de 3 statuts (le dernier géolocalisé, à la position de référence)
+STATUS_BATCH = encode_status_batch(25, [
+    LatestStatus(0, 25, SEED_START + timedelta(days=1, minutes=k), 60.0, True, 2000.0 + k,
+                 *(seed_position(25) if k == 2 else (None, None)))
+    for k in range(3)
+])
+
+# Lot de véhicules : une création, une mise à jour (véhicule 21, nom inchangé), un conflit
+BULK = [
+    {"external_id": "budget-bulk", "name": "budget", "vin": "BUDGETBULK"},
+    {"external_id": "ext-21", "name": "car-021", "vin": "VIN00021"},
+    {"external_id": "ext-22", "name": "budget", "vin": "BUDGETCONFLICT"},
+]
+
+# Règle d'alerte propre à un véhicule réservé (sans effet sur les autres budgets)
+RULE = {"name": "budget", "vehicle_id": 29, "conditions": [{"field": "battery_level", "op": "<", "value": 5}]}
+
+# Destinataire de webhooks (outbox désactivée dans les tests : sans effet sur l'ingestion)
+WEBHOOK = {"url": "http://127.0.0.1:9/budget", "secret": "budget-secret-0123", "vehicle_id": 29}
+
+# (méthode, route, URL, corps JSON ou binaire, statut HTTP attendu, nombre de requêtes SQL)
+# Véhicules réservés : 21-29 lecture / écriture, 30 suppression.
+BUDGETS = [
+    ("GET", "/health", "/health", None, 200, 0),
+    ("GET", "/health/", "/health/", None, 200, 0),
+    ("GET", "/health/admission", "/health/admission", None, 200, 0),
+    ("GET", "/health/hot-store", "/health/hot-store", None, 200, 0),
+    # Création : INSERT + entrée du journal de changements + relecture de la ligne
+    ("POST", "/vehicles", "/vehicles", {"external_id": "budget-new", "name": "budget", "vin": "BUDGETNEW"}, 201, 3),
+    # Doublon : INSERT refusé (IntegrityError)
+    ("POST", "/vehicles", "/vehicles", {"external_id": "budget-new", "name": "budget", "vin": "BUDGETNEW"}, 409, 1),
+    # Lecture des existants (VIN / external_id) + INSERT ... ON CONFLICT + journal des changements
+    ("POST", "/vehicles:bulk", "/vehicles:bulk", BULK, 200, 3),
+    ("GET", "/vehicles", "/vehicles", None, 200, 1),
+    ("GET", "/vehicles", "/vehicles?q=car-02&limit=5", None, 200, 1),
+    ("GET", "/vehicles", "/vehicles?fields=id,vin&after=10", None, 200, 1),
+    ("GET", "/vehicles/by-vin/{vin}", "/vehicles/by-vin/VIN00021", None, 200, 1),
+    ("GET", "/vehicles/by-external-id/{external_id}", "/vehicles/by-external-id/ext-21", None, 200, 1),
+    ("GET", "/vehicles/within", "/vehicles/within?bbox=2.305,48.805,2.335,48.845", None, 200, 1),
+    ("GET", "/vehicles/within", "/vehicles/within?bbox=2.3,48.8,2.4", None, 400, 0),
+    # Une passe au rayon initial, une au rayon du n-ième candidat
+    ("GET", "/vehicles/nearest", "/vehicles/nearest?lat=48.83&lon=2.32&n=5", None, 200, 2),
+    ("GET", "/vehicles/{vehicle_id}", "/vehicles/21", None, 200, 1),
+    ("GET", "/vehicles/{vehicle_id}", f"/vehicles/{10 ** 6}", None, 404, 1),
+    # Véhicule + un lot de purge (historique < PURGE_CHUNK_SIZE) + DELETE en cascade
+    # + entrée du journal de changements
+    ("DELETE", "/vehicles/{vehicle_id}", "/vehicles/30", None, 204, 4),
+    # Véhicule + INSERT + relecture
+    ("POST", "/vehicles/{vehicle_id}/status", "/vehicles/22/status", {"battery_level": 40.0}, 201, 3),
+    # ... + mise à jour de la position
+    ("POST", "/vehicles/{vehicle_id}/status", "/vehicles/22/status",
+     {"battery_level": 40.0, "latitude": 48.9, "longitude": 2.4}, 201, 4),
+    ("GET", "/vehicles/{vehicle_id}/statuses", "/vehicles/21/statuses", None, 200, 2),
+    ("GET", "/vehicles/{vehicle_id}/statuses",
+     "/vehicles/21/statuses?format=columnar&fields=timestamp,battery_level&order=asc", None, 200, 2),
+    ("GET", "/vehicles/{vehicle_id}/statuses", "/vehicles/21/statuses?format=binary", None, 200, 2),
+    # Véhicule + comptage de la plage + passe LTTB
+    ("GET", "/vehicles/{vehicle_id}/statuses/downsample", "/vehicles/21/statuses/downsample?points=50", None, 200, 3),
+    # Véhicule + un lot de purge + dernier statut géolocalisé + suppression de la position
+    ("DELETE", "/vehicles/{vehicle_id}/statuses", "/vehicles/23/statuses", None, 200, 4),
+    # Véhicule + INSERT multi-lignes + mise à jour de la position
+    ("POST", "/statuses:binary", "/statuses:binary", STATUS_BATCH, 201, 3),
+    ("POST", "/statuses:binary", "/statuses:binary", STATUS_BATCH[:-1], 400, 0),
+    ("GET", "/vehicles/{vehicle_id}/status/latest", "/vehicles/21/status/latest", None, 200, 1),
+    # Véhicule + ligne d'agrégats + distances journalières
+    ("GET", "/vehicles/{vehicle_id}/analytics", "/vehicles/21/analytics", None, 200, 3),
+    ("GET", "/vehicles/{vehicle_id}/charging-sessions", "/vehicles/21/charging-sessions", None, 200, 2),
+    ("GET", "/vehicles/{vehicle_id}/trips", "/vehicles/21/trips", None, 200, 2),
+    ("POST", "/jobs", "/jobs", {"kind": "status_summary", "params": {}}, 202, 2),
+    ("GET", "/jobs/{job_id}", "/jobs/{job_id}", None, 200, 1),
+    # Job en file : rien à télécharger
+    ("GET", "/jobs/{job_id}/download", "/jobs/{job_id}/download", None, 409, 1),
+    ("POST", "/jobs/{job_id}/cancel", "/jobs/{job_id}/cancel", None, 200, 3),
+    ("GET", "/fleet/status/latest", "/fleet/status/latest", None, 200, 1),
+    # Compteurs en mémoire (réconciliés par la fixture `fleet_counters_ready`)
+    ("GET", "/fleet/summary", "/fleet/summary", None, 200, 0),
+    # Une plage de clé primaire par journal (statuts, véhicules)
+    ("GET", "/changes", "/changes?limit=50", None, 200, 2),
+    ("GET", "/changes", "/changes?cursor=not-a-cursor", None, 400, 0),
+    # Véhicule + INSERT + rechargement des règles compilées (qui relit la règle)
+    ("POST", "/alert-rules", "/alert-rules", RULE, 201, 3),
+    ("GET", "/alert-rules", "/alert-rules?vehicle_id=29", None, 200, 1),
+    ("GET", "/alert-rules/{rule_id}", "/alert-rules/{rule_id}", None, 200, 1),
+    ("GET", "/alert-rules/{rule_id}", f"/alert-rules/{10 ** 6}", None, 404, 1),
+    # Règle + véhicule + clôture des alertes ouvertes (définition identique :
+    # pas d'UPDATE de la règle) + rechargement
+    ("PUT", "/alert-rules/{rule_id}", "/alert-rules/{rule_id}", RULE, 200, 4),
+    # Règle + DELETE (alertes en cascade) + rechargement
+    ("DELETE", "/alert-rules/{rule_id}", "/alert-rules/{spare_rule_id}", None, 204, 3),
+    ("GET", "/alerts", "/alerts?vehicle_id=29&open=true", None, 200, 1),
+    # Véhicule + INSERT + relecture
+    ("POST", "/webhooks", "/webhooks", WEBHOOK, 201, 3),
+    ("GET", "/webhooks", "/webhooks", None, 200, 1),
+    ("GET", "/webhooks/{endpoint_id}", "/webhooks/{endpoint_id}", None, 200, 1),
+    # Destinataire + DELETE (livraisons en cascade) + événements orphelins
+    ("DELETE", "/webhooks/{endpoint_id}", "/webhooks/{spare_endpoint_id}", None, 204, 3),
+    ("GET", "/webhooks/{endpoint_id}/deliveries", "/webhooks/{endpoint_id}/deliveries?state=pending", None, 200, 2),
+    ("POST", "/webhooks/{endpoint_id}/deliveries:retry", "/webhooks/{endpoint_id}/deliveries:retry", None, 200, 2),
+]
+
+
+@pytest.fixture(scope="module")
+def job_id():
+    from fastapi.testclient import TestClient
+
+    response = TestClient(app).post(f"{API}/jobs", json={"kind": "status_summary", "params": {}})
+    return response.json()["id"]
+
+
+@pytest.fixture(scope="module")
+def resource_ids():
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app)
+    return {
+        "rule_id": client.post(f"{API}/alert-rules", json=RULE).json()["id"],
+        "spare_rule_id": client.post(f"{API}/alert-rules", json=RULE).json()["id"],
+        "endpoint_id": client.post(f"{API}/webhooks", json=WEBHOOK).json()["id"],
+        "spare_endpoint_id": client.post(f"{API}/webhooks", json=WEBHOOK).json()["id"],
+    }
+
+
+@pytest.fixture(scope="module", autouse=True)
+def fleet_counters_ready():
+    # Sans lifespan dans les tests : première réconciliation faite ici
+    with SessionLocal() as db:
+        fleet_counters.reconcile(db)
+
+
+def test_every_route_has_a_budget():
+    routes = {
+        (method, route.path[len(API):])
+        for route in app.routes
+        if route.path.startswith(API)
+        for method in getattr(route, "methods", ())
+    }
+    assert routes == {(method, route) for method, route, *_ in BUDGETS}
+
+
+@pytest.mark.parametrize(
+    "method, route, url, body, expected_status, budget",
+    BUDGETS,
+    ids=[f"{method} {url}" for method, _, url, *_ in BUDGETS],
+)
+def test_statement_budget(method, route, url, body, expected_status, budget, job_id, resource_ids, client, statements):
+    url = API + url.format(job_id=job_id, **resource_ids)
+    with statements() as log:
+        if isinstance(body, bytes):
+            response = client.request(method, url, content=body, headers={"content-type": MEDIA_BINARY_BATCH})
+        else:
+            response = client.request(method, url, json=body)
+    assert response.status_code == expected_status, response.text
+    assert len(log) == budget, "\n".join([f"{method} {url}: {len(log)} statements, budget {budget}"] + log.sql())
+
+
+def test_identifier_lookup_is_cached(client, statements):
+    client.get(f"{API}/vehicles/by-vin/VIN00024")
+    with statements() as log:
+        response = client.get(f"{API}/vehicles/by-vin/VIN00024")
+    assert response.status_code == 200
+    assert len(log) == 0
@@ -0,0 +1,139 @@
+# tests/test_query_plans.py
+"""
+Plans d'exécution des requêtes de la couche service (app/services/vehicles.py).
+
+Chaque fonction est exécutée sur la base de référence ; chaque requête
+capturée passe par `EXPLAIN QUERY PLAN`. On vérifie que les index attendus
+sont utilisés, qu'aucune requête ne parcourt `vehicle_status` ou
+`vehicle_positions` en entier (`SCAN ...`) et qu'aucun tri ne passe par un
+B-tree temporaire.
+"""
+import inspect
+from datetime import timedelta
+
+import pytest
+
+from app.schemas.vehicle import VehicleCreate, VehicleStatusCreate
+from app.services import vehicles as vehicle_service
+from app.services.geohash import BBox
+
+from conftest import SEED_START, explain
+
+STATUS_INDEX = "ix_vehicle_status_vehicle_id_timestamp"
+POSITION_INDEX = "ix_vehicle_positions_geohash"
+FULL_SCANS = ("SCAN vehicle_status", "SCAN vehicle_positions")
+
+# (fonction, appel, fragments attendus dans le plan)
+# Véhicules réservés : 1-10 lecture seule, 11 écriture, 12 purge, 13 suppression.
+CASES = [
+    ("create_vehicle", lambda db: vehicle_service.create_vehicle(
+        db, VehicleCreate(external_id="plan-new", name="plan-new", vin="PLANNEW")
+    ), ["INTEGER PRIMARY KEY"]),
+    # Lecture par VIN ou external_id (deux index), puis ON CONFLICT (vin)
+    ("upsert_vehicles", lambda db: vehicle_service.upsert_vehicles(db, [
+        VehicleCreate(external_id="ext-11", name="car-011", vin="VIN00011"),
+        VehicleCreate(external_id="plan-bulk", name="plan-bulk", vin="PLANBULK"),
+    ]), ["ix_vehicles_vin", "ix_vehicles_external_id"]),
+    ("list_vehicles", lambda db: vehicle_service.list_vehicles(db, after=5, limit=10), ["INTEGER PRIMARY KEY"]),
+    # Recherche : plage de (nom, id), puis de VIN si la page n'est pas pleine
+    ("list_vehicles", lambda db: vehicle_service.list_vehicles(db, q="car-00", limit=10),
+     ["ix_vehicles_name_id (name>? AND name<?)", "ix_vehicles_vin (vin>? AND vin<?)"]),
+    # Page 2 : reprise après (nom, id) dans le même index
+    ("list_vehicles", lambda db: vehicle_service.list_vehicles(
+        db, q="car-0", after=vehicle_service.VehicleSearchCursor("name", "car-005", 5), limit=10
+    ), ["ix_vehicles_name_id (name>? AND name<?)"]),
+    ("list_vehicles", lambda db: vehicle_service.list_vehicles(
+        db, q="VIN0001", after=vehicle_service.VehicleSearchCursor("vin", "VIN00012", 12), limit=10
+    ), ["ix_vehicles_vin (vin>? AND vin<?)"]),
+    ("list_vehicles", lambda db: vehicle_service.list_vehicles(db, fields=("id", "vin")), []),
+    ("get_vehicle", lambda db: vehicle_service.get_vehicle(db, 1), ["INTEGER PRIMARY KEY"]),
+    ("get_vehicle_by_vin", lambda db: vehicle_service.get_vehicle_by_vin(db, "VIN00002"), ["ix_vehicles_vin"]),
+    ("get_vehicle_by_external_id", lambda db: vehicle_service.get_vehicle_by_external_id(db, "ext-3"),
+     ["ix_vehicles_external_id"]),
+    ("get_latest_status", lambda db: vehicle_service.get_latest_status(db, 4), [STATUS_INDEX]),
+    ("get_latest_status_cached", lambda db: vehicle_service.get_latest_status_cached(db, 4), [STATUS_INDEX]),
+    # Saut d'un vehicle_id au suivant, puis une recherche par véhicule
+    ("list_latest_statuses", lambda db: vehicle_service.list_latest_statuses(db),
+     ["ix_vehicle_status_vehicle_id (vehicle_id>?)", f"{STATUS_INDEX} (vehicle_id=?)"]),
+    ("list_statuses", lambda db: vehicle_service.list_statuses(db, 5), [STATUS_INDEX]),
+    ("list_statuses", lambda db: vehicle_service.list_statuses(
+        db, 5, since=SEED_START, until=SEED_START + timedelta(hours=1), order="asc", limit=10,
+        fields=("timestamp", "battery_level"),
+    ), [f"{STATUS_INDEX} (vehicle_id=? AND timestamp>? AND timestamp<?)"]),
+    ("downsample_statuses", lambda db: vehicle_service.downsample_statuses(db, 5, "battery_level", 20),
+     [STATUS_INDEX]),
+    ("create_status", lambda db: vehicle_service.create_status(
+        db, 11, VehicleStatusCreate(battery_level=50.0, odometer_km=1.0)
+    ), ["INTEGER PRIMARY KEY"]),
+    ("create_status", lambda db: vehicle_service.create_status(
+        db, 11, VehicleStatusCreate(battery_level=50.0, latitude=48.9, longitude=2.4)
+    ), ["INTEGER PRIMARY KEY"]),
+    ("existing_vehicle_ids", lambda db: vehicle_service.existing_vehicle_ids(db, [3, 11, 10 ** 6]),
+     ["INTEGER PRIMARY KEY"]),
+    ("create_statuses", lambda db: vehicle_service.create_statuses(db, [
+        {"vehicle_id": 11, "timestamp": SEED_START + timedelta(days=1, minutes=k), "battery_level": 50.0,
+         "doors_locked": True, "odometer_km": None, "latitude": 48.9, "longitude": 2.4}
+        for k in range(3)
+    ]), ["INTEGER PRIMARY KEY"]),
+    ("refresh_vehicle_position", lambda db: vehicle_service.refresh_vehicle_position(db, 11),
+     [f"{STATUS_INDEX} (vehicle_id=?)", "INTEGER PRIMARY KEY"]),
+    ("list_vehicles_within", lambda db: vehicle_service.list_vehicles_within(
+        db, BBox(2.305, 48.805, 2.335, 48.845), limit=10
+    ), [f"{POSITION_INDEX} (geohash>? AND geohash<?)", "MERGE (UNION ALL)"]),
+    ("list_vehicles_within", lambda db: vehicle_service.list_vehicles_within(
+        db, BBox(170.0, -10.0, -170.0, 10.0)
+    ), [f"{POSITION_INDEX} (geohash>? AND geohash<?)"]),
+    ("list_nearest_vehicles", lambda db: vehicle_service.list_nearest_vehicles(db, 48.83, 2.32, 5),
+     [f"{POSITION_INDEX} (geohash>? AND geohash<?)"]),
+    ("purge_statuses", lambda db: vehicle_service.purge_statuses(
+        db, 12, before=SEED_START + timedelta(minutes=30)
+    ), [f"{STATUS_INDEX} (vehicle_id=? AND timestamp<?)"]),
+    ("purge_statuses", lambda db: vehicle_service.purge_statuses(db, 12), ["ix_vehicle_status_vehicle_id"]),
+    ("delete_vehicle", lambda db: vehicle_service.delete_vehicle(
+        db, vehicle_service.get_vehicle(db, 13)
+    ), ["ix_vehicle_status_vehicle_id"]),
+]
+
+
+def _plans(log):
+    plans = []
+    for statement, parameters, executemany in log.statements:
+        if executemany:
+            continue
+        plans.append((statement, explain(statement, parameters)))
+    return plans
+
+
+def test_every_service_function_is_covered():
+    """
+    Toute fonction de app/services/vehicles.py qui prend une session
+    doit avoir au moins un cas de plan ci-dessous.
+    """
+    with_db = {
+        name
+        for name, fn in inspect.getmembers(vehicle_service, inspect.isfunction)
+        if fn.__module__ == vehicle_service.__name__
+        and not name.startswith("_")
+        and "db" in inspect.signature(fn).parameters
+    }
+    assert with_db == {case[0] for case in CASES}
+
+
+@pytest.mark.parametrize(
+    "name, call, expected",
+    CASES,
+    ids=[f"{case[0]}-{i}" for i, case in enumerate(CASES)],
+)
+def test_query_plan(name, call, expected, db, statements):
+    with statements() as log:
+        call(db)
+    plans = _plans(log)
+    assert plans, f"{name} ran no SQL"
+
+    details = [detail for _, plan in plans for detail in plan]
+    for statement, plan in plans:
+        for detail in plan:
+            assert not detail.startswith(FULL_SCANS), f"full scan in {name}: {detail}\n{statement}"
+            assert "TEMP B-TREE" not in detail, f"temporary sort in {name}: {detail}\n{statement}"
+    for fragment in expected:
+        assert any(fragment in detail for detail in details), f"{name}: {fragment!r} not in {details}"
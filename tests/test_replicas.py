@@ -0,0 +1,127 @@
+# tests/test_replicas.py
+"""
+Réplicas en lecture, sur plusieurs fichiers SQLite : round-robin,
+épinglage read-your-writes sur le primaire, éjection sur perte de
+connexion (et seulement sur elle) puis remise en rotation.
+"""
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text, update
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from app.db import session as session_module
+from app.db.models.vehicle import Vehicle
+from app.db.replicas import ReplicaRouter
+from app.db.session import SessionLocal, get_db, make_engine
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def replicas(tmp_path, monkeypatch):
+    """
+    Trois réplicas (fichiers distincts, chacun marqué de son nom) branchés
+    sur les sessions de l'application, avec une horloge manuelle.
+    """
+    engines = []
+    for i in range(3):
+        eng = make_engine(f"sqlite:///{tmp_path / f'replica{i}.db'}")
+        with eng.begin() as conn:
+            conn.execute(text("CREATE TABLE marker (name TEXT)"))
+            conn.execute(text("INSERT INTO marker VALUES (:name)"), {"name": f"replica{i}"})
+        engines.append(eng)
+    clock = Clock()
+    router = ReplicaRouter(engines, eject_seconds=30.0, read_your_writes_seconds=5.0, clock=clock)
+    monkeypatch.setattr(session_module, "replica_router", router)
+    yield SimpleNamespace(router=router, engines=engines, clock=clock)
+    for eng in engines:
+        eng.dispose()
+
+
+def _read_marker():
+    with SessionLocal() as db:
+        return db.execute(text("SELECT name FROM marker")).scalar()
+
+
+def test_reads_round_robin_over_replicas(replicas):
+    seen = [_read_marker() for _ in range(6)]
+    assert sorted(seen[:3]) == ["replica0", "replica1", "replica2"]
+    assert seen[3:] == seen[:3]
+
+    # Une session reste sur le même réplica ; ses écritures vont au primaire
+    with SessionLocal() as db:
+        first = db.execute(text("SELECT name FROM marker")).scalar()
+        assert db.execute(text("SELECT name FROM marker")).scalar() == first
+        db.execute(update(Vehicle).where(Vehicle.id == -1).values(name="x"))
+        assert db.get_bind() is session_module.engine
+
+
+def test_writer_is_pinned_to_primary(replicas):
+    connection = SimpleNamespace(headers={"x-client-id": "writer"}, client=SimpleNamespace(host="10.0.0.1"))
+
+    def session_for(conn):
+        dependency = get_db(conn)
+        return dependency, next(dependency)
+
+    dependency, db = session_for(connection)
+    assert not db.info.get("use_primary")
+    db.execute(update(Vehicle).where(Vehicle.id == -1).values(name="x"))
+    db.commit()
+    dependency.close()
+
+    # Fenêtre read-your-writes : les lectures suivantes du client restent sur le primaire
+    dependency, db = session_for(connection)
+    assert db.info.get("use_primary")
+    assert db.get_bind() is session_module.engine
+    dependency.close()
+    other = SimpleNamespace(headers={}, client=SimpleNamespace(host="10.0.0.2"))
+    dependency, db = session_for(other)
+    assert not db.info.get("use_primary")
+    dependency.close()
+
+    replicas.clock.now += 6
+    dependency, db = session_for(connection)
+    assert not db.info.get("use_primary")
+    dependency.close()
+
+
+def test_query_errors_do_not_eject(replicas):
+    eng = replicas.engines[0]
+    with pytest.raises(OperationalError):
+        with eng.connect() as conn:
+            conn.execute(text("SELECT * FROM missing_table"))
+
+    # Requête interrompue (deadline : progress handler SQLite)
+    with pytest.raises(OperationalError, match="interrupted"):
+        with eng.connect() as conn:
+            conn.connection.driver_connection.set_progress_handler(lambda: 1, 1)
+            conn.execute(text("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n"))
+    assert replicas.router.healthy_indexes() == [0, 1, 2]
+
+
+def test_lost_connection_ejects_until_recovery(replicas):
+    eng = replicas.engines[1]
+    with pytest.raises(ProgrammingError):
+        with eng.connect() as conn:
+            conn.connection.driver_connection.close()
+            conn.execute(text("SELECT name FROM marker"))
+    assert replicas.router.healthy_indexes() == [0, 2]
+    assert {_read_marker() for _ in range(6)} == {"replica0", "replica2"}
+
+    replicas.clock.now += 31
+    assert replicas.router.healthy_indexes() == [0, 1, 2]
+    assert {_read_marker() for _ in range(6)} == {"replica0", "replica1", "replica2"}
+
+    # Plus aucun réplica sain : lectures sur le primaire
+    for i in range(3):
+        replicas.router.eject(i)
+    with SessionLocal() as db:
+        db.execute(text("SELECT 1"))
+        assert db.get_bind() is session_module.engine
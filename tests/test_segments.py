@@ -0,0 +1,167 @@
+# tests/test_segments.py
+"""
+Détection des trajets et des recharges : découpage du flux, bornes
+SEGMENT_GAP_SECONDS / SEGMENT_MAX_INTERVAL_SECONDS, historique rattrapé
+(redétection identique à une ingestion dans l'ordre), statuts non
+stabilisés, rafraîchissement après ingestion par l'API.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.schemas.vehicle import VehicleCreate
+from app.services import segments as segment_service
+from app.services import vehicles as vehicle_service
+from conftest import wait_for
+
+START = datetime(2026, 4, 1, 8, 0)
+GAP = 600.0
+MAX_INTERVAL = 3600.0
+
+
+def _status(vehicle_id, seconds, odometer, battery=50.0):
+    return {
+        "vehicle_id": vehicle_id, "timestamp": START + timedelta(seconds=seconds), "battery_level": battery,
+        "doors_locked": True, "odometer_km": odometer, "latitude": None, "longitude": None,
+    }
+
+
+def _ingest(db, vehicle_id, samples):
+    """
+    Insère des statuts (secondes, odomètre[, batterie]) puis rafraîchit.
+    """
+    vehicle_service.create_statuses(db, [_status(vehicle_id, *sample) for sample in samples])
+    return segment_service.refresh_vehicle_segments(db, vehicle_id)
+
+
+def _trips(db, vehicle_id):
+    return [
+        ((trip.started_at - START).total_seconds(), (trip.ended_at - START).total_seconds(), trip.distance_km, trip.ongoing)
+        for trip in reversed(segment_service.list_trips(db, vehicle_id))
+    ]
+
+
+def _charges(db, vehicle_id):
+    return [
+        ((charge.started_at - START).total_seconds(), (charge.ended_at - START).total_seconds(), charge.battery_gained_pct, charge.ongoing)
+        for charge in reversed(segment_service.list_charging_sessions(db, vehicle_id))
+    ]
+
+
+@pytest.fixture
+def new_vehicle(db, monkeypatch):
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0.0)
+    monkeypatch.setattr(settings, "SEGMENT_GAP_SECONDS", GAP)
+    monkeypatch.setattr(settings, "SEGMENT_MAX_INTERVAL_SECONDS", MAX_INTERVAL)
+    monkeypatch.setattr(settings, "ANALYTICS_BATCH_SIZE", 4)
+
+    def create():
+        name = f"segments-{datetime.utcnow().timestamp()}"
+        return vehicle_service.create_vehicle(db, VehicleCreate(external_id=name, name=name, vin=name)).id
+
+    return create
+
+
+def test_trip_then_charging_session(db, new_vehicle):
+    vehicle_id = new_vehicle()
+    assert _ingest(db, vehicle_id, [
+        (0, 100.0, 80.0), (300, 105.0, 78.0), (600, 110.0, 76.0),  # trajet
+        (900, 110.0, 76.0),  # arrêt
+        (1200, 110.0, 85.0), (1500, 110.0, 95.0),  # recharge
+        (1800, 110.0, 94.0),  # batterie en baisse : recharge close
+    ]) == 7
+    assert _trips(db, vehicle_id) == [(0, 600, 10.0, False)]
+    assert _charges(db, vehicle_id) == [(900, 1500, 19.0, False)]
+
+    # Un déplacement rouvre un trajet, encore en cours
+    _ingest(db, vehicle_id, [(2100, 112.0, 93.0)])
+    assert _trips(db, vehicle_id)[-1] == (1800, 2100, 2.0, True)
+
+
+@pytest.mark.parametrize("idle, trips", [
+    (GAP - 60, [(0, 1200 + GAP - 60, 3.0, True)]),
+    (GAP, [(0, 600, 2.0, False), (600 + GAP, 1200 + GAP, 1.0, True)]),
+])
+def test_gap_boundary_closes_trip(db, new_vehicle, idle, trips):
+    vehicle_id = new_vehicle()
+    _ingest(db, vehicle_id, [
+        (0, 100.0), (600, 102.0),
+        (600 + idle / 2, 102.0), (600 + idle, 102.0),  # arrêt de `idle` secondes
+        (1200 + idle, 103.0),
+    ])
+    assert _trips(db, vehicle_id) == trips
+
+
+@pytest.mark.parametrize("interval, trips", [
+    # Exactement le maximum : l'intervalle compte encore
+    (MAX_INTERVAL, [(0, 600 + MAX_INTERVAL, 40.0, True)]),
+    # Au-delà : trou de télémétrie, segment clos et intervalle non attribué
+    (MAX_INTERVAL + 1, [(0, 300, 5.0, False), (301 + MAX_INTERVAL, 601 + MAX_INTERVAL, 5.0, True)]),
+])
+def test_max_interval_boundary(db, new_vehicle, interval, trips):
+    vehicle_id = new_vehicle()
+    _ingest(db, vehicle_id, [(0, 100.0), (300, 105.0), (300 + interval, 135.0), (600 + interval, 140.0)])
+    assert _trips(db, vehicle_id) == trips
+
+
+def test_backfilled_statuses_split_closed_segments(db, new_vehicle):
+    # Trajet de 10 min, arrêt de 18 min (> GAP), nouveau trajet, puis recharge
+    timeline = (
+        [(k * 60, 100.0 + k) for k in range(0, 11)]
+        + [(k * 60, 110.0) for k in range(12, 29, 2)]
+        + [(k * 60, 110.0 + (k - 28)) for k in range(29, 41)]
+        + [(k * 60, 122.0, 40.0 + k) for k in range(45, 60, 5)]
+    )
+    reference = new_vehicle()
+    _ingest(db, reference, timeline)
+    expected_trips, expected_charges = _trips(db, reference), _charges(db, reference)
+    assert [trip[:2] for trip in expected_trips] == [(0, 600), (1680, 2400)]
+
+    # Le boîtier envoie d'abord une partie du flux : l'arrêt passe inaperçu
+    vehicle_id = new_vehicle()
+    first = [sample for sample in timeline if sample[0] % 900 == 0]
+    _ingest(db, vehicle_id, first)
+    assert len(_trips(db, vehicle_id)) == 1
+
+    late = [sample for sample in timeline if sample[0] % 900 != 0]
+    assert _ingest(db, vehicle_id, late) == len(late)
+    assert _trips(db, vehicle_id) == expected_trips
+    assert _charges(db, vehicle_id) == expected_charges
+
+    # Les statuts suivants prolongent les segments redétectés
+    _ingest(db, vehicle_id, [(3600, 122.0, 99.0)])
+    _ingest(db, reference, [(3600, 122.0, 99.0)])
+    assert _charges(db, vehicle_id) == _charges(db, reference)
+
+
+def test_unsettled_statuses_wait(db, new_vehicle, monkeypatch):
+    vehicle_id = new_vehicle()
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 3600.0)
+    assert _ingest(db, vehicle_id, [(0, 100.0), (300, 105.0)]) == 0
+    assert _trips(db, vehicle_id) == []
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0.0)
+    assert segment_service.refresh_vehicle_segments(db, vehicle_id) == 2
+    assert _trips(db, vehicle_id) == [(0, 300, 5.0, True)]
+
+
+def test_statuses_posted_through_the_api_reach_trips(client, new_vehicle, derived_refresher, monkeypatch):
+    monkeypatch.setattr(settings, "SEGMENTS_REFRESH_ON_INGEST", True)
+    vehicle_id = new_vehicle()
+
+    def post(odometer):
+        response = client.post(f"/api/v1/vehicles/{vehicle_id}/status", json={"odometer_km": odometer, "battery_level": 80.0})
+        assert response.status_code == 201
+
+    def trips():
+        return [(trip["distance_km"], trip["ongoing"]) for trip in client.get(f"/api/v1/vehicles/{vehicle_id}/trips").json()]
+
+    for odometer in (100.0, 101.0, 102.0):
+        post(odometer)
+    # Intégrés une fois stabilisés, sans job
+    assert wait_for(lambda: trips() == [(2.0, True)])
+    # Statut reçu pendant un rafraîchissement programmé : un suivant le reprend
+    post(103.0)
+    post(104.5)
+    assert wait_for(lambda: trips() == [(4.5, True)])
+    assert derived_refresher.pending() == 0
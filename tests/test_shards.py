@@ -0,0 +1,218 @@
+# tests/test_shards.py
+"""
+Sharding des statuts, sur plusieurs fichiers SQLite : affectation par
+l'anneau, écritures sur le shard du véhicule dans sa plage d'ids, lectures
+fusionnées sur tous les shards, rééquilibrage (`shard_admin rebalance`)
+après ajout d'un shard, y compris repris après interruption.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.db import session as session_module
+from app.db import shard_admin
+from app.db.models.segments import SegmentDetectorState, Trip
+from app.db.models.vehicle_analytics import VehicleAnalytics
+from app.db.session import fan_out_statuses, make_engine, status_database_name, status_session
+from app.db.shards import HashRing, ShardSet, shard_status_table
+from app.schemas.vehicle import VehicleCreate
+from app.services import analytics as analytics_service
+from app.services import segments as segment_service
+from app.services import vehicles as vehicle_service
+
+START = datetime(2026, 5, 1, 7, 0)
+STRIDE = 1_000_000
+STATUSES = 30
+
+
+def _shard_set(engines):
+    shards = ShardSet(engines, vnodes=16, id_stride=STRIDE)
+    shards.create_all()
+    return shards
+
+
+def _use(monkeypatch, shards):
+    monkeypatch.setattr(session_module, "status_shards", shards)
+    monkeypatch.setattr(shard_admin, "status_shards", shards)
+
+
+@pytest.fixture
+def shard_engines(tmp_path, monkeypatch):
+    """
+    Trois fichiers SQLite ; les deux premiers forment les shards actifs.
+    """
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0.0)
+    engines = [make_engine(f"sqlite:///{tmp_path / f'shard{i}.db'}") for i in range(3)]
+    shards = _shard_set(engines[:2])
+    _use(monkeypatch, shards)
+    yield engines
+    shards.executor.shutdown()
+    for eng in engines:
+        eng.dispose()
+
+
+@pytest.fixture
+def fleet(db, shard_engines):
+    """
+    Huit véhicules neufs, STATUSES statuts chacun (un trajet continu).
+    """
+    vehicle_ids = []
+    for k in range(8):
+        name = f"shards-{datetime.utcnow().timestamp()}-{k}"
+        vehicle_ids.append(vehicle_service.create_vehicle(db, VehicleCreate(external_id=name, name=name, vin=name)).id)
+    vehicle_service.create_statuses(db, [
+        {
+            "vehicle_id": vehicle_id, "timestamp": START + timedelta(minutes=m), "battery_level": 80.0 - m * 0.5,
+            "doors_locked": False, "odometer_km": 100.0 * vehicle_id + m, "latitude": None, "longitude": None,
+        }
+        for m in range(STATUSES)
+        for vehicle_id in vehicle_ids
+    ])
+    return vehicle_ids
+
+
+def _rows(engine, vehicle_id):
+    with engine.connect() as conn:
+        return conn.execute(
+            select(shard_status_table.c.id, shard_status_table.c.timestamp)
+            .where(shard_status_table.c.vehicle_id == vehicle_id)
+            .order_by(shard_status_table.c.id)
+        ).all()
+
+
+def _timestamp_of(shards, vehicle_id, status_id):
+    with shards.engine_for(vehicle_id).connect() as conn:
+        return conn.execute(
+            select(shard_status_table.c.timestamp).where(shard_status_table.c.id == status_id)
+        ).scalar_one()
+
+
+def test_ring_is_stable_and_a_new_shard_takes_a_fair_share():
+    three = HashRing(["shard0", "shard1", "shard2"], vnodes=64)
+    four = HashRing(["shard0", "shard1", "shard2", "shard3"], vnodes=64)
+    vehicle_ids = range(1, 2001)
+    before = [three.lookup(vid) for vid in vehicle_ids]
+    assert before == [HashRing(["shard0", "shard1", "shard2"], vnodes=64).lookup(vid) for vid in vehicle_ids]
+    assert all(before.count(index) > 400 for index in range(3))
+
+    # Ajout d'un shard : seuls les véhicules qui partent vers lui changent de place
+    after = [four.lookup(vid) for vid in vehicle_ids]
+    moved = [(a, b) for a, b in zip(before, after) if a != b]
+    assert all(b == 3 for _, b in moved)
+    assert 0.15 < len(moved) / len(before) < 0.35
+
+
+def test_statuses_are_written_to_their_shard_in_its_id_range(db, fleet, shard_engines):
+    shards = session_module.status_shards
+    assert {shards.shard_for(vid) for vid in fleet} == {0, 1}
+    for vehicle_id in fleet:
+        index = shards.shard_for(vehicle_id)
+        low, high = shards.id_range(index)
+        rows = _rows(shard_engines[index], vehicle_id)
+        assert len(rows) == STATUSES
+        assert all(low < row.id < high for row in rows)
+        assert _rows(shard_engines[1 - index], vehicle_id) == []
+        # Rien sur la base principale
+        assert db.scalar(select(func.count()).select_from(shard_status_table).where(
+            shard_status_table.c.vehicle_id == vehicle_id
+        )) == 0
+
+    # create_all idempotent : le compteur d'un shard ne recule pas
+    top = max(row.id for vid in fleet if shards.shard_for(vid) == 1 for row in _rows(shard_engines[1], vid))
+    shards.create_all()
+    vehicle_id = next(vid for vid in fleet if shards.shard_for(vid) == 1)
+    status = vehicle_service.create_statuses(db, [{
+        "vehicle_id": vehicle_id, "timestamp": START + timedelta(hours=1), "battery_level": 50.0,
+        "doors_locked": True, "odometer_km": 1.0, "latitude": None, "longitude": None,
+    }])[0]
+    assert status.id == top + 1
+
+
+def test_reads_fan_out_over_all_shards(db, fleet):
+    shards = session_module.status_shards
+    latest = {row.vehicle_id: row for row in vehicle_service.list_latest_statuses(db)}
+    assert sorted(latest) == sorted(fleet)
+    assert {row.timestamp for row in latest.values()} == {START + timedelta(minutes=STATUSES - 1)}
+
+    # Une session par shard, nommée d'après lui
+    names = fan_out_statuses(db, status_database_name)
+    assert names == ["shard0", "shard1"]
+    counts = fan_out_statuses(db, lambda status_db: status_db.scalar(select(func.count()).select_from(shard_status_table)))
+    assert sum(counts) == len(fleet) * STATUSES
+
+    # Lecture ciblée : la session du shard du véhicule, réutilisée dans `db`
+    for vehicle_id in fleet:
+        status_db = status_session(db, vehicle_id)
+        assert status_database_name(status_db) == shards.names[shards.shard_for(vehicle_id)]
+        assert vehicle_service.get_latest_status(db, vehicle_id).id == latest[vehicle_id].id
+    assert len(db.info["shard_sessions"]) == 2
+
+
+def _references(db, shards, vehicle_id):
+    """
+    Statuts référencés par la base principale, désignés par leur timestamp.
+    """
+    db.expire_all()
+    analytics = db.get(VehicleAnalytics, vehicle_id)
+    detector = db.get(SegmentDetectorState, vehicle_id)
+    trip = db.scalars(select(Trip).where(Trip.vehicle_id == vehicle_id)).one()
+    refs = [analytics.checkpoint_status_id, detector.checkpoint_status_id, trip.start_status_id, trip.end_status_id]
+    db.rollback()
+    return [_timestamp_of(shards, vehicle_id, ref) for ref in refs]
+
+
+def _grow(monkeypatch, shard_engines):
+    shards = _shard_set(shard_engines)
+    _use(monkeypatch, shards)
+    return shards
+
+
+@pytest.mark.parametrize("crash", [None, "_copy_vehicle", "_remap_references"])
+def test_rebalance_moves_vehicles_to_a_new_shard(db, fleet, shard_engines, monkeypatch, tmp_path, crash):
+    before = session_module.status_shards
+    for vehicle_id in fleet:
+        analytics_service.refresh_vehicle_analytics(db, vehicle_id)
+        segment_service.refresh_vehicle_segments(db, vehicle_id)
+    expected = {vid: _references(db, before, vid) for vid in fleet}
+    history = {vid: [row.timestamp for row in _rows(before.engine_for(vid), vid)] for vid in fleet}
+    db.close()
+
+    after = _grow(monkeypatch, shard_engines)
+    moving = [vid for vid in fleet if after.shard_for(vid) != before.shard_for(vid)]
+    assert moving and all(after.shard_for(vid) == 2 for vid in moving)
+    journal = str(tmp_path / "rebalance.json")
+
+    if crash is not None:
+        # Arrêt brutal après l'étape, une fois : la commande suivante reprend
+        real = getattr(shard_admin, crash)
+
+        def fail_once(*args, **kwargs):
+            real(*args, **kwargs)
+            monkeypatch.setattr(shard_admin, crash, real)
+            raise RuntimeError("interrupted")
+
+        monkeypatch.setattr(shard_admin, crash, fail_once)
+        with pytest.raises(RuntimeError):
+            shard_admin.main(["rebalance", "--journal", journal, "--chunk-size", "7"])
+        assert len(shard_admin.Journal(journal).moves) == 1
+
+    shard_admin.main(["rebalance", "--journal", journal, "--chunk-size", "7"])
+    assert shard_admin.Journal(journal).moves == {}
+
+    for vehicle_id in fleet:
+        index = after.shard_for(vehicle_id)
+        low, high = after.id_range(index)
+        rows = _rows(shard_engines[index], vehicle_id)
+        # Historique complet, une seule fois, dans la plage du shard cible
+        assert [row.timestamp for row in rows] == history[vehicle_id]
+        assert all(low < row.id < high for row in rows)
+        for other in set(range(3)) - {index}:
+            assert _rows(shard_engines[other], vehicle_id) == []
+        # Les références désignent toujours les mêmes statuts
+        assert _references(db, after, vehicle_id) == expected[vehicle_id]
+
+    # Plus rien à déplacer
+    shard_admin.main(["rebalance", "--journal", journal])
+    assert shard_admin._vehicle_ids(shard_engines[2]) == sorted(moving)
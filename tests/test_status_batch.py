@@ -0,0 +1,85 @@
+# tests/test_status_batch.py
+"""
+Lot d'ingestion binaire : aller-retour encodeur / décodeur, validation
+des enregistrements et insertion par l'API.
+"""
+import math
+import struct
+from datetime import timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.services import telemetry_formats
+from app.services.latest_status_table import LatestStatus
+from app.services.telemetry_formats import MEDIA_BINARY_BATCH, decode_status_batch, encode_status_batch
+
+from conftest import SEED_START
+
+API = "/api/v1"
+
+
+def _status(k, **overrides):
+    values = dict(
+        id=0, vehicle_id=26, timestamp=SEED_START + timedelta(days=2, seconds=k),
+        battery_level=50.0 + k, doors_locked=k % 2 == 0, odometer_km=None, latitude=None, longitude=None,
+    )
+    values.update(overrides)
+    return LatestStatus(**values)
+
+
+def test_round_trip():
+    rows = [_status(0), _status(1, latitude=48.5, longitude=-2.25, odometer_km=12.5)]
+    vehicle_id, decoded = decode_status_batch(encode_status_batch(26, rows))
+    assert vehicle_id == 26
+    assert decoded == [
+        {field: getattr(row, field) for field in decoded[0]}
+        for row in rows
+    ]
+
+
+@pytest.mark.parametrize("row", [
+    _status(0, latitude=48.5),
+    _status(0, latitude=91.0, longitude=0.0),
+    _status(0, battery_level=math.inf),
+    _status(0, timestamp=SEED_START + timedelta(days=365 * 100)),
+])
+def test_invalid_records_are_rejected(row):
+    with pytest.raises(ValueError, match="record 0"):
+        decode_status_batch(encode_status_batch(26, [row]))
+
+
+def test_header_is_checked():
+    payload = encode_status_batch(26, [_status(0), _status(1)])
+    with pytest.raises(ValueError, match="length"):
+        decode_status_batch(payload[:-1])
+    with pytest.raises(ValueError, match="Unsupported"):
+        decode_status_batch(b"BLTC" + payload[4:])
+    assert len(payload) == telemetry_formats.status_batch_length(2)
+    assert struct.unpack_from("<H", payload, 6)[0] == 41
+
+
+def test_batch_is_inserted_in_order(client):
+    rows = [_status(k) for k in (3, 1, 2)]
+    response = client.post(
+        f"{API}/statuses:binary",
+        content=encode_status_batch(26, rows),
+        headers={"content-type": MEDIA_BINARY_BATCH},
+    )
+    assert response.status_code == 201, response.text
+    result = response.json()
+    assert result["inserted"] == 3
+
+    latest = client.get(f"{API}/vehicles/26/status/latest").json()
+    assert latest["timestamp"] == rows[0].timestamp.isoformat()
+    assert latest["id"] == result["first_id"]
+
+
+def test_oversized_batch_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(settings, "STATUS_INGEST_MAX_RECORDS", 1)
+    response = client.post(
+        f"{API}/statuses:binary",
+        content=encode_status_batch(26, [_status(0), _status(1)]),
+        headers={"content-type": MEDIA_BINARY_BATCH},
+    )
+    assert response.status_code == 413
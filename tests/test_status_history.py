@@ -0,0 +1,84 @@
+# tests/test_status_history.py
+"""
+Historique des statuts (`GET /vehicles/{id}/statuses`) : `since` inclus,
+`until` exclu, tri `asc` / `desc` et plafond STATUS_HISTORY_MAX_ROWS,
+depuis la DB comme depuis le stockage chaud.
+"""
+from datetime import timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.services import vehicles as vehicle_service
+from app.services.hot_store import HotStore
+from conftest import SEED_START, SEED_STATUSES_PER_VEHICLE
+
+API = "/api/v1"
+VEHICLE_ID = 2
+
+
+@pytest.fixture(params=["db", "hot_store"])
+def source(request, db, monkeypatch):
+    """
+    Sert l'historique depuis la DB, ou depuis un stockage chaud préchauffé
+    qui couvre tout l'historique du véhicule.
+    """
+    store = None
+    if request.param == "hot_store":
+        store = HotStore(capacity=2 * SEED_STATUSES_PER_VEHICLE, memory_bytes=64 << 20)
+        store.warm(db)
+    monkeypatch.setattr(vehicle_service, "hot_store", store)
+    return store
+
+
+def _minute(k):
+    return SEED_START + timedelta(minutes=k)
+
+
+def _timestamps(client, **params):
+    response = client.get(f"{API}/vehicles/{VEHICLE_ID}/statuses", params=params)
+    assert response.status_code == 200, response.text
+    return [item["timestamp"] for item in response.json()]
+
+
+def _iso(k):
+    return _minute(k).isoformat()
+
+
+def test_since_is_inclusive_and_until_exclusive(client, source):
+    assert _timestamps(client, since=_iso(10), until=_iso(20), order="asc") == [_iso(k) for k in range(10, 20)]
+    # Bornes avec fuseau : ramenées en UTC
+    local = (_minute(10) + timedelta(hours=2)).isoformat() + "+02:00"
+    assert _timestamps(client, since=local, until=_iso(12), order="asc") == [_iso(10), _iso(11)]
+    # Plage vide, puis bornes à une microseconde des statuts
+    assert _timestamps(client, since=_iso(10), until=_iso(10)) == []
+    step = timedelta(microseconds=1)
+    assert _timestamps(
+        client, since=(_minute(10) + step).isoformat(), until=(_minute(12) + step).isoformat(), order="asc"
+    ) == [_iso(11), _iso(12)]
+    if source is not None:
+        assert source.hits >= 4 and source.misses == 0
+
+
+def test_order(client, source):
+    ascending = _timestamps(client, since=_iso(50), until=_iso(60), order="asc")
+    assert ascending == sorted(ascending) and len(ascending) == 10
+    assert _timestamps(client, since=_iso(50), until=_iso(60), order="desc") == ascending[::-1]
+    # Par défaut : du plus récent au plus ancien
+    assert _timestamps(client, since=_iso(50), until=_iso(60)) == ascending[::-1]
+    # La limite garde le début de l'ordre demandé
+    assert _timestamps(client, since=_iso(50), until=_iso(60), order="asc", limit=3) == ascending[:3]
+    assert _timestamps(client, since=_iso(50), until=_iso(60), order="desc", limit=3) == ascending[::-1][:3]
+    assert client.get(f"{API}/vehicles/{VEHICLE_ID}/statuses", params={"order": "random"}).status_code == 422
+
+
+def test_rows_are_capped_by_status_history_max_rows(client, source, monkeypatch):
+    monkeypatch.setattr(settings, "STATUS_HISTORY_MAX_ROWS", 25)
+    latest = SEED_STATUSES_PER_VEHICLE - 1
+    # Sans limite, ou au-delà du plafond : plafonné, les plus récents d'abord
+    assert _timestamps(client) == [_iso(k) for k in range(latest, latest - 25, -1)]
+    assert _timestamps(client, limit=1000) == [_iso(k) for k in range(latest, latest - 25, -1)]
+    assert _timestamps(client, limit=1000, order="asc") == [_iso(k) for k in range(25)]
+    # En dessous du plafond : la limite demandée
+    assert len(_timestamps(client, limit=10)) == 10
+    assert client.get(f"{API}/vehicles/{VEHICLE_ID}/statuses", params={"limit": 0}).status_code == 422
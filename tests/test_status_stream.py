@@ -0,0 +1,79 @@
+# tests/test_status_stream.py
+"""
+Canal WebSocket d'ingestion : authentification, lots acquittés par
+numéro de séquence, rejets par trame et contre-pression.
+"""
+import json
+from datetime import timedelta
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.core.config import settings
+from app.services.latest_status_table import LatestStatus
+from app.services.telemetry_formats import encode_status_batch
+
+from conftest import SEED_START
+
+URL = "/api/v1/statuses:stream"
+
+
+def _receive_until_ack(ws, seq):
+    messages = []
+    while True:
+        message = ws.receive_json()
+        messages.append(message)
+        if message["type"] == "ack" and message["seq"] >= seq:
+            return messages
+
+
+def _history_length(client, vehicle_id):
+    return len(client.get(f"/api/v1/vehicles/{vehicle_id}/statuses", params={"limit": 1000}).json())
+
+
+def test_frames_are_batched_and_acknowledged(client, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_STREAM_TOKENS", "secret")
+    before = _history_length(client, 27)
+    batch = encode_status_batch(27, [
+        LatestStatus(0, 27, SEED_START + timedelta(days=3, minutes=k), 40.0, True, None) for k in range(3)
+    ])
+    with client.websocket_connect(URL) as ws:
+        ws.send_json({"type": "hello", "token": "secret"})
+        assert ws.receive_json()["type"] == "ready"
+        ws.send_json({"vehicle_id": 27, "battery_level": 41.0})
+        ws.send_bytes(batch)
+        ws.send_json({"vehicle_id": 27, "latitude": 95.0, "longitude": 2.0})
+        ws.send_json({"vehicle_id": 10 ** 6, "battery_level": 1.0})
+        ws.send_json({"vehicle_id": 27, "battery_level": 42.0, "timestamp": "2026-01-05T00:00:00+02:00"})
+        messages = _receive_until_ack(ws, 5)
+
+    errors = {m["seq"]: m["detail"] for m in messages if m["type"] == "error"}
+    assert sorted(errors) == [3, 4]
+    assert "Vehicle not found" in errors[4]
+    assert _history_length(client, 27) == before + 5
+
+
+def test_invalid_token_is_refused(client, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_STREAM_TOKENS", "secret")
+    with client.websocket_connect(URL) as ws:
+        ws.send_json({"type": "hello", "token": "wrong"})
+        with pytest.raises(WebSocketDisconnect) as exc:
+            ws.receive_json()
+    assert exc.value.code == 1008
+
+
+def test_back_pressure_keeps_every_frame(client, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_STREAM_BATCH_SIZE", 3)
+    monkeypatch.setattr(settings, "INGEST_STREAM_MAX_PENDING", 4)
+    monkeypatch.setattr(settings, "INGEST_STREAM_FLUSH_MS", 1)
+    before = _history_length(client, 28)
+    with client.websocket_connect(URL) as ws:
+        ws.send_text(json.dumps({"type": "hello"}))
+        ws.receive_json()
+        for k in range(20):
+            ws.send_json({"vehicle_id": 28, "battery_level": float(k)})
+        messages = _receive_until_ack(ws, 20)
+
+    acks = [m["seq"] for m in messages if m["type"] == "ack"]
+    assert acks == sorted(acks) and len(acks) > 1
+    assert _history_length(client, 28) == before + 20
@@ -0,0 +1,82 @@
+# tests/test_vehicle_bulk.py
+"""
+Enregistrement de véhicules en lot (POST /vehicles:bulk) : créations,
+mises à jour par VIN, conflits par élément, journal des changements et
+caches ; unicité sur POST /vehicles.
+"""
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.models.vehicle_change import VehicleChange
+from app.services.fleet_summary import fleet_counters
+
+API = "/api/v1"
+
+
+def _vehicle(n, name="bulk"):
+    return {"external_id": f"bulk-ext-{n}", "name": name, "vin": f"BULKVIN{n:04d}"}
+
+
+def _ops(db, vehicle_ids):
+    rows = db.execute(
+        select(VehicleChange.vehicle_id, VehicleChange.op)
+        .where(VehicleChange.vehicle_id.in_(vehicle_ids))
+        .order_by(VehicleChange.id)
+    ).all()
+    return [tuple(row) for row in rows]
+
+
+def test_bulk_upsert(db, client):
+    fleet_counters.reconcile(db)
+    vehicles_before = fleet_counters.summary(db).vehicles
+
+    response = client.post(f"{API}/vehicles:bulk", json=[_vehicle(n) for n in range(1200)])
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["created"], body["updated"], body["conflicts"]) == (1200, 0, 0)
+    ids = [item["id"] for item in body["items"]]
+    assert [item["index"] for item in body["items"]] == list(range(1200))
+    assert fleet_counters.summary(db).vehicles == vehicles_before + 1200
+
+    # Lecture mise en cache, puis renommage par le lot suivant
+    assert client.get(f"{API}/vehicles/by-vin/BULKVIN0001").json()["name"] == "bulk"
+    response = client.post(f"{API}/vehicles:bulk", json=[
+        _vehicle(0),  # inchangé
+        _vehicle(1, name="renamed"),
+        _vehicle(5000),
+        _vehicle(5000),  # VIN en double dans le lot
+        {**_vehicle(5001), "external_id": "bulk-ext-5000"},  # external_id en double dans le lot
+        {**_vehicle(5002), "external_id": "bulk-ext-2"},  # external_id d'un autre véhicule
+    ])
+    body = response.json()
+    assert (body["created"], body["updated"], body["conflicts"]) == (1, 2, 3)
+    assert [(item["result"], item["id"]) for item in body["items"][:3]] == [
+        ("updated", ids[0]), ("updated", ids[1]), ("created", body["items"][2]["id"]),
+    ]
+    assert [item["detail"] for item in body["items"][3:]] == [
+        "duplicate vin in request",
+        "duplicate external_id in request",
+        "external_id already registered to another vehicle",
+    ]
+    assert all(item["id"] is None for item in body["items"][3:])
+    assert client.get(f"{API}/vehicles/by-vin/BULKVIN0001").json()["name"] == "renamed"
+    assert client.get(f"{API}/vehicles/by-vin/BULKVIN5001").status_code == 404
+
+    # Journal : créations, puis seulement le véhicule réellement modifié
+    new_id = body["items"][2]["id"]
+    assert _ops(db, [ids[0], ids[1], new_id]) == [(ids[0], "created"), (ids[1], "created"), (ids[1], "updated"), (new_id, "created")]
+
+
+def test_bulk_limits(client, monkeypatch):
+    assert client.post(f"{API}/vehicles:bulk", json=[]).json() == {"created": 0, "updated": 0, "conflicts": 0, "items": []}
+    assert client.post(f"{API}/vehicles:bulk", json=[{"vin": "NONAME"}]).status_code == 422
+    monkeypatch.setattr(settings, "VEHICLE_BULK_MAX_ITEMS", 2)
+    assert client.post(f"{API}/vehicles:bulk", json=[_vehicle(n) for n in range(3)]).status_code == 413
+
+
+def test_create_vehicle_conflict(client):
+    vehicle = {"external_id": "unique-ext", "name": "unique", "vin": "UNIQUEVIN"}
+    assert client.post(f"{API}/vehicles", json=vehicle).status_code == 201
+    assert client.post(f"{API}/vehicles", json=vehicle).status_code == 409
+    assert client.post(f"{API}/vehicles", json={**vehicle, "vin": "OTHERVIN"}).status_code == 409
+    assert client.post(f"{API}/vehicles", json={**vehicle, "external_id": "other-ext", "vin": "OTHERVIN"}).status_code == 201
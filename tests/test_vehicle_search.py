@@ -0,0 +1,74 @@
+# tests/test_vehicle_search.py
+"""
+Recherche de véhicules par préfixe (`GET /vehicles?q=`) : pagination par
+(nom, id) puis (VIN, id), sans doublon ni trou d'une page à l'autre,
+préfixes en bout de plage Unicode.
+"""
+from datetime import datetime
+
+from app.schemas.vehicle import VehicleCreate
+from app.services import vehicles as vehicle_service
+
+API = "/api/v1"
+
+
+def _create(db, name, vin):
+    stamp = datetime.utcnow().timestamp()
+    return vehicle_service.create_vehicle(db, VehicleCreate(external_id=f"{vin}-{stamp}", name=name, vin=vin)).id
+
+
+def _pages(client, q, limit, fields=None):
+    pages, after = [], None
+    while True:
+        params = {"q": q, "limit": limit}
+        if after is not None:
+            params["after"] = after
+        if fields is not None:
+            params["fields"] = fields
+        response = client.get(f"{API}/vehicles", params=params)
+        assert response.status_code == 200, response.text
+        pages.append(response.json())
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            return pages
+
+
+def test_search_pages_by_name_then_vin(client, db):
+    prefix = f"srch{int(datetime.utcnow().timestamp() * 1e6)}"
+    ids = {
+        "b": _create(db, f"{prefix}-b", f"{prefix}-VIN-B"),  # nom et VIN : servi une fois
+        "a2": _create(db, f"{prefix}-a", f"OTHER-{prefix}-2"),  # même nom : départagés par id
+        "a1": _create(db, f"{prefix}-a", f"OTHER-{prefix}-1"),
+        "vin_z": _create(db, f"zz-{prefix}", f"{prefix}-VIN-Z"),  # VIN seul
+        "vin_c": _create(db, f"cc-{prefix}", f"{prefix}-VIN-C"),
+    }
+    _create(db, f"x{prefix}", f"x{prefix}")  # ni l'un ni l'autre
+
+    expected = [ids["a2"], ids["a1"], ids["b"], ids["vin_c"], ids["vin_z"]]
+    for limit in (1, 2, 3, 5):
+        pages = _pages(client, prefix, limit)
+        assert [item["id"] for page in pages for item in page] == expected
+        assert all(len(page) == limit for page in pages[:-1])
+
+    # Projection : les colonnes du curseur ne sont pas renvoyées
+    pages = _pages(client, prefix, 2, fields="external_id")
+    assert all(list(item) == ["external_id"] for page in pages for item in page)
+    assert sum(len(page) for page in pages) == len(expected)
+
+
+def test_invalid_search_cursor(client):
+    assert client.get(f"{API}/vehicles", params={"q": "car", "after": "7"}).status_code == 400
+    assert client.get(f"{API}/vehicles", params={"after": "not-an-id"}).status_code == 400
+
+
+def test_prefix_ending_with_the_last_code_point(db):
+    top = chr(0x10FFFF)
+    stamp = int(datetime.utcnow().timestamp() * 1e6)
+    inside = _create(db, f"u{stamp}{top}{top}z", f"u{stamp}-1")
+    after = _create(db, f"u{stamp}{chr(0xE000)}", f"u{stamp}-2")
+    assert [v.id for v in vehicle_service.list_vehicles(db, q=f"u{stamp}{top}")] == [inside]
+    assert [v.id for v in vehicle_service.list_vehicles(db, q=top * 2)] == []
+    # Le caractère suivant U+D7FF n'est pas un substitut
+    before = _create(db, f"w{stamp}{chr(0xD7FF)}", f"w{stamp}-1")
+    assert [v.id for v in vehicle_service.list_vehicles(db, q=f"w{stamp}{chr(0xD7FF)}")] == [before]
+    assert after not in [v.id for v in vehicle_service.list_vehicles(db, q=f"u{stamp}{top}")]
@@ -0,0 +1,270 @@
+# tests/test_webhooks.py
+"""
+Webhooks : outbox écrite avec les statuts, lots signés livrés à un
+destinataire HTTP local, nouveaux essais, lettres mortes, concurrence
+par destinataire, destinataires servis indépendamment, bilan réservé au
+détenteur du bail. Véhicules réservés : 35-37.
+"""
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from sqlalchemy import func, select, update
+
+from app.core.config import settings
+from app.db.models.webhook import OutboxEvent, WebhookDelivery
+from app.schemas.vehicle import VehicleStatusCreate
+from app.services import vehicles as vehicle_service
+from app.services import webhooks as webhook_service
+
+API = "/api/v1"
+SECRET = "s3cret-for-tests-0123"
+
+
+class Receiver:
+    """
+    Destinataire HTTP local : enregistre les requêtes, répond avec les
+    codes de `statuses` (200 une fois la liste épuisée).
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.requests = []
+        self.statuses = []
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                with receiver._lock:
+                    receiver.in_flight += 1
+                    receiver.max_in_flight = max(receiver.max_in_flight, receiver.in_flight)
+                    receiver.requests.append((dict(self.headers), body))
+                    code = receiver.statuses.pop(0) if receiver.statuses else 200
+                time.sleep(receiver.delay)
+                with receiver._lock:
+                    receiver.in_flight -= 1
+                self.send_response(code)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def events(self):
+        return [event for _, body in self.requests for event in json.loads(body)["events"]]
+
+
+@pytest.fixture
+def receiver():
+    receiver = Receiver()
+    yield receiver
+    receiver.server.shutdown()
+
+
+@pytest.fixture
+def webhooks_on(monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOKS_ENABLED", True)
+
+
+def _dispatch(dispatcher=None):
+    dispatcher = dispatcher or webhook_service.WebhookDispatcher(poll_seconds=0)
+
+    async def run():
+        async with dispatcher.client() as client:
+            return await dispatcher.run_once(client)
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def register(client):
+    """
+    Enregistre des destinataires, supprimés en fin de test.
+    """
+    endpoint_ids = []
+
+    def register(url, vehicle_id, **extra):
+        response = client.post(f"{API}/webhooks", json={"url": url, "secret": SECRET, "vehicle_id": vehicle_id, **extra})
+        assert response.status_code == 201, response.text
+        assert "secret" not in response.json()
+        endpoint_ids.append(response.json()["id"])
+        return endpoint_ids[-1]
+
+    yield register
+    for endpoint_id in endpoint_ids:
+        client.delete(f"{API}/webhooks/{endpoint_id}")
+
+
+def _row(vehicle_id, timestamp, battery_level):
+    return {
+        "vehicle_id": vehicle_id,
+        "timestamp": timestamp,
+        "battery_level": battery_level,
+        "doors_locked": True,
+        "odometer_km": 100.0,
+        "latitude": None,
+        "longitude": None,
+    }
+
+
+def test_statuses_are_delivered_in_signed_batches(db, client, receiver, register, webhooks_on):
+    endpoint_id = register(receiver.url, 35)
+    _dispatch()  # événements antérieurs (autres véhicules) écartés
+
+    first = vehicle_service.create_status(db, 35, VehicleStatusCreate(battery_level=70.0))
+    start = datetime(2026, 4, 1)
+    batch = vehicle_service.create_statuses(db, [_row(35, start + timedelta(minutes=k), 60.0 + k) for k in range(3)])
+    vehicle_service.create_status(db, 36, VehicleStatusCreate(battery_level=10.0))
+    # Outbox écrite avec les statuts, rien n'est encore envoyé
+    assert db.scalar(select(func.count()).select_from(OutboxEvent).where(OutboxEvent.dispatched_at.is_(None))) == 5
+    assert receiver.requests == []
+
+    assert _dispatch() == 1
+    [(headers, body)] = receiver.requests
+    assert webhook_service.verify_signature(
+        SECRET, headers[webhook_service.TIMESTAMP_HEADER], body, headers[webhook_service.SIGNATURE_HEADER]
+    )
+    assert not webhook_service.verify_signature(
+        "wrong-secret-0123456", headers[webhook_service.TIMESTAMP_HEADER], body, headers[webhook_service.SIGNATURE_HEADER]
+    )
+    events = receiver.events()
+    assert {event["data"]["id"] for event in events} == {first.id, *(s.id for s in batch)}
+    assert {event["type"] for event in events} == {webhook_service.EVENT_STATUS_CREATED}
+
+    # Livré : plus de livraison ni d'événement en attente
+    assert db.scalar(select(func.count()).select_from(WebhookDelivery).where(WebhookDelivery.endpoint_id == endpoint_id)) == 0
+    assert db.scalar(select(func.count()).select_from(OutboxEvent)) == 0
+    assert _dispatch() == 0
+
+
+def test_failures_are_retried_then_dead_lettered(db, client, receiver, register, webhooks_on, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_RETRY_BASE_SECONDS", 0.0)
+    monkeypatch.setattr(settings, "WEBHOOK_MAX_ATTEMPTS", 2)
+    endpoint_id = register(receiver.url, 36)
+    _dispatch()
+
+    status = vehicle_service.create_status(db, 36, VehicleStatusCreate(battery_level=55.0))
+    receiver.statuses = [503, 500]
+    assert _dispatch() == 1
+    [pending] = client.get(f"{API}/webhooks/{endpoint_id}/deliveries", params={"state": "pending"}).json()
+    assert (pending["attempts"], pending["last_error"]) == (1, "HTTP 503")
+
+    assert _dispatch() == 1
+    [dead] = client.get(f"{API}/webhooks/{endpoint_id}/deliveries").json()
+    assert (dead["state"], dead["attempts"], dead["last_error"]) == ("dead", 2, "HTTP 500")
+    assert _dispatch() == 0
+
+    response = client.post(f"{API}/webhooks/{endpoint_id}/deliveries:retry")
+    assert response.json() == {"endpoint_id": endpoint_id, "requeued": 1}
+    assert _dispatch() == 1
+    assert [event["data"]["id"] for event in receiver.events()] == [status.id] * 3
+    assert client.get(f"{API}/webhooks/{endpoint_id}/deliveries").json() == []
+
+
+def test_per_endpoint_concurrency_limit(db, client, receiver, register, webhooks_on, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_BATCH_SIZE", 1)
+    receiver.delay = 0.05
+    endpoint_id = register(receiver.url, 37, max_concurrency=1)
+    _dispatch()
+    vehicle_service.create_statuses(db, [_row(37, datetime(2026, 4, 2, 0, k), 50.0) for k in range(4)])
+    assert _dispatch() == 4
+    assert receiver.max_in_flight == 1
+    assert len(receiver.events()) == 4
+
+    assert client.delete(f"{API}/webhooks/{endpoint_id}").status_code == 204
+    assert client.get(f"{API}/webhooks/{endpoint_id}").status_code == 404
+
+
+def test_unreachable_endpoint_is_retried_later(db, client, webhooks_on):
+    endpoint_id = client.post(f"{API}/webhooks", json={
+        "url": "http://127.0.0.1:9/unreachable", "secret": SECRET, "vehicle_id": 35,
+    }).json()["id"]
+    _dispatch()
+    vehicle_service.create_status(db, 35, VehicleStatusCreate(battery_level=42.0))
+    assert _dispatch() == 1
+    [pending] = client.get(f"{API}/webhooks/{endpoint_id}/deliveries", params={"state": "pending"}).json()
+    assert pending["attempts"] == 1 and pending["last_error"].startswith("ConnectError")
+    assert datetime.fromisoformat(pending["next_attempt_at"]) > datetime.utcnow()
+    assert _dispatch() == 0
+
+    # La suppression du destinataire emporte ses livraisons et les événements orphelins
+    assert client.delete(f"{API}/webhooks/{endpoint_id}").status_code == 204
+    assert db.scalar(select(func.count()).select_from(OutboxEvent)) == 0
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_slow_endpoint_does_not_delay_the_others(db, register, webhooks_on):
+    slow, fast = Receiver(delay=2.0), Receiver()
+    register(slow.url, 35)
+    register(fast.url, 36)
+    _dispatch()
+    dispatcher = webhook_service.WebhookDispatcher(poll_seconds=0.02)
+    dispatcher.start()
+    try:
+        vehicle_service.create_status(db, 35, VehicleStatusCreate(battery_level=30.0))
+        vehicle_service.create_status(db, 36, VehicleStatusCreate(battery_level=31.0))
+        assert _wait_for(lambda: len(fast.events()) == 1 and slow.in_flight == 1)
+
+        # Le lot lent est toujours en vol : le destinataire rapide est servi quand même
+        started = time.monotonic()
+        later = vehicle_service.create_status(db, 36, VehicleStatusCreate(battery_level=32.0))
+        assert _wait_for(lambda: len(fast.events()) == 2)
+        assert time.monotonic() - started < 1.5
+        assert slow.in_flight == 1
+        assert fast.events()[-1]["data"]["id"] == later.id
+    finally:
+        dispatcher.stop()
+        slow.server.shutdown()
+        fast.server.shutdown()
+
+
+def test_results_are_recorded_only_by_the_lease_holder(db, receiver, register, webhooks_on, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_BATCH_SIZE", 1)
+    monkeypatch.setattr(settings, "WEBHOOK_LEASE_SECONDS", 20.0)
+    monkeypatch.setattr(settings, "WEBHOOK_TIMEOUT_SECONDS", 10.0)
+    endpoint_id = register(receiver.url, 37, max_concurrency=1)
+    _dispatch()
+    vehicle_service.create_statuses(db, [_row(37, datetime(2026, 4, 3, 0, k), 50.0) for k in range(3)])
+    webhook_service.fan_out_events(db)
+
+    # Au plus ce qui peut partir pendant le bail : 1 lot en vol x 2 délais
+    first = webhook_service.claim_batches(db, endpoint_id)
+    assert len(first) == 2
+    [rest] = webhook_service.claim_batches(db, endpoint_id)
+    assert webhook_service.claim_batches(db, endpoint_id) == []
+
+    # Bail expiré (processus trop lent) : un autre processus réclame à nouveau
+    db.execute(update(WebhookDelivery).where(WebhookDelivery.endpoint_id == endpoint_id).values(next_attempt_at=datetime.utcnow()))
+    db.commit()
+    second = webhook_service.claim_batches(db, endpoint_id)
+    assert [b.deliveries for b in second] == [b.deliveries for b in first]
+    assert second[0].lease_token != first[0].lease_token
+
+    # Bilan du premier processus ignoré, réussite comme échec
+    webhook_service.record_results(db, [(first[0], None), (first[1], "HTTP 500")])
+    rows = db.scalars(select(WebhookDelivery).where(WebhookDelivery.endpoint_id == endpoint_id).order_by(WebhookDelivery.id)).all()
+    assert [(row.attempts, row.last_error) for row in rows] == [(0, None)] * 3
+
+    # Bail expiré mais pas réclamé ailleurs : le bilan compte encore
+    webhook_service.record_results(db, [(batch, None) for batch in second + [rest]])
+    db.expire_all()
+    assert db.scalar(select(func.count()).select_from(WebhookDelivery).where(WebhookDelivery.endpoint_id == endpoint_id)) == 0
+